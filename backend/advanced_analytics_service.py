@@ -8,6 +8,8 @@ from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Any
 import logging
 
+from core.dates import dt_expr, range_q
+
 logger = logging.getLogger(__name__)
 
 class AdvancedAnalyticsService:
@@ -24,7 +26,7 @@ class AdvancedAnalyticsService:
             # Get page views
             page_views = await self.db.analytics_events.count_documents({
                 "event_type": "page_view",
-                "created_at": {"$gte": start_date.isoformat()}
+                **range_q("created_at", gte=start_date)
             })
             
             # Get unique visitors
@@ -32,7 +34,7 @@ class AdvancedAnalyticsService:
                 {
                     "$match": {
                         "event_type": "page_view",
-                        "created_at": {"$gte": start_date.isoformat()}
+                        **range_q("created_at", gte=start_date)
                     }
                 },
                 {
@@ -51,7 +53,7 @@ class AdvancedAnalyticsService:
                 {
                     "$match": {
                         "event_type": "session_end",
-                        "created_at": {"$gte": start_date.isoformat()}
+                        **range_q("created_at", gte=start_date)
                     }
                 },
                 {
@@ -77,7 +79,7 @@ class AdvancedAnalyticsService:
                 {
                     "$match": {
                         "event_type": "session_end",
-                        "created_at": {"$gte": start_date.isoformat()}
+                        **range_q("created_at", gte=start_date)
                     }
                 },
                 {
@@ -282,83 +284,11 @@ class AdvancedAnalyticsService:
     async def get_product_performance(self, days: int = 30) -> List[Dict[str, Any]]:
         """
         Get product performance metrics: views, carts, purchases
+        Set-based passes + cached top-50 table (see ProductPerformanceEngine)
         """
         try:
-            start_date = datetime.now(timezone.utc) - timedelta(days=days)
-            
-            # Get all products
-            products = await self.db.products.find({}, {"_id": 0}).to_list(1000)
-            
-            result = []
-            for product in products:
-                product_id = product["id"]
-                
-                # Count in carts
-                in_cart_count = 0
-                carts = await self.db.carts.find(
-                    {"items.product_id": product_id},
-                    {"_id": 0}
-                ).to_list(1000)
-                for cart in carts:
-                    for item in cart.get("items", []):
-                        if item.get("product_id") == product_id:
-                            in_cart_count += item.get("quantity", 0)
-                
-                # Count purchases
-                pipeline = [
-                    {
-                        "$match": {
-                            "created_at": {"$gte": start_date.isoformat()},
-                            "items.product_id": product_id
-                        }
-                    },
-                    {"$unwind": "$items"},
-                    {
-                        "$match": {"items.product_id": product_id}
-                    },
-                    {
-                        "$group": {
-                            "_id": None,
-                            "total_sold": {"$sum": "$items.quantity"},
-                            "total_revenue": {
-                                "$sum": {
-                                    "$multiply": ["$items.price", "$items.quantity"]
-                                }
-                            }
-                        }
-                    }
-                ]
-                
-                sales_result = await self.db.orders.aggregate(pipeline).to_list(1)
-                
-                total_sold = 0
-                total_revenue = 0
-                if sales_result:
-                    total_sold = sales_result[0].get("total_sold", 0)
-                    total_revenue = sales_result[0].get("total_revenue", 0)
-                
-                # Count in wishlist
-                wishlist_count = await self.db.favorites.count_documents(
-                    {"products": product_id}
-                )
-                
-                result.append({
-                    "product_id": product_id,
-                    "product_name": product.get("title", "Unknown"),
-                    "category": product.get("category_name", "N/A"),
-                    "price": product.get("price", 0),
-                    "stock": product.get("stock_level", 0),
-                    "in_cart": in_cart_count,
-                    "in_wishlist": wishlist_count,
-                    "total_sold": total_sold,
-                    "revenue": total_revenue,
-                    "cart_to_purchase_rate": (total_sold / in_cart_count * 100) if in_cart_count > 0 else 0
-                })
-            
-            # Sort by revenue
-            result.sort(key=lambda x: x["revenue"], reverse=True)
-            
-            return result[:50]  # Top 50
+            from modules.analytics_intel.product_performance import ProductPerformanceEngine
+            return await ProductPerformanceEngine(self.db).get(days)
         except Exception as e:
             logger.error(f"Error getting product performance: {str(e)}")
             return []
@@ -374,12 +304,12 @@ class AdvancedAnalyticsService:
             pipeline = [
                 {
                     "$match": {
-                        "created_at": {"$gte": start_date.isoformat()}
+                        **range_q("created_at", gte=start_date)
                     }
                 },
                 {
                     "$addFields": {
-                        "created_date": {"$toDate": "$created_at"}
+                        "created_date": dt_expr("created_at")
                     }
                 },
                 {
@@ -426,8 +356,9 @@ class AdvancedAnalyticsService:
                         "_id": "$buyer_id",
                         "total_orders": {"$sum": 1},
                         "total_spent": {"$sum": "$total_amount"},
-                        "first_order": {"$min": "$created_at"},
-                        "last_order": {"$max": "$created_at"}
+                        # strings and dates never compare: normalize first
+                        "first_order": {"$min": dt_expr("created_at")},
+                        "last_order": {"$max": dt_expr("created_at")}
                     }
                 },
                 {"$sort": {"total_spent": -1}},
@@ -461,50 +392,21 @@ class AdvancedAnalyticsService:
     
     async def get_category_performance(self) -> List[Dict[str, Any]]:
         """
-        Analyze performance by category
+        Analyze performance by category (order_line_facts, one aggregation)
         """
         try:
-            # Get all orders with items
-            orders = await self.db.orders.find({}, {"_id": 0}).to_list(10000)
-            
-            category_stats = {}
-            
-            for order in orders:
-                for item in order.get("items", []):
-                    # Get product to find category
-                    product = await self.db.products.find_one(
-                        {"id": item.get("product_id")},
-                        {"_id": 0, "category_name": 1}
-                    )
-                    
-                    if product:
-                        category = product.get("category_name", "Без категории")
-                        
-                        if category not in category_stats:
-                            category_stats[category] = {
-                                "orders": 0,
-                                "items_sold": 0,
-                                "revenue": 0
-                            }
-                        
-                        category_stats[category]["orders"] += 1
-                        category_stats[category]["items_sold"] += item.get("quantity", 0)
-                        category_stats[category]["revenue"] += item.get("price", 0) * item.get("quantity", 0)
+            from modules.analytics_intel.order_facts import OrderFactsRepo
+            rows = await OrderFactsRepo(self.db).category_report()
             
-            # Convert to list
-            result = [
+            return [
                 {
-                    "category": cat,
-                    "orders": stats["orders"],
-                    "items_sold": stats["items_sold"],
-                    "revenue": stats["revenue"]
+                    "category": r["_id"],
+                    "orders": r["lines"],
+                    "items_sold": r["items_sold"],
+                    "revenue": r["revenue"]
                 }
-                for cat, stats in category_stats.items()
+                for r in rows
             ]
-            
-            result.sort(key=lambda x: x["revenue"], reverse=True)
-            
-            return result
         except Exception as e:
             logger.error(f"Error getting category performance: {str(e)}")
             return []
@@ -6,6 +6,9 @@ from datetime import datetime, timezone, timedelta
 from typing import Dict, List, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from core.dates import day_expr, range_q
+from modules.analytics_intel.order_facts import OrderFactsRepo
+
 class AnalyticsService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
@@ -16,21 +19,20 @@ class AnalyticsService:
         total_products = await self.db.products.count_documents({})
         total_orders = await self.db.orders.count_documents({})
         
-        orders = await self.db.orders.find({"payment_status": "paid"}).to_list(10000)
-        total_revenue = sum(order.get("total_amount", 0) for order in orders)
+        revenue = await self.db.orders.aggregate([
+            {"$match": {"payment_status": "paid"}},
+            {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
+        ]).to_list(1)
+        total_revenue = revenue[0]["total"] if revenue else 0
         
         # Get counts by time period
         now = datetime.now(timezone.utc)
         month_ago = now - timedelta(days=30)
         week_ago = now - timedelta(days=7)
         
-        users_this_month = await self.db.users.count_documents({
-            "created_at": {"$gte": month_ago.isoformat()}
-        })
+        users_this_month = await self.db.users.count_documents(range_q("created_at", gte=month_ago))
         
-        orders_this_month = await self.db.orders.count_documents({
-            "created_at": {"$gte": month_ago.isoformat()}
-        })
+        orders_this_month = await self.db.orders.count_documents(range_q("created_at", gte=month_ago))
         
         return {
             "total_users": total_users,
@@ -51,17 +53,12 @@ class AnalyticsService:
             {
                 "$match": {
                     "payment_status": "paid",
-                    "created_at": {"$gte": start_date.isoformat()}
+                    **range_q("created_at", gte=start_date)
                 }
             },
             {
                 "$group": {
-                    "_id": {
-                        "$dateToString": {
-                            "format": "%Y-%m-%d",
-                            "date": {"$dateFromString": {"dateString": "$created_at"}}
-                        }
-                    },
+                    "_id": day_expr("created_at"),
                     "revenue": {"$sum": "$total_amount"},
                     "orders": {"$sum": 1}
                 }
@@ -82,34 +79,26 @@ class AnalyticsService:
     
     async def get_top_products(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top selling products"""
-        pipeline = [
-            {"$unwind": "$items"},
-            {
-                "$group": {
-                    "_id": "$items.product_id",
-                    "total_quantity": {"$sum": "$items.quantity"},
-                    "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
-                    "order_count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"total_revenue": -1}},
-            {"$limit": limit}
-        ]
-        
-        results = await self.db.orders.aggregate(pipeline).to_list(limit)
-        
-        # Enrich with product details
+        results = await OrderFactsRepo(self.db).product_report(limit=limit)
+        
+        # Enrich with product details (one $in query)
+        products = {
+            p["id"]: p async for p in self.db.products.find(
+                {"id": {"$in": [r["_id"] for r in results]}},
+                {"_id": 0, "id": 1, "title": 1, "images": 1}
+            )
+        }
         top_products = []
         for r in results:
-            product = await self.db.products.find_one({"id": r["_id"]}, {"_id": 0, "title": 1, "images": 1})
+            product = products.get(r["_id"])
             if product:
                 top_products.append({
                     "product_id": r["_id"],
                     "title": product.get("title", "Unknown"),
-                    "image": product.get("images", [None])[0],
-                    "total_quantity": r["total_quantity"],
-                    "total_revenue": round(r["total_revenue"], 2),
-                    "order_count": r["order_count"]
+                    "image": (product.get("images") or [None])[0],
+                    "total_quantity": r["items_sold"],
+                    "total_revenue": round(r["revenue"], 2),
+                    "order_count": r["lines"]
                 })
         
         return top_products
@@ -149,18 +138,11 @@ class AnalyticsService:
         
         pipeline = [
             {
-                "$match": {
-                    "created_at": {"$gte": start_date.isoformat()}
-                }
+                "$match": range_q("created_at", gte=start_date)
             },
             {
                 "$group": {
-                    "_id": {
-                        "$dateToString": {
-                            "format": "%Y-%m-%d",
-                            "date": {"$dateFromString": {"dateString": "$created_at"}}
-                        }
-                    },
+                    "_id": day_expr("created_at"),
                     "count": {"$sum": 1}
                 }
             },
@@ -179,31 +161,24 @@ class AnalyticsService:
     
     async def get_seller_performance(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top performing sellers"""
-        pipeline = [
-            {"$unwind": "$items"},
-            {
-                "$group": {
-                    "_id": "$items.seller_id",
-                    "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
-                    "total_orders": {"$sum": 1}
-                }
-            },
-            {"$sort": {"total_revenue": -1}},
-            {"$limit": limit}
-        ]
-        
-        results = await self.db.orders.aggregate(pipeline).to_list(limit)
-        
-        # Enrich with seller details
+        results = await OrderFactsRepo(self.db).seller_report(limit=limit)
+        
+        # Enrich with seller details (one $in query)
+        users = {
+            u["id"]: u async for u in self.db.users.find(
+                {"id": {"$in": [r["_id"] for r in results]}},
+                {"_id": 0, "id": 1, "full_name": 1, "company_name": 1}
+            )
+        }
         sellers = []
         for r in results:
-            user = await self.db.users.find_one({"id": r["_id"]}, {"_id": 0, "full_name": 1, "company_name": 1})
+            user = users.get(r["_id"])
             if user:
                 sellers.append({
                     "seller_id": r["_id"],
                     "name": user.get("company_name") or user.get("full_name", "Unknown"),
-                    "total_revenue": round(r["total_revenue"], 2),
-                    "total_orders": r["total_orders"]
+                    "total_revenue": round(r["revenue"], 2),
+                    "total_orders": r["lines"]
                 })
         
         return sellers
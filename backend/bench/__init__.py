@@ -0,0 +1,16 @@
+"""
+Load benchmarks for storefront and checkout hot paths
+
+1. Generate a reproducible dataset into a dedicated database (same --seed,
+   same data):
+       python -m bench.datagen --db marketplace_bench --products 100000 --users 20000 --orders 200000
+2. Start the API against it (DB_NAME=marketplace_bench, FONDY_MERCHANT_PASSWORD
+   set to the value passed to the runner for the webhook scenario)
+3. Run the scenarios and compare with the stored baseline:
+       python -m bench.run --base-url http://localhost:8001 --db marketplace_bench \\
+           --baseline bench/baseline.json
+   Record a new baseline (same dataset size and machine) with --save-baseline.
+
+Per scenario the runner reports p50/p95/p99 latency, requests/sec and the
+error rate; it exits 1 when a scenario regresses past --tolerance.
+"""
@@ -0,0 +1,239 @@
+"""
+Synthetic dataset for the load benchmarks
+
+Categories come from seed_categories.CATEGORIES and products are variants of
+the seed_products.PRODUCTS templates (title, category, price band), so the
+catalog looks like the real one at 10k-500k documents. Users (customers,
+sellers and one admin) and orders spread over the last --days days are
+generated with the same RNG: the same --seed always produces the same ids,
+prices and date offsets (relative to today).
+
+Writes into a dedicated database (the name must contain "bench") after
+dropping the generated collections:
+    python -m bench.datagen --db marketplace_bench --products 100000 --users 20000 --orders 200000
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+import asyncio
+import logging
+import random
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from seed_categories import CATEGORIES  # noqa: E402
+from seed_products import PRODUCTS  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+BENCH_PASSWORD = "bench-password"
+ADMIN_EMAIL = "bench-admin@bench.local"
+COLLECTIONS = ("categories", "products", "users", "orders", "carts")
+CHUNK = 2000
+
+CITIES = ["Київ", "Львів", "Харків", "Одеса", "Дніпро", "Запоріжжя", "Вінниця", "Полтава", "Черкаси", "Житомир"]
+BRANDS = ["Apple", "Samsung", "Xiaomi", "Sony", "LG", "Bosch", "Philips", "Lenovo", "Asus", "HP", "Tefal", "Dyson"]
+ORDER_STATUSES = [
+    ("DELIVERED", 45), ("SHIPPED", 10), ("PROCESSING", 8), ("PAID", 7), ("NEW", 10),
+    ("AWAITING_PAYMENT", 8), ("CANCELLED", 6), ("RETURNED", 4), ("REFUNDED", 2),
+]
+PAID = {"DELIVERED", "SHIPPED", "PROCESSING", "PAID", "RETURNED", "REFUNDED"}
+
+
+def make_uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def category_docs(rng: random.Random, now: datetime) -> List[dict]:
+    docs = []
+    for cat in CATEGORIES:
+        parent = {"id": make_uuid(rng), "name": cat["name"], "slug": cat["slug"], "parent_id": None,
+                  "image_url": None, "created_at": now.isoformat()}
+        docs.append(parent)
+        for sub in cat.get("subcategories", []):
+            docs.append({"id": make_uuid(rng), "name": sub["name"], "slug": sub["slug"], "parent_id": parent["id"],
+                         "image_url": None, "created_at": now.isoformat()})
+    return docs
+
+
+def user_docs(rng: random.Random, count: int, sellers: int, password_hash: str, now: datetime,
+              days: int) -> Iterator[dict]:
+    yield {"id": make_uuid(rng), "email": ADMIN_EMAIL, "full_name": "Bench Admin", "role": "admin",
+           "password_hash": password_hash, "created_at": (now - timedelta(days=days)).isoformat()}
+    for i in range(count):
+        role = "seller" if i < sellers else "customer"
+        yield {
+            "id": make_uuid(rng),
+            "email": f"bench-{role}-{i}@bench.local",
+            "full_name": f"Bench {role.title()} {i}",
+            "role": role,
+            "phone": f"+38067{i:07d}",
+            "city": rng.choice(CITIES),
+            "password_hash": password_hash,
+            "created_at": (now - timedelta(seconds=rng.randint(0, days * 86400))).isoformat(),
+        }
+
+
+def product_docs(rng: random.Random, count: int, categories: List[dict], seller_ids: List[str],
+                 now: datetime, days: int) -> Iterator[dict]:
+    by_slug = {c["slug"]: c for c in categories}
+    leaves = [c for c in categories if c["parent_id"]]
+    for i in range(count):
+        tpl = PRODUCTS[i % len(PRODUCTS)]
+        category = by_slug.get(tpl["category_slug"]) or rng.choice(leaves)
+        price = round(tpl["price"] * rng.uniform(0.6, 1.4), -1) or tpl["price"]
+        compare = round(price * rng.uniform(1.05, 1.3), -1) if rng.random() < 0.3 else None
+        title = f"{tpl['title']} {rng.choice(BRANDS)} #{i}"
+        created = now - timedelta(seconds=rng.randint(0, days * 86400))
+        yield {
+            "id": make_uuid(rng),
+            "seller_id": rng.choice(seller_ids),
+            "title": title,
+            "slug": f"{slugify(tpl['title'])}-{i}",
+            "description": tpl["description"],
+            "short_description": tpl["description"][:150],
+            "category_id": category["id"],
+            "category_name": category["name"],
+            "brand": rng.choice(BRANDS),
+            "price": price,
+            "compare_price": compare,
+            "currency": "UAH",
+            "stock_level": rng.choice([0, 1, 5, 20, 100]) if rng.random() < 0.9 else 0,
+            "images": tpl.get("images", []),
+            "status": "published" if rng.random() < 0.95 else "draft",
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "reviews_count": rng.randint(0, 500),
+            "views_count": rng.randint(0, 50000),
+            "sales_count": rng.randint(0, 2000),
+            "is_bestseller": rng.random() < 0.05,
+            "is_featured": rng.random() < 0.05,
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+        }
+
+
+def order_docs(rng: random.Random, count: int, buyers: List[dict], products: List[dict],
+               now: datetime, days: int) -> Iterator[dict]:
+    statuses, weights = zip(*ORDER_STATUSES)
+    for i in range(count):
+        buyer = rng.choice(buyers)
+        items = []
+        for p in rng.sample(products, rng.randint(1, 4)):
+            items.append({"product_id": p["id"], "title": p["title"], "quantity": rng.randint(1, 3),
+                          "price": p["price"], "seller_id": p["seller_id"]})
+        total = round(sum(it["price"] * it["quantity"] for it in items), 2)
+        status = rng.choices(statuses, weights)[0]
+        created = now - timedelta(seconds=rng.randint(0, days * 86400))
+        method = "card" if rng.random() < 0.6 else "cash_on_delivery"
+        paid = status in PAID and (method == "card" or status != "PAID")
+        doc = {
+            "id": make_uuid(rng),
+            "order_number": f"BENCH-{i:08d}",
+            "buyer_id": buyer["id"],
+            "buyer_phone": buyer["phone"],
+            "items": items,
+            "total_amount": total,
+            "totals": {"subtotal": total, "grand": total},
+            "currency": "UAH",
+            "shipping_address": {"street": "вул. Бенчмаркова, 1", "city": buyer["city"], "state": "",
+                                 "postal_code": "01001", "country": "UA"},
+            "shipping": {"city": buyer["city"], "phone": buyer["phone"], "full_name": buyer["full_name"]},
+            "status": status,
+            "payment_status": "refunded" if status == "REFUNDED" else ("paid" if paid else "pending"),
+            "payment_method": method,
+            "created_at": created.isoformat(),
+            "updated_at": created.isoformat(),
+        }
+        if paid:
+            doc["paid_at"] = (created + timedelta(minutes=rng.randint(1, 120))).isoformat()
+        yield doc
+
+
+async def _insert(collection, docs: Iterator[dict], keep=None) -> int:
+    batch, total = [], 0
+    for doc in docs:
+        if keep is not None:
+            keep(doc)
+        batch.append(doc)
+        if len(batch) >= CHUNK:
+            await collection.insert_many(batch, ordered=False)
+            total += len(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        total += len(batch)
+    return total
+
+
+async def generate(db, products: int, users: int, orders: int, seed: int = 42, days: int = 180,
+                   sellers: int = 50) -> Dict[str, int]:
+    """Drop the generated collections and fill them; returns counts per collection"""
+    # passlib is only needed here (bcrypt once, shared by every generated user)
+    from passlib.context import CryptContext
+
+    rng = random.Random(seed)
+    # Dates are offsets from today's midnight: windowed dashboards stay populated
+    now = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    sellers = max(1, min(sellers, users))
+    password_hash = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(BENCH_PASSWORD)
+
+    for name in COLLECTIONS:
+        await db[name].drop()
+
+    categories = category_docs(rng, now)
+    await db.categories.insert_many(categories)
+
+    user_rows: List[dict] = []
+    keep_user = lambda u: user_rows.append({k: u.get(k) for k in ("id", "role", "phone", "city", "full_name")})  # noqa: E731
+    n_users = await _insert(db.users, user_docs(rng, users, sellers, password_hash, now, days), keep_user)
+    seller_ids = [u["id"] for u in user_rows if u["role"] == "seller"]
+    buyers = [u for u in user_rows if u["role"] == "customer"] or [u for u in user_rows if u["role"] == "seller"]
+
+    product_rows: List[dict] = []
+    keep_product = lambda p: product_rows.append({k: p[k] for k in ("id", "title", "price", "seller_id")})  # noqa: E731
+    n_products = await _insert(db.products, product_docs(rng, products, categories, seller_ids, now, days), keep_product)
+
+    n_orders = await _insert(db.orders, order_docs(rng, orders, buyers, product_rows, now, days)) if product_rows else 0
+    return {"categories": len(categories), "users": n_users, "products": n_products, "orders": n_orders}
+
+
+async def _main():
+    import argparse
+    import os
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Generate the benchmark dataset")
+    parser.add_argument("--db", default="marketplace_bench")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--sellers", type=int, default=50)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if "bench" not in args.db:
+        parser.error("--db must contain 'bench' (the generated collections are dropped first)")
+
+    load_dotenv(Path(__file__).parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    started = time.monotonic()
+    counts = await generate(client[args.db], args.products, args.users, args.orders, args.seed, args.days, args.sellers)
+    logger.info(f"Benchmark dataset in {args.db}: {counts} ({time.monotonic() - started:.0f}s)")
+    logger.info(f"Admin: {ADMIN_EMAIL} / {BENCH_PASSWORD}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
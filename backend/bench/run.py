@@ -0,0 +1,225 @@
+"""
+Benchmark runner
+
+Runs the selected scenarios one after another against a running API:
+--concurrency virtual users loop a scenario for --duration seconds after a
+--warmup (not recorded). Carts, orders placed by the run and paid sampled
+orders are reset before each scenario and after the last one. Reported per step ("<scenario>.<step>") and per
+scenario: p50/p95/p99 latency (ms), requests/sec and error rate.
+
+With --baseline the results are compared with a stored run; a step
+regresses when its p95 grows by more than --tolerance (and at least
+--min-delta-ms), its requests/sec drops by more than --tolerance, or its
+error rate exceeds --max-error-rate. Any regression exits with status 1.
+--save-baseline writes this run as the new baseline.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.scenarios import SCENARIOS, Session, load_context, login_all, missing_inputs, reset_state  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.enabled = True
+
+    def __call__(self, label: str, seconds: float, ok: bool):
+        if self.enabled:
+            self.latencies[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        out = {}
+        for label, values in self.latencies.items():
+            values = sorted(values)
+            out[label] = {
+                "count": len(values),
+                "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "error_rate": round(self.errors[label] / len(values), 4),
+            }
+        return out
+
+
+async def run_scenario(client, ctx, name: str, concurrency: int, duration: float, warmup: float,
+                       seed: int) -> Dict[str, dict]:
+    fn = SCENARIOS[name]
+    recorder = Recorder()
+    actions: List[float] = []
+
+    async def worker(i: int, until: float, record_actions: bool):
+        session = Session(client, ctx, random.Random(f"{seed}:{name}:{i}"), recorder)
+        session.scenario = name
+        while time.monotonic() < until:
+            started = time.perf_counter()
+            try:
+                await fn(session)
+            except Exception as e:
+                recorder(f"{name}.exception", time.perf_counter() - started, False)
+                logger.debug(f"{name}: {e!r}")
+                continue
+            if record_actions:
+                actions.append(time.perf_counter() - started)
+
+    if warmup > 0:
+        recorder.enabled = False
+        until = time.monotonic() + warmup
+        await asyncio.gather(*(worker(i, until, False) for i in range(concurrency)))
+        recorder.enabled = True
+
+    started = time.monotonic()
+    until = started + duration
+    await asyncio.gather(*(worker(i, until, True) for i in range(concurrency)))
+    elapsed = time.monotonic() - started
+
+    results = recorder.summary(elapsed)
+    # Whole action (all steps of one scenario iteration)
+    actions.sort()
+    results[name] = {
+        "count": len(actions),
+        "rps": round(len(actions) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(actions, 50) * 1000, 2),
+        "p95_ms": round(percentile(actions, 95) * 1000, 2),
+        "p99_ms": round(percentile(actions, 99) * 1000, 2),
+        "error_rate": round(sum(recorder.errors.values()) / max(1, sum(len(v) for v in recorder.latencies.values())), 4),
+    }
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float, min_delta_ms: float,
+            max_error_rate: float) -> List[str]:
+    regressions = []
+    for label, cur in sorted(results.items()):
+        if cur["error_rate"] > max_error_rate:
+            regressions.append(f"{label}: error rate {cur['error_rate']:.2%} > {max_error_rate:.2%}")
+        base = baseline.get(label)
+        if not base:
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + tolerance) and cur["p95_ms"] - base["p95_ms"] >= min_delta_ms:
+            regressions.append(f"{label}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+        if base["rps"] and cur["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: rps {base['rps']} -> {cur['rps']}")
+    return regressions
+
+
+def print_table(results: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None):
+    header = f"{'step':<34}{'count':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'err':>8}"
+    print(header + ("  p95 vs baseline" if baseline else ""))
+    print("-" * (len(header) + (18 if baseline else 0)))
+    for label, r in sorted(results.items()):
+        line = (f"{label:<34}{r['count']:>8}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+                f"{r['p99_ms']:>10.1f}{r['error_rate']:>8.1%}")
+        base = (baseline or {}).get(label)
+        if base and base["p95_ms"]:
+            line += f"  {(r['p95_ms'] / base['p95_ms'] - 1):+.0%}"
+        print(line)
+
+
+async def _main():
+    import argparse
+    import os
+    from dotenv import load_dotenv
+    import httpx
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Run the storefront / checkout load benchmarks")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--db", default="marketplace_bench", help="Database the server runs against (inputs are sampled from it)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--fondy-password", default=None, help="Defaults to FONDY_MERCHANT_PASSWORD")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare with")
+    parser.add_argument("--save-baseline", default=None, help="Write this run as a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=5)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    load_dotenv(Path(__file__).parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    mongo = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    fondy_password = args.fondy_password if args.fondy_password is not None else os.getenv("FONDY_MERCHANT_PASSWORD", "")
+    db = mongo[args.db]
+    ctx = await load_context(db, customers=args.concurrency, fondy_password=fondy_password)
+    dataset = {name: await db[name].estimated_document_count() for name in ("products", "users", "orders")}
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    results: Dict[str, dict] = {}
+    skipped: Dict[str, str] = {}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        await login_all(client, ctx)
+        for name in names:
+            reason = missing_inputs(name, ctx)
+            if reason:
+                skipped[name] = reason
+                logger.warning(f"Skipping {name}: {reason}")
+                continue
+            await reset_state(db, ctx)
+            logger.info(f"Running {name}: {args.concurrency} users x {args.duration:.0f}s")
+            results.update(await run_scenario(client, ctx, name, args.concurrency, args.duration, args.warmup, args.seed))
+    logger.info(f"Benchmark state reset: {await reset_state(db, ctx)}")
+    mongo.close()
+
+    baseline = None
+    if args.baseline and Path(args.baseline).exists():
+        stored = json.loads(Path(args.baseline).read_text())
+        baseline = stored.get("results", {})
+        if stored.get("meta", {}).get("dataset") != dataset:
+            logger.warning(f"Baseline dataset {stored.get('meta', {}).get('dataset')} differs from {dataset}")
+    elif args.baseline:
+        logger.warning(f"Baseline {args.baseline} not found: nothing to compare")
+
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        meta = {"dataset": dataset, "concurrency": args.concurrency, "duration": args.duration,
+                "seed": args.seed, "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        Path(args.save_baseline).write_text(json.dumps({"meta": meta, "results": results}, indent=2, sort_keys=True) + "\n")
+        logger.info(f"Baseline written to {args.save_baseline}")
+
+    regressions = compare(results, baseline or {}, args.tolerance, args.min_delta_ms, args.max_error_rate)
+    if skipped:
+        print("\nSkipped: " + "; ".join(f"{k} ({v})" for k, v in skipped.items()))
+    if regressions:
+        print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("\nOK" + (" (within baseline)" if baseline else ""))
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,241 @@
+"""
+Benchmark scenarios
+
+Each scenario is one user action against a running API: an async function
+(session) that issues its requests through `session.call(step, ...)`, which
+times every request under "<scenario>.<step>". Inputs (product ids,
+categories, search terms, customer logins, unpaid orders) are sampled from
+the benchmark database by `load_context()`; `reset_state()` undoes what the
+write scenarios left behind (carts, orders placed by the run, paid sampled
+orders) so every scenario and every run starts from the same data.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+import random
+import time
+import uuid
+
+from bench.datagen import ADMIN_EMAIL, BENCH_PASSWORD
+from core.dates import range_q
+
+SAMPLE_SIZE = 2000
+
+
+@dataclass
+class BenchContext:
+    product_ids: List[str]
+    products: Dict[str, dict]
+    category_ids: List[str]
+    category_slugs: List[str]
+    terms: List[str]
+    customer_emails: List[str]
+    customer_ids: List[str]
+    unpaid_orders: List[dict]
+    fondy_password: str = ""
+    tokens: List[str] = field(default_factory=list)
+    admin_token: Optional[str] = None
+    # Per run: Fondy payment ids derive from it, so replays never cross runs
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    # Unpaid orders not yet paid in the current scenario (refilled by reset_state)
+    webhook_pool: List[dict] = field(default_factory=list)
+
+
+async def load_context(db, customers: int = 20, fondy_password: str = "") -> BenchContext:
+    """Sample scenario inputs from the benchmark database"""
+    products = await db.products.aggregate([
+        {"$match": {"status": "published", "stock_level": {"$gt": 0}}},
+        {"$sample": {"size": SAMPLE_SIZE}},
+        {"$project": {"_id": 0, "id": 1, "title": 1, "price": 1, "seller_id": 1}},
+    ]).to_list(SAMPLE_SIZE)
+    categories = await db.categories.find({}, {"_id": 0, "id": 1, "slug": 1}).to_list(None)
+    users = await db.users.find({"role": "customer", "email": {"$regex": "@bench\\.local$"}},
+                                {"_id": 0, "email": 1, "id": 1}).limit(customers).to_list(customers)
+    unpaid = await db.orders.find(
+        {"status": "AWAITING_PAYMENT", "payment_method": "card"}, {"_id": 0, "id": 1, "total_amount": 1}
+    ).limit(SAMPLE_SIZE).to_list(SAMPLE_SIZE)
+
+    terms = set()
+    for p in products:
+        words = [w for w in p["title"].split() if len(w) >= 3 and not w.startswith("#")]
+        terms.update(words[:2])
+    return BenchContext(
+        product_ids=[p["id"] for p in products],
+        products={p["id"]: p for p in products},
+        category_ids=[c["id"] for c in categories],
+        category_slugs=[c["slug"] for c in categories if c.get("slug")],
+        terms=sorted(terms),
+        customer_emails=[u["email"] for u in users],
+        customer_ids=[u["id"] for u in users if u.get("id")],
+        unpaid_orders=unpaid,
+        fondy_password=fondy_password,
+    )
+
+
+async def reset_state(db, ctx: BenchContext) -> dict:
+    """Empty the customers' carts, drop their orders placed by this run, unpay the sampled orders"""
+    carts = await db.carts.update_many({"user_id": {"$in": ctx.customer_ids}}, {"$set": {"items": []}})
+    placed = await db.orders.delete_many(
+        {"buyer_id": {"$in": ctx.customer_ids}, **range_q("created_at", gte=ctx.started_at)}
+    )
+    unpaid = await db.orders.update_many(
+        {"id": {"$in": [o["id"] for o in ctx.unpaid_orders]}},
+        {"$set": {"status": "AWAITING_PAYMENT"}, "$unset": {"paid_at": "", "payment_id": ""}}
+    )
+    ctx.webhook_pool = list(ctx.unpaid_orders)
+    return {"carts": carts.modified_count, "orders_deleted": placed.deleted_count, "unpaid": unpaid.modified_count}
+
+
+async def login(client, email: str, password: str = BENCH_PASSWORD) -> Optional[str]:
+    r = await client.post("/api/auth/login", json={"email": email, "password": password})
+    return r.json().get("access_token") if r.status_code == 200 else None
+
+
+async def login_all(client, ctx: BenchContext):
+    """Tokens for the sampled customers and the admin (bcrypt once per user, outside the timings)"""
+    ctx.tokens = [t for t in [await login(client, e) for e in ctx.customer_emails] if t]
+    ctx.admin_token = await login(client, ADMIN_EMAIL)
+
+
+class Session:
+    """One virtual user: its RNG, customer token and the recorder for its timings"""
+
+    def __init__(self, client, ctx: BenchContext, rng: random.Random, record: Callable[[str, float, bool], None]):
+        self.client = client
+        self.ctx = ctx
+        self.rng = rng
+        self.record = record
+        self.scenario = ""
+        self.token = rng.choice(ctx.tokens) if ctx.tokens else None
+
+    def auth(self, admin: bool = False) -> dict:
+        token = self.ctx.admin_token if admin else self.token
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    async def call(self, step: str, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            ok = response.status_code < 400
+            return response
+        finally:
+            self.record(f"{self.scenario}.{step}", time.perf_counter() - started, ok)
+
+
+# ---- Storefront ----
+
+async def catalog_browse(s: Session):
+    sort = s.rng.choice(["popular", "price_asc", "price_desc", "new"])
+    params = {"category": s.rng.choice(s.ctx.category_slugs), "sort_by": sort, "limit": 24}
+    r = await s.call("list", "GET", "/api/v2/catalog", params=params)
+    cursor = r.json().get("next_cursor") if r.status_code == 200 else None
+    if cursor:
+        await s.call("next_page", "GET", "/api/v2/catalog", params={**params, "cursor": cursor})
+    await s.call("product", "GET", f"/api/products/{s.rng.choice(s.ctx.product_ids)}")
+
+
+async def facets(s: Session):
+    await s.call("facets", "GET", "/api/v2/catalog/facets", params={"category_id": s.rng.choice(s.ctx.category_ids)})
+    await s.call("filters", "GET", "/api/v2/catalog/filters", params={"category": s.rng.choice(s.ctx.category_slugs)})
+
+
+async def search(s: Session):
+    term = s.rng.choice(s.ctx.terms)
+    for n in (2, 3, 4):
+        if len(term) >= n:
+            await s.call("autocomplete", "GET", "/api/v2/search/autocomplete", params={"q": term[:n]})
+    await s.call("suggest", "GET", "/api/v2/search/suggest", params={"q": term})
+    await s.call("search", "GET", "/api/v2/search", params={"q": term})
+
+
+async def cart(s: Session):
+    for pid in s.rng.sample(s.ctx.product_ids, 2):
+        await s.call("add", "POST", "/api/cart/items", json={"product_id": pid, "quantity": 1}, headers=s.auth())
+    await s.call("get", "GET", "/api/cart", headers=s.auth())
+
+
+async def checkout(s: Session):
+    lines = []
+    for pid in s.rng.sample(s.ctx.product_ids, s.rng.randint(1, 3)):
+        p = s.ctx.products[pid]
+        lines.append({"product_id": pid, "title": p["title"], "quantity": 1, "price": p["price"],
+                      "seller_id": p["seller_id"]})
+        await s.call("add", "POST", "/api/cart/items", json={"product_id": pid, "quantity": 1}, headers=s.auth())
+    await s.call("cart", "GET", "/api/cart", headers=s.auth())
+    await s.call("order", "POST", "/api/orders", headers=s.auth(), json={
+        "items": lines,
+        "total_amount": round(sum(l["price"] for l in lines), 2),
+        "currency": "UAH",
+        "payment_method": "cash_on_delivery",
+        "shipping_address": {"street": "вул. Бенчмаркова, 1", "city": "Київ", "state": "",
+                             "postal_code": "01001", "country": "UA"},
+    })
+
+
+def fondy_payload(ctx: BenchContext, order: dict) -> dict:
+    """Signed approved callback; identical for the same order within a run"""
+    from modules.payments.fondy_provider import build_signature
+
+    payment_id = uuid.uuid5(uuid.NAMESPACE_URL, f"bench:{ctx.run_id}:{order['id']}")
+    payload = {
+        "order_id": f"{order['id']}:ORDER_PAYMENT:{payment_id}",
+        "order_status": "approved",
+        "response_status": "success",
+        "amount": int(round(float(order.get("total_amount") or 0) * 100)),
+        "currency": "UAH",
+    }
+    payload["signature"] = build_signature(payload, ctx.fondy_password)
+    return payload
+
+
+async def payment_webhook(s: Session):
+    """
+    First callback for a not yet paid sampled order ("fondy": pays it), then
+    the identical payload again ("fondy_replay": deduped by signature). Once
+    every sampled order is paid, iterations only send replays.
+    """
+    if s.ctx.webhook_pool:
+        payload = fondy_payload(s.ctx, s.ctx.webhook_pool.pop())
+        await s.call("fondy", "POST", "/api/v2/payments/webhook/fondy", json=payload)
+    else:
+        payload = fondy_payload(s.ctx, s.rng.choice(s.ctx.unpaid_orders))
+    await s.call("fondy_replay", "POST", "/api/v2/payments/webhook/fondy", json=payload)
+
+
+# ---- Admin ----
+
+async def admin_dashboards(s: Session):
+    today = datetime.now(timezone.utc).date()
+    window = {"from": (today - timedelta(days=30)).isoformat(), "to": today.isoformat()}
+    await s.call("ops", "GET", "/api/v2/admin/ops/dashboard", params=window, headers=s.auth(admin=True))
+    await s.call("stats", "GET", "/api/admin/stats", headers=s.auth(admin=True))
+    await s.call("revenue", "GET", "/api/admin/analytics/revenue", headers=s.auth(admin=True))
+    await s.call("orders", "GET", "/api/admin/orders", headers=s.auth(admin=True))
+
+
+ScenarioFn = Callable[[Session], Awaitable[None]]
+
+SCENARIOS: Dict[str, ScenarioFn] = {
+    "catalog_browse": catalog_browse,
+    "facets": facets,
+    "search": search,
+    "cart": cart,
+    "checkout": checkout,
+    "payment_webhook": payment_webhook,
+    "admin_dashboards": admin_dashboards,
+}
+
+
+def missing_inputs(name: str, ctx: BenchContext) -> Optional[str]:
+    """Why a scenario cannot run against this dataset / server, or None"""
+    if not ctx.product_ids or not ctx.category_ids:
+        return "no published products or categories"
+    if name in ("cart", "checkout") and not ctx.tokens:
+        return "no customer could log in"
+    if name == "admin_dashboards" and not ctx.admin_token:
+        return "admin login failed"
+    if name == "payment_webhook" and (not ctx.unpaid_orders or not ctx.fondy_password):
+        return "needs unpaid card orders and --fondy-password"
+    return None
@@ -0,0 +1,261 @@
+"""
+Y-Store Marketplace - Deployable app profiles
+
+One router registry, several app shapes (APP_PROFILE, `create_app(profile)`):
+
+    storefront  catalog, search, cart, checkout, customer cabinet, payment
+                webhooks. No index creation, no schedulers: starts fast and
+                stays small, scale it horizontally
+    admin       admin / ops / finance / CRM / analytics APIs; owns the schema
+                (creates indexes, runs the one-off backfills at startup)
+    worker      no business routes (health + /metrics); creates indexes and
+                runs the job + growth schedulers regardless of JOBS_MODE
+    all         (default) storefront + admin routers. Startup matches the
+                pre-profile app.py: init_db core indexes only, no module
+                indexes / backfills, no schedulers. Note it mounts every
+                module router, a superset of the 15 app.py used to mount
+
+Router modules are imported only when their profile includes them, so a
+storefront worker never loads admin, bot or batch code (nor the Mongo
+clients some of those modules create at import). Import time per module is
+measured and logged at boot, slowest first, and kept in
+`app.state.profile_report`.
+"""
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import importlib
+import logging
+import time
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STOREFRONT = "storefront"
+ADMIN = "admin"
+WORKER = "worker"
+ALL = "all"
+
+_BOOT_STARTED = time.perf_counter()
+
+
+@dataclass(frozen=True)
+class ProfileSpec:
+    name: str
+    groups: FrozenSet[str]
+    # create indexes / run one-off backfills at startup
+    owns_schema: bool
+    # None: follow JOBS_MODE, True: always start the schedulers, False: never
+    jobs: Optional[bool]
+    # core.db.init_db indexes only (without owns_schema)
+    core_indexes: bool = False
+
+
+PROFILES: Dict[str, ProfileSpec] = {
+    STOREFRONT: ProfileSpec(STOREFRONT, frozenset({STOREFRONT}), owns_schema=False, jobs=False),
+    ADMIN: ProfileSpec(ADMIN, frozenset({ADMIN}), owns_schema=True, jobs=False),
+    WORKER: ProfileSpec(WORKER, frozenset(), owns_schema=True, jobs=True),
+    ALL: ProfileSpec(ALL, frozenset({STOREFRONT, ADMIN}), owns_schema=False, jobs=False, core_indexes=True),
+}
+
+
+@dataclass(frozen=True)
+class RouterSpec:
+    module: str
+    group: str
+    attr: str = "router"
+    prefix: str = ""
+
+
+# Mounts follow server.py where a module is served there; modules.* routers
+# that were only in app.py keep their /api prefix.
+ROUTERS: List[RouterSpec] = [
+    # ---- Storefront ----
+    RouterSpec("modules.auth.routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.auth.auth_v2_routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.products.routes", STOREFRONT, attr="categories_router", prefix="/api"),
+    RouterSpec("modules.products.routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.cart.routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.orders.routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.orders.orders_v2_routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.orders.order_tracking_routes", STOREFRONT, prefix="/api/v2"),
+    RouterSpec("modules.reviews.routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.content.routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.delivery.routes", STOREFRONT),
+    RouterSpec("modules.delivery.routes_v2", STOREFRONT, prefix="/api/v2"),
+    RouterSpec("modules.payments.routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.payments.fondy_routes", STOREFRONT),
+    RouterSpec("modules.payments.payments_policy_routes", STOREFRONT),
+    RouterSpec("modules.payments.resume_routes", STOREFRONT),
+    RouterSpec("modules.cabinet.cabinet_routes", STOREFRONT, prefix="/api"),
+    RouterSpec("modules.catalog.catalog_routes", STOREFRONT),
+    RouterSpec("modules.catalog.facets_routes", STOREFRONT),
+    RouterSpec("modules.search.routes", STOREFRONT),
+    RouterSpec("modules.wishlist.wishlist_routes", STOREFRONT),
+    RouterSpec("modules.compare.compare_routes", STOREFRONT),
+    RouterSpec("modules.refunds.refunds_routes", STOREFRONT, prefix="/api/v2"),
+    RouterSpec("modules.seo.routes", STOREFRONT),
+    # event ingestion (+ its admin reports)
+    RouterSpec("modules.analytics.routes", STOREFRONT),
+    # ---- Admin ----
+    RouterSpec("modules.admin.routes", ADMIN, prefix="/api"),
+    RouterSpec("modules.payments.payment_health_routes", ADMIN, prefix="/api"),
+    RouterSpec("modules.payments.payment_health_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.risk.risk_routes", ADMIN, prefix="/api"),
+    RouterSpec("modules.risk.risk_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.ops.analytics.shipping_analytics_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.ops.dashboard.dashboard_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.ops.migrations.migration_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.finance.finance_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.crm.crm_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.crm.actions.crm_actions_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.guard.guard_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.timeline.timeline_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.analytics_intel.analytics_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.orders.admin_orders_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.jobs.job_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.pickup_control.pickup_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.returns.return_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.returns.policy_routes", ADMIN, prefix="/api/v2/admin/returns"),
+    RouterSpec("modules.payments.retry.retry_routes", ADMIN),
+    RouterSpec("modules.payments.recovery_analytics_routes", ADMIN),
+    RouterSpec("modules.payments.reconciliation_routes", ADMIN),
+    RouterSpec("modules.revenue.revenue_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.ab.ab_routes", ADMIN, prefix="/api/v2/admin"),
+    RouterSpec("modules.ab.ab_simulator_routes", ADMIN, prefix="/api/v2/admin/ab"),
+    RouterSpec("modules.refunds.refunds_admin_routes", ADMIN, prefix="/api/v2"),
+    RouterSpec("modules.growth.routes", ADMIN),
+]
+
+# Served by every profile
+COMMON_ROUTERS: List[RouterSpec] = [
+    RouterSpec("modules.ops.metrics.metrics_routes", ALL),
+]
+
+
+def get_profile(name: Optional[str] = None) -> ProfileSpec:
+    name = (name or settings.APP_PROFILE or ALL).strip().lower()
+    if name not in PROFILES:
+        raise ValueError(f"UNKNOWN_APP_PROFILE:{name} (expected one of {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def routers_for(profile: ProfileSpec) -> List[RouterSpec]:
+    return [r for r in ROUTERS if r.group in profile.groups] + COMMON_ROUTERS
+
+
+def include_routers(app: FastAPI, profile: ProfileSpec) -> List[Tuple[str, float]]:
+    """Import the profile's router modules and mount them; returns (module, import seconds)"""
+    timings: Dict[str, float] = {}
+    for spec in routers_for(profile):
+        started = time.perf_counter()
+        module = importlib.import_module(spec.module)
+        # Modules already imported as a dependency of an earlier one cost ~0 here
+        timings[spec.module] = timings.get(spec.module, 0.0) + time.perf_counter() - started
+        app.include_router(getattr(module, spec.attr), prefix=spec.prefix)
+    return sorted(timings.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def _log_report(report: dict):
+    slowest = ", ".join(f"{m} {s * 1000:.0f}ms" for m, s in report["imports"][:settings.APP_PROFILE_REPORT_TOP])
+    logger.info(
+        f"App profile '{report['profile']}': {report['routers']} routers from {len(report['imports'])} modules, "
+        f"imports {report['import_sec'] * 1000:.0f}ms, app built {report['build_sec'] * 1000:.0f}ms after boot; "
+        f"slowest: {slowest or '-'}"
+    )
+
+
+def create_app(profile_name: Optional[str] = None) -> FastAPI:
+    from core.compression import CompressionMiddleware
+    from core.db_profiler import DBProfilerMiddleware, install_db_profiler
+    from core.responses import FastJSONResponse
+    install_db_profiler()  # before core.db creates the Motor client
+    from core.db import close_db, db, init_db
+
+    profile = get_profile(profile_name)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        logger.info(f"🚀 Starting Y-Store API (profile: {profile.name})...")
+        if profile.owns_schema:
+            from core.startup import ensure_indexes
+            await init_db()
+            await ensure_indexes(db)
+            logger.info("✅ Database connected and indexes created")
+        elif profile.core_indexes:
+            await init_db()
+            logger.info("✅ Database connected and core indexes created")
+        from core.runtime_config import get_runtime_config
+        get_runtime_config(db).start()
+        if profile.jobs is not False:
+            from core.startup import start_background_jobs
+            start_background_jobs(db, force=bool(profile.jobs))
+        app.state.profile_report["ready_sec"] = round(time.perf_counter() - _BOOT_STARTED, 3)
+        logger.info(f"✅ Ready in {app.state.profile_report['ready_sec'] * 1000:.0f}ms after boot")
+        yield
+        logger.info("👋 Shutting down...")
+        if profile.jobs is not False:
+            from modules.jobs.job_runner import get_job_runner
+            try:
+                await get_job_runner(db).shutdown()
+            except Exception as e:
+                logger.warning(f"Job runner shutdown failed: {e}")
+        await get_runtime_config(db).stop()
+        await close_db()
+
+    app = FastAPI(
+        title="Y-Store Marketplace API",
+        description=f"Modular e-commerce API ({profile.name} profile)",
+        version="2.0.0",
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse
+    )
+
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS.split(","),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Catalog payload compression (brotli / gzip)
+    app.add_middleware(CompressionMiddleware)
+
+    # Per-request DB stats (X-DB-* headers in debug, slow-request log, /metrics)
+    app.add_middleware(DBProfilerMiddleware)
+
+    started = time.perf_counter()
+    imports = include_routers(app, profile)
+    report = {
+        "profile": profile.name,
+        "routers": len(routers_for(profile)),
+        "import_sec": round(time.perf_counter() - started, 3),
+        "build_sec": round(time.perf_counter() - _BOOT_STARTED, 3),
+        "imports": [(m, round(s, 4)) for m, s in imports],
+    }
+    app.state.profile = profile.name
+    app.state.profile_report = report
+    _log_report(report)
+
+    @app.get("/api")
+    async def root():
+        """API health check"""
+        return {
+            "message": "Y-Store API v2.0",
+            "status": "running",
+            "profile": profile.name,
+            "docs": "/docs"
+        }
+
+    @app.get("/api/health")
+    async def health():
+        """Health check endpoint"""
+        return {"status": "healthy", "profile": profile.name}
+
+    return app
@@ -0,0 +1,111 @@
+"""
+Y-Store Marketplace - Response compression for catalog payloads
+
+Pure ASGI middleware: responses under COMPRESSION_PATHS (catalog, facets,
+search, product and category lists) of at least COMPRESSION_MIN_SIZE bytes
+are compressed with the best encoding the client accepts - brotli when the
+`brotli` package is installed, else gzip. Other paths, already encoded and
+non-JSON/text responses, and streaming bodies pass through uncompressed.
+Every response under those paths carries `Vary: Accept-Encoding`, compressed
+or not, so shared caches never serve one encoding to a client that asked
+for another.
+"""
+from typing import Iterable, Optional, Tuple
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def parse_accept_encoding(value: str) -> dict:
+    """'gzip;q=0.8, br' -> {"gzip": 0.8, "br": 1.0}"""
+    out = {}
+    for part in value.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        out[token] = q
+    return out
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = parse_accept_encoding(accept_encoding)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for enc in candidates:
+        q = accepted.get(enc, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, prefixes: Optional[Iterable[str]] = None, minimum_size: Optional[int] = None):
+        self.app = app
+        if prefixes is None:
+            prefixes = [p.strip() for p in settings.COMPRESSION_PATHS.split(",") if p.strip()]
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            async def send_vary(message):
+                if message["type"] == "http.response.start":
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                await send(message)
+            return await self.app(scope, receive, send_vary)
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                # Held until the body shows whether it is worth compressing
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            content_type = headers.get("content-type", "")
+            if (message.get("more_body") or len(body) < self.minimum_size or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -40,9 +40,77 @@ class Settings(BaseSettings):
     FONDY_CALLBACK_URL: str = ""
     FONDY_RETURN_URL: str = ""
     
+    # Notifications: TurboSMS / SMTP (unset -> messages are mocked)
+    TURBOSMS_TOKEN: str = ""
+    TURBOSMS_API_BASE: str = "https://api.turbosms.ua"
+    TURBOSMS_SENDER: str = "Y-Store"
+    TURBOSMS_BATCH_SIZE: int = 100
+    SMTP_HOST: str = ""
+    SMTP_PORT: int = 587
+    SMTP_USER: str = ""
+    SMTP_PASS: str = ""
+    EMAIL_FROM: str = "noreply@y-store.ua"
+    SMTP_BATCH_SIZE: int = 50
+    # Per-provider limits: concurrent upstream requests / messages per second (0 = unlimited)
+    SMS_CONCURRENCY: int = 4
+    SMS_RATE_PER_SEC: float = 0
+    EMAIL_CONCURRENCY: int = 2
+    EMAIL_RATE_PER_SEC: float = 0
+    # Offline throughput testing: fake providers with fixed latency
+    NOTIFY_FAKE_PROVIDERS: bool = False
+    NOTIFY_FAKE_LATENCY_MS: float = 50
+    
     # Optional
     CLOUDINARY_URL: str = ""
     
+    # Storage: write timestamps as native BSON dates (enable after bson_dates migration)
+    NATIVE_DATES: bool = False
+    
+    # Outbox: tail domain_events with a change stream (requires a replica set)
+    OUTBOX_CHANGE_STREAM: bool = False
+    
+    # Guard: tail orders with a change stream instead of a 5s incremental poll
+    GUARD_CHANGE_STREAM: bool = False
+    
+    # Runtime config: version poll interval / change stream on config_versions
+    CONFIG_POLL_SEC: float = 5
+    CONFIG_CHANGE_STREAM: bool = False
+    
+    # Cart pricing: product snapshot cache / priced cart reuse at checkout
+    CART_PRODUCT_CACHE_TTL_SEC: float = 30
+    CART_PRICING_TTL_SEC: float = 600
+    
+    # Dimension cache: max age of categories / seller names held in memory
+    DIMENSION_CACHE_TTL_SEC: float = 300
+    
+    # DB profiler: per-request command stats, /metrics, sampled slow-request log
+    DB_PROFILER_ENABLED: bool = True
+    DB_PROFILER_HEADERS: bool = False  # debug: X-DB-* response headers
+    DB_PROFILER_REPEAT_THRESHOLD: int = 10
+    SLOW_REQUEST_MS: float = 1000
+    SLOW_REQUEST_LOG_SAMPLE: float = 0.1
+    METRICS_TOKEN: str = ""  # GET /metrics requires "Authorization: Bearer <token>"; unset: /metrics is off (404)
+    
+    # App profile served by app.py: storefront | admin | worker | all (core.app_profiles);
+    # all = every router with the pre-profile startup (init_db only, no schedulers)
+    APP_PROFILE: str = "all"
+    APP_PROFILE_REPORT_TOP: int = 10  # slowest router imports logged at boot
+    
+    # Payment webhooks: verify + append to payment_events and answer 200; the
+    # payment_webhook_inbox job applies them. Only enable it when some process
+    # of the deployment runs the jobs (APP_PROFILE=worker, or JOBS_MODE with
+    # the schedulers in the API): no other profile consumes the inbox.
+    # false (default): processed inside the request
+    PAYMENT_WEBHOOK_ASYNC: bool = False
+    PAYMENT_WEBHOOK_CHANGE_STREAM: bool = False  # tail payment_events (requires a replica set)
+    PAYMENT_WEBHOOK_CONCURRENCY: int = 8  # orders processed in parallel per batch
+    
+    # Response compression (brotli if installed, else gzip) for catalog payloads
+    COMPRESSION_PATHS: str = "/api/v2/catalog,/api/v2/categories,/api/v2/search,/api/products,/api/categories"
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 5
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
     class Config:
         env_file = ".env"
         extra = "ignore"
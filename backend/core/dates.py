@@ -0,0 +1,102 @@
+"""
+Y-Store Marketplace - Date/time storage helpers
+
+Timestamps were historically stored as ISO-8601 strings, some writers store
+native BSON datetimes. BSON range operators never match across types, so
+every time-range query must go through these helpers during the migration:
+
+- ts()/ts_now(): value to write (native datetime once NATIVE_DATES is on)
+- range_q():     dual-read filter matching both string and datetime values
+- day_expr():    "YYYY-MM-DD" aggregation expression for either type
+- to_dt():       parse a stored value in Python
+"""
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from core.config import settings
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def to_dt(value: Any) -> Optional[datetime]:
+    """Stored value (ISO string or datetime) -> aware UTC datetime"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def to_iso(value: Any) -> Optional[str]:
+    dt = to_dt(value)
+    return dt.isoformat() if dt else None
+
+
+def day_of(value: Any) -> str:
+    """Stored value -> 'YYYY-MM-DD' ('' if unparseable)"""
+    dt = to_dt(value)
+    return dt.date().isoformat() if dt else ""
+
+
+def ts(dt: datetime):
+    """Value to store for a timestamp"""
+    return dt if settings.NATIVE_DATES else dt.isoformat()
+
+
+def ts_now():
+    return ts(utcnow())
+
+
+def range_q(field: str, gte: Any = None, lt: Any = None, lte: Any = None) -> dict:
+    """
+    Dual-read range filter: {"$or": [datetime range, ISO string range]}.
+    Combine with other $or clauses via {"$and": [...]}. An unparseable bound
+    (e.g. a user-supplied filter) raises ValueError("INVALID_DATE:<field>").
+    """
+    dt_cond, str_cond = {}, {}
+    for op, bound in (("$gte", gte), ("$lt", lt), ("$lte", lte)):
+        if bound is None:
+            continue
+        dt = to_dt(bound)
+        if dt is None:
+            raise ValueError(f"INVALID_DATE:{field}")
+        dt_cond[op] = dt
+        str_cond[op] = dt.isoformat()
+    if not dt_cond:
+        return {}
+    return {"$or": [{field: dt_cond}, {field: str_cond}]}
+
+
+def dt_expr(field: str) -> dict:
+    """Aggregation expression: stored value -> BSON date"""
+    return {"$toDate": f"${field}"}
+
+
+def day_expr(field: str) -> dict:
+    """Aggregation expression: stored value -> 'YYYY-MM-DD' without parsing strings"""
+    return {"$cond": [
+        {"$eq": [{"$type": f"${field}"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d", "date": f"${field}"}},
+        {"$substrBytes": [{"$ifNull": [f"${field}", ""]}, 0, 10]}
+    ]}
+
+
+def and_q(*parts: dict) -> dict:
+    """Merge filters; clashing keys (e.g. two $or clauses) move into $and"""
+    out: dict = {}
+    extra = []
+    for part in parts:
+        for k, v in part.items():
+            if k in out or k == "$and":
+                extra.append({k: v})
+            else:
+                out[k] = v
+    if extra:
+        out["$and"] = extra
+    return out
@@ -0,0 +1,274 @@
+"""
+Y-Store Marketplace - Per-request database profiler
+
+A pymongo command listener (registered before any client is created)
+attributes every MongoDB command to the HTTP request that issued it via a
+contextvar. Motor runs pymongo in a thread pool with a copy of the caller's
+context, so commands land on the right request.
+
+Per request: command count, time in DB, slowest command and command
+"shapes" (command + collection + filter with values replaced by "?").
+A shape issued more than DB_PROFILER_REPEAT_THRESHOLD times in one request
+is reported as a repeated shape (typically an N+1 loop).
+
+Surfaces:
+- X-DB-* response headers when DB_PROFILER_HEADERS=true (debug)
+- a sampled warning log for requests slower than SLOW_REQUEST_MS
+- per-route histograms (DB time, request duration) and counters rendered
+  in Prometheus text format by `render_metrics()` (GET /metrics)
+Metrics are per process.
+"""
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import random
+import threading
+import time
+
+from pymongo import monitoring
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue",
+    "endSessions", "killCursors", "buildInfo", "getLastError",
+}
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _shape(value, depth: int = 0):
+    if isinstance(value, dict):
+        if depth > 4:
+            return "{...}"
+        return {k: _shape(v, depth + 1) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_shape(value[0], depth + 1)] if value else []
+    return "?"
+
+
+def command_shape(name: str, command: dict) -> str:
+    """'find products {"id":"?"}' - same string for the same query with other values"""
+    coll = command.get("collection") if name == "getMore" else command.get(name)
+    if name in ("update", "delete"):
+        ops = command.get(f"{name}s") or [{}]
+        flt = ops[0].get("q")
+    elif name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        flt = [{k: (_shape(v) if k == "$match" else "?") for k, v in stage.items()} for stage in pipeline[:3]]
+    elif name == "findAndModify":
+        flt = command.get("query")
+    elif name in ("find", "count", "distinct"):
+        flt = command.get("filter", command.get("query"))
+    else:
+        flt = None
+    shape = "" if flt is None else " " + json.dumps(_shape(flt), sort_keys=True, separators=(",", ":"), default=str)
+    return f"{name} {coll}{shape}"
+
+
+class RequestDBStats:
+    """Commands of one request; updated from Motor's executor threads"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest: Optional[Tuple[float, str]] = None
+        self.shapes: Counter = Counter()
+        self._pending: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, key: tuple, shape: str):
+        with self._lock:
+            self._pending[key] = shape
+            self.shapes[shape] += 1
+            self.count += 1
+
+    def finished(self, key: tuple, seconds: float):
+        with self._lock:
+            shape = self._pending.pop(key, "?")
+            self.seconds += seconds
+            if self.slowest is None or seconds > self.slowest[0]:
+                self.slowest = (seconds, shape)
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        threshold = settings.DB_PROFILER_REPEAT_THRESHOLD if threshold is None else threshold
+        return [(s, n) for s, n in self.shapes.most_common() if n > threshold]
+
+
+_current: ContextVar[Optional[RequestDBStats]] = ContextVar("db_request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestDBStats]:
+    return _current.get()
+
+
+class _CommandListener(monitoring.CommandListener):
+    def started(self, event):
+        stats = _current.get()
+        if stats is not None and event.command_name not in IGNORED_COMMANDS:
+            stats.started((event.connection_id, event.request_id), command_shape(event.command_name, event.command))
+
+    def _finished(self, event):
+        stats = _current.get()
+        if stats is not None and event.command_name not in IGNORED_COMMANDS:
+            stats.finished((event.connection_id, event.request_id), event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+
+_installed = False
+
+
+def install_db_profiler():
+    """Register the listener; clients created before this call are not profiled"""
+    global _installed
+    if not _installed and settings.DB_PROFILER_ENABLED:
+        monitoring.register(_CommandListener())
+        _installed = True
+
+
+# ---- Route metrics ----
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.db_seconds: Dict[tuple, _Histogram] = {}
+        self.duration: Dict[tuple, _Histogram] = {}
+        self.requests: Counter = Counter()
+        self.queries: Counter = Counter()
+        self.repeated: Counter = Counter()
+
+    def observe(self, labels: tuple, duration: float, stats: RequestDBStats, repeated: bool):
+        self.db_seconds.setdefault(labels, _Histogram()).observe(stats.seconds)
+        self.duration.setdefault(labels, _Histogram()).observe(duration)
+        self.requests[labels] += 1
+        self.queries[labels] += stats.count
+        if repeated:
+            self.repeated[labels] += 1
+
+    @staticmethod
+    def _labels(labels: tuple, extra: str = "") -> str:
+        def esc(v):
+            return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        route, method = labels
+        return f'route="{esc(route)}",method="{esc(method)}"{extra}'
+
+    def _histogram(self, name: str, help_text: str, data: Dict[tuple, _Histogram]) -> List[str]:
+        out = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for labels, h in sorted(data.items()):
+            for bound, n in zip(BUCKETS, h.buckets):
+                le = ',le="%s"' % bound
+                out.append(f"{name}_bucket{{{self._labels(labels, le)}}} {n}")
+            le = ',le="+Inf"'
+            out.append(f"{name}_bucket{{{self._labels(labels, le)}}} {h.count}")
+            out.append(f"{name}_sum{{{self._labels(labels)}}} {h.sum:.6f}")
+            out.append(f"{name}_count{{{self._labels(labels)}}} {h.count}")
+        return out
+
+    def _counter(self, name: str, help_text: str, data: Counter) -> List[str]:
+        out = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        out += [f"{name}{{{self._labels(labels)}}} {n}" for labels, n in sorted(data.items())]
+        return out
+
+    def render(self) -> str:
+        lines = (
+            self._histogram("http_request_db_seconds", "Time spent in MongoDB commands per request", self.db_seconds)
+            + self._histogram("http_request_duration_seconds", "Request duration", self.duration)
+            + self._counter("http_requests_total", "Requests", self.requests)
+            + self._counter("http_request_db_queries_total", "MongoDB commands issued by requests", self.queries)
+            + self._counter("http_request_db_repeated_total", "Requests that repeated one query shape over the threshold", self.repeated)
+        )
+        return "\n".join(lines) + "\n"
+
+
+route_metrics = RouteMetrics()
+
+
+def render_metrics() -> str:
+    return route_metrics.render()
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return f"{scope.get('root_path', '')}{path}" if path else "unmatched"
+
+
+class DBProfilerMiddleware:
+    """Pure ASGI: the contextvar is set in the task that runs the endpoint"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _installed:
+            return await self.app(scope, receive, send)
+
+        stats = RequestDBStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.DB_PROFILER_HEADERS:
+                    headers = list(message.get("headers") or [])
+                    headers += [(k.encode(), v.encode()) for k, v in debug_headers(stats).items()]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _finish(scope, stats, time.perf_counter() - started, status)
+
+
+def debug_headers(stats: RequestDBStats) -> Dict[str, str]:
+    headers = {"X-DB-Queries": str(stats.count), "X-DB-Time-Ms": f"{stats.seconds * 1000:.1f}"}
+    if stats.slowest:
+        headers["X-DB-Slowest"] = f"{stats.slowest[0] * 1000:.1f}ms {stats.slowest[1]}"[:200]
+    repeated = stats.repeated()
+    if repeated:
+        headers["X-DB-Repeated"] = "; ".join(f"{n}x {s}" for s, n in repeated[:3])[:400]
+    return headers
+
+
+def _finish(scope, stats: RequestDBStats, duration: float, status: int):
+    try:
+        route = _route_label(scope)
+        repeated = stats.repeated()
+        route_metrics.observe((route, scope.get("method", "")), duration, stats, bool(repeated))
+        if duration * 1000 >= settings.SLOW_REQUEST_MS and random.random() < settings.SLOW_REQUEST_LOG_SAMPLE:
+            slowest = f"{stats.slowest[1]} {stats.slowest[0] * 1000:.0f}ms" if stats.slowest else "-"
+            logger.warning(
+                f"Slow request {scope.get('method')} {route} -> {status}: {duration * 1000:.0f}ms, "
+                f"db {stats.seconds * 1000:.0f}ms / {stats.count} queries, slowest {slowest}, "
+                f"repeated {repeated[:3]}"
+            )
+    except Exception as e:
+        logger.debug(f"DB profiler record failed: {e}")
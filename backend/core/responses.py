@@ -0,0 +1,120 @@
+"""
+Y-Store Marketplace - Fast JSON responses
+
+- FastJSONResponse renders with orjson (stdlib json when it is missing) and
+  is the default response class of both apps. FastAPI still runs
+  response_model validation / jsonable_encoder before rendering it.
+- Large list endpoints that return Mongo documents of a known shape skip
+  that step: `trusted_response(content)` is returned directly, with the
+  documents passed through a `DocumentShape(Model)` (the model's fields plus
+  its static defaults, one dict pass per document, no validation). Routes
+  keep response_model for the OpenAPI schema.
+  float and datetime fields are coerced the way response_model serialized
+  them (ints as floats, dates as pydantic ISO strings with a "Z" for UTC);
+  other values are emitted as stored.
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union, get_args, get_origin
+import json
+
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements
+    orjson = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _as_float(v: Any) -> Any:
+    if isinstance(v, int) and not isinstance(v, bool):
+        return float(v)
+    return v
+
+
+def _as_iso(v: Any) -> Any:
+    """pydantic's JSON form of a datetime: isoformat with "Z" for UTC"""
+    if isinstance(v, str):
+        try:
+            v = datetime.fromisoformat(v)
+        except ValueError:
+            return v
+    if isinstance(v, datetime):
+        s = v.isoformat()
+        return s[:-6] + "Z" if s.endswith("+00:00") else s
+    return v
+
+
+def _coercer(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    if get_origin(annotation) is Union:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        annotation = args[0] if len(args) == 1 else None
+    if annotation is float:
+        return _as_float
+    if annotation is datetime:
+        return _as_iso
+    return None
+
+
+class DocumentShape:
+    """Project stored documents onto a response model without validating them"""
+
+    def __init__(self, model: type):
+        self.keys: List[str] = []
+        # Static defaults only: default_factory fields (ids, timestamps) are always stored
+        self.defaults: Dict[str, Any] = {}
+        # Per-key coercion matching response_model output (float / datetime fields)
+        self.coerce: Dict[str, Callable[[Any], Any]] = {}
+        for name, f in model.model_fields.items():
+            key = f.alias or name
+            self.keys.append(key)
+            if not f.is_required() and f.default_factory is None:
+                self.defaults[key] = f.default
+            fn = _coercer(f.annotation)
+            if fn is not None:
+                self.coerce[key] = fn
+
+    def __call__(self, doc: dict) -> dict:
+        defaults = self.defaults
+        out = {k: doc[k] if k in doc else defaults[k] for k in self.keys if k in doc or k in defaults}
+        for k, fn in self.coerce.items():
+            if k in out:
+                out[k] = fn(out[k])
+        return out
+
+    def many(self, docs: Iterable[dict]) -> List[dict]:
+        return [self(d) for d in docs]
+
+
+def trusted_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    """Rendered as is: bypasses response_model validation and jsonable_encoder"""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,248 @@
+"""
+Y-Store Marketplace - Runtime configuration service
+
+Admin-editable settings documents (bot_settings, revenue_settings,
+system_settings, ...) and env-derived config are read on hot paths
+(checkout, risk scoring, alerts, automation ticks). Sections are held
+in memory as validated snapshots instead of one Mongo read per use:
+
+- Each section registers a loader + defaults; loaded data is deep-merged
+  over the defaults and leaf values are coerced to the default's type
+  (invalid values fall back to the default with a warning)
+- Writers call bump_config(db, name) after changing a section: its version
+  in config_versions is incremented and the local snapshot reloaded
+- Other workers pick the change up from a change stream on config_versions
+  (CONFIG_CHANGE_STREAM=true, needs a replica set) or by polling the
+  versions every CONFIG_POLL_SEC; without the background task, get()
+  re-checks versions lazily at the same interval
+- Snapshots carry `version` (and a content fingerprint) so decisions can
+  record which config they were made with
+- Env sections are parsed once per process (version 0)
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import time
+
+from pymongo.errors import OperationFailure
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConfigSection:
+    name: str
+    # async (db) -> dict for stored sections, () -> dict for env sections
+    load: Callable[..., Any]
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    env: bool = False
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    name: str
+    version: int
+    data: Dict[str, Any]
+    fingerprint: str
+    loaded_at: float
+
+    def copy(self) -> Dict[str, Any]:
+        """Mutable copy for callers that edit the dict"""
+        return copy.deepcopy(self.data)
+
+
+_sections: Dict[str, ConfigSection] = {}
+_service: Optional["RuntimeConfig"] = None
+
+
+def register_section(section: ConfigSection) -> ConfigSection:
+    _sections[section.name] = section
+    return section
+
+
+def _coerce(value: Any, default: Any, path: str) -> Any:
+    if isinstance(default, dict):
+        if not isinstance(value, dict):
+            if value is not None:
+                logger.warning(f"Config {path}: expected object, using defaults")
+            return copy.deepcopy(default)
+        out = dict(value)
+        for k, d in default.items():
+            out[k] = _coerce(value.get(k), d, f"{path}.{k}")
+        return out
+    if value is None:
+        return copy.deepcopy(default)
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ("1", "true", "yes", "on", "0", "false", "no", "off"):
+            return str(value).lower() in ("1", "true", "yes", "on")
+    elif isinstance(default, (int, float)) and not isinstance(value, bool):
+        try:
+            return type(default)(value) if isinstance(default, float) or float(value).is_integer() else float(value)
+        except (TypeError, ValueError):
+            pass
+    else:
+        return value
+    logger.warning(f"Config {path}: invalid value {value!r}, using default {default!r}")
+    return default
+
+
+def validate(data: Optional[dict], defaults: dict, name: str = "config") -> dict:
+    return _coerce(data or {}, defaults, name)
+
+
+def fingerprint(data: dict) -> str:
+    raw = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+class RuntimeConfig:
+    def __init__(self, db, poll_sec: Optional[float] = None):
+        self.db = db
+        self.versions = db["config_versions"]
+        self.poll_sec = float(poll_sec if poll_sec is not None else settings.CONFIG_POLL_SEC)
+        self.snapshots: Dict[str, ConfigSnapshot] = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- Reads ----
+
+    def peek(self, name: str) -> Optional[ConfigSnapshot]:
+        """Current snapshot without I/O (env sections are parsed on first use)"""
+        snap = self.snapshots.get(name)
+        if snap is None:
+            section = _sections.get(name)
+            if section is not None and section.env:
+                snap = self._store(section, 0, section.load())
+        return snap
+
+    async def get(self, name: str) -> ConfigSnapshot:
+        section = _sections.get(name)
+        if section is None:
+            raise KeyError(f"UNKNOWN_CONFIG_SECTION:{name}")
+        if section.env:
+            return self.peek(name)
+        if self._task is None and time.monotonic() - self._checked_at > self.poll_sec:
+            # No watcher in this process: lazy version check
+            await self.refresh()
+        snap = self.snapshots.get(name)
+        if snap is None:
+            snap = await self._reload(name)
+        return snap
+
+    # ---- Loading ----
+
+    def _store(self, section: ConfigSection, version: int, data: dict) -> ConfigSnapshot:
+        data = validate(data, section.defaults, section.name)
+        snap = ConfigSnapshot(section.name, version, data, fingerprint(data), time.monotonic())
+        self.snapshots[section.name] = snap
+        return snap
+
+    async def _version(self, name: str) -> int:
+        doc = await self.versions.find_one({"_id": name})
+        return int((doc or {}).get("version") or 0)
+
+    async def _reload(self, name: str, version: Optional[int] = None) -> ConfigSnapshot:
+        section = _sections[name]
+        async with self._lock:
+            # Version first: the document read after it is at least that new
+            if version is None:
+                version = await self._version(name)
+            data = await section.load(self.db)
+            return self._store(section, version, data)
+
+    async def reload(self, name: str) -> ConfigSnapshot:
+        """Re-read a stored section now (picks up writes made without a bump)"""
+        return await self._reload(name)
+
+    async def refresh(self) -> list:
+        """Reload loaded sections whose stored version moved; returns their names"""
+        self._checked_at = time.monotonic()
+        loaded = [n for n, s in self.snapshots.items() if not _sections[n].env]
+        if not loaded:
+            return []
+        current = {d["_id"]: int(d.get("version") or 0) async for d in self.versions.find({"_id": {"$in": loaded}})}
+        changed = [n for n in loaded if current.get(n, 0) != self.snapshots[n].version]
+        for name in changed:
+            await self._reload(name, current.get(name, 0))
+            logger.info(f"Runtime config reloaded: {name} v{self.snapshots[name].version}")
+        return changed
+
+    async def bump(self, name: str) -> ConfigSnapshot:
+        """Call after writing a section: new version for every worker, local reload now"""
+        doc = await self.versions.find_one_and_update(
+            {"_id": name}, {"$inc": {"version": 1}}, upsert=True, return_document=True
+        )
+        return await self._reload(name, int((doc or {}).get("version") or 0))
+
+    # ---- Propagation ----
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Runtime config poll failed: {e}")
+            await asyncio.sleep(self.poll_sec)
+
+    async def _watch(self):
+        while True:
+            try:
+                async with self.versions.watch(full_document="updateLookup") as stream:
+                    logger.info("Runtime config: change stream active")
+                    await self.refresh()
+                    async for change in stream:
+                        name = (change.get("documentKey") or {}).get("_id")
+                        if name in self.snapshots and not _sections[name].env:
+                            version = int((change.get("fullDocument") or {}).get("version") or 0)
+                            if version != self.snapshots[name].version:
+                                await self._reload(name, version)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                logger.warning(f"Runtime config change stream unavailable, polling instead: {e}")
+                return await self._poll()
+            except Exception as e:
+                logger.error(f"Runtime config change stream error: {e}")
+                await asyncio.sleep(5)
+
+    def start(self):
+        """Keep snapshots fresh in the background (every worker process)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch() if settings.CONFIG_CHANGE_STREAM else self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> dict:
+        return {
+            name: {"version": s.version, "fingerprint": s.fingerprint, "age_sec": round(time.monotonic() - s.loaded_at, 1)}
+            for name, s in self.snapshots.items()
+        }
+
+
+def get_runtime_config(db=None) -> RuntimeConfig:
+    global _service
+    if _service is None:
+        if db is None:
+            from core.db import db
+        _service = RuntimeConfig(db)
+    return _service
+
+
+async def get_config(db, name: str) -> ConfigSnapshot:
+    return await get_runtime_config(db).get(name)
+
+
+async def bump_config(db, name: str) -> ConfigSnapshot:
+    return await get_runtime_config(db).bump(name)
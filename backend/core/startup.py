@@ -0,0 +1,149 @@
+"""
+Y-Store Marketplace - Startup tasks shared by the app entrypoints
+
+- ensure_indexes(db): indexes of the production-ready modules (formerly in
+  server.py startup_init). Idempotent, but ~60 create_index round trips:
+  app profiles that do not own the schema (storefront) skip it. One-off
+  backfills / rebuilds of empty stores are job runner jobs (leader only).
+- start_background_jobs(db, force): job + growth schedulers. API processes
+  follow JOBS_MODE (inline by default); the worker profile forces them on.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def ensure_indexes(db):
+    """Initialize database indexes for production-ready modules"""
+    # Analytics indexes
+    await db.events.create_index("event")
+    await db.events.create_index("ts")
+    await db.events.create_index("sid")
+    await db.events.create_index([("ts", -1), ("event", 1)])
+    
+    # Orders indexes - with optimistic locking support
+    await db.orders.create_index("id", unique=True)
+    await db.orders.create_index("user_id")
+    await db.orders.create_index("status")
+    await db.orders.create_index("created_at")
+    
+    # Payment events - webhook idempotency
+    await db.payment_events.create_index(
+        [("provider", 1), ("provider_event_id", 1)], 
+        unique=True
+    )
+    await db.payment_events.create_index("order_id")
+    await db.payment_events.create_index("signature_hash", unique=True, sparse=True)
+    
+    # Payment webhook inbox (fast-ack queue in payment_events)
+    from modules.payments.webhook_inbox import WebhookInboxRepo
+    await WebhookInboxRepo(db).ensure_indexes()
+    
+    # Shipment events - TTN idempotency (Nova Poshta)
+    await db.shipment_events.create_index(
+        [("provider", 1), ("event_id", 1)],
+        unique=True
+    )
+    await db.shipment_events.create_index("order_id")
+    
+    # Idempotency keys - general API idempotency
+    await db.idempotency_keys.create_index("key_hash", unique=True)
+    await db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+    
+    # O2: Domain events (outbox)
+    from modules.ops.events.events_repo import EventsRepo
+    await EventsRepo(db).ensure_indexes()
+    
+    # O2: Notification queue
+    await db.notification_queue.create_index("status")
+    await db.notification_queue.create_index("dedupe_key", unique=True, sparse=True)
+    
+    # O5: Finance ledger (unique key: outbox handler replays are no-ops)
+    from modules.finance.finance_repo import FinanceRepo
+    await FinanceRepo(db).ensure_indexes()
+    
+    # O5: Customers CRM
+    await db.customers.create_index("phone", unique=True)
+    await db.customers.create_index("segment")
+    
+    # Performance: Compound indexes for fast queries
+    await db.products.create_index([("category_id", 1), ("status", 1), ("created_at", -1)])
+    await db.products.create_index([("is_active", 1), ("price", 1)])
+    await db.products.create_index("slug")
+    await db.products.create_index("sku", sparse=True)
+    
+    await db.orders.create_index([("phone", 1), ("created_at", -1)])
+    await db.orders.create_index([("status", 1), ("payment_status", 1)])
+    await db.orders.create_index([("user_id", 1), ("status", 1)])
+    
+    # Growth: Abandoned cart indexes
+    await db.carts.create_index([("updated_at", 1), ("converted", 1)])
+    await db.carts.create_index("phone")
+    
+    # Notifications indexes
+    await db.notifications.create_index([("type", 1), ("status", 1)])
+    await db.notifications.create_index("created_at")
+
+    # Payment health: daily buckets + window indexes
+    from modules.payments.payment_health_service import PaymentHealthService
+    await PaymentHealthService(db).ensure_indexes()
+
+    # Order-line facts (category/seller/product reports)
+    from modules.analytics_intel.order_facts import OrderFactsRepo
+    await OrderFactsRepo(db).ensure_indexes()
+
+    # Admin orders keyset (created_at, id)
+    from modules.orders.admin_orders_service import AdminOrdersService
+    await AdminOrdersService(db).ensure_indexes()
+
+    # Catalog keyset indexes; normalized category/brand keys are backfilled
+    # by the job runner leader (catalog_keys_backfill job; filters use the
+    # legacy $or/$regex until done)
+    from modules.catalog.catalog_query import ensure_catalog_indexes
+    await ensure_catalog_indexes(db)
+
+    # Live KPI counters; an empty store is rebuilt from orders by the job
+    # runner leader (kpi_counters_rebuild job)
+    from modules.analytics_intel.kpi_counters import KpiCountersRepo
+    await KpiCountersRepo(db).ensure_indexes()
+
+    # Seller ledger / balances; an empty store is rebuilt by the job runner
+    # leader (seller_ledger_rebuild job, or python -m modules.finance.seller_ledger)
+    from modules.finance.seller_ledger import SellerLedgerRepo
+    await SellerLedgerRepo(db).ensure_indexes()
+
+    # Customer 360 projection + CRM notes (embedded customers.notes are
+    # moved to crm_notes by the job runner leader: crm_notes_migration job)
+    from modules.crm.customer360 import Customer360Repo
+    from modules.crm.actions.crm_actions_service import CRMActionsService
+    await Customer360Repo(db).ensure_indexes()
+    await CRMActionsService(db).ensure_indexes()
+    
+    logger.info("✅ Production indexes created")
+
+
+def start_background_jobs(db, force: bool = False) -> bool:
+    """Start the schedulers; returns whether they were started"""
+    # O21: Background jobs run on the leader only; JOBS_MODE=worker moves them
+    # to a dedicated process (python -m modules.jobs.worker or APP_PROFILE=worker)
+    from modules.jobs.job_runner import jobs_enabled_in_api, jobs_mode
+    if not force and not jobs_enabled_in_api():
+        logger.info(f"⏭ Background jobs not started in API process (JOBS_MODE={jobs_mode()})")
+        return False
+
+    # O1+O2: Start background jobs scheduler
+    try:
+        from modules.jobs.scheduler import start_jobs_scheduler
+        start_jobs_scheduler(db)
+        logger.info("✅ Background jobs scheduler started")
+    except Exception as e:
+        logger.error(f"Failed to start jobs scheduler: {e}")
+    
+    # Start Growth Automation scheduler
+    try:
+        from modules.growth.scheduler import start_growth_scheduler
+        start_growth_scheduler(db)
+        logger.info("✅ Growth automation scheduler started")
+    except Exception as e:
+        logger.warning(f"Growth scheduler not started: {e}")
+    return True
@@ -7,6 +7,9 @@ from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Any, Optional
 import logging
 
+from core.dates import range_q, to_dt
+from modules.crm.customer360 import Customer360Repo
+
 logger = logging.getLogger(__name__)
 
 class CRMService:
@@ -23,32 +26,33 @@ class CRMService:
             if not user:
                 return None
             
-            # Get orders
-            orders = await self.db.orders.find({"buyer_id": user_id}, {"_id": 0}).to_list(1000)
-            
-            # Calculate metrics
-            total_orders = len(orders)
-            total_spent = sum(order.get("total_amount", 0) for order in orders)
+            # Rolling metrics from the customer 360 projection (built on first read)
+            c360 = await Customer360Repo(self.db).get(user_id)
+            total_orders = c360.get("orders_count", 0)
+            total_spent = c360.get("total_spent", 0)
             avg_order_value = total_spent / total_orders if total_orders > 0 else 0
             
             # Last order date
-            last_order_date = None
-            if orders:
-                last_order_date = max(order.get("created_at") for order in orders if order.get("created_at"))
+            last_order_date = to_dt(c360.get("last_order_at"))
             
             # Days since last order
             days_since_last_order = None
             if last_order_date:
                 days_since_last_order = (datetime.now(timezone.utc) - last_order_date).days
             
+            # Last 10 orders (indexed buyer_id + created_at)
+            orders = await self.db.orders.find({"buyer_id": user_id}, {"_id": 0}).sort("created_at", -1).limit(10).to_list(10)
+            
             # Customer segment
             segment = self.determine_segment(total_orders, total_spent, days_since_last_order)
             
             # Get notes
-            notes = await self.db.customer_notes.find({"customer_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
+            notes = await self.db.customer_notes.find({"customer_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(20)
+            notes_count = await self.db.customer_notes.count_documents({"customer_id": user_id})
             
             # Get tasks
-            tasks = await self.db.crm_tasks.find({"customer_id": user_id}, {"_id": 0}).to_list(100)
+            tasks = await self.db.crm_tasks.find({"customer_id": user_id}, {"_id": 0}).to_list(20)
+            tasks_count = await self.db.crm_tasks.count_documents({"customer_id": user_id})
             
             # Get cart (abandoned cart check)
             cart = await self.db.carts.find_one({"user_id": user_id}, {"_id": 0})
@@ -67,12 +71,13 @@ class CRMService:
                 "last_order_date": last_order_date,
                 "days_since_last_order": days_since_last_order,
                 "segment": segment,
-                "notes_count": len(notes),
-                "tasks_count": len(tasks),
+                "notes_count": notes_count,
+                "tasks_count": tasks_count,
                 "has_abandoned_cart": has_abandoned_cart,
-                "orders": orders[-10:],  # Last 10 orders
-                "notes": notes[:20],  # Last 20 notes
-                "tasks": tasks[:20]  # Last 20 tasks
+                "orders": orders,  # Last 10 orders
+                "notes": notes,  # Last 20 notes
+                "tasks": tasks,  # First 20 tasks
+                "recent_events": c360.get("events", [])
             }
         except Exception as e:
             logger.error(f"Error getting customer profile: {str(e)}")
@@ -235,21 +240,15 @@ class CRMService:
             start_date = datetime.now(timezone.utc) - timedelta(days=days)
             
             # New registrations
-            new_customers = await self.db.users.count_documents({
-                "created_at": {"$gte": start_date}
-            })
+            new_customers = await self.db.users.count_documents(range_q("created_at", gte=start_date))
             
             # Orders placed
-            orders_placed = await self.db.orders.count_documents({
-                "created_at": {"$gte": start_date}
-            })
+            orders_placed = await self.db.orders.count_documents(range_q("created_at", gte=start_date))
             
             # Active customers (placed orders)
             active_customers_pipeline = [
                 {
-                    "$match": {
-                        "created_at": {"$gte": start_date}
-                    }
+                    "$match": range_q("created_at", gte=start_date)
                 },
                 {
                     "$group": {
@@ -1,7 +1,21 @@
 """
 A/B Testing Module
+
+Routers are resolved on first access: services importing modules.ab.ab_service
+(cart pricing, checkout) do not pull in the admin routes / numpy simulator.
 """
-from .ab_routes import router
-from .ab_simulator_routes import router as simulator_router
+import importlib
+
+_LAZY = {
+    "router": (".ab_routes", "router"),
+    "simulator_router": (".ab_simulator_routes", "router"),
+}
 
 __all__ = ["router", "simulator_router"]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        module, attr = _LAZY[name]
+        return getattr(importlib.import_module(module, __name__), attr)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,25 @@
 """
 A/B Monte Carlo Simulator - Probabilistic simulation with variance
+
+Two engines share one summary/recommendation step:
+- simulate: reference pure-Python loop
+- simulate_fast: NumPy-vectorized, seedable, chunked (used by the API)
+plus posterior: Bayesian sampling from real ABReportService counts.
 """
 import random
 import statistics
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is in requirements
+    np = None
+
+# Draws generated per chunk in vectorized mode (bounds temporary arrays)
+CHUNK_RUNS = 20000
+
+# Share of revenue lost on a returned order (same as simulator)
+RETURN_LOSS_SHARE = 0.5
 
 
 class ABMonteCarlo:
@@ -18,7 +34,8 @@ class ABMonteCarlo:
         base_paid_rate: float,
         return_rate: float,
         elasticity: float,
-        variants: List[Dict]
+        variants: List[Dict],
+        seed: Optional[int] = None
     ) -> Dict:
         """
         Monte Carlo simulation for A/B testing.
@@ -33,15 +50,16 @@ class ABMonteCarlo:
             - Percentiles (p10, p50, p90)
             - Winner probability
         """
+        rng = random.Random(seed)
         results = {v["key"]: [] for v in variants}
 
         for _ in range(runs):
             prepaid_total = int(orders_total * prepaid_share)
 
             # Add noise to parameters
-            paid_noise = random.uniform(-0.02, 0.02)
-            return_noise = random.uniform(-0.02, 0.02)
-            grand_noise = random.uniform(-0.05, 0.05)
+            paid_noise = rng.uniform(-0.02, 0.02)
+            return_noise = rng.uniform(-0.02, 0.02)
+            grand_noise = rng.uniform(-0.05, 0.05)
 
             for v in variants:
                 discount_pct = float(v.get("discount_pct", 0))
@@ -64,7 +82,7 @@ class ABMonteCarlo:
 
                 discount_cost = revenue * (discount_pct / 100.0)
                 gross_margin = revenue * margin_rate
-                return_losses = revenue * adj_return_rate * 0.5
+                return_losses = revenue * adj_return_rate * RETURN_LOSS_SHARE
 
                 net_profit = gross_margin - discount_cost - return_losses
 
@@ -72,27 +90,18 @@ class ABMonteCarlo:
 
         # Calculate summary statistics
         summary = []
-        for key, profits in results.items():
-            mean_profit = statistics.mean(profits)
-            p50 = statistics.median(profits)
+        for v in variants:
+            profits = results[v["key"]]
             std_dev = statistics.stdev(profits) if len(profits) > 1 else 0
-            
             quantiles = statistics.quantiles(profits, n=10)
-            p10 = quantiles[0]
-            p90 = quantiles[8]
-
-            variant_data = next(v for v in variants if v["key"] == key)
-            
-            summary.append({
-                "variant": key,
-                "discount_pct": variant_data.get("discount_pct", 0),
-                "mean_profit": round(mean_profit, 2),
-                "std_dev": round(std_dev, 2),
-                "p10": round(p10, 2),
-                "p50": round(p50, 2),
-                "p90": round(p90, 2),
-                "risk_adjusted": round(mean_profit - std_dev, 2),  # Sharpe-like
-            })
+            summary.append(ABMonteCarlo._variant_summary(
+                v,
+                mean_profit=statistics.mean(profits),
+                std_dev=std_dev,
+                p10=quantiles[0],
+                p50=statistics.median(profits),
+                p90=quantiles[8]
+            ))
 
         # Calculate winner probability
         winner_count = {v["key"]: 0 for v in variants}
@@ -113,6 +122,182 @@ class ABMonteCarlo:
             for key, count in winner_count.items()
         }
 
+        return ABMonteCarlo._build_result(
+            runs, orders_total, prepaid_share, avg_grand, margin_rate,
+            base_paid_rate, return_rate, elasticity, summary, winner_prob
+        )
+
+    @staticmethod
+    def simulate_fast(
+        runs: int,
+        orders_total: int,
+        prepaid_share: float,
+        avg_grand: float,
+        margin_rate: float,
+        base_paid_rate: float,
+        return_rate: float,
+        elasticity: float,
+        variants: List[Dict],
+        seed: Optional[int] = None,
+        chunk_runs: int = CHUNK_RUNS
+    ) -> Dict:
+        """
+        Vectorized equivalent of simulate().
+
+        Noise for a chunk of runs is drawn as arrays and broadcast over
+        variants, so temporaries stay at chunk_runs x variants. Profits are
+        kept in one (runs, variants) float64 matrix for exact percentiles.
+        CPU-bound: call it from a worker thread, not the event loop.
+        """
+        if np is None:
+            return ABMonteCarlo.simulate(
+                runs, orders_total, prepaid_share, avg_grand, margin_rate,
+                base_paid_rate, return_rate, elasticity, variants, seed=seed
+            )
+
+        rng = np.random.default_rng(seed)
+        prepaid_total = int(orders_total * prepaid_share)
+
+        discount = np.array([float(v.get("discount_pct", 0)) for v in variants]) / 100.0
+        uplift = elasticity * discount
+        profits = np.empty((runs, len(variants)), dtype=np.float64)
+
+        for lo in range(0, runs, chunk_runs):
+            hi = min(runs, lo + chunk_runs)
+            n = hi - lo
+
+            # Same noise per run for every variant (column vectors broadcast)
+            paid_noise = rng.uniform(-0.02, 0.02, size=(n, 1))
+            return_noise = rng.uniform(-0.02, 0.02, size=(n, 1))
+            grand_noise = rng.uniform(-0.05, 0.05, size=(n, 1))
+
+            paid_rate = np.clip(base_paid_rate + uplift + paid_noise, 0.01, 0.99)
+            adj_return_rate = np.maximum(0.01, return_rate + return_noise)
+            adj_grand = avg_grand * (1 + grand_noise)
+
+            paid_orders = np.floor(prepaid_total * paid_rate)
+            revenue = paid_orders * adj_grand
+
+            profits[lo:hi] = revenue * (
+                margin_rate - discount - adj_return_rate * RETURN_LOSS_SHARE
+            )
+
+        return ABMonteCarlo._summarize_matrix(
+            profits, variants,
+            lambda summary, winner_prob: ABMonteCarlo._build_result(
+                runs, orders_total, prepaid_share, avg_grand, margin_rate,
+                base_paid_rate, return_rate, elasticity, summary, winner_prob
+            )
+        )
+
+    @staticmethod
+    def posterior(
+        rows: List[Dict],
+        margin_rate: float,
+        draws: int = 20000,
+        seed: Optional[int] = None
+    ) -> Dict:
+        """
+        Bayesian comparison from observed ABReportService rows.
+
+        Paid and return rates get Beta(1 + k, 1 + n - k) posteriors;
+        expected net profit per order is computed per draw with the same
+        margin/discount/return-loss model as the simulator.
+        """
+        if np is None:
+            return {"ok": False, "error": "NUMPY_NOT_AVAILABLE"}
+
+        rows = [r for r in rows if r.get("orders_total", 0) > 0]
+        if not rows:
+            return {"ok": False, "error": "NO_DATA"}
+
+        rng = np.random.default_rng(seed)
+        variants = []
+        paid_cols, profit_cols = [], []
+
+        for r in rows:
+            n = int(r["orders_total"])
+            paid = int(r.get("paid_total", 0))
+            returns = int(r.get("returns_total", 0))
+            d = float(r.get("discount_pct", 0)) / 100.0
+            # Pre-discount order value, as in the simulator
+            grand = (r.get("revenue_gross", 0) / paid) if paid else float(r.get("avg_grand", 0))
+
+            paid_rate = rng.beta(1 + paid, 1 + n - paid, size=draws)
+            ret_rate = rng.beta(1 + returns, 1 + n - returns, size=draws)
+
+            paid_cols.append(paid_rate)
+            profit_cols.append(
+                paid_rate * grand * (margin_rate - d - ret_rate * RETURN_LOSS_SHARE)
+            )
+            variants.append({"key": r["variant"], "discount_pct": r.get("discount_pct", 0)})
+
+        paid_matrix = np.column_stack(paid_cols)
+        paid_best = np.bincount(np.argmax(paid_matrix, axis=1), minlength=len(variants)) / draws
+
+        def build(summary, winner_prob):
+            summary_sorted = sorted(summary, key=lambda x: x["mean_profit"], reverse=True)
+            return {
+                "ok": True,
+                "draws": draws,
+                "metric": "net_profit_per_order",
+                "summary": summary_sorted,
+                "prob_best_profit": winner_prob,
+                "prob_best_paid_rate": {
+                    v["key"]: round(float(p), 4) for v, p in zip(variants, paid_best)
+                },
+                "recommendation": ABMonteCarlo._get_recommendation(summary_sorted, winner_prob),
+            }
+
+        return ABMonteCarlo._summarize_matrix(np.column_stack(profit_cols), variants, build)
+
+    @staticmethod
+    def _summarize_matrix(profits, variants: List[Dict], build) -> Dict:
+        """Per-variant stats and winner probability from a (runs, variants) matrix"""
+        runs = profits.shape[0]
+        means = profits.mean(axis=0)
+        stds = profits.std(axis=0, ddof=1) if runs > 1 else np.zeros(len(variants))
+        # "weibull" == statistics.quantiles(method="exclusive")
+        p10, p90 = np.percentile(profits, [10, 90], axis=0, method="weibull")
+        p50 = np.median(profits, axis=0)
+
+        summary = [
+            ABMonteCarlo._variant_summary(
+                v,
+                mean_profit=float(means[i]),
+                std_dev=float(stds[i]),
+                p10=float(p10[i]),
+                p50=float(p50[i]),
+                p90=float(p90[i])
+            )
+            for i, v in enumerate(variants)
+        ]
+
+        wins = np.bincount(np.argmax(profits, axis=1), minlength=len(variants))
+        winner_prob = {
+            v["key"]: round(float(wins[i]) / runs, 4)
+            for i, v in enumerate(variants)
+        }
+        return build(summary, winner_prob)
+
+    @staticmethod
+    def _variant_summary(v: Dict, mean_profit, std_dev, p10, p50, p90) -> Dict:
+        return {
+            "variant": v["key"],
+            "discount_pct": v.get("discount_pct", 0),
+            "mean_profit": round(mean_profit, 2),
+            "std_dev": round(std_dev, 2),
+            "p10": round(p10, 2),
+            "p50": round(p50, 2),
+            "p90": round(p90, 2),
+            "risk_adjusted": round(mean_profit - std_dev, 2),  # Sharpe-like
+        }
+
+    @staticmethod
+    def _build_result(
+        runs, orders_total, prepaid_share, avg_grand, margin_rate,
+        base_paid_rate, return_rate, elasticity, summary, winner_prob
+    ) -> Dict:
         # Sort summary by mean_profit descending
         summary_sorted = sorted(summary, key=lambda x: x["mean_profit"], reverse=True)
 
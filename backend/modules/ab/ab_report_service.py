@@ -4,6 +4,8 @@ A/B Report Service - Analytics by cohort
 from datetime import datetime, timedelta, timezone
 import logging
 
+from core.dates import range_q
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,7 +25,7 @@ class ABReportService:
         
         Orders must have: order.ab.exp_id and order.ab.variant
         """
-        since = (now() - timedelta(days=range_days)).isoformat()
+        since = now() - timedelta(days=range_days)
         
         exp = await self.experiments.find_one({"id": exp_id}, {"_id": 0})
         if not exp:
@@ -33,7 +35,7 @@ class ABReportService:
 
         pipeline = [
             {"$match": {
-                "created_at": {"$gte": since},
+                **range_q("created_at", gte=since),
                 "ab.exp_id": exp_id
             }},
             {"$group": {
@@ -156,14 +158,14 @@ class ABReportService:
 
     async def summary_all_experiments(self, range_days: int = 14) -> dict:
         """Get summary for all active experiments"""
-        since = (now() - timedelta(days=range_days)).isoformat()
+        since = now() - timedelta(days=range_days)
         
         experiments = await self.experiments.find({"active": True}, {"_id": 0}).to_list(100)
         summaries = []
         
         for exp in experiments:
             orders_count = await self.orders.count_documents({
-                "created_at": {"$gte": since},
+                **range_q("created_at", gte=since),
                 "ab.exp_id": exp["id"]
             })
             summaries.append({
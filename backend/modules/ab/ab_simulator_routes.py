@@ -1,13 +1,16 @@
 """
 A/B Simulator Routes - Simulation endpoints
 """
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
+from core.db import db
 from core.security import get_current_admin
 
 from .ab_simulator import ABSimulator
 from .ab_monte_carlo import ABMonteCarlo
+from .ab_report_service import ABReportService
 
 router = APIRouter(tags=["A/B Simulation"])
 
@@ -35,7 +38,8 @@ class SimulateRequest(BaseModel):
 
 
 class MonteCarloRequest(SimulateRequest):
-    runs: int = Field(default=2000, ge=100, le=10000)
+    runs: int = Field(default=2000, ge=100, le=200000)
+    seed: Optional[int] = None
 
 
 @router.post("/simulate")
@@ -79,8 +83,12 @@ async def monte_carlo_simulation(
     - Risk metrics (p10, p50, p90, std_dev)
     - Winner probability
     - Recommendation
+
+    Vectorized (NumPy) and run in a worker thread; pass `seed` for
+    reproducible results.
     """
-    return ABMonteCarlo.simulate(
+    return await asyncio.to_thread(
+        ABMonteCarlo.simulate_fast,
         runs=req.runs,
         orders_total=req.orders_total,
         prepaid_share=req.prepaid_share,
@@ -89,8 +97,39 @@ async def monte_carlo_simulation(
         base_paid_rate=req.base_paid_rate,
         return_rate=req.return_rate,
         elasticity=req.elasticity,
-        variants=[v.model_dump() for v in req.variants]
+        variants=[v.model_dump() for v in req.variants],
+        seed=req.seed
+    )
+
+
+@router.get("/posterior/{exp_id}")
+async def posterior_simulation(
+    exp_id: str,
+    range_days: int = Query(14, ge=1, le=180),
+    margin_rate: float = Query(0.41, ge=0.05, le=0.9),
+    draws: int = Query(20000, ge=1000, le=200000),
+    seed: Optional[int] = None,
+    current_user: dict = Depends(get_current_admin)
+):
+    """
+    Bayesian A/B comparison on real experiment data.
+
+    Samples Beta posteriors of paid and return rates from the
+    ABReportService counts and returns the probability that each variant
+    has the best paid rate / net profit per order.
+    """
+    report = await ABReportService(db).report(exp_id, range_days)
+    if not report.get("ok"):
+        raise HTTPException(status_code=404, detail=report.get("error", "EXPERIMENT_NOT_FOUND"))
+
+    result = await asyncio.to_thread(
+        ABMonteCarlo.posterior,
+        report["rows"],
+        margin_rate,
+        draws,
+        seed
     )
+    return {"exp": report["exp"], **result}
 
 
 @router.post("/quick-estimate")
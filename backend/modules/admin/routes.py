@@ -8,6 +8,7 @@ from datetime import datetime, timezone, timedelta
 
 from core.db import db
 from core.security import get_current_admin
+from modules.catalog.dimensions import get_categories
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -130,9 +131,9 @@ async def get_category_distribution(current_user: dict = Depends(get_current_adm
     result = await db.products.aggregate(pipeline).to_list(50)
     
     # Enrich with category names
+    cats = await get_categories(db)
     for r in result:
-        cat = await db.categories.find_one({"id": r["_id"]}, {"name": 1})
-        r["category_name"] = cat["name"] if cat else "Unknown"
+        r["category_name"] = cats.name(r["_id"], "Unknown")
     
     return result
 
@@ -4,6 +4,8 @@ Analytics Routes - Event tracking and funnel endpoints
 from fastapi import APIRouter, Request, HTTPException
 from datetime import datetime, timezone
 from typing import Optional
+
+from core.dates import range_q
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 
@@ -97,13 +99,11 @@ async def admin_overview(days: int = 7):
     })
     
     # Get orders
-    orders = await db.orders.count_documents({
-        "created_at": {"$gte": since}
-    })
+    orders = await db.orders.count_documents(range_q("created_at", gte=since))
     
     # Get revenue
     revenue_pipeline = [
-        {"$match": {"created_at": {"$gte": since}, "payment_status": "paid"}},
+        {"$match": {**range_q("created_at", gte=since), "payment_status": "paid"}},
         {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
     ]
     revenue_result = await db.orders.aggregate(revenue_pipeline).to_list(1)
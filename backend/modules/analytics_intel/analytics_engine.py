@@ -3,6 +3,7 @@ O18: Analytics Engine - KPI/Funnel/Cohorts/LTV/SLA
 """
 from datetime import datetime, timezone, timedelta
 from modules.analytics_intel.analytics_repo import AnalyticsRepo
+from modules.analytics_intel.kpi_counters import KpiCountersRepo, KpiTotals, last_days
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +25,7 @@ class AnalyticsEngine:
     def __init__(self, db):
         self.db = db
         self.repo = AnalyticsRepo(db)
+        self.counters = KpiCountersRepo(db)
         self.orders = db["orders"]
         self.users = db["users"]
 
@@ -32,38 +34,12 @@ class AnalyticsEngine:
         await self.repo.ensure_indexes()
 
         start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = start + timedelta(days=1)
         day_key = day_str(start)
 
-        # Revenue and orders by status
-        pipeline = [
-            {"$match": {"created_at": {"$gte": iso(start), "$lt": iso(end)}}},
-            {"$group": {
-                "_id": None,
-                "orders": {"$sum": 1},
-                "revenue": {"$sum": {"$cond": [
-                    {"$in": ["$status", ["paid", "processing", "shipped", "delivered", "PAID", "PROCESSING", "SHIPPED", "DELIVERED"]]},
-                    "$total_amount",
-                    0
-                ]}},
-                "paid": {"$sum": {"$cond": [{"$in": ["$payment_status", ["paid", "completed", "PAID"]]}, 1, 0]}},
-                "awaiting_payment": {"$sum": {"$cond": [{"$in": ["$status", ["pending", "AWAITING_PAYMENT"]]}, 1, 0]}},
-                "processing": {"$sum": {"$cond": [{"$in": ["$status", ["processing", "PROCESSING"]]}, 1, 0]}},
-                "shipped": {"$sum": {"$cond": [{"$in": ["$status", ["shipped", "SHIPPED"]]}, 1, 0]}},
-                "delivered": {"$sum": {"$cond": [{"$in": ["$status", ["delivered", "DELIVERED"]]}, 1, 0]}},
-                "cancels": {"$sum": {"$cond": [{"$in": ["$status", ["cancelled", "CANCELLED"]]}, 1, 0]}},
-                "returns": {"$sum": {"$cond": [{"$in": ["$status", ["returned", "RETURNED"]]}, 1, 0]}},
-            }}
-        ]
-
-        rows = await self.orders.aggregate(pipeline).to_list(1)
-        agg = rows[0] if rows else {
-            "orders": 0, "revenue": 0, "paid": 0, "awaiting_payment": 0,
-            "processing": 0, "shipped": 0, "delivered": 0, "cancels": 0, "returns": 0
-        }
-
-        orders = int(agg.get("orders", 0))
-        revenue = float(agg.get("revenue", 0))
+        # Revenue and orders by status (KPI counters)
+        kpi = await self.counters.totals(day_key, day_key)
+        orders = kpi.orders
+        revenue = kpi.revenue
         aov = (revenue / orders) if orders else 0.0
 
         # Simple SLA calculation (placeholder)
@@ -81,15 +57,7 @@ class AnalyticsEngine:
             "revenue": revenue,
             "orders": orders,
             "aov": aov,
-            "funnel": {
-                "paid": int(agg.get("paid", 0)),
-                "awaiting_payment": int(agg.get("awaiting_payment", 0)),
-                "processing": int(agg.get("processing", 0)),
-                "shipped": int(agg.get("shipped", 0)),
-                "delivered": int(agg.get("delivered", 0)),
-                "cancels": int(agg.get("cancels", 0)),
-                "returns": int(agg.get("returns", 0)),
-            },
+            "funnel": self._funnel(kpi),
             "sla": sla,
             "risk_dist": risk_dist,
         })
@@ -135,50 +103,29 @@ class AnalyticsEngine:
             "by_day": [{"day": d["day"], "revenue": d.get("revenue", 0), "orders": d.get("orders", 0)} for d in data]
         }
 
-    async def _calculate_live(self, range_days: int):
-        """Calculate KPI directly from orders (fallback)"""
-        now = utcnow()
-        start = now - timedelta(days=range_days)
-
-        pipeline = [
-            {"$match": {"created_at": {"$gte": iso(start)}}},
-            {"$group": {
-                "_id": None,
-                "orders": {"$sum": 1},
-                "revenue": {"$sum": {"$cond": [
-                    {"$in": ["$payment_status", ["paid", "completed", "PAID"]]},
-                    "$total_amount",
-                    0
-                ]}},
-                "paid": {"$sum": {"$cond": [{"$in": ["$payment_status", ["paid", "completed", "PAID"]]}, 1, 0]}},
-                "awaiting_payment": {"$sum": {"$cond": [{"$in": ["$status", ["pending", "AWAITING_PAYMENT"]]}, 1, 0]}},
-                "processing": {"$sum": {"$cond": [{"$in": ["$status", ["processing", "PROCESSING"]]}, 1, 0]}},
-                "shipped": {"$sum": {"$cond": [{"$in": ["$status", ["shipped", "SHIPPED"]]}, 1, 0]}},
-                "delivered": {"$sum": {"$cond": [{"$in": ["$status", ["delivered", "DELIVERED"]]}, 1, 0]}},
-                "cancels": {"$sum": {"$cond": [{"$in": ["$status", ["cancelled", "CANCELLED"]]}, 1, 0]}},
-                "returns": {"$sum": {"$cond": [{"$in": ["$status", ["returned", "RETURNED"]]}, 1, 0]}},
-            }}
-        ]
-
-        rows = await self.orders.aggregate(pipeline).to_list(1)
-        agg = rows[0] if rows else {}
+    @staticmethod
+    def _funnel(kpi: KpiTotals) -> dict:
+        return {
+            "paid": kpi.paid,
+            "awaiting_payment": kpi.count("AWAITING_PAYMENT"),
+            "processing": kpi.count("PROCESSING"),
+            "shipped": kpi.count("SHIPPED"),
+            "delivered": kpi.count("DELIVERED"),
+            "cancels": kpi.count("CANCELED"),
+            "returns": kpi.count("RETURNED"),
+        }
 
-        orders = int(agg.get("orders", 0))
-        revenue = float(agg.get("revenue", 0))
-        aov = (revenue / orders) if orders else 0.0
+    async def _calculate_live(self, range_days: int):
+        """Calculate KPI from live counters (no daily snapshots yet)"""
+        kpi = await self.counters.totals(*last_days(range_days))
+        aov = (kpi.revenue / kpi.orders) if kpi.orders else 0.0
 
         return {
             "range_days": range_days,
-            "revenue": revenue,
-            "orders": orders,
+            "revenue": kpi.revenue,
+            "orders": kpi.orders,
             "aov": aov,
-            "paid": int(agg.get("paid", 0)),
-            "awaiting_payment": int(agg.get("awaiting_payment", 0)),
-            "processing": int(agg.get("processing", 0)),
-            "shipped": int(agg.get("shipped", 0)),
-            "delivered": int(agg.get("delivered", 0)),
-            "cancels": int(agg.get("cancels", 0)),
-            "returns": int(agg.get("returns", 0)),
+            **self._funnel(kpi),
             "sla": {"avg_h": 0, "median_h": 0, "p95_h": 0},
-            "by_day": []
+            "by_day": kpi.by_day
         }
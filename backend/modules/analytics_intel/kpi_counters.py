@@ -0,0 +1,278 @@
+"""
+O18: Live KPI counters (kpi_counters)
+
+One document per order day (created_at date, UTC) with order counts and
+amounts per canonical status, paid revenue and the number of paid orders:
+    {"day": "2026-10-19", "orders": 42, "revenue": 31250.0, "paid": 13,
+     "status": {"PAID": {"n": 12, "amount": 9800.0}, ...}}
+
+Amounts are totals.grand (total_amount for legacy orders). "revenue" sums
+orders in a PAID_STATUSES status; "paid" counts orders whose status or
+payment_status is paid (is_paid: any spelling, or "completed").
+
+Updated with $inc when an order is created (order_hooks) and right after
+the conditional update in OrderRepository.atomic_transition /
+mark_paid_atomic, so a transition is counted exactly once. Guard,
+analytics, revenue snapshot, returns and ops dashboard read O(days)
+counter documents instead of aggregating orders.
+
+Status writes outside the repository (legacy admin endpoints) drift the
+counters; `verify()` recomputes recent days from orders and overwrites
+drifted ones (every 15 minutes for today/yesterday, nightly for 35 days).
+An empty store is rebuilt by the job runner leader (kpi_counters_rebuild):
+    python -m modules.analytics_intel.kpi_counters [--since-days N]
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
+from core.dates import day_expr, day_of, range_q, to_dt, utcnow
+
+logger = logging.getLogger(__name__)
+
+PAID_STATUSES = ("PAID", "PROCESSING", "SHIPPED", "DELIVERED")
+PAID_MARKS = PAID_STATUSES + ("COMPLETED",)
+STATUS_ALIASES = {"PENDING": "AWAITING_PAYMENT", "CANCELLED": "CANCELED"}
+AMOUNT_EPS = 0.01
+
+
+def norm_status(status: Optional[str]) -> str:
+    """Legacy lower-case / alias spellings -> OrderStatus value"""
+    s = str(status or "UNKNOWN").upper()
+    return STATUS_ALIASES.get(s, s)
+
+
+def order_amount(order: dict) -> float:
+    return float((order.get("totals") or {}).get("grand") or order.get("total_amount") or 0)
+
+
+def is_paid(order: dict) -> bool:
+    """Status or payment_status says paid (legacy lower-case / "completed" included)"""
+    return (norm_status(order.get("status")) in PAID_MARKS
+            or norm_status(order.get("payment_status")) in PAID_MARKS)
+
+
+# Aggregation counterparts of order_amount / is_paid (verifier)
+AMOUNT_EXPR = {"$cond": [
+    {"$ne": [{"$ifNull": ["$totals.grand", 0]}, 0]}, "$totals.grand", {"$ifNull": ["$total_amount", 0]}
+]}
+IS_PAID_EXPR = {"$or": [
+    {"$in": [{"$toUpper": {"$ifNull": ["$status", ""]}}, list(PAID_MARKS)]},
+    {"$in": [{"$toUpper": {"$ifNull": ["$payment_status", ""]}}, list(PAID_MARKS)]},
+]}
+
+
+def day_range(start_day: str, end_day: str) -> List[str]:
+    s, e = date.fromisoformat(start_day), date.fromisoformat(end_day)
+    return [(s + timedelta(days=i)).isoformat() for i in range((e - s).days + 1)]
+
+
+def last_days(days: int) -> tuple:
+    """(first, last) day strings for the last N days including today"""
+    today = utcnow().date()
+    return (today - timedelta(days=max(days, 1) - 1)).isoformat(), today.isoformat()
+
+
+class KpiTotals:
+    """Sum of counter documents over a day range"""
+
+    def __init__(self, docs: Iterable[dict]):
+        self.orders = 0
+        self.revenue = 0.0
+        self.paid = 0
+        self.by_status: Dict[str, Dict[str, float]] = {}
+        self.by_day: List[dict] = []
+        for d in docs:
+            self.orders += int(d.get("orders") or 0)
+            self.revenue += float(d.get("revenue") or 0)
+            self.paid += int(d.get("paid") or 0)
+            for s, v in (d.get("status") or {}).items():
+                acc = self.by_status.setdefault(s, {"n": 0, "amount": 0.0})
+                acc["n"] += int(v.get("n") or 0)
+                acc["amount"] += float(v.get("amount") or 0)
+            self.by_day.append({"day": d["day"], "orders": int(d.get("orders") or 0),
+                                "revenue": float(d.get("revenue") or 0)})
+
+    def count(self, *statuses: str) -> int:
+        return sum(int(self.by_status.get(s, {}).get("n", 0)) for s in statuses)
+
+
+class KpiCountersRepo:
+    def __init__(self, db):
+        self.db = db
+        self.col = db["kpi_counters"]
+        self.orders = db["orders"]
+
+    async def ensure_indexes(self):
+        await self.col.create_index("day", unique=True)
+
+    async def _inc(self, day: str, inc: Dict[str, float]):
+        if not day:
+            return
+        update = {"$inc": inc, "$set": {"updated_at": utcnow().isoformat()}}
+        try:
+            await self.col.update_one({"day": day}, update, upsert=True)
+        except DuplicateKeyError:
+            # Concurrent first write of the day: the other upsert created it
+            await self.col.update_one({"day": day}, update)
+
+    # ---- Write side ----
+
+    async def on_created(self, order: dict):
+        status = norm_status(order.get("status"))
+        amount = order_amount(order)
+        inc = {"orders": 1, f"status.{status}.n": 1, f"status.{status}.amount": amount}
+        if status in PAID_STATUSES:
+            inc["revenue"] = amount
+        if is_paid(order):
+            inc["paid"] = 1
+        await self._inc(day_of(order.get("created_at")), inc)
+
+    async def on_transition(self, order: dict, from_status: str, before: Optional[dict] = None):
+        """
+        `order` is the document after the transition; `before` the one before
+        it when payment_status may have changed too (default: only status did)
+        """
+        before = {**order, **(before or {}), "status": from_status}
+        frm, to = norm_status(from_status), norm_status(order.get("status"))
+        amount = order_amount(order)
+        inc: Dict[str, float] = {}
+        if frm != to:
+            inc.update({
+                f"status.{frm}.n": -1, f"status.{frm}.amount": -amount,
+                f"status.{to}.n": 1, f"status.{to}.amount": amount,
+            })
+            revenue_delta = (to in PAID_STATUSES) - (frm in PAID_STATUSES)
+            if revenue_delta:
+                inc["revenue"] = revenue_delta * amount
+        paid_delta = is_paid(order) - is_paid(before)
+        if paid_delta:
+            inc["paid"] = paid_delta
+        if inc:
+            await self._inc(day_of(order.get("created_at")), inc)
+
+    # ---- Read side ----
+
+    async def totals(self, start_day: str, end_day: str) -> KpiTotals:
+        cur = self.col.find({"day": {"$gte": start_day, "$lte": end_day}}, {"_id": 0}).sort("day", 1)
+        return KpiTotals([d async for d in cur])
+
+    async def last(self, days: int) -> KpiTotals:
+        return await self.totals(*last_days(days))
+
+    # ---- Verifier ----
+
+    async def compute(self, start_day: str, end_day: str) -> Dict[str, dict]:
+        """Counter documents recomputed from orders (one grouped aggregation)"""
+        end_excl = to_dt(end_day) + timedelta(days=1)
+        pipeline = [
+            {"$match": range_q("created_at", to_dt(start_day), end_excl)},
+            {"$group": {
+                "_id": {"day": day_expr("created_at"), "status": "$status"},
+                "n": {"$sum": 1},
+                "amount": {"$sum": AMOUNT_EXPR},
+                "paid": {"$sum": {"$cond": [IS_PAID_EXPR, 1, 0]}},
+            }},
+        ]
+        out: Dict[str, dict] = {
+            d: {"day": d, "orders": 0, "revenue": 0.0, "paid": 0, "status": {}} for d in day_range(start_day, end_day)
+        }
+        async for row in self.orders.aggregate(pipeline, allowDiskUse=True):
+            doc = out.get(row["_id"]["day"])
+            if doc is None:
+                continue
+            status = norm_status(row["_id"].get("status"))
+            acc = doc["status"].setdefault(status, {"n": 0, "amount": 0.0})
+            acc["n"] += int(row["n"])
+            acc["amount"] += float(row["amount"] or 0)
+            doc["orders"] += int(row["n"])
+            doc["paid"] += int(row["paid"])
+            if status in PAID_STATUSES:
+                doc["revenue"] += float(row["amount"] or 0)
+        return out
+
+    @staticmethod
+    def _drifted(stored: Optional[dict], expected: dict) -> bool:
+        if stored is None:
+            return expected["orders"] > 0
+        if int(stored.get("orders") or 0) != expected["orders"]:
+            return True
+        if "paid" not in stored or int(stored["paid"] or 0) != expected["paid"]:
+            return True
+        if abs(float(stored.get("revenue") or 0) - expected["revenue"]) > AMOUNT_EPS:
+            return True
+        have = stored.get("status") or {}
+        for s in set(have) | set(expected["status"]):
+            a, b = have.get(s) or {}, expected["status"].get(s) or {}
+            if int(a.get("n") or 0) != int(b.get("n") or 0):
+                return True
+            if abs(float(a.get("amount") or 0) - float(b.get("amount") or 0)) > AMOUNT_EPS:
+                return True
+        return False
+
+    async def verify(self, since_days: int = 2, fix: bool = True) -> dict:
+        """
+        Reconcile the last N days against orders. A transition landing between
+        the aggregation and the overwrite can be lost; the next run repairs it.
+        """
+        await self.ensure_indexes()
+        start_day, end_day = last_days(since_days + 1)
+        expected = await self.compute(start_day, end_day)
+        stored = {d["day"]: d async for d in self.col.find({"day": {"$gte": start_day, "$lte": end_day}}, {"_id": 0})}
+
+        drifted = [day for day, exp in expected.items() if self._drifted(stored.get(day), exp)]
+        now = utcnow().isoformat()
+        if fix:
+            for day in drifted:
+                await self.col.update_one(
+                    {"day": day},
+                    {"$set": {**expected[day], "updated_at": now, "verified_at": now}},
+                    upsert=True
+                )
+        if drifted:
+            logger.warning(f"KPI counters drift on {len(drifted)} day(s): {drifted[:10]}")
+        return {"ok": True, "days": len(expected), "drifted": drifted, "fixed": fix}
+
+
+# ---- Hooks (never fail the caller) ----
+
+async def record_order_created(db, order: dict):
+    try:
+        await KpiCountersRepo(db).on_created(order)
+    except Exception as e:
+        logger.warning(f"KPI counters create write failed for {order.get('id')}: {e}")
+
+
+async def record_order_transition(db, order: dict, from_status: str, before: Optional[dict] = None):
+    try:
+        await KpiCountersRepo(db).on_transition(order, from_status, before)
+    except Exception as e:
+        logger.warning(f"KPI counters transition write failed for {order.get('id')}: {e}")
+
+
+async def _main():
+    import argparse
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Rebuild kpi_counters from orders")
+    parser.add_argument("--since-days", type=int, default=400)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent.parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "marketplace_db")]
+    result = await KpiCountersRepo(db).verify(since_days=args.since_days)
+    logger.info(f"KPI counters rebuild: {len(result['drifted'])} of {result['days']} days rewritten")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,211 @@
+"""
+O18: Order-line fact table (order_line_facts)
+
+One document per order line, denormalized at write time:
+product, category, seller, price, quantity, amount, order/payment status
+and a day bucket. Category/seller/product reports become single indexed
+aggregations instead of order scans with a products lookup per line.
+
+Written on order creation (record_order_facts) and on status transitions
+(sync_order_status); `backfill()` populates existing history and the
+nightly reconcile job absorbs changes made outside those paths:
+    python -m modules.analytics_intel.order_facts [--since-days N]
+"""
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+import asyncio
+import logging
+
+from core.dates import utcnow, day_of, range_q, ts_now
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+UNCATEGORIZED = "Без категории"
+
+
+class OrderFactsRepo:
+    def __init__(self, db):
+        self.db = db
+        self.col = db["order_line_facts"]
+        self.orders = db["orders"]
+        self.products = db["products"]
+
+    async def ensure_indexes(self):
+        await self.col.create_index([("order_id", 1), ("line", 1)], unique=True)
+        await self.col.create_index([("day", 1), ("category_name", 1)])
+        await self.col.create_index([("seller_id", 1), ("day", 1)])
+        await self.col.create_index([("product_id", 1), ("day", 1)])
+        await self.col.create_index([("payment_status", 1), ("day", 1)])
+
+    async def _product_map(self, product_ids: Iterable[str]) -> Dict[str, dict]:
+        ids = list({pid for pid in product_ids if pid})
+        if not ids:
+            return {}
+        cur = self.products.find(
+            {"id": {"$in": ids}},
+            {"_id": 0, "id": 1, "category_id": 1, "category_name": 1, "seller_id": 1}
+        )
+        return {p["id"]: p async for p in cur}
+
+    @staticmethod
+    def build_facts(order: dict, products: Dict[str, dict]) -> List[dict]:
+        facts = []
+        day = day_of(order.get("created_at"))
+        for line, item in enumerate(order.get("items") or []):
+            pid = item.get("product_id")
+            product = products.get(pid)
+            price = float(item.get("price") or 0)
+            qty = int(item.get("quantity") or 0)
+            facts.append({
+                "order_id": order.get("id"),
+                "line": line,
+                "product_id": pid,
+                "product_found": product is not None,
+                "category_id": (product or {}).get("category_id"),
+                "category_name": (product or {}).get("category_name") or UNCATEGORIZED,
+                "seller_id": item.get("seller_id") or (product or {}).get("seller_id"),
+                "buyer_id": order.get("buyer_id") or order.get("user_id"),
+                "price": price,
+                "quantity": qty,
+                "amount": round(price * qty, 2),
+                "status": order.get("status"),
+                "payment_status": order.get("payment_status"),
+                "day": day,
+                "created_at": order.get("created_at"),
+            })
+        return facts
+
+    async def upsert_orders(self, orders: List[dict]) -> int:
+        """Build and upsert facts for a batch of orders (one products $in query)"""
+        products = await self._product_map(
+            item.get("product_id") for o in orders for item in (o.get("items") or [])
+        )
+        now = ts_now()
+        ops = []
+        stale = []
+        for order in orders:
+            facts = self.build_facts(order, products)
+            for f in facts:
+                ops.append(UpdateOne(
+                    {"order_id": f["order_id"], "line": f["line"]},
+                    {"$set": {**f, "updated_at": now}},
+                    upsert=True
+                ))
+            # Lines removed from an edited order
+            stale.append({"order_id": order.get("id"), "line": {"$gte": len(facts)}})
+        if stale:
+            await self.col.delete_many({"$or": stale})
+        if ops:
+            await self.col.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    async def sync_status(self, order_id: str, status: Optional[str] = None, payment_status: Optional[str] = None):
+        upd = {"updated_at": ts_now()}
+        if status is not None:
+            upd["status"] = status
+        if payment_status is not None:
+            upd["payment_status"] = payment_status
+        await self.col.update_many({"order_id": order_id}, {"$set": upd})
+
+    async def backfill(self, since_days: Optional[int] = None, batch_size: int = BATCH_SIZE) -> dict:
+        """Rebuild facts from orders (all history, or orders touched in the last N days)"""
+        await self.ensure_indexes()
+        q = {}
+        if since_days is not None:
+            since = utcnow() - timedelta(days=since_days)
+            q = {"$or": [range_q("created_at", since), range_q("updated_at", since)]}
+
+        orders_n = facts_n = 0
+        batch = []
+        cur = self.orders.find(q, {"_id": 0, "id": 1, "items": 1, "status": 1, "payment_status": 1,
+                                   "buyer_id": 1, "user_id": 1, "created_at": 1}).batch_size(batch_size)
+        async for order in cur:
+            if not order.get("id"):
+                continue
+            batch.append(order)
+            if len(batch) >= batch_size:
+                facts_n += await self.upsert_orders(batch)
+                orders_n += len(batch)
+                batch = []
+        if batch:
+            facts_n += await self.upsert_orders(batch)
+            orders_n += len(batch)
+        return {"ok": True, "orders": orders_n, "facts": facts_n}
+
+    # ---- Reports ----
+
+    async def _group(self, key: str, match: Optional[dict] = None, limit: int = 0) -> List[dict]:
+        pipeline = [
+            {"$match": match or {}},
+            {"$group": {
+                "_id": f"${key}",
+                "lines": {"$sum": 1},
+                "items_sold": {"$sum": "$quantity"},
+                "revenue": {"$sum": "$amount"},
+                "orders": {"$addToSet": "$order_id"},
+            }},
+            {"$project": {"lines": 1, "items_sold": 1, "revenue": 1, "order_count": {"$size": "$orders"}}},
+            {"$sort": {"revenue": -1}},
+        ]
+        if limit:
+            pipeline.append({"$limit": limit})
+        return await self.col.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+    async def category_report(self, since_day: Optional[str] = None) -> List[dict]:
+        match = {"product_found": True}
+        if since_day:
+            match["day"] = {"$gte": since_day}
+        return await self._group("category_name", match)
+
+    async def seller_report(self, limit: int = 10, since_day: Optional[str] = None) -> List[dict]:
+        match = {"seller_id": {"$ne": None}}
+        if since_day:
+            match["day"] = {"$gte": since_day}
+        return await self._group("seller_id", match, limit)
+
+    async def product_report(self, limit: int = 10, since_day: Optional[str] = None) -> List[dict]:
+        match = {"day": {"$gte": since_day}} if since_day else {}
+        return await self._group("product_id", match, limit)
+
+
+async def record_order_facts(db, order: dict):
+    """Order creation hook - never fails the caller"""
+    try:
+        await OrderFactsRepo(db).upsert_orders([order])
+    except Exception as e:
+        logger.warning(f"Order facts write failed for {order.get('id')}: {e}")
+
+
+async def sync_order_status(db, order_id: str, status: Optional[str] = None, payment_status: Optional[str] = None):
+    """Status transition hook - never fails the caller"""
+    try:
+        await OrderFactsRepo(db).sync_status(order_id, status=status, payment_status=payment_status)
+    except Exception as e:
+        logger.warning(f"Order facts status sync failed for {order_id}: {e}")
+
+
+async def _main():
+    import argparse
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Backfill order_line_facts")
+    parser.add_argument("--since-days", type=int, default=None)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent.parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "marketplace_db")]
+    result = await OrderFactsRepo(db).backfill(since_days=args.since_days)
+    logger.info(f"Order facts backfill: {result}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,224 @@
+"""
+O18: Product Performance Engine (set-based)
+
+Replaces the per-product query loop (carts/orders/favorites per product)
+with three set-based passes joined in memory by product id:
+- orders:    $unwind items -> $group (day, product_id) into product_sales_daily
+- carts:     $unwind items -> $group product_id (current cart quantity)
+- favorites: $unwind products -> $group product_id (wishlist count)
+
+Sales buckets are refreshed incrementally (from the last synced day);
+carts/favorites are current-state snapshots and are always recomputed.
+Only published products are ranked. Top-K rows per window are cached in
+product_performance under a run id; analytics_state points readers at the
+newest complete run and older runs are deleted after the switch, so readers
+never see a half-written table.
+"""
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List
+import heapq
+import logging
+import uuid
+
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from core.dates import range_q, day_expr
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 50
+CACHE_TTL_SEC = 15 * 60
+STATE_ID = "product_sales"
+ACTIVE_PRODUCT_Q = {"status": "published"}
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def day_str(d) -> str:
+    return d.strftime("%Y-%m-%d")
+
+
+class ProductPerformanceEngine:
+    def __init__(self, db):
+        self.db = db
+        self.orders = db["orders"]
+        self.carts = db["carts"]
+        self.favorites = db["favorites"]
+        self.products = db["products"]
+        self.sales = db["product_sales_daily"]
+        self.table = db["product_performance"]
+        self.state = db["analytics_state"]
+
+    async def ensure_indexes(self):
+        await self.sales.create_index([("day", 1), ("product_id", 1)], unique=True)
+        # Rows of several runs coexist until the older ones are deleted
+        try:
+            await self.table.drop_index("days_1_product_id_1")
+        except OperationFailure:
+            pass
+        await self.table.create_index([("days", 1), ("run_id", 1), ("product_id", 1)], unique=True)
+        await self.table.create_index([("days", 1), ("run_id", 1), ("rank", 1)])
+
+    async def get(self, days: int = 30, top_k: int = TOP_K) -> List[dict]:
+        """Cached top-K rows for the window; refreshed inline when stale"""
+        meta = await self.state.find_one({"_id": f"product_performance:{days}"})
+        fresh = False
+        if meta and meta.get("run_id") and meta.get("top_k", 0) >= top_k:
+            computed = datetime.fromisoformat(meta["computed_at"])
+            fresh = (utcnow() - computed).total_seconds() < CACHE_TTL_SEC
+
+        if not fresh:
+            await self.refresh(days, top_k)
+            # An overlapping newer refresh may already have replaced this run
+            meta = await self.state.find_one({"_id": f"product_performance:{days}"})
+        run_id = meta["run_id"]
+        cur = self.table.find(
+            {"days": days, "run_id": run_id}, {"_id": 0, "days": 0, "run_id": 0, "rank": 0}
+        ).sort("rank", 1).limit(top_k)
+        return [r async for r in cur]
+
+    async def refresh(self, days: int = 30, top_k: int = TOP_K) -> dict:
+        await self.ensure_indexes()
+        today = utcnow().date()
+        window_from = day_str(today - timedelta(days=days))
+        await self._sync_sales(window_from)
+
+        sold = await self._sales_by_product(window_from)
+        in_cart = await self._cart_quantities()
+        in_wishlist = await self._wishlist_counts()
+
+        # Rank only products that still exist and are published
+        candidates = set(sold) | set(in_cart) | set(in_wishlist)
+        active = set()
+        if candidates:
+            async for p in self.products.find({"id": {"$in": list(candidates)}, **ACTIVE_PRODUCT_Q}, {"_id": 0, "id": 1}):
+                active.add(p["id"])
+        top = heapq.nlargest(
+            top_k, active,
+            key=lambda pid: ((sold.get(pid) or {}).get("revenue", 0), (sold.get(pid) or {}).get("sold", 0))
+        )
+
+        # Product details: one $in query for the top-K
+        products = {}
+        async for p in self.products.find({"id": {"$in": top}}, {"_id": 0}):
+            products[p["id"]] = p
+        top = [pid for pid in top if pid in products]
+
+        # Sortable by time: the newest run wins when refreshes overlap
+        computed_at = utcnow().isoformat()
+        run_id = f"{computed_at}:{uuid.uuid4().hex[:8]}"
+        rows = []
+        for rank, pid in enumerate(top):
+            product = products[pid]
+            s = sold.get(pid) or {}
+            total_sold = s.get("sold", 0)
+            cart_qty = in_cart.get(pid, 0)
+            rows.append({
+                "days": days,
+                "run_id": run_id,
+                "rank": rank,
+                "product_id": pid,
+                "product_name": product.get("title", "Unknown"),
+                "category": product.get("category_name", "N/A"),
+                "price": product.get("price", 0),
+                "stock": product.get("stock_level", 0),
+                "in_cart": cart_qty,
+                "in_wishlist": in_wishlist.get(pid, 0),
+                "total_sold": total_sold,
+                "revenue": s.get("revenue", 0),
+                "cart_to_purchase_rate": (total_sold / cart_qty * 100) if cart_qty > 0 else 0
+            })
+
+        # Write the new run, point readers at it, then drop the older runs
+        await self._insert_ignoring_dups(self.table, rows)
+        await self.state.update_one(
+            {"_id": f"product_performance:{days}"},
+            {"$max": {"run_id": run_id, "computed_at": computed_at},
+             "$set": {"top_k": top_k, "rows": len(rows)}},
+            upsert=True
+        )
+        await self.table.delete_many({"days": days, "$or": [{"run_id": {"$lt": run_id}}, {"run_id": {"$exists": False}}]})
+        return {"ok": True, "days": days, "run_id": run_id, "rows": len(rows), "candidates": len(candidates)}
+
+    async def _sync_sales(self, window_from: str):
+        """Recompute daily sales buckets from the last synced day (or window start)"""
+        state = await self.state.find_one({"_id": STATE_ID}) or {}
+        covered_from = state.get("covered_from")
+        synced_day = state.get("synced_day")
+
+        if not covered_from or window_from < covered_from:
+            from_day = window_from
+        else:
+            from_day = synced_day or window_from
+
+        pipeline = [
+            {"$match": range_q("created_at", from_day)},
+            {"$project": {"_id": 0, "day": day_expr("created_at"), "items": 1}},
+            {"$unwind": "$items"},
+            {"$group": {
+                "_id": {"day": "$day", "product_id": "$items.product_id"},
+                "sold": {"$sum": "$items.quantity"},
+                "revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+                "orders": {"$sum": 1},
+            }},
+        ]
+        docs = [
+            {
+                "day": r["_id"]["day"],
+                "product_id": r["_id"]["product_id"],
+                "sold": r["sold"] or 0,
+                "revenue": r["revenue"] or 0,
+                "orders": r["orders"],
+            }
+            async for r in self.orders.aggregate(pipeline)
+            if r["_id"].get("product_id")
+        ]
+
+        # Replace the recomputed day range
+        await self.sales.delete_many({"day": {"$gte": from_day}})
+        await self._insert_ignoring_dups(self.sales, docs)
+
+        await self.state.update_one(
+            {"_id": STATE_ID},
+            {"$set": {
+                "covered_from": min(covered_from or from_day, from_day),
+                "synced_day": day_str(utcnow()),
+                "updated_at": utcnow().isoformat()
+            }},
+            upsert=True
+        )
+
+    async def _insert_ignoring_dups(self, col, docs: List[dict]):
+        # A concurrent refresh (job + inline cache miss) may insert the same rows
+        if not docs:
+            return
+        try:
+            await col.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            if any(w.get("code") != 11000 for w in e.details.get("writeErrors", [])):
+                raise
+
+    async def _sales_by_product(self, window_from: str) -> Dict[str, dict]:
+        pipeline = [
+            {"$match": {"day": {"$gte": window_from}}},
+            {"$group": {"_id": "$product_id", "sold": {"$sum": "$sold"}, "revenue": {"$sum": "$revenue"}}},
+        ]
+        return {r["_id"]: r async for r in self.sales.aggregate(pipeline)}
+
+    async def _cart_quantities(self) -> Dict[str, int]:
+        pipeline = [
+            {"$match": {"items.0": {"$exists": True}}},
+            {"$unwind": "$items"},
+            {"$group": {"_id": "$items.product_id", "qty": {"$sum": "$items.quantity"}}},
+        ]
+        return {r["_id"]: r["qty"] or 0 async for r in self.carts.aggregate(pipeline) if r["_id"]}
+
+    async def _wishlist_counts(self) -> Dict[str, int]:
+        pipeline = [
+            {"$project": {"products": {"$setUnion": [{"$ifNull": ["$products", []]}, []]}}},
+            {"$unwind": "$products"},
+            {"$group": {"_id": "$products", "count": {"$sum": 1}}},
+        ]
+        return {r["_id"]: r["count"] async for r in self.favorites.aggregate(pipeline) if r["_id"]}
@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 import uuid
 
 from core.db import db
+from modules.catalog.dimensions import invalidate_sellers
 from core.security import (
     verify_password, 
     get_password_hash, 
@@ -95,6 +96,7 @@ async def update_profile(
             {"id": current_user["id"]},
             {"$set": update_dict}
         )
+        invalidate_sellers(current_user["id"])
     
     updated_user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
     return UserResponse(**{k: v for k, v in updated_user.items() if k != "hashed_password"})
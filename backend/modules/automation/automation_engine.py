@@ -1,17 +1,41 @@
 """
 O11: Smart Automation Engine
 Auto-VIP, Auto-RISK, Delay Alerts, Notification Health
+
+Each rule selects its candidates with one query and returns "hits"
+(dedupe key, optional customer update, alert). Hits are executed either
+per row (once -> update_one -> enqueue) or, by default, in bulk mode:
+- one $in lookup against automation_events, one insert_many to claim keys
+- customer changes in one unordered bulk_write
+- one digest alert per rule (a single hit keeps its original alert)
+Per-rule timings and row counts are returned in `timings`.
 """
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone, timedelta
+from typing import List
+import hashlib
 import logging
+import time
+
+from pymongo import UpdateOne
 
+from core.dates import range_q
 from modules.bot.bot_settings_repo import BotSettingsRepo
 from modules.bot.bot_alerts_repo import BotAlertsRepo
 from .automation_repo import AutomationEventsRepo
 
 logger = logging.getLogger(__name__)
 
+DIGEST_MAX_LINES = 30
+
+DIGEST_TITLES = {
+    "VIP_UPGRADE": "⭐ <b>Авто-VIP</b>",
+    "RISK_MARK": "⚠️ <b>Авто-RISK</b>",
+    "DELAY_ALERT": "⏳ <b>Затримки доставки</b>",
+    "NOTIF_FAIL_ALERT": "🚨 <b>Збої сповіщень</b>",
+    "AUTO_BLOCK": "🛑 <b>Авто-блокування клієнтів</b>",
+}
+
 
 def utcnow_dt():
     return datetime.now(timezone.utc)
@@ -27,6 +51,15 @@ def hours_between(iso_a: str, iso_b: str) -> float:
         return 0
 
 
+def hit(rule: str, dedupe: str, entity: str, alert_type: str, text: str, line: str,
+        update: tuple = None, reply_markup: dict = None) -> dict:
+    """One rule match: update is (filter, update) on customers or None"""
+    return {
+        "rule": rule, "dedupe": dedupe, "entity": entity, "update": update,
+        "alert_type": alert_type, "text": text, "line": line, "reply_markup": reply_markup,
+    }
+
+
 class AutomationEngine:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
@@ -50,47 +83,107 @@ class AutomationEngine:
             return {"ok": True, "skipped": True, "reason": "automation_disabled"}
 
         await self.init()
-        
-        results = {
-            "vip_upgrades": 0,
-            "risk_marks": 0,
-            "delay_alerts": 0,
-            "notif_alerts": 0,
-            "auto_blocks": 0
-        }
+        bulk = auto.get("bulk", True)
 
-        # 1) VIP upgrades
         vip_cfg = auto.get("vip") or {}
-        if vip_cfg.get("enabled", True):
-            results["vip_upgrades"] = await self._vip_upgrade(vip_cfg)
-
-        # 2) RISK marks
         risk_cfg = auto.get("risk") or {}
-        if risk_cfg.get("enabled", True):
-            results["risk_marks"] = await self._risk_mark(risk_cfg)
-
-        # 3) Delivery delay alerts
         delay_cfg = auto.get("delay") or {}
-        if delay_cfg.get("enabled", True):
-            results["delay_alerts"] = await self._delay_alert(delay_cfg)
+        block_cfg = auto.get("auto_block") or {}
 
-        # 4) Notification fail alerts
-        if risk_cfg.get("enabled", True):
-            results["notif_alerts"] = await self._notif_fail_alert(risk_cfg)
+        rules = [
+            # (result key, rule, enabled, candidate selector)
+            ("vip_upgrades", "VIP_UPGRADE", vip_cfg.get("enabled", True), lambda: self._vip_upgrade(vip_cfg)),
+            ("risk_marks", "RISK_MARK", risk_cfg.get("enabled", True), lambda: self._risk_mark(risk_cfg)),
+            ("delay_alerts", "DELAY_ALERT", delay_cfg.get("enabled", True), lambda: self._delay_alert(delay_cfg)),
+            ("notif_alerts", "NOTIF_FAIL_ALERT", risk_cfg.get("enabled", True), lambda: self._notif_fail_alert(risk_cfg)),
+            ("auto_blocks", "AUTO_BLOCK", block_cfg.get("enabled", False), lambda: self._auto_block(block_cfg)),
+        ]
 
-        # 5) Auto-block (optional)
-        block_cfg = auto.get("auto_block") or {}
-        if block_cfg.get("enabled", False):
-            results["auto_blocks"] = await self._auto_block(block_cfg)
+        results = {"bulk": bulk}
+        timings = {}
+        for key, rule, enabled, select in rules:
+            results[key] = 0
+            if not enabled:
+                continue
+            t0 = time.monotonic()
+            hits = await select()
+            t_select = time.monotonic()
+            if bulk:
+                stats = await self._execute_bulk(rule, hits)
+            else:
+                stats = await self._execute_rows(hits)
+            results[key] = stats["applied"]
+            timings[rule] = {
+                "candidates": len(hits),
+                **stats,
+                "select_ms": int((t_select - t0) * 1000),
+                "total_ms": int((time.monotonic() - t0) * 1000),
+            }
 
         logger.info(f"🤖 Automation run: {results}")
-        return {"ok": True, **results}
+        return {"ok": True, **results, "timings": timings}
 
-    async def _vip_upgrade(self, cfg: dict) -> int:
+    # ---- Execution ----
+
+    async def _execute_rows(self, hits: List[dict]) -> dict:
+        """Per-row mode: once -> update_one -> enqueue for each hit"""
+        applied = 0
+        for h in hits:
+            first = await self.repo.once(h["dedupe"], {"rule": h["rule"], "entity": h["entity"]})
+            if not first:
+                continue
+            if h["update"]:
+                await self.customers.update_one(*h["update"])
+            await self.alerts.enqueue(h["alert_type"], h["text"], h["dedupe"], reply_markup=h["reply_markup"])
+            applied += 1
+        return {"applied": applied, "updates": applied, "alerts": applied}
+
+    async def _execute_bulk(self, rule: str, hits: List[dict]) -> dict:
+        """Bulk mode: $in dedupe, insert_many claim, bulk_write updates, one digest"""
+        if not hits:
+            return {"applied": 0, "updates": 0, "alerts": 0}
+
+        seen = await self.repo.seen([h["dedupe"] for h in hits])
+        fresh = [h for h in hits if h["dedupe"] not in seen]
+        claimed = await self.repo.once_many([
+            (h["dedupe"], {"rule": h["rule"], "entity": h["entity"]}) for h in fresh
+        ])
+        new = [h for h in fresh if h["dedupe"] in claimed]
+        if not new:
+            return {"applied": 0, "updates": 0, "alerts": 0}
+
+        ops = [UpdateOne(*h["update"]) for h in new if h["update"]]
+        if ops:
+            await self.customers.bulk_write(ops, ordered=False)
+
+        alerts = await self.alerts.enqueue_many([self._digest(rule, new)])
+        return {"applied": len(new), "updates": len(ops), "alerts": alerts}
+
+    def _digest(self, rule: str, hits: List[dict]) -> dict:
+        if len(hits) == 1:
+            h = hits[0]
+            return {"type": h["alert_type"], "text": h["text"], "dedupe_key": h["dedupe"], "reply_markup": h["reply_markup"]}
+
+        keys = sorted(h["dedupe"] for h in hits)
+        digest_id = hashlib.sha1("\n".join(keys).encode()).hexdigest()[:16]
+        lines = [f"• {h['line']}" for h in hits[:DIGEST_MAX_LINES]]
+        if len(hits) > DIGEST_MAX_LINES:
+            lines.append(f"… та ще {len(hits) - DIGEST_MAX_LINES}")
+        text = f"{DIGEST_TITLES.get(rule, rule)}: {len(hits)}\n\n" + "\n".join(lines)
+        return {
+            "type": hits[0]["alert_type"],
+            "text": text,
+            "dedupe_key": f"DIGEST:{rule}:{digest_id}",
+            "payload": {"count": len(hits), "entities": [h["entity"] for h in hits]},
+        }
+
+    # ---- Rules (candidate selection) ----
+
+    async def _vip_upgrade(self, cfg: dict) -> List[dict]:
         """Auto-upgrade customers to VIP based on LTV/delivered count"""
         ltv = float(cfg.get("ltv_uah", 20000))
         delivered_need = int(cfg.get("delivered_count", 10))
-        count = 0
+        hits = []
 
         cur = self.customers.find({
             "is_blocked": {"$ne": True},
@@ -99,114 +192,83 @@ class AutomationEngine:
                 {"total_spent": {"$gte": ltv}},
                 {"delivered_count": {"$gte": delivered_need}}
             ]
-        }, {"_id": 0})
+        }, {"_id": 0, "phone": 1, "total_spent": 1, "delivered_count": 1})
 
         async for c in cur:
             phone = c["phone"]
-            dedupe = f"VIP_UPGRADE:{phone}:{ltv}:{delivered_need}"
-            
-            first = await self.repo.once(dedupe, {
-                "rule": "VIP_UPGRADE",
-                "entity": f"customer:{phone}"
-            })
-            
-            if not first:
-                continue
-
-            # Update customer
-            tags = list(set((c.get("tags") or []) + ["VIP"]))
-            await self.customers.update_one(
-                {"phone": phone},
-                {"$set": {"tags": tags, "segment": "VIP"}}
-            )
-
-            # Send alert
+            spent = float(c.get("total_spent", 0))
+            delivered = int(c.get("delivered_count", 0))
             text = (
                 f"⭐ <b>Авто-VIP</b>\n\n"
                 f"Клієнт: <code>{phone}</code>\n"
-                f"LTV: {float(c.get('total_spent', 0)):.2f} грн\n"
-                f"Доставок: {int(c.get('delivered_count', 0))}\n\n"
+                f"LTV: {spent:.2f} грн\n"
+                f"Доставок: {delivered}\n\n"
                 f"Дія: сегмент → VIP, тег → VIP"
             )
-            await self.alerts.enqueue("VIP_UPGRADE", text, dedupe)
-            count += 1
+            hits.append(hit(
+                "VIP_UPGRADE", f"VIP_UPGRADE:{phone}:{ltv}:{delivered_need}", f"customer:{phone}",
+                "VIP_UPGRADE", text, f"<code>{phone}</code> LTV {spent:.2f} грн, доставок {delivered}",
+                update=({"phone": phone}, {"$addToSet": {"tags": "VIP"}, "$set": {"segment": "VIP"}}),
+            ))
 
-        return count
+        return hits
 
-    async def _risk_mark(self, cfg: dict) -> int:
+    async def _risk_mark(self, cfg: dict) -> List[dict]:
         """Auto-mark customers as RISK based on returns"""
         returns_need = int(cfg.get("returns_count", 2))
-        count = 0
+        hits = []
 
         cur = self.customers.find({
             "returned_count": {"$gte": returns_need},
             "is_blocked": {"$ne": True},
             "segment": {"$ne": "RISK"}
-        }, {"_id": 0})
+        }, {"_id": 0, "phone": 1, "returned_count": 1})
 
         async for c in cur:
             phone = c["phone"]
-            dedupe = f"RISK_MARK:{phone}:{returns_need}"
-            
-            first = await self.repo.once(dedupe, {
-                "rule": "RISK_MARK",
-                "entity": f"customer:{phone}"
-            })
-            
-            if not first:
-                continue
-
-            tags = list(set((c.get("tags") or []) + ["RISK"]))
-            await self.customers.update_one(
-                {"phone": phone},
-                {"$set": {"tags": tags, "segment": "RISK"}}
-            )
-
+            returned = int(c.get("returned_count", 0))
             text = (
                 f"⚠️ <b>Авто-RISK</b>\n\n"
                 f"Клієнт: <code>{phone}</code>\n"
-                f"Повернень: {int(c.get('returned_count', 0))}\n\n"
+                f"Повернень: {returned}\n\n"
                 f"Дія: сегмент → RISK, тег → RISK"
             )
-            await self.alerts.enqueue("RISK_MARK", text, dedupe)
-            count += 1
+            hits.append(hit(
+                "RISK_MARK", f"RISK_MARK:{phone}:{returns_need}", f"customer:{phone}",
+                "RISK_MARK", text, f"<code>{phone}</code> повернень {returned}",
+                update=({"phone": phone}, {"$addToSet": {"tags": "RISK"}, "$set": {"segment": "RISK"}}),
+            ))
 
-        return count
+        return hits
 
-    async def _delay_alert(self, cfg: dict) -> int:
+    async def _delay_alert(self, cfg: dict) -> List[dict]:
         """Alert on delayed deliveries"""
         hours_thr = float(cfg.get("hours", 48))
-        count = 0
-        now_iso = utcnow_dt().isoformat()
+        now = utcnow_dt()
+        now_iso = now.isoformat()
+        hits = []
 
+        # Threshold applied in the query: only shipments older than hours_thr
         cur = self.orders.find({
             "status": "SHIPPED",
             "shipment.provider": "NOVAPOSHTA",
             "shipment.ttn": {"$exists": True},
-            "shipment.created_at": {"$exists": True},
-        }, {"_id": 0})
+            **range_q("shipment.created_at", lte=now - timedelta(hours=hours_thr)),
+        }, {"_id": 0, "id": 1, "shipment.ttn": 1, "shipment.created_at": 1})
 
         async for o in cur:
             shipped_at = o.get("shipment", {}).get("created_at")
             if not shipped_at:
                 continue
 
+            if isinstance(shipped_at, datetime):
+                shipped_at = shipped_at.isoformat()
             h = hours_between(shipped_at, now_iso)
             if h < hours_thr:
                 continue
 
             order_id = o["id"]
             ttn = o.get("shipment", {}).get("ttn")
-            dedupe = f"DELAY_ALERT:{order_id}:{int(hours_thr)}"
-            
-            first = await self.repo.once(dedupe, {
-                "rule": "DELAY_ALERT",
-                "entity": f"order:{order_id}"
-            })
-            
-            if not first:
-                continue
-
             text = (
                 f"⏳ <b>Затримка доставки</b>\n\n"
                 f"Замовлення: <code>{order_id}</code>\n"
@@ -223,46 +285,31 @@ class AutomationEngine:
                     ]
                 ]
             }
-            
-            await self.alerts.enqueue(
-                "ЗАТРИМКА_ДОСТАВКИ", 
-                text, 
-                dedupe,
-                reply_markup=keyboard
-            )
-            count += 1
+            hits.append(hit(
+                "DELAY_ALERT", f"DELAY_ALERT:{order_id}:{int(hours_thr)}", f"order:{order_id}",
+                "ЗАТРИМКА_ДОСТАВКИ", text, f"<code>{order_id}</code> ТТН <code>{ttn}</code> ~{h:.1f} год",
+                reply_markup=keyboard,
+            ))
 
-        return count
+        return hits
 
-    async def _notif_fail_alert(self, cfg: dict) -> int:
+    async def _notif_fail_alert(self, cfg: dict) -> List[dict]:
         """Alert on notification failure streaks"""
         streak_thr = int(cfg.get("notif_fail_streak", 5))
-        count = 0
         now = utcnow_dt()
         hour_ago = (now - timedelta(hours=1)).isoformat()
+        hits = []
 
         pipeline = [
             {"$match": {"created_at": {"$gte": hour_ago}, "status": "FAILED"}},
             {"$group": {"_id": "$channel", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gte": streak_thr}}},
         ]
         
         rows = await self.notifs.aggregate(pipeline).to_list(length=10)
 
         for r in rows:
-            if int(r["count"]) < streak_thr:
-                continue
-            
             channel = r["_id"]
-            dedupe = f"NOTIF_FAIL_ALERT:{channel}:{hour_ago[:13]}:{streak_thr}"
-            
-            first = await self.repo.once(dedupe, {
-                "rule": "NOTIF_FAIL_ALERT",
-                "entity": f"channel:{channel}"
-            })
-            
-            if not first:
-                continue
-
             text = (
                 f"🚨 <b>Збої сповіщень</b>\n\n"
                 f"Канал: <b>{channel}</b>\n"
@@ -270,45 +317,36 @@ class AutomationEngine:
                 f"Поріг: {streak_thr}\n\n"
                 f"Дія: перевірити креденшіали/ліміти провайдера"
             )
-            await self.alerts.enqueue("NOTIF_FAIL_ALERT", text, dedupe)
-            count += 1
+            hits.append(hit(
+                "NOTIF_FAIL_ALERT", f"NOTIF_FAIL_ALERT:{channel}:{hour_ago[:13]}:{streak_thr}", f"channel:{channel}",
+                "NOTIF_FAIL_ALERT", text, f"<b>{channel}</b>: FAILED {int(r['count'])} (поріг {streak_thr})",
+            ))
 
-        return count
+        return hits
 
-    async def _auto_block(self, cfg: dict) -> int:
+    async def _auto_block(self, cfg: dict) -> List[dict]:
         """Auto-block customers with too many returns"""
         returns_thr = int(cfg.get("returns_count", 3))
-        count = 0
+        hits = []
 
         cur = self.customers.find({
             "returned_count": {"$gte": returns_thr},
             "is_blocked": {"$ne": True},
-        }, {"_id": 0})
+        }, {"_id": 0, "phone": 1, "returned_count": 1})
 
         async for c in cur:
             phone = c["phone"]
-            dedupe = f"AUTO_BLOCK:{phone}:{returns_thr}"
-            
-            first = await self.repo.once(dedupe, {
-                "rule": "AUTO_BLOCK",
-                "entity": f"customer:{phone}"
-            })
-            
-            if not first:
-                continue
-
-            await self.customers.update_one(
-                {"phone": phone},
-                {"$set": {"is_blocked": True}}
-            )
-            
+            returned = int(c.get("returned_count", 0))
             text = (
                 f"🛑 <b>Авто-блокування клієнта</b>\n\n"
                 f"Клієнт: <code>{phone}</code>\n"
-                f"Повернень: {int(c.get('returned_count', 0))} (поріг {returns_thr})\n\n"
+                f"Повернень: {returned} (поріг {returns_thr})\n\n"
                 f"Дія: is_blocked = True"
             )
-            await self.alerts.enqueue("AUTO_BLOCK", text, dedupe)
-            count += 1
+            hits.append(hit(
+                "AUTO_BLOCK", f"AUTO_BLOCK:{phone}:{returns_thr}", f"customer:{phone}",
+                "AUTO_BLOCK", text, f"<code>{phone}</code> повернень {returned}",
+                update=({"phone": phone}, {"$set": {"is_blocked": True}}),
+            ))
 
-        return count
+        return hits
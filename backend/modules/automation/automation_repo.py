@@ -3,6 +3,9 @@ O11: Automation Events Repository (idempotency)
 """
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone
+from typing import List, Set, Tuple
+
+from pymongo.errors import BulkWriteError
 
 
 def utcnow():
@@ -29,3 +32,29 @@ class AutomationEventsRepo:
             return True
         except Exception:
             return False
+
+    async def seen(self, keys: List[str]) -> Set[str]:
+        """Dedupe keys already recorded (one $in lookup)"""
+        if not keys:
+            return set()
+        cur = self.col.find({"dedupe_key": {"$in": keys}}, {"_id": 0, "dedupe_key": 1})
+        return {d["dedupe_key"] async for d in cur}
+
+    async def once_many(self, items: List[Tuple[str, dict]]) -> Set[str]:
+        """
+        Bulk once(): one unordered insert_many.
+        Returns the dedupe keys inserted by this call (a concurrent run
+        that won the race shows up as a duplicate-key error and is dropped).
+        """
+        docs = [{**doc, "dedupe_key": key, "created_at": utcnow()} for key, doc in items]
+        if not docs:
+            return set()
+        inserted = {d["dedupe_key"] for d in docs}
+        try:
+            await self.col.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for w in e.details.get("writeErrors", []):
+                if w.get("code") != 11000:
+                    raise
+                inserted.discard(docs[w["index"]]["dedupe_key"])
+        return inserted
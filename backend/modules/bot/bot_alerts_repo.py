@@ -4,7 +4,9 @@ O9: Admin Alerts Queue Repository
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone, timedelta
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from pymongo.errors import BulkWriteError
 
 def utcnow():
     return datetime.now(timezone.utc).isoformat()
@@ -52,6 +54,37 @@ class BotAlertsRepo:
             existing = await self.col.find_one({"dedupe_key": dedupe_key}, {"_id": 0})
             return {"inserted": False, "doc": existing}
 
+    async def enqueue_many(self, alerts: List[Dict[str, Any]]) -> int:
+        """
+        Bulk enqueue: alerts are dicts with type, text, dedupe_key and
+        optional payload/reply_markup. Duplicates are skipped.
+        Returns the number of alerts inserted.
+        """
+        now = utcnow()
+        docs = [{
+            "id": str(uuid.uuid4()),
+            "type": a["type"],
+            "text": a["text"],
+            "payload": a.get("payload") or {},
+            "reply_markup": a.get("reply_markup"),
+            "dedupe_key": a["dedupe_key"],
+            "status": "PENDING",
+            "attempts": 0,
+            "next_retry_at": None,
+            "created_at": now,
+            "updated_at": now,
+        } for a in alerts]
+        if not docs:
+            return 0
+        try:
+            result = await self.col.insert_many(docs, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(w.get("code") != 11000 for w in errors):
+                raise
+            return e.details.get("nInserted", len(docs) - len(errors))
+
     async def pick(self, limit: int = 50) -> list:
         """Pick pending or ready-to-retry alerts"""
         now = utcnow()
@@ -30,6 +30,7 @@ from modules.bot.wizards.broadcast_wizard import BroadcastWizard
 from modules.bot.wizards.incidents_wizard import IncidentsWizard
 
 from modules.automation.automation_engine import AutomationEngine
+from modules.jobs.job_lease_repo import JobLeaseRepo
 
 # O20.2: Pickup Control Handler
 from modules.bot.handlers.pickup_control_handler import router as pickup_control_router
@@ -85,6 +86,7 @@ incidents_wizard = IncidentsWizard(db)
 # Workers
 alerts_worker = AlertsWorker(db, TOKEN)
 automation_engine = AutomationEngine(db)
+lease_repo = JobLeaseRepo(db)
 
 
 # ============= DEBUG HANDLER (first to catch all) =============
@@ -449,9 +451,12 @@ async def menu_risk_scores(message: types.Message):
 async def menu_analytics(message: types.Message):
     """Analytics intelligence - daily KPIs"""
     from datetime import datetime, timezone, timedelta
+    from core.dates import range_q
     
-    today = datetime.now(timezone.utc).date().isoformat()
-    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).date().isoformat()
+    now = datetime.now(timezone.utc)
+    today = now.date().isoformat()
+    yesterday = (now - timedelta(days=1)).date().isoformat()
+    since_midnight = range_q("created_at", gte=now.replace(hour=0, minute=0, second=0, microsecond=0))
     
     # Get today's analytics
     today_stats = await db["analytics_daily"].find_one({"date": today}, {"_id": 0})
@@ -460,19 +465,15 @@ async def menu_analytics(message: types.Message):
     # Fallback to real-time if no daily snapshot
     if not today_stats:
         # Calculate real-time
-        orders_today = await db["orders"].count_documents({
-            "created_at": {"$gte": today}
-        })
+        orders_today = await db["orders"].count_documents(since_midnight)
         revenue_pipeline = [
-            {"$match": {"created_at": {"$gte": today}, "payment_status": {"$in": ["paid", "completed"]}}},
+            {"$match": {**since_midnight, "payment_status": {"$in": ["paid", "completed"]}}},
             {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
         ]
         rev_result = await db["orders"].aggregate(revenue_pipeline).to_list(1)
         revenue_today = rev_result[0]["total"] if rev_result else 0
         
-        customers_today = await db["users"].count_documents({
-            "created_at": {"$gte": today}
-        })
+        customers_today = await db["users"].count_documents(since_midnight)
         
         today_stats = {
             "orders": orders_today,
@@ -845,11 +846,19 @@ async def automation_loop():
     await automation_engine.init()
     logger.info("🤖 Automation engine started")
     
+    # O21: share the job runner lock so API/worker processes don't run it concurrently
+    lock_name = "job:automation_engine"
+    owner = f"bot:{os.getpid()}"
+
     while True:
         try:
-            result = await automation_engine.run_once()
-            if not result.get("skipped"):
-                logger.info(f"Automation run: {result}")
+            if await lease_repo.acquire(lock_name, owner, 120):
+                try:
+                    result = await automation_engine.run_once()
+                finally:
+                    await lease_repo.release(lock_name, owner)
+                if not result.get("skipped"):
+                    logger.info(f"Automation run: {result}")
         except Exception as e:
             logger.error(f"Automation engine error: {e}")
         
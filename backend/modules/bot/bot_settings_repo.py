@@ -4,6 +4,8 @@ O9: Bot Settings Repository
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import os
 
+from core.runtime_config import ConfigSection, ConfigSnapshot, bump_config, get_config, register_section
+
 DEFAULT_SETTINGS = {
     "id": "global",
     "enabled": True,
@@ -41,33 +43,47 @@ DEFAULT_SETTINGS = {
         "auto_block": {
             "enabled": False,
             "returns_count": 3
-        }
+        },
+        "bulk": True
     }
 }
 
 
+async def _load_settings(db) -> dict:
+    col = db["bot_settings"]
+    doc = await col.find_one({"id": "global"}, {"_id": 0})
+    if not doc:
+        # Initialize with defaults + env chat IDs
+        defaults = dict(DEFAULT_SETTINGS)
+        
+        # Parse env vars
+        chat_ids = os.getenv("TELEGRAM_ADMIN_CHAT_IDS", "")
+        user_ids = os.getenv("TELEGRAM_ADMIN_USER_IDS", "")
+        
+        if chat_ids:
+            defaults["admin_chat_ids"] = [x.strip() for x in chat_ids.split(",") if x.strip()]
+        if user_ids:
+            defaults["admin_user_ids"] = [int(x.strip()) for x in user_ids.split(",") if x.strip()]
+        
+        await col.insert_one(dict(defaults))
+        return defaults
+    return doc
+
+
+register_section(ConfigSection("bot", _load_settings, DEFAULT_SETTINGS))
+
+
 class BotSettingsRepo:
     def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
         self.col = db["bot_settings"]
 
+    async def snapshot(self) -> ConfigSnapshot:
+        """Cached settings (read-only) + version, see core.runtime_config"""
+        return await get_config(self.db, "bot")
+
     async def get(self) -> dict:
-        doc = await self.col.find_one({"id": "global"}, {"_id": 0})
-        if not doc:
-            # Initialize with defaults + env chat IDs
-            defaults = dict(DEFAULT_SETTINGS)
-            
-            # Parse env vars
-            chat_ids = os.getenv("TELEGRAM_ADMIN_CHAT_IDS", "")
-            user_ids = os.getenv("TELEGRAM_ADMIN_USER_IDS", "")
-            
-            if chat_ids:
-                defaults["admin_chat_ids"] = [x.strip() for x in chat_ids.split(",") if x.strip()]
-            if user_ids:
-                defaults["admin_user_ids"] = [int(x.strip()) for x in user_ids.split(",") if x.strip()]
-            
-            await self.col.insert_one(defaults)
-            return defaults
-        return doc
+        return (await self.snapshot()).copy()
 
     async def update(self, data: dict):
         await self.col.update_one(
@@ -75,27 +91,32 @@ class BotSettingsRepo:
             {"$set": data}, 
             upsert=True
         )
+        await bump_config(self.db, "bot")
 
     async def update_threshold(self, key: str, value):
         await self.col.update_one(
             {"id": "global"},
             {"$set": {f"thresholds.{key}": value}}
         )
+        await bump_config(self.db, "bot")
 
     async def toggle_alert(self, alert_type: str, enabled: bool):
         await self.col.update_one(
             {"id": "global"},
             {"$set": {f"alerts.{alert_type}": enabled}}
         )
+        await bump_config(self.db, "bot")
 
     async def add_chat_id(self, chat_id: str):
         await self.col.update_one(
             {"id": "global"},
             {"$addToSet": {"admin_chat_ids": chat_id}}
         )
+        await bump_config(self.db, "bot")
 
     async def add_user_id(self, user_id: int):
         await self.col.update_one(
             {"id": "global"},
             {"$addToSet": {"admin_user_ids": user_id}}
         )
+        await bump_config(self.db, "bot")
@@ -53,7 +53,8 @@ class BotSettings(BaseModel):
         "auto_block": {
             "enabled": False,
             "returns_count": 3
-        }
+        },
+        "bulk": True
     }
 
 class AdminAlert(BaseModel):
@@ -8,6 +8,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 
+from core.dates import day_of
+
 logger = logging.getLogger(__name__)
 
 router = Router()
@@ -158,7 +160,7 @@ async def cmd_return_find(message: types.Message):
     )
     
     if returns.get("updated_at"):
-        text += f"   Оновлено: {returns['updated_at'][:10]}\n"
+        text += f"   Оновлено: {day_of(returns['updated_at'])}\n"
     
     # Inline buttons
     buttons = [
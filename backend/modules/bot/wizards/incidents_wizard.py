@@ -6,6 +6,8 @@ from aiogram import types
 from datetime import datetime, timezone, timedelta
 import logging
 
+from core.dates import range_q
+
 from ..bot_sessions_repo import BotSessionsRepo
 from ..bot_audit_repo import BotAuditRepo
 from ..bot_actions_service import BotActionsService
@@ -60,9 +62,9 @@ class IncidentsWizard:
             })
         
         # 2) Failed notifications (last hour)
-        hour_ago = (now - timedelta(hours=1)).isoformat()
+        hour_ago = now - timedelta(hours=1)
         failed = await self.notifs.find(
-            {"status": "FAILED", "created_at": {"$gte": hour_ago}},
+            {"status": "FAILED", **range_q("created_at", gte=hour_ago)},
             {"_id": 0, "id": 1, "channel": 1, "to": 1}
         ).sort("created_at", -1).limit(10).to_list(10)
         
@@ -74,9 +76,9 @@ class IncidentsWizard:
             })
         
         # 3) Awaiting payment >24h
-        thr2 = (now - timedelta(hours=24)).isoformat()
+        thr2 = now - timedelta(hours=24)
         awaitpay = await self.orders.find(
-            {"status": "AWAITING_PAYMENT", "created_at": {"$lte": thr2}},
+            {"status": "AWAITING_PAYMENT", **range_q("created_at", lte=thr2)},
             {"_id": 0, "id": 1, "totals.grand": 1}
         ).sort("created_at", 1).limit(10).to_list(10)
         
@@ -11,6 +11,7 @@ import random
 import logging
 
 from core.db import db
+from modules.catalog.dimensions import invalidate_sellers
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/v2/cabinet", tags=["Cabinet V2"])
@@ -77,6 +78,7 @@ async def update_profile(request: Request):
     if update_data:
         update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
         await db.users.update_one({"id": user["id"]}, {"$set": update_data})
+        invalidate_sellers(user["id"])
     
     updated = await db.users.find_one({"id": user["id"]}, {"_id": 0, "password_hash": 0})
     return updated
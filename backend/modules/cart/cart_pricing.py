@@ -0,0 +1,324 @@
+"""
+O19: Cart pricing engine
+
+Prices a cart in one pass:
+- every line is resolved through one batched `products.find({"id": {"$in": ...}})`
+  behind a per-process product snapshot cache (CART_PRODUCT_CACHE_TTL_SEC);
+  only ids missing or expired in the cache go to Mongo
+- line totals, subtotal, the prepaid discount (with the A/B override when an
+  assignment unit is given) and the payment policy preview are computed
+  together and returned as a PricedCart (policy preview for COD and
+  FULL_PREPAID) with a `fingerprint` over everything that affects the
+  amount charged
+
+Priced carts are kept in memory by fingerprint for CART_PRICING_TTL_SEC.
+Checkout passes the fingerprint it showed the customer; when the cart lines
+still match, the priced lines are reused instead of re-reading products and
+only the payment policy / A/B discount is re-applied (no I/O besides the
+assignment). Lines priced more than CART_PRODUCT_CACHE_TTL_SEC ago are
+re-verified against current prices first (one `$in` read of id + price).
+Unknown or expired fingerprints (other worker, cart changed) or changed
+prices mean the cart is simply re-priced.
+"""
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional
+import hashlib
+import json
+import logging
+import time
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from core.config import settings
+from core.runtime_config import get_runtime_config
+from modules.ab.ab_service import ABService
+
+logger = logging.getLogger(__name__)
+
+# Full documents: cart responses embed the product as before
+PRODUCT_FIELDS = {"_id": 0}
+MAX_CACHED_PRODUCTS = 5000
+MAX_CACHED_CARTS = 2000
+# A/B experiment ID for prepaid discount testing
+AB_PREPAID_DISCOUNT_EXP_ID = "prepaid_discount_v1"
+
+
+def policy_mode_for(payment_method: Optional[str]) -> str:
+    return "FULL_PREPAID" if payment_method and payment_method != "cash" else "COD"
+
+
+def items_key(items: Iterable[dict]) -> str:
+    """Order-independent key of (product_id, quantity) lines"""
+    lines = sorted((str(i.get("product_id")), int(i.get("quantity") or 0)) for i in items)
+    return hashlib.sha1(json.dumps(lines).encode()).hexdigest()[:16]
+
+
+class ProductSnapshotCache:
+    """product_id -> (expires_at, projected product doc or None for missing ids)"""
+
+    def __init__(self, ttl_sec: Optional[float] = None, max_size: int = MAX_CACHED_PRODUCTS):
+        self.ttl_sec = float(ttl_sec if ttl_sec is not None else settings.CART_PRODUCT_CACHE_TTL_SEC)
+        self.max_size = max_size
+        self._docs: Dict[str, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_many(self, db, ids: Iterable[str]) -> Dict[str, dict]:
+        now = time.monotonic()
+        out: Dict[str, dict] = {}
+        missing = []
+        for pid in dict.fromkeys(ids):
+            cached = self._docs.get(pid)
+            if cached is not None and cached[0] > now:
+                self.hits += 1
+                if cached[1] is not None:
+                    out[pid] = cached[1]
+            else:
+                missing.append(pid)
+        if missing:
+            self.misses += len(missing)
+            found = {p["id"]: p async for p in db.products.find({"id": {"$in": missing}}, PRODUCT_FIELDS)}
+            if len(self._docs) + len(missing) > self.max_size:
+                self._docs = {k: v for k, v in self._docs.items() if v[0] > now}
+                if len(self._docs) + len(missing) > self.max_size:
+                    self._docs.clear()
+            expires = now + self.ttl_sec
+            for pid in missing:
+                self._docs[pid] = (expires, found.get(pid))
+            out.update(found)
+        return out
+
+    def invalidate(self, ids: Optional[Iterable[str]] = None):
+        if ids is None:
+            self._docs.clear()
+        else:
+            for pid in ids:
+                self._docs.pop(pid, None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._docs), "hits": self.hits, "misses": self.misses, "ttl_sec": self.ttl_sec}
+
+
+@dataclass
+class PricedCart:
+    lines: List[dict]
+    items_key: str
+    subtotal: float
+    count: int
+    policy_mode: str
+    # Discount if the cart is paid online (policy preview), whatever the current mode
+    prepaid_discount: Optional[dict]
+    ab: Optional[dict] = None
+    missing: List[str] = field(default_factory=list)
+    fingerprint: str = ""
+    priced_at: float = 0.0
+
+    @property
+    def discount(self) -> Optional[dict]:
+        return self.prepaid_discount if self.policy_mode == "FULL_PREPAID" else None
+
+    @property
+    def total(self) -> float:
+        d = self.discount
+        return round(self.subtotal - d["amount"], 2) if d else self.subtotal
+
+    def to_dict(self) -> dict:
+        prepaid_total = round(self.subtotal - self.prepaid_discount["amount"], 2) if self.prepaid_discount else self.subtotal
+        return {
+            "lines": [{k: v for k, v in l.items() if k != "product"} for l in self.lines],
+            "subtotal": self.subtotal,
+            "count": self.count,
+            "discount": self.discount,
+            "total": self.total,
+            "policy": {
+                "mode": self.policy_mode,
+                "preview": {
+                    "COD": {"discount": None, "total": self.subtotal},
+                    "FULL_PREPAID": {"discount": self.prepaid_discount, "total": prepaid_total},
+                },
+            },
+            "missing": self.missing,
+            "fingerprint": self.fingerprint,
+        }
+
+
+def _fingerprint(priced: PricedCart) -> str:
+    prepaid = get_runtime_config().peek("prepaid")
+    raw = json.dumps({
+        "lines": [(l["product_id"], l["quantity"], l["price"]) for l in priced.lines],
+        "policy": priced.policy_mode,
+        "discount": (priced.prepaid_discount or {}).get("amount"),
+        "variant": (priced.ab or {}).get("variant"),
+        "config": prepaid.fingerprint if prepaid else None,
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+class CartPricingEngine:
+    def __init__(self, db, products: Optional[ProductSnapshotCache] = None):
+        self.db = db
+        self.products = products or ProductSnapshotCache()
+        self._priced: Dict[str, PricedCart] = {}
+
+    async def _ab(self, unit: Optional[str]) -> Optional[dict]:
+        if not unit:
+            return None
+        try:
+            assignment = await ABService(self.db).get_assignment(AB_PREPAID_DISCOUNT_EXP_ID, unit)
+        except Exception as e:
+            logger.warning(f"A/B assignment failed, using default: {e}")
+            return {"exp_id": AB_PREPAID_DISCOUNT_EXP_ID, "variant": None, "discount_pct": None, "active": False}
+        if assignment and assignment.get("active"):
+            return {
+                "exp_id": assignment.get("exp_id"),
+                "variant": assignment.get("variant"),
+                "discount_pct": assignment.get("discount_pct"),
+                "active": True,
+            }
+        return None
+
+    async def price(self, items: List[dict], payment_method: Optional[str] = None,
+                    ab_unit: Optional[str] = None) -> PricedCart:
+        """Cart lines ({"product_id", "quantity"}) -> PricedCart; unknown products are skipped"""
+        return await self._price(items, payment_method, await self._ab(ab_unit))
+
+    async def _price(self, items: List[dict], payment_method: Optional[str], ab: Optional[dict]) -> PricedCart:
+        products = await self.products.get_many(self.db, (i["product_id"] for i in items))
+        lines, missing = [], []
+        subtotal, count = 0.0, 0
+        for item in items:
+            product = products.get(item["product_id"])
+            qty = int(item.get("quantity") or 0)
+            if not product or qty <= 0:
+                missing.append(item["product_id"])
+                continue
+            price = float(product.get("price") or 0)
+            lines.append({
+                "product_id": product["id"],
+                "quantity": qty,
+                "price": price,
+                "line_total": round(price * qty, 2),
+                "name": product.get("name") or product.get("title", "Unknown Product"),
+                "seller_id": product.get("seller_id"),
+                "product": product,
+            })
+            subtotal += price * qty
+            count += qty
+        priced = PricedCart(lines, items_key(items), round(subtotal, 2), count, policy_mode_for(payment_method),
+                            None, missing=missing)
+        return self._apply_policy(priced, payment_method, ab)
+
+    def _apply_policy(self, priced: PricedCart, payment_method: Optional[str], ab: Optional[dict]) -> PricedCart:
+        """Discount + policy on already resolved lines (no I/O); keeps the lines' priced_at"""
+        # Late import: modules.payments -> orders -> this module
+        from modules.payments.prepaid_discount import calc_prepaid_discount
+        discount = None
+        if priced.lines:
+            discount = calc_prepaid_discount(priced.subtotal, "FULL_PREPAID", (ab or {}).get("discount_pct"))
+        priced = replace(priced, policy_mode=policy_mode_for(payment_method), prepaid_discount=discount,
+                         ab=ab, priced_at=priced.priced_at or time.monotonic())
+        priced.fingerprint = _fingerprint(priced)
+        self._remember(priced)
+        return priced
+
+    def _remember(self, priced: PricedCart):
+        if len(self._priced) >= MAX_CACHED_CARTS:
+            now = time.monotonic()
+            self._priced = {k: v for k, v in self._priced.items() if now - v.priced_at < settings.CART_PRICING_TTL_SEC}
+            if len(self._priced) >= MAX_CACHED_CARTS:
+                self._priced.clear()
+        self._priced[priced.fingerprint] = priced
+
+    def reuse(self, fingerprint: Optional[str], items: List[dict]) -> Optional[PricedCart]:
+        """Priced cart shown to the customer, if still fresh and for the same lines"""
+        priced = self._priced.get(fingerprint) if fingerprint else None
+        if priced is None:
+            return None
+        if time.monotonic() - priced.priced_at > settings.CART_PRICING_TTL_SEC:
+            self._priced.pop(fingerprint, None)
+            return None
+        return priced if priced.items_key == items_key(items) else None
+
+    async def price_for_checkout(self, items: List[dict], payment_method: Optional[str],
+                                 ab_unit: Optional[str], fingerprint: Optional[str] = None) -> PricedCart:
+        """
+        Reuse the lines priced behind `fingerprint` (no product reads) when the
+        cart is unchanged; payment policy and A/B discount are re-applied.
+        """
+        ab = await self._ab(ab_unit)
+        priced = self.reuse(fingerprint, items)
+        if priced is not None and await self._prices_current(priced):
+            return self._apply_policy(priced, payment_method, ab)
+        return await self._price(items, payment_method, ab)
+
+    async def _prices_current(self, priced: PricedCart) -> bool:
+        """Lines older than the product snapshot TTL must still match the stored prices"""
+        if time.monotonic() - priced.priced_at <= self.products.ttl_sec:
+            return True
+        ids = [l["product_id"] for l in priced.lines]
+        current = {p["id"]: float(p.get("price") or 0) async for p in self.db.products.find(
+            {"id": {"$in": ids}}, {"_id": 0, "id": 1, "price": 1}
+        )}
+        stale = [l["product_id"] for l in priced.lines if current.get(l["product_id"]) != l["price"]]
+        if stale:
+            self.products.invalidate(stale)
+            self._priced.pop(priced.fingerprint, None)
+            return False
+        priced.priced_at = time.monotonic()
+        return True
+
+    def invalidate_products(self, ids: Optional[Iterable[str]] = None):
+        self.products.invalidate(ids)
+        self._priced.clear()
+
+
+_engine: Optional[CartPricingEngine] = None
+
+
+def get_cart_pricing(db=None) -> CartPricingEngine:
+    global _engine
+    if _engine is None:
+        if db is None:
+            from core.db import db
+        _engine = CartPricingEngine(db)
+    return _engine
+
+
+def invalidate_products(*ids: str):
+    """Call after writing a product (this worker; others expire within the TTL)"""
+    if _engine is not None:
+        _engine.invalidate_products(ids or None)
+
+
+async def add_cart_line(db, user_id: str, product_id: str, quantity: int, updated_at,
+                        line: Optional[dict] = None, seed: Optional[dict] = None) -> Optional[dict]:
+    """
+    Add `quantity` of a product without reading the cart first:
+    $inc an existing line, else $push a new one (upserting the cart).
+    `line` extends the pushed line (e.g. price), `seed` fields are set on a new cart.
+    Returns the cart after the write.
+    """
+    for _ in range(2):
+        cart = await db.carts.find_one_and_update(
+            {"user_id": user_id, "items.product_id": product_id},
+            {"$inc": {"items.$.quantity": quantity}, "$set": {"updated_at": updated_at}},
+            projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+        if cart is not None:
+            return cart
+        update = {
+            "$push": {"items": {"product_id": product_id, "quantity": quantity, **(line or {})}},
+            "$set": {"updated_at": updated_at},
+        }
+        if seed:
+            update["$setOnInsert"] = seed
+        try:
+            return await db.carts.find_one_and_update(
+                {"user_id": user_id, "items.product_id": {"$ne": product_id}}, update,
+                projection={"_id": 0}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The line appeared concurrently: the cart now matches the $inc branch
+            continue
+    return None
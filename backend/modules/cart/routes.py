@@ -8,6 +8,7 @@ from datetime import datetime, timezone
 
 from core.db import db
 from core.security import get_current_user
+from .cart_pricing import add_cart_line, get_cart_pricing
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
@@ -32,6 +33,8 @@ class CartResponse(BaseModel):
     items: List[CartItemResponse]
     total: float
     count: int
+    # Lines, discount, policy preview and fingerprint (pass to POST /orders)
+    pricing: Optional[dict] = None
 
 
 @router.get("", response_model=CartResponse)
@@ -42,23 +45,17 @@ async def get_cart(current_user: dict = Depends(get_current_user)):
     if not cart:
         return CartResponse(items=[], total=0, count=0)
     
-    items = []
-    total = 0
-    
-    for item in cart.get("items", []):
-        product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
-        if product:
-            items.append(CartItemResponse(
-                product_id=item["product_id"],
-                quantity=item["quantity"],
-                product=product
-            ))
-            total += product["price"] * item["quantity"]
+    priced = await get_cart_pricing(db).price(cart.get("items", []))
+    items = [
+        CartItemResponse(product_id=line["product_id"], quantity=line["quantity"], product=line["product"])
+        for line in priced.lines
+    ]
     
     return CartResponse(
         items=items,
-        total=total,
-        count=sum(i.quantity for i in items)
+        total=priced.subtotal,
+        count=priced.count,
+        pricing=priced.to_dict()
     )
 
 
@@ -68,40 +65,12 @@ async def add_to_cart(
     current_user: dict = Depends(get_current_user)
 ):
     """Add item to cart"""
-    # Verify product exists
-    product = await db.products.find_one({"id": data.product_id})
-    if not product:
+    # Verify product exists (snapshot cache), then one conditional write instead of reading the cart
+    products = await get_cart_pricing(db).products.get_many(db, [data.product_id])
+    if data.product_id not in products:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    user_id = current_user["id"]
-    cart = await db.carts.find_one({"user_id": user_id})
-    
-    if not cart:
-        await db.carts.insert_one({
-            "user_id": user_id,
-            "items": [{"product_id": data.product_id, "quantity": data.quantity}],
-            "updated_at": datetime.now(timezone.utc)
-        })
-    else:
-        # Check if product already in cart
-        existing = next((i for i in cart.get("items", []) if i["product_id"] == data.product_id), None)
-        
-        if existing:
-            await db.carts.update_one(
-                {"user_id": user_id, "items.product_id": data.product_id},
-                {
-                    "$inc": {"items.$.quantity": data.quantity},
-                    "$set": {"updated_at": datetime.now(timezone.utc)}
-                }
-            )
-        else:
-            await db.carts.update_one(
-                {"user_id": user_id},
-                {
-                    "$push": {"items": {"product_id": data.product_id, "quantity": data.quantity}},
-                    "$set": {"updated_at": datetime.now(timezone.utc)}
-                }
-            )
+    await add_cart_line(db, current_user["id"], data.product_id, data.quantity, datetime.now(timezone.utc))
     
     return {"message": "Added to cart"}
 
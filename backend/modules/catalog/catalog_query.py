@@ -0,0 +1,270 @@
+"""
+V2-3: Catalog query layer - keyset cursors, normalized filter keys, cached counts
+
+- Opaque cursor tokens carry the sort key values + product id of the last
+  row; the next page is an index range instead of skip(offset)
+- Every sort ends with `id` as tie-breaker in the direction of the last
+  sort field, so each mode is served by one compound index
+- category_keys (name/slug/id, lower-cased) and brand_key replace the
+  category $or and the case-insensitive brand $regex. Product writers set
+  them with catalog_keys() / refresh_catalog_keys(); older products are
+  backfilled by the job runner leader (catalog_keys_backfill). Until that
+  finishes the legacy filters are used: processes that do not run the
+  backfill probe for products without keys every KEYS_PROBE_SEC
+- Totals come from a per-process TTL cache: a miss counts up to
+  COUNT_CAP synchronously, stale entries are served while a background
+  task recounts
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+import time
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COUNT_TTL_SEC = 300
+COUNT_CAP = 10000
+COUNT_CACHE_MAX = 5000
+BACKFILL_BATCH = 500
+KEYS_PROBE_SEC = 30
+NO_ID = {"_id": 0}
+
+SORT_MODES: Dict[str, List[Tuple[str, int]]] = {
+    "popular": [("views_count", -1), ("rating", -1)],
+    "price_asc": [("price", 1)],
+    "price_desc": [("price", -1)],
+    "new": [("created_at", -1)],
+    "rating": [("rating", -1)],
+    "discount": [("compare_price", -1)],
+}
+
+_keys_ready = False
+_keys_probed_at = 0.0
+_counts: Dict[str, Tuple[float, int, bool]] = {}
+_recounting: set = set()
+
+
+# ============= NORMALIZED KEYS =============
+
+def norm_key(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    key = re.sub(r"\s+", " ", str(value)).strip().lower()
+    return key or None
+
+
+def catalog_keys(product: dict) -> dict:
+    """Derived filter fields stored on the product"""
+    cats = {norm_key(product.get(f)) for f in ("category_name", "category_slug", "category_id")}
+    return {
+        "category_keys": sorted(k for k in cats if k),
+        "brand_key": norm_key(product.get("brand")),
+    }
+
+
+async def refresh_catalog_keys(db, product_id: str):
+    """Recompute keys after a partial update (category/brand may have changed)"""
+    doc = await db.products.find_one(
+        {"id": product_id},
+        {"_id": 0, "category_name": 1, "category_slug": 1, "category_id": 1, "brand": 1}
+    )
+    if doc is not None:
+        await db.products.update_one({"id": product_id}, {"$set": catalog_keys(doc)})
+
+
+async def ensure_catalog_indexes(db):
+    for fields in SORT_MODES.values():
+        spec = sort_spec(fields)
+        await db.products.create_index([("status", 1), *spec])
+        await db.products.create_index([("status", 1), ("category_keys", 1), *spec])
+    await db.products.create_index([("status", 1), ("brand_key", 1), *sort_spec(SORT_MODES["popular"])])
+
+
+async def backfill_catalog_keys(db, batch_size: int = BACKFILL_BATCH) -> int:
+    """Add keys to products that have none; marks keys as usable when done"""
+    global _keys_ready
+    missing = {"category_keys": {"$exists": False}}
+    fields = {"_id": 1, "category_name": 1, "category_slug": 1, "category_id": 1, "brand": 1}
+    done = 0
+    try:
+        while True:
+            batch = await db.products.find(missing, fields).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            await db.products.bulk_write(
+                [UpdateOne({"_id": p["_id"]}, {"$set": catalog_keys(p)}) for p in batch],
+                ordered=False
+            )
+            done += len(batch)
+    except Exception as e:
+        logger.error(f"Catalog keys backfill stopped after {done} products: {e}")
+        return done
+    _keys_ready = True
+    if done:
+        logger.info(f"Catalog keys backfilled for {done} products")
+    return done
+
+
+async def keys_ready(db) -> bool:
+    """Whether the normalized keys are usable; throttled probe until they are"""
+    global _keys_ready, _keys_probed_at
+    if _keys_ready or time.monotonic() - _keys_probed_at < KEYS_PROBE_SEC:
+        return _keys_ready
+    _keys_probed_at = time.monotonic()
+    try:
+        missing = await db.products.find_one({"category_keys": {"$exists": False}}, {"_id": 1})
+    except Exception as e:
+        logger.warning(f"Catalog keys probe failed: {e}")
+        return False
+    _keys_ready = missing is None
+    return _keys_ready
+
+
+def category_filter(category: str) -> dict:
+    if _keys_ready:
+        return {"category_keys": norm_key(category)}
+    return {"$or": [
+        {"category_name": category},
+        {"category_slug": category},
+        {"category_id": category}
+    ]}
+
+
+def brand_filter(brand: str) -> dict:
+    if _keys_ready:
+        return {"brand_key": norm_key(brand)}
+    return {"brand": {"$regex": re.escape(brand), "$options": "i"}}
+
+
+# ============= KEYSET CURSORS =============
+
+def sort_spec(fields: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """Sort fields + id tie-breaker (same direction as the last field)"""
+    fields = [f for f in fields if f[0] != "id"]
+    return [*fields, ("id", fields[-1][1] if fields else -1)]
+
+
+def _sig(spec: List[Tuple[str, int]]) -> str:
+    return ",".join(f"{f}:{d}" for f, d in spec)
+
+
+def _enc(v):
+    return {"$d": v.isoformat()} if isinstance(v, datetime) else v
+
+
+def _dec(v):
+    if isinstance(v, dict) and "$d" in v:
+        return datetime.fromisoformat(v["$d"])
+    return v
+
+
+def encode_cursor(doc: dict, spec: List[Tuple[str, int]]) -> str:
+    payload = {"s": _sig(spec), "v": [_enc(doc.get(f)) for f, _ in spec]}
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str, spec: List[Tuple[str, int]]) -> list:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        values = [_dec(v) for v in payload["v"]]
+    except Exception:
+        raise ValueError("INVALID_CURSOR")
+    if payload.get("s") != _sig(spec) or len(values) != len(spec):
+        raise ValueError("CURSOR_SORT_MISMATCH")
+    return values
+
+
+def _beyond(field: str, direction: int, value) -> Optional[dict]:
+    """Rows strictly after `value` on one field (missing/null sorts lowest)"""
+    if value is None:
+        # Descending: nulls are last, nothing beyond. Ascending: everything non-null
+        return None if direction < 0 else {field: {"$ne": None}}
+    if direction < 0:
+        return {"$or": [{field: {"$lt": value}}, {field: None}]}
+    return {field: {"$gt": value}}
+
+
+def after_cursor(spec: List[Tuple[str, int]], values: list) -> dict:
+    clauses = []
+    prefix: Dict[str, Any] = {}
+    for (field, direction), value in zip(spec, values):
+        beyond = _beyond(field, direction, value)
+        if beyond is not None:
+            clauses.append({**prefix, **beyond})
+        prefix[field] = value
+    return {"$or": clauses} if clauses else {"id": {"$in": []}}
+
+
+async def keyset_page(
+    col,
+    query: dict,
+    sort_fields: List[Tuple[str, int]],
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = NO_ID,
+) -> Tuple[List[dict], Optional[str]]:
+    """One page in sort order + the cursor for the next page (None on the last)"""
+    spec = sort_spec(sort_fields)
+    limit = max(1, limit)
+    q = query
+    if cursor:
+        after = after_cursor(spec, decode_cursor(cursor, spec))
+        q = {"$and": [query, after]} if query else after
+    rows = await col.find(q, projection).sort(spec).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1], spec) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+# ============= COUNTS =============
+
+def _count_key(collection: str, query: dict) -> str:
+    raw = json.dumps(query, sort_keys=True, default=str)
+    return f"{collection}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+async def _recount(col, key: str, query: dict):
+    try:
+        total = await col.count_documents(query)
+        _counts[key] = (time.monotonic(), total, True)
+    except Exception as e:
+        logger.warning(f"Catalog recount failed: {e}")
+    finally:
+        _recounting.discard(key)
+
+
+def _schedule_recount(col, key: str, query: dict):
+    if key not in _recounting:
+        _recounting.add(key)
+        asyncio.ensure_future(_recount(col, key, query))
+
+
+async def cached_count(col, query: dict) -> Tuple[int, bool]:
+    """
+    (total, exact). Fresh cache hit: as stored. Stale: stored value +
+    background recount. Miss: count capped at COUNT_CAP (exact=False when
+    capped, with a background exact recount).
+    """
+    key = _count_key(col.name, query)
+    hit = _counts.get(key)
+    if hit:
+        at, total, exact = hit
+        if time.monotonic() - at > COUNT_TTL_SEC or not exact:
+            _schedule_recount(col, key, query)
+        return total, exact
+
+    total = await col.count_documents(query, limit=COUNT_CAP + 1)
+    exact = total <= COUNT_CAP
+    if not exact:
+        total = COUNT_CAP
+        _schedule_recount(col, key, query)
+    if len(_counts) >= COUNT_CACHE_MAX:
+        _counts.clear()
+    _counts[key] = (time.monotonic(), total, exact)
+    return total, exact
@@ -2,9 +2,14 @@
 V2-3: Catalog API with filters, sorting, pagination
 V2-3: Categories Tree for MegaMenu
 """
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from typing import Optional, List
 from core.db import db
+from core.responses import trusted_response
+from modules.catalog.catalog_query import (
+    SORT_MODES, brand_filter, cached_count, category_filter, encode_cursor, keys_ready, keyset_page, sort_spec
+)
+from modules.catalog.dimensions import get_categories
 import re
 
 router = APIRouter(tags=["Catalog V2"])
@@ -21,22 +26,23 @@ async def catalog(
     in_stock: Optional[bool] = None,
     sort_by: str = "popular",
     page: int = 1,
-    limit: int = 24
+    limit: int = 24,
+    cursor: Optional[str] = None
 ):
     """
-    Catalog endpoint with filters, sorting, pagination
+    Catalog endpoint with filters, sorting, pagination.
+    Pass `next_cursor` from the previous response as `cursor` for the next
+    page (keyset); `page` alone still works but skips rows.
     """
     q = {"status": "published"}
+    if category or brand:
+        await keys_ready(db)
     
     if category:
-        q["$or"] = [
-            {"category_name": category},
-            {"category_slug": category},
-            {"category_id": category}
-        ]
+        q.update(category_filter(category))
     
     if brand:
-        q["brand"] = {"$regex": brand, "$options": "i"}
+        q.update(brand_filter(brand))
     
     if in_stock is True:
         q["stock_level"] = {"$gt": 0}
@@ -51,30 +57,29 @@ async def catalog(
             price_q["$lte"] = max_price
         q["price"] = price_q
     
-    # Sort mapping
-    sort_map = {
-        "popular": [("views_count", -1), ("rating", -1)],
-        "price_asc": [("price", 1)],
-        "price_desc": [("price", -1)],
-        "new": [("created_at", -1)],
-        "rating": [("rating", -1)],
-        "discount": [("compare_price", -1)]
-    }
-    
-    sort_order = sort_map.get(sort_by, sort_map["popular"])
-    skip = (page - 1) * limit
+    sort_fields = SORT_MODES.get(sort_by, SORT_MODES["popular"])
     
-    cursor = db.products.find(q, {"_id": 0}).sort(sort_order).skip(skip).limit(limit)
-    products = await cursor.to_list(limit)
+    if cursor or page <= 1:
+        try:
+            products, next_cursor = await keyset_page(db.products, q, sort_fields, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        cur = db.products.find(q, {"_id": 0}).sort(sort_spec(sort_fields)).skip((page - 1) * limit).limit(limit + 1)
+        products = await cur.to_list(limit + 1)
+        next_cursor = encode_cursor(products[limit - 1], sort_spec(sort_fields)) if len(products) > limit else None
+        products = products[:limit]
     
-    total = await db.products.count_documents(q)
+    total, exact = await cached_count(db.products, q)
     
-    return {
+    return trusted_response({
         "products": products,
         "total": total,
+        "total_exact": exact,
         "page": page,
-        "pages": (total // limit) + (1 if total % limit else 0)
-    }
+        "pages": (total // limit) + (1 if total % limit else 0),
+        "next_cursor": next_cursor
+    })
 
 
 @router.get("/api/v2/catalog/filters")
@@ -121,26 +126,9 @@ async def categories_tree():
     """
     Get categories as tree structure for MegaMenu
     """
-    items = await db.categories.find({}, {"_id": 0}).sort([("order", 1)]).to_list(1000)
-    
-    # If no categories_v2 structure, use flat categories
-    if not items:
-        items = await db.categories.find({}, {"_id": 0}).to_list(1000)
-    
-    # Build tree
-    by_parent = {}
-    for c in items:
-        pid = c.get("parent_id") or None
-        by_parent.setdefault(pid, []).append(c)
-    
-    def build(pid=None):
-        result = []
-        for c in by_parent.get(pid, []):
-            node = {**c, "children": build(c.get("id"))}
-            result.append(node)
-        return result
-    
-    return {"tree": build(None)}
+    dims = await get_categories(db)
+    # Sorted by "order" (categories without it first, as in an ascending Mongo sort)
+    return {"tree": dims.tree(sort_key=lambda c: (c.get("order") is not None, c.get("order") or 0))}
 
 
 # ============= SEARCH =============
@@ -0,0 +1,187 @@
+"""
+V2-4: Dimension cache - categories and seller display names
+
+Product lists join two small, rarely written dimensions. Both are held in
+memory per process so enrichment costs no queries on a warm cache:
+
+- Categories: the whole collection is a runtime config section
+  ("categories", core.runtime_config). Category writes call
+  `invalidate_categories(db)`, which bumps its version so every worker
+  reloads; writes made elsewhere (seed/import scripts) are picked up after
+  DIMENSION_CACHE_TTL_SEC. Each snapshot is indexed once into CategoryDims
+  (id -> doc, slug -> id, parent -> children).
+- Seller names: users.full_name by id, fetched for cache misses with one
+  $in query and kept for DIMENSION_CACHE_TTL_SEC; profile writes call
+  `invalidate_sellers(id)` (this worker; others expire within the TTL).
+
+Cached documents are shared: copy before mutating (`CategoryDims.copies()`).
+"""
+from typing import Callable, Dict, Iterable, List, Optional
+import logging
+import time
+
+from core.config import settings
+from core.runtime_config import ConfigSection, bump_config, get_runtime_config, register_section
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_SECTION = "categories"
+MAX_CACHED_SELLERS = 20000
+
+
+async def _load_categories(db) -> dict:
+    return {"items": await db.categories.find({}, {"_id": 0}).to_list(None)}
+
+
+register_section(ConfigSection(CATEGORY_SECTION, _load_categories, {"items": []}))
+
+
+class CategoryDims:
+    def __init__(self, items: List[dict], version: int = 0, fingerprint: str = ""):
+        self.items = [c for c in items if c.get("id")]
+        self.version = version
+        self.fingerprint = fingerprint
+        self.by_id: Dict[str, dict] = {c["id"]: c for c in self.items}
+        self.by_slug: Dict[str, str] = {c["slug"]: c["id"] for c in self.items if c.get("slug")}
+        self.children: Dict[Optional[str], List[str]] = {}
+        for c in self.items:
+            parent = c.get("parent_id") or None
+            if parent is not None and parent not in self.by_id:
+                parent = None
+            self.children.setdefault(parent, []).append(c["id"])
+
+    def get(self, category_id: Optional[str]) -> Optional[dict]:
+        return self.by_id.get(category_id) if category_id else None
+
+    def name(self, category_id: Optional[str], default=None):
+        c = self.get(category_id)
+        return c.get("name", default) if c else default
+
+    def resolve(self, slug_or_id: Optional[str]) -> Optional[str]:
+        """Category id for a slug or id"""
+        if not slug_or_id:
+            return None
+        return slug_or_id if slug_or_id in self.by_id else self.by_slug.get(slug_or_id)
+
+    def descendants(self, category_id: str) -> List[str]:
+        """category_id and all ids below it"""
+        out, stack = [], [category_id]
+        while stack:
+            cid = stack.pop()
+            out.append(cid)
+            stack.extend(self.children.get(cid, []))
+        return out
+
+    def copies(self) -> List[dict]:
+        return [dict(c) for c in self.items]
+
+    def tree(self, node: Optional[Callable[[dict], dict]] = None, sort_key: Optional[Callable[[dict], object]] = None,
+             keep_empty: bool = True) -> List[dict]:
+        """Nested copies; node(doc) builds each entry (default: dict copy)"""
+        node = node or dict
+
+        def build(parent):
+            out = []
+            ids = self.children.get(parent, [])
+            docs = sorted((self.by_id[i] for i in ids), key=sort_key) if sort_key else (self.by_id[i] for i in ids)
+            for c in docs:
+                entry = node(c)
+                kids = build(c["id"])
+                if kids or keep_empty:
+                    entry["children"] = kids
+                out.append(entry)
+            return out
+
+        return build(None)
+
+
+class DimensionCache:
+    def __init__(self, db, ttl_sec: Optional[float] = None):
+        self.db = db
+        self.ttl_sec = float(ttl_sec if ttl_sec is not None else settings.DIMENSION_CACHE_TTL_SEC)
+        self._categories: Optional[CategoryDims] = None
+        self._sellers: Dict[str, tuple] = {}
+
+    async def categories(self) -> CategoryDims:
+        config = get_runtime_config(self.db)
+        snap = await config.get(CATEGORY_SECTION)
+        if time.monotonic() - snap.loaded_at > self.ttl_sec:
+            snap = await config.reload(CATEGORY_SECTION)
+        if self._categories is None or self._categories.fingerprint != snap.fingerprint:
+            self._categories = CategoryDims(snap.data["items"], snap.version, snap.fingerprint)
+        return self._categories
+
+    async def seller_names(self, ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        now = time.monotonic()
+        out: Dict[str, Optional[str]] = {}
+        missing = []
+        for sid in dict.fromkeys(i for i in ids if i):
+            cached = self._sellers.get(sid)
+            if cached is not None and cached[0] > now:
+                out[sid] = cached[1]
+            else:
+                missing.append(sid)
+        if missing:
+            found = {u["id"]: u.get("full_name") async for u in self.db.users.find(
+                {"id": {"$in": missing}}, {"_id": 0, "id": 1, "full_name": 1}
+            )}
+            if len(self._sellers) + len(missing) > MAX_CACHED_SELLERS:
+                self._sellers = {k: v for k, v in self._sellers.items() if v[0] > now}
+                if len(self._sellers) + len(missing) > MAX_CACHED_SELLERS:
+                    self._sellers.clear()
+            expires = now + self.ttl_sec
+            for sid in missing:
+                self._sellers[sid] = (expires, found.get(sid))
+                out[sid] = found.get(sid)
+        return out
+
+    async def enrich_products(self, products: List[dict]) -> List[dict]:
+        """Set category_name / seller_name on each product (in place)"""
+        cats = await self.categories()
+        names = await self.seller_names(p.get("seller_id") for p in products)
+        for p in products:
+            if p.get("category_id"):
+                p["category_name"] = cats.name(p["category_id"])
+            if p.get("seller_id"):
+                p["seller_name"] = names.get(p["seller_id"])
+        return products
+
+    def invalidate_sellers(self, ids: Optional[Iterable[str]] = None):
+        if ids is None:
+            self._sellers.clear()
+        else:
+            for sid in ids:
+                self._sellers.pop(sid, None)
+
+
+_cache: Optional[DimensionCache] = None
+
+
+def get_dimensions(db=None) -> DimensionCache:
+    global _cache
+    if _cache is None:
+        if db is None:
+            from core.db import db
+        _cache = DimensionCache(db)
+    return _cache
+
+
+async def get_categories(db=None) -> CategoryDims:
+    return await get_dimensions(db).categories()
+
+
+async def enrich_products(db, products: List[dict]) -> List[dict]:
+    return await get_dimensions(db).enrich_products(products)
+
+
+async def invalidate_categories(db):
+    """Call after writing categories: every worker reloads the section"""
+    try:
+        await bump_config(db, CATEGORY_SECTION)
+    except Exception as e:
+        logger.warning(f"Category dimension invalidation failed: {e}")
+
+
+def invalidate_sellers(*ids: str):
+    if _cache is not None:
+        _cache.invalidate_sellers(ids or None)
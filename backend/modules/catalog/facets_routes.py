@@ -8,6 +8,9 @@ from typing import Optional, List
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 
+from core.responses import trusted_response
+from modules.catalog.dimensions import get_categories
+
 router = APIRouter(prefix="/api/v2/catalog", tags=["Catalog V2"])
 
 # Get db from environment
@@ -121,7 +124,7 @@ async def get_catalog_facets(
             async for doc in db.products.aggregate(specs_pipeline)
         ]
     
-    return {
+    return trusted_response({
         "categories": categories,
         "brands": brands,
         "price_range": {
@@ -132,7 +135,7 @@ async def get_catalog_facets(
         "specs": specs,
         "total_products": total_products,
         "lang": lang
-    }
+    })
 
 
 @router.get("/categories/tree")
@@ -140,8 +143,7 @@ async def get_categories_tree():
     """
     Get categories as hierarchical tree for MegaMenu
     """
-    categories_cursor = db.categories.find({}, {"_id": 0})
-    categories = await categories_cursor.to_list(500)
+    categories = (await get_categories()).copies()
     
     # Get product counts
     counts_pipeline = [
@@ -15,6 +15,14 @@ async def add_note(
     svc = CRMActionsService(db)
     return await svc.add_note(phone, body["text"], admin["id"])
 
+@router.get("/customer/{phone}/notes")
+async def list_notes(
+    phone: str,
+    limit: int = 50,
+    admin: dict = Depends(get_current_admin)
+):
+    return {"items": await CRMActionsService(db).list_notes(phone, min(limit, 200))}
+
 @router.post("/customer/{phone}/tags")
 async def set_tags(
     phone: str,
@@ -1,30 +1,89 @@
 # O8: CRM Actions Service
+# Notes live in crm_notes (one document per note, indexed by phone/user),
+# not in an array on the customer document.
 import uuid
+import logging
 from datetime import datetime, timezone
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+
+from modules.crm.customer360 import record_customer_event, timeline_event
+
+logger = logging.getLogger(__name__)
+
+# Legacy embedded notes have been moved (set by migrate_embedded_notes)
+_notes_migrated = False
 
 def utcnow():
     return datetime.now(timezone.utc).isoformat()
 
+def legacy_note_id(phone: str, note: dict) -> str:
+    """Stable id for an embedded note without one: reruns insert the same note"""
+    key = "|".join(str(note.get(k) or "") for k in ("created_at", "text", "author"))
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"crm_note:{phone}:{key}"))
+
 class CRMActionsService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.col = db["customers"]
+        self.notes = db["crm_notes"]
         self.notifs = db["notification_queue"]
 
+    async def ensure_indexes(self):
+        await self.notes.create_index("id", unique=True)
+        await self.notes.create_index([("phone", 1), ("created_at", -1)])
+        await self.notes.create_index([("user_id", 1), ("created_at", -1)])
+
+    async def _user_id(self, phone: str):
+        user = await self.db["users"].find_one({"phone": phone}, {"_id": 0, "id": 1})
+        return (user or {}).get("id")
+
     async def add_note(self, phone: str, text: str, admin_id: str):
         note = {
             "id": str(uuid.uuid4()),
+            "phone": phone,
+            "user_id": await self._user_id(phone),
             "text": text,
             "author": admin_id,
             "created_at": utcnow()
         }
-        await self.col.update_one(
-            {"phone": phone},
-            {"$push": {"notes": note}}
+        await self.notes.insert_one(dict(note))
+        await record_customer_event(
+            self.db, note["user_id"],
+            timeline_event(note["created_at"], "CRM_NOTE", "CRM Note", text[:100], {"note_id": note["id"]}),
+            counter="notes_count"
         )
+        note.pop("user_id")
         return note
 
+    async def list_notes(self, phone: str, limit: int = 50):
+        cur = self.notes.find({"phone": phone}, {"_id": 0}).sort("created_at", -1).limit(limit)
+        return [n async for n in cur]
+
+    async def migrate_embedded_notes(self) -> int:
+        """Move legacy customers.notes arrays into crm_notes (idempotent; the job runner leader runs it)"""
+        global _notes_migrated
+        await self.ensure_indexes()
+        moved = 0
+        cur = self.col.find({"notes.0": {"$exists": True}}, {"_id": 0, "phone": 1, "notes": 1})
+        async for c in cur:
+            user_id = await self._user_id(c["phone"])
+            docs = [
+                {**n, "id": n.get("id") or legacy_note_id(c["phone"], n), "phone": c["phone"], "user_id": user_id}
+                for n in c["notes"]
+            ]
+            try:
+                await self.notes.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                if any(w.get("code") != 11000 for w in e.details.get("writeErrors", [])):
+                    raise
+            await self.col.update_one({"phone": c["phone"]}, {"$unset": {"notes": ""}})
+            moved += len(docs)
+        if moved:
+            logger.info(f"Moved {moved} embedded customer notes to crm_notes")
+        _notes_migrated = True
+        return moved
+
     async def set_tags(self, phone: str, tags: list):
         await self.col.update_one(
             {"phone": phone},
@@ -43,7 +43,6 @@ class CRMRepository:
                 "returned_count": 0,
                 "segment": "NEW",
                 "tags": [],
-                "notes": [],
                 "is_blocked": False,
                 "first_order_at": now,
                 "last_order_at": now,
@@ -77,10 +76,14 @@ class CRMRepository:
         )
         return await self.col.find_one({"phone": phone}, {"_id": 0})
 
-    async def increment_delivered(self, phone: str):
+    async def increment_delivered(self, phone: str, event_id: str = None):
+        """`event_id` makes the increment apply once per source event"""
+        if not event_id:
+            await self.col.update_one({"phone": phone}, {"$inc": {"delivered_count": 1}})
+            return
         await self.col.update_one(
-            {"phone": phone},
-            {"$inc": {"delivered_count": 1}}
+            {"phone": phone, "delivered_events": {"$ne": event_id}},
+            {"$inc": {"delivered_count": 1}, "$addToSet": {"delivered_events": event_id}}
         )
 
     async def increment_returned(self, phone: str):
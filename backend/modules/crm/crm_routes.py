@@ -41,6 +41,10 @@ async def customer_detail(
         {"_id": 0}
     ).sort("created_at", -1).limit(100).to_list(100)
 
+    customer["notes"] = await db["crm_notes"].find(
+        {"phone": phone}, {"_id": 0}
+    ).sort("created_at", -1).limit(50).to_list(50)
+
     return {"customer": customer, "orders": orders}
 
 @router.get("/stats")
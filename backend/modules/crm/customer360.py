@@ -0,0 +1,207 @@
+"""
+O5: Customer 360 projection (customer_360)
+
+One document per buyer (users.id) with rolling aggregates and bounded rings:
+- orders_count / total_spent / first_order_at / last_order_at
+- recent_orders: summaries of the last RECENT_ORDERS orders
+- events: the last EVENT_RING timeline events (orders, TTN, notes, incidents)
+- notes_count / incidents_count
+
+Maintained by write hooks (order creation + status, CRM notes, guard
+incidents, outbox TTN/delivery events). A missing document is built on
+first read with rebuild(); the nightly reconcile rebuilds buyers whose
+orders changed outside the hooks.
+"""
+from datetime import timedelta
+from typing import Optional
+import logging
+
+from core.dates import dt_expr, range_q, to_iso, utcnow
+
+logger = logging.getLogger(__name__)
+
+RECENT_ORDERS = 10
+EVENT_RING = 50
+
+
+def order_summary(order: dict) -> dict:
+    return {
+        "id": order.get("id"),
+        "order_number": order.get("order_number"),
+        "status": order.get("status"),
+        "payment_status": order.get("payment_status"),
+        "total_amount": float(order.get("total_amount") or 0),
+        "currency": order.get("currency", "UAH"),
+        "created_at": to_iso(order.get("created_at")),
+    }
+
+
+def timeline_event(ts, type_: str, title: str, description: str, payload: Optional[dict] = None) -> dict:
+    return {
+        "ts": to_iso(ts) or utcnow().isoformat(),
+        "type": type_,
+        "title": title,
+        "description": description,
+        "payload": payload or {},
+    }
+
+
+def order_created_event(order: dict) -> dict:
+    return timeline_event(
+        order.get("created_at"),
+        "ORDER_CREATED",
+        "Order Created",
+        f"ID {(order.get('id') or '')[:8]}... | {order.get('status')} | "
+        f"{float(order.get('total_amount') or 0):.2f} {order.get('currency', 'UAH')}",
+        {"order_id": order.get("id")}
+    )
+
+
+class Customer360Repo:
+    def __init__(self, db):
+        self.db = db
+        self.col = db["customer_360"]
+        self.orders = db["orders"]
+
+    async def ensure_indexes(self):
+        await self.col.create_index("user_id", unique=True)
+        await self.col.create_index("last_order_at")
+        await self.orders.create_index([("buyer_id", 1), ("created_at", -1)])
+
+    def _ring(self, event: dict) -> dict:
+        return {"$each": [event], "$sort": {"ts": -1}, "$slice": EVENT_RING}
+
+    async def get(self, user_id: str, build: bool = True) -> Optional[dict]:
+        doc = await self.col.find_one({"user_id": user_id}, {"_id": 0})
+        if doc is None and build:
+            doc = await self.rebuild(user_id)
+        return doc
+
+    # ---- Write hooks ----
+
+    async def on_order_created(self, order: dict):
+        user_id = order.get("buyer_id")
+        if not user_id:
+            return
+        created = to_iso(order.get("created_at")) or utcnow().isoformat()
+        result = await self.col.update_one(
+            {"user_id": user_id},
+            {
+                "$inc": {"orders_count": 1, "total_spent": float(order.get("total_amount") or 0)},
+                "$min": {"first_order_at": created},
+                "$max": {"last_order_at": created},
+                "$push": {
+                    "recent_orders": {"$each": [order_summary(order)], "$sort": {"created_at": -1}, "$slice": RECENT_ORDERS},
+                    "events": self._ring(order_created_event(order)),
+                },
+                "$set": {"updated_at": utcnow().isoformat()},
+            }
+        )
+        if result.matched_count == 0:
+            # First sighting: build from history (includes this order)
+            await self.rebuild(user_id)
+
+    async def on_order_status(self, order_id: str, status: Optional[str] = None, payment_status: Optional[str] = None):
+        order = await self.orders.find_one({"id": order_id}, {"_id": 0, "buyer_id": 1})
+        if not order or not order.get("buyer_id"):
+            return
+        upd = {"updated_at": utcnow().isoformat()}
+        if status is not None:
+            upd["recent_orders.$[o].status"] = status
+        if payment_status is not None:
+            upd["recent_orders.$[o].payment_status"] = payment_status
+        event = timeline_event(
+            utcnow(), "ORDER_STATUS", "Order Status",
+            f"ID {order_id[:8]}... | {status or ''}{' | ' + payment_status if payment_status else ''}",
+            {"order_id": order_id, "status": status, "payment_status": payment_status}
+        )
+        # No upsert: a missing projection is built from orders on first read
+        await self.col.update_one(
+            {"user_id": order["buyer_id"]},
+            {"$set": upd, "$push": {"events": self._ring(event)}},
+            array_filters=[{"o.id": order_id}]
+        )
+
+    async def on_event(self, user_id: str, event: dict, counter: Optional[str] = None):
+        update = {"$push": {"events": self._ring(event)}, "$set": {"updated_at": utcnow().isoformat()}}
+        if counter:
+            update["$inc"] = {counter: 1}
+        await self.col.update_one({"user_id": user_id}, update)
+
+    # ---- Rebuild ----
+
+    async def rebuild(self, user_id: str) -> dict:
+        """Recompute one buyer from orders, notes and incidents"""
+        from modules.timeline.timeline_service import TimelineService
+
+        rows = await self.orders.aggregate([
+            {"$match": {"buyer_id": user_id}},
+            {"$group": {
+                "_id": None,
+                "orders_count": {"$sum": 1},
+                "total_spent": {"$sum": "$total_amount"},
+                "first": {"$min": dt_expr("created_at")},
+                "last": {"$max": dt_expr("created_at")},
+            }},
+        ]).to_list(1)
+        agg = rows[0] if rows else {}
+
+        recent = await self.orders.find({"buyer_id": user_id}, {"_id": 0}).sort(
+            "created_at", -1
+        ).limit(RECENT_ORDERS).to_list(RECENT_ORDERS)
+        events, _ = await TimelineService(self.db).page(user_id, limit=EVENT_RING)
+
+        doc = {
+            "user_id": user_id,
+            "orders_count": int(agg.get("orders_count") or 0),
+            "total_spent": float(agg.get("total_spent") or 0),
+            "first_order_at": to_iso(agg.get("first")),
+            "last_order_at": to_iso(agg.get("last")),
+            "recent_orders": [order_summary(o) for o in recent],
+            "events": events,
+            "notes_count": await self.db["crm_notes"].count_documents({"user_id": user_id}),
+            "incidents_count": await self.db["guard_incidents"].count_documents({"entity": f"customer:{user_id}"}),
+            "rebuilt_at": utcnow().isoformat(),
+            "updated_at": utcnow().isoformat(),
+        }
+        await self.col.update_one({"user_id": user_id}, {"$set": doc}, upsert=True)
+        return doc
+
+    async def reconcile(self, since_days: int = 2) -> dict:
+        """Rebuild buyers whose orders were created/updated in the last N days"""
+        await self.ensure_indexes()
+        since = utcnow() - timedelta(days=since_days)
+        buyer_ids = await self.orders.distinct(
+            "buyer_id", {"$or": [range_q("created_at", since), range_q("updated_at", since)]}
+        )
+        n = 0
+        for user_id in buyer_ids:
+            if user_id:
+                await self.rebuild(user_id)
+                n += 1
+        return {"ok": True, "customers": n}
+
+
+# ---- Hooks (never fail the caller) ----
+
+async def record_customer_order(db, order: dict):
+    try:
+        await Customer360Repo(db).on_order_created(order)
+    except Exception as e:
+        logger.warning(f"Customer 360 order write failed for {order.get('id')}: {e}")
+
+
+async def record_customer_order_status(db, order_id: str, status: Optional[str] = None, payment_status: Optional[str] = None):
+    try:
+        await Customer360Repo(db).on_order_status(order_id, status=status, payment_status=payment_status)
+    except Exception as e:
+        logger.warning(f"Customer 360 status write failed for {order_id}: {e}")
+
+
+async def record_customer_event(db, user_id: Optional[str], event: dict, counter: Optional[str] = None):
+    if not user_id:
+        return
+    try:
+        await Customer360Repo(db).on_event(user_id, event, counter=counter)
+    except Exception as e:
+        logger.warning(f"Customer 360 event write failed for {user_id}: {e}")
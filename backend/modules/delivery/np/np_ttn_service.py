@@ -224,31 +224,22 @@ class NPTTNService:
         
         logger.info(f"✅ TTN created: {ttn} for order {req.order_id}")
         
-        # O2: Emit event for notifications
+        # O2: Emit event; the outbox dispatcher queues notifications and
+        # records the shipping cost (SHIP_COST_OUT) in the finance ledger
         try:
             from modules.ops.events.events_repo import EventsRepo
             await EventsRepo(self.db).emit(
                 "TTN_CREATED",
                 req.order_id,
-                {"ttn": ttn, "phone": order.get("shipping", {}).get("phone")}
+                {
+                    "ttn": ttn,
+                    "phone": order.get("shipping", {}).get("phone"),
+                    "cost": float(cost) if cost else None,
+                }
             )
         except Exception as e:
             logger.error(f"Failed to emit TTN_CREATED event: {e}")
         
-        # O5: Record shipping cost in finance ledger
-        try:
-            if cost:
-                from modules.finance.finance_repo import FinanceRepo
-                await FinanceRepo(self.db).record(
-                    order_id=req.order_id,
-                    type_="SHIP_COST_OUT",
-                    amount=float(cost),
-                    direction="OUT",
-                    meta={"method": "NOVAPOSHTA", "ttn": ttn}
-                )
-        except Exception as e:
-            logger.error(f"Failed to record shipping cost: {e}")
-        
         # O9: Send Telegram alert
         try:
             from modules.bot.alerts_service import AlertsService
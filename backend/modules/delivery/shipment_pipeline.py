@@ -0,0 +1,179 @@
+"""
+O20: Shipment Processing Pipeline
+Shared by PickupControlEngine and ReturnEngine cycles.
+
+- Orders are streamed from a cursor, never loaded as one list
+- Per-order work (NP tracking fetch, policy, notifications) runs with
+  bounded concurrency (asyncio.Semaphore)
+- Order/ledger/timeline writes are collected into unordered bulk_write
+  batches per collection; duplicate-key errors count as idempotent skips
+- Work that must follow durable writes (dedupe markers, hooks) is
+  registered with `writes.after_flush()`; it runs once the flush holding
+  the ops buffered before it succeeds and is dropped when that flush fails
+- Per-stage timings are recorded for every cycle
+"""
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List
+import asyncio
+import logging
+import time
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_BATCH_SIZE = 200
+CURSOR_BATCH_SIZE = 200
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBatcher:
+    """Buffers pymongo write ops per collection and flushes them with bulk_write"""
+
+    def __init__(self, db, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self._ops: Dict[str, List] = defaultdict(list)
+        self._after: List[Callable[[], Awaitable[Any]]] = []
+        self.stats = {"ops": 0, "batches": 0, "duplicates": 0, "errors": 0, "dropped_callbacks": 0}
+
+    def add(self, collection: str, op):
+        self._ops[collection].append(op)
+
+    def after_flush(self, callback: Callable[[], Awaitable[Any]]):
+        """Run `callback` after the ops added so far are written; dropped if that flush fails"""
+        self._after.append(callback)
+
+    def pending(self) -> int:
+        return sum(len(v) for v in self._ops.values()) + len(self._after)
+
+    def full(self) -> bool:
+        return self.pending() >= self.batch_size
+
+    async def flush(self):
+        # Swap buffers first: workers may keep adding while we await
+        ops, self._ops = self._ops, defaultdict(list)
+        after, self._after = self._after, []
+        failed = False
+        for collection, batch in ops.items():
+            if not batch:
+                continue
+            self.stats["ops"] += len(batch)
+            self.stats["batches"] += 1
+            try:
+                await self.db[collection].bulk_write(batch, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                dups = sum(1 for w in errors if w.get("code") == DUPLICATE_KEY)
+                self.stats["duplicates"] += dups
+                self.stats["errors"] += len(errors) - dups
+                if len(errors) > dups:
+                    failed = True
+                    logger.error(f"Bulk write to {collection}: {len(errors) - dups} errors")
+            except Exception as e:
+                failed = True
+                self.stats["errors"] += len(batch)
+                logger.error(f"Bulk write to {collection} failed: {e}")
+
+        if failed:
+            # Their ops may be missing: the next cycle redoes the work
+            self.stats["dropped_callbacks"] += len(after)
+            if after:
+                logger.warning(f"Bulk write failed, {len(after)} after-flush callbacks dropped")
+            return
+        for result in await asyncio.gather(*(cb() for cb in after), return_exceptions=True):
+            if isinstance(result, Exception):
+                self.stats["errors"] += 1
+                logger.error(f"After-flush callback failed: {result}")
+
+
+class StageTimer:
+    """Accumulates wall time per named stage across concurrent workers"""
+
+    def __init__(self):
+        self._stages: Dict[str, Dict[str, float]] = {}
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, (time.monotonic() - t0) * 1000)
+
+    def add(self, name: str, ms: float):
+        s = self._stages.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["count"] += 1
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "count": int(s["count"]),
+                "total_ms": round(s["total_ms"], 1),
+                "avg_ms": round(s["total_ms"] / s["count"], 2) if s["count"] else 0,
+                "max_ms": round(s["max_ms"], 1),
+            }
+            for name, s in self._stages.items()
+        }
+
+
+class ShipmentPipeline:
+    """
+    Usage:
+        pipe = ShipmentPipeline(db)
+        stats = await pipe.run(cursor, handler)   # handler(order, pipe)
+    Handlers add writes via pipe.writes.add(...) and time work via
+    `async with pipe.timer.stage("fetch"): ...`.
+    """
+
+    def __init__(self, db, concurrency: int = DEFAULT_CONCURRENCY, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.concurrency = max(1, concurrency)
+        self.writes = WriteBatcher(db, batch_size=batch_size)
+        self.timer = StageTimer()
+
+    async def run(self, cursor, handler: Callable[[Dict, "ShipmentPipeline"], Awaitable[Any]]) -> Dict[str, Any]:
+        sem = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+        stats = {"scanned": 0, "processed": 0, "errors": 0}
+        t0 = time.monotonic()
+
+        async def work(doc):
+            try:
+                async with self.timer.stage("order"):
+                    await handler(doc, self)
+                stats["processed"] += 1
+            except Exception as e:
+                stats["errors"] += 1
+                logger.error(f"Error processing order {doc.get('id')}: {e}")
+            finally:
+                sem.release()
+
+        async with self.timer.stage("stream"):
+            async for doc in cursor:
+                stats["scanned"] += 1
+                await sem.acquire()
+                task = asyncio.create_task(work(doc))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+
+                if self.writes.full():
+                    async with self.timer.stage("flush"):
+                        await self.writes.flush()
+
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        async with self.timer.stage("flush"):
+            await self.writes.flush()
+
+        return {
+            **stats,
+            "duration_ms": int((time.monotonic() - t0) * 1000),
+            "writes": dict(self.writes.stats),
+            "timings": self.timer.summary(),
+        }
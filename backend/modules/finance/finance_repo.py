@@ -1,8 +1,11 @@
 # O5: Finance Repository
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone
+from typing import Optional
 import uuid
 
+from pymongo.errors import DuplicateKeyError
+
 def utcnow():
     return datetime.now(timezone.utc).isoformat()
 
@@ -15,8 +18,11 @@ class FinanceRepo:
         await self.ledger.create_index("order_id")
         await self.ledger.create_index("created_at")
         await self.ledger.create_index("type")
+        await self.ledger.create_index("key", unique=True, sparse=True)
 
-    async def record(self, order_id: str, type_: str, amount: float, direction: str, meta: dict = None):
+    async def record(self, order_id: str, type_: str, amount: float, direction: str, meta: dict = None,
+                     key: Optional[str] = None):
+        """`key` (e.g. the source event id) makes the entry write-once; a replay returns None"""
         doc = {
             "id": str(uuid.uuid4()),
             "order_id": order_id,
@@ -26,5 +32,10 @@ class FinanceRepo:
             "meta": meta or {},
             "created_at": utcnow(),
         }
-        await self.ledger.insert_one(doc)
+        if key:
+            doc["key"] = key
+        try:
+            await self.ledger.insert_one(doc)
+        except DuplicateKeyError:
+            return None
         return doc
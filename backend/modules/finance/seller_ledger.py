@@ -0,0 +1,302 @@
+"""
+O5: Seller ledger (seller_ledger + seller_balances)
+
+Append-only entries per (order, seller) and payout, each with a unique key
+so replaying an event is a no-op:
+    PAID:{order_id}:{seller_id}        seller lines of a paid order
+    DELIVERED:{order_id}:{seller_id}   paid order delivered -> earns balance
+    REFUND:{order_id}:{seller_id}      reverses PAID (and DELIVERED if booked)
+    PAYOUT:{payout_id}                 payout processing/completed
+    PAYOUT_REVERSED:{payout_id}        payout left processing/completed
+Every new entry $inc's the seller_balances document (totals + monthly
+buckets of paid revenue / orders), so balance and stats reads are a single
+find_one.
+
+Orders are synced from their current state (order_hooks on create/status);
+payouts from PayoutsService. Rebuild from history:
+    python -m modules.finance.seller_ledger [--seller-id ID]
+A full rebuild replays into *_rebuild staging collections and renames them
+over the live ones, then re-syncs orders touched since it started (live
+posts during the replay went to the old collections). A post landing
+between the two renames books its entry in the new ledger but $inc's the
+old balances, so balances of sellers with entries since the swap are
+recomputed from their entries. The job runner leader rebuilds an empty
+ledger (job seller_ledger_rebuild).
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+import asyncio
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
+from core.dates import day_of, range_q, utcnow
+from modules.analytics_intel.kpi_counters import PAID_STATUSES, norm_status
+
+logger = logging.getLogger(__name__)
+
+COMMISSION_RATE = 0.10
+PAYOUT_COUNTED = ("completed", "processing")
+PAID_PAYMENT_STATUSES = ("paid", "completed")
+DELIVERED_STATUSES = ("DELIVERED", "COMPLETED")
+STAGING_SUFFIX = "_rebuild"
+ORDER_FIELDS = {"_id": 0, "id": 1, "items": 1, "status": 1, "payment_status": 1,
+                "paid_at": 1, "payment.paid_at": 1, "created_at": 1}
+
+EMPTY_BALANCE = {
+    "revenue": 0.0, "orders": 0, "items": 0,
+    "delivered_revenue": 0.0, "refunded": 0.0, "paid_out": 0.0,
+}
+
+
+def order_flags(order: dict) -> dict:
+    status = norm_status(order.get("status"))
+    payment_status = str(order.get("payment_status") or "").lower()
+    refunded = status == "REFUNDED" or payment_status == "refunded"
+    paid = refunded or payment_status in PAID_PAYMENT_STATUSES or status in PAID_STATUSES
+    return {"paid": paid, "delivered": paid and status in DELIVERED_STATUSES, "refunded": refunded}
+
+
+def seller_lines(order: dict) -> Dict[str, dict]:
+    """seller_id -> {"amount", "items"} for the order's lines"""
+    out: Dict[str, dict] = defaultdict(lambda: {"amount": 0.0, "items": 0})
+    for item in order.get("items") or []:
+        seller_id = item.get("seller_id")
+        if not seller_id:
+            continue
+        qty = int(item.get("quantity") or 0)
+        out[seller_id]["amount"] += float(item.get("price") or 0) * qty
+        out[seller_id]["items"] += qty
+    return dict(out)
+
+
+def paid_month(order: dict) -> str:
+    paid_at = order.get("paid_at") or (order.get("payment") or {}).get("paid_at") or order.get("created_at")
+    return day_of(paid_at)[:7] or utcnow().strftime("%Y-%m")
+
+
+class SellerLedgerRepo:
+    def __init__(self, db, suffix: str = ""):
+        self.db = db
+        self.entries = db["seller_ledger" + suffix]
+        self.balances = db["seller_balances" + suffix]
+        self.orders = db["orders"]
+        self.payouts = db["payouts"]
+
+    async def ensure_indexes(self):
+        await self.entries.create_index("key", unique=True)
+        await self.entries.create_index([("seller_id", 1), ("created_at", -1)])
+        await self.entries.create_index("order_id")
+        await self.balances.create_index("seller_id", unique=True)
+        await self.orders.create_index("items.seller_id")
+
+    async def _post(self, key: str, seller_id: str, kind: str, inc: Dict[str, float], **fields) -> bool:
+        """Insert the entry once; only the first insert moves the balance"""
+        now = utcnow().isoformat()
+        try:
+            await self.entries.insert_one({
+                "key": key, "seller_id": seller_id, "kind": kind, "inc": inc, **fields, "created_at": now,
+            })
+        except DuplicateKeyError:
+            return False
+        update = {"$inc": inc, "$set": {"updated_at": now}}
+        try:
+            await self.balances.update_one({"seller_id": seller_id}, update, upsert=True)
+        except DuplicateKeyError:
+            # Concurrent first entry for this seller created the balance
+            await self.balances.update_one({"seller_id": seller_id}, update)
+        return True
+
+    # ---- Write side ----
+
+    async def sync_order(self, order: dict, only_seller: Optional[str] = None) -> int:
+        """Post whatever entries the order's current state implies and are not booked yet"""
+        flags = order_flags(order)
+        if not flags["paid"] or not order.get("id"):
+            return 0
+        lines = seller_lines(order)
+        if only_seller is not None:
+            lines = {k: v for k, v in lines.items() if k == only_seller}
+        if not lines:
+            return 0
+
+        order_id = order["id"]
+        booked = {e["key"] async for e in self.entries.find({"order_id": order_id}, {"_id": 0, "key": 1})}
+        month = paid_month(order)
+        posted = 0
+        for seller_id, line in lines.items():
+            amount, items = round(line["amount"], 2), line["items"]
+            paid_key, delivered_key = f"PAID:{order_id}:{seller_id}", f"DELIVERED:{order_id}:{seller_id}"
+
+            if paid_key not in booked:
+                posted += await self._post(paid_key, seller_id, "PAID", {
+                    "revenue": amount, "orders": 1, "items": items,
+                    f"months.{month}.revenue": amount, f"months.{month}.orders": 1,
+                }, order_id=order_id, amount=amount, month=month)
+                booked.add(paid_key)
+
+            if flags["refunded"]:
+                refund_key = f"REFUND:{order_id}:{seller_id}"
+                if refund_key not in booked:
+                    inc = {
+                        "revenue": -amount, "orders": -1, "items": -items, "refunded": amount,
+                        f"months.{month}.revenue": -amount, f"months.{month}.orders": -1,
+                    }
+                    if delivered_key in booked:
+                        inc["delivered_revenue"] = -amount
+                    posted += await self._post(refund_key, seller_id, "REFUND", inc,
+                                               order_id=order_id, amount=amount, month=month)
+            elif flags["delivered"] and delivered_key not in booked:
+                posted += await self._post(delivered_key, seller_id, "DELIVERED",
+                                           {"delivered_revenue": amount}, order_id=order_id, amount=amount)
+        return posted
+
+    async def sync_order_id(self, order_id: str) -> int:
+        order = await self.orders.find_one({"id": order_id}, ORDER_FIELDS)
+        return await self.sync_order(order) if order else 0
+
+    async def sync_payout(self, payout: dict) -> bool:
+        payout_id, seller_id = payout.get("id"), payout.get("seller_id")
+        if not payout_id or not seller_id:
+            return False
+        amount = round(float(payout.get("amount") or 0), 2)
+        counted = payout.get("status") in PAYOUT_COUNTED
+        booked = {e["key"] async for e in self.entries.find(
+            {"key": {"$in": [f"PAYOUT:{payout_id}", f"PAYOUT_REVERSED:{payout_id}"]}}, {"_id": 0, "key": 1}
+        )}
+        if counted and f"PAYOUT:{payout_id}" not in booked:
+            return await self._post(f"PAYOUT:{payout_id}", seller_id, "PAYOUT", {"paid_out": amount},
+                                    payout_id=payout_id, amount=amount)
+        if not counted and f"PAYOUT:{payout_id}" in booked and f"PAYOUT_REVERSED:{payout_id}" not in booked:
+            return await self._post(f"PAYOUT_REVERSED:{payout_id}", seller_id, "PAYOUT_REVERSED", {"paid_out": -amount},
+                                    payout_id=payout_id, amount=amount)
+        return False
+
+    # ---- Read side ----
+
+    async def get(self, seller_id: str) -> dict:
+        doc = await self.balances.find_one({"seller_id": seller_id}, {"_id": 0}) or {}
+        return {**EMPTY_BALANCE, "months": {}, **doc, "seller_id": seller_id}
+
+    async def balance(self, seller_id: str) -> Dict[str, float]:
+        """Same shape as the former PayoutsService aggregation"""
+        b = await self.get(seller_id)
+        earned = float(b["delivered_revenue"])
+        commission = earned * COMMISSION_RATE
+        return {
+            "total_revenue": round(earned, 2),
+            "commission": round(commission, 2),
+            "total_paid": round(float(b["paid_out"]), 2),
+            "available_balance": round(max(0, earned - commission - float(b["paid_out"])), 2),
+        }
+
+    async def entries_for(self, seller_id: str, limit: int = 50) -> List[dict]:
+        cur = self.entries.find({"seller_id": seller_id}, {"_id": 0}).sort("created_at", -1).limit(limit)
+        return await cur.to_list(limit)
+
+    # ---- Rebuild ----
+
+    async def needs_rebuild(self) -> bool:
+        """Empty balances while orders carry seller lines (fresh deploy / dropped store)"""
+        if await self.balances.estimated_document_count() > 0:
+            return False
+        return await self.orders.find_one({"items.seller_id": {"$exists": True}}, {"_id": 1}) is not None
+
+    async def _replay(self, orders_q: dict, payouts_q: dict, only_seller: Optional[str] = None) -> dict:
+        orders = posted = 0
+        async for order in self.orders.find(orders_q, ORDER_FIELDS).batch_size(500):
+            posted += await self.sync_order(order, only_seller=only_seller)
+            orders += 1
+        async for payout in self.payouts.find(payouts_q, {"_id": 0}):
+            posted += await self.sync_payout(payout)
+        return {"orders": orders, "entries": posted}
+
+    async def recompute_balances(self, seller_ids: List[str]) -> int:
+        """Balance documents re-summed from the sellers' entries (each entry keeps its inc)"""
+        for seller_id in seller_ids:
+            totals: Dict[str, float] = {}
+            async for e in self.entries.find({"seller_id": seller_id}, {"_id": 0, "inc": 1}):
+                for k, v in (e.get("inc") or {}).items():
+                    totals[k] = totals.get(k, 0) + v
+            doc: dict = {"seller_id": seller_id, "updated_at": utcnow().isoformat()}
+            for k, v in totals.items():
+                *path, leaf = k.split(".")
+                node = doc
+                for part in path:
+                    node = node.setdefault(part, {})
+                node[leaf] = round(v, 2) if isinstance(v, float) else v
+            await self.balances.replace_one({"seller_id": seller_id}, doc, upsert=True)
+        return len(seller_ids)
+
+    async def rebuild(self, seller_id: Optional[str] = None) -> dict:
+        """Replay entries from orders + payouts (one seller in place, or all via staging + swap)"""
+        await self.ensure_indexes()
+        if seller_id:
+            scope = {"seller_id": seller_id}
+            await self.entries.delete_many(scope)
+            await self.balances.delete_many(scope)
+            result = await self._replay({"items.seller_id": seller_id}, scope, only_seller=seller_id)
+            return {"ok": True, **result}
+
+        started = utcnow()
+        staging = SellerLedgerRepo(self.db, suffix=STAGING_SUFFIX)
+        await staging.entries.drop()
+        await staging.balances.drop()
+        await staging.ensure_indexes()
+        result = await staging._replay({"items.seller_id": {"$exists": True}}, {})
+
+        swapped_at = utcnow().isoformat()
+        await staging.entries.rename(self.entries.name, dropTarget=True)
+        await staging.balances.rename(self.balances.name, dropTarget=True)
+
+        # Orders / payouts that changed during the replay (posting is idempotent)
+        touched = {"$or": range_q("updated_at", gte=started)["$or"] + range_q("created_at", gte=started)["$or"]}
+        caught_up = await self._replay({"$and": [{"items.seller_id": {"$exists": True}}, touched]}, {})
+
+        # Entries booked since the swap may have moved the dropped balances
+        sellers = await self.entries.distinct("seller_id", {"created_at": {"$gte": swapped_at}})
+        recomputed = await self.recompute_balances(sellers)
+        return {"ok": True, **result, "caught_up": caught_up["entries"], "recomputed": recomputed}
+
+
+# ---- Hooks (never fail the caller) ----
+
+async def record_seller_order(db, order_id: str, order: Optional[dict] = None):
+    """`order` (e.g. the freshly inserted document) saves the re-read"""
+    try:
+        repo = SellerLedgerRepo(db)
+        await (repo.sync_order(order) if order is not None else repo.sync_order_id(order_id))
+    except Exception as e:
+        logger.warning(f"Seller ledger sync failed for order {order_id}: {e}")
+
+
+async def record_seller_payout(db, payout: dict):
+    try:
+        await SellerLedgerRepo(db).sync_payout(payout)
+    except Exception as e:
+        logger.warning(f"Seller ledger sync failed for payout {payout.get('id')}: {e}")
+
+
+async def _main():
+    import argparse
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Rebuild seller_ledger / seller_balances from orders and payouts")
+    parser.add_argument("--seller-id", default=None)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent.parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "marketplace_db")]
+    result = await SellerLedgerRepo(db).rebuild(seller_id=args.seller_id)
+    logger.info(f"Seller ledger rebuild: {result}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
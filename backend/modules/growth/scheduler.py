@@ -5,16 +5,12 @@ Growth Automation Scheduler
 - Post-purchase review requests
 - Telegram broadcasts
 """
-import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import Optional
 import os
 
 logger = logging.getLogger(__name__)
 
-# Global reference to scheduler task
-_scheduler_task: Optional[asyncio.Task] = None
 _db = None
 
 # Telegram Bot Token
@@ -203,45 +199,30 @@ async def process_review_requests():
         logger.info(f"⭐ Sent {processed} review requests")
 
 
-async def scheduler_loop():
-    """Main scheduler loop"""
-    logger.info("🚀 Growth scheduler started")
-    
-    while True:
-        try:
-            # Run tasks every 10 minutes
-            await process_abandoned_carts()
-            await asyncio.sleep(60)  # 1 min between tasks
-            
-            await process_payment_recovery()
-            await asyncio.sleep(60)
-            
-            await process_review_requests()
-            
-            # Wait before next cycle (10 minutes total)
-            await asyncio.sleep(480)  # 8 minutes
-            
-        except asyncio.CancelledError:
-            logger.info("Growth scheduler stopped")
-            break
-        except Exception as e:
-            logger.error(f"Growth scheduler error: {e}")
-            await asyncio.sleep(300)  # Wait 5 min on error
+GROWTH_JOB_IDS = ("growth_abandoned_carts", "growth_payment_recovery", "growth_review_requests")
 
 
 def start_growth_scheduler(db):
-    """Start the growth automation scheduler"""
-    global _scheduler_task, _db
+    """Register growth automation jobs on the job runner (every 10 minutes)"""
+    global _db
     _db = db
-    
-    loop = asyncio.get_event_loop()
-    _scheduler_task = loop.create_task(scheduler_loop())
-    logger.info("✅ Growth automation scheduler initialized")
+
+    from modules.jobs.job_runner import get_job_runner
+    runner = get_job_runner(db)
+
+    runner.add_job(process_abandoned_carts, "interval", minutes=10, id="growth_abandoned_carts")
+    runner.add_job(process_payment_recovery, "interval", minutes=10, id="growth_payment_recovery")
+    runner.add_job(process_review_requests, "interval", minutes=10, id="growth_review_requests")
+    runner.start()
+    logger.info("✅ Growth automation jobs registered")
 
 
 def stop_growth_scheduler():
-    """Stop the growth automation scheduler"""
-    global _scheduler_task
-    if _scheduler_task:
-        _scheduler_task.cancel()
-        _scheduler_task = None
+    """Remove growth automation jobs from the job runner"""
+    if _db is None:
+        return
+    from modules.jobs.job_runner import get_job_runner
+    runner = get_job_runner(_db)
+    for job_id in GROWTH_JOB_IDS:
+        if runner.scheduler.get_job(job_id):
+            runner.scheduler.remove_job(job_id)
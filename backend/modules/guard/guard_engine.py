@@ -3,6 +3,8 @@ O14: Guard Engine - Financial & Fraud Guard
 KPI alerts + anti-fraud detection
 """
 from datetime import datetime, timezone, timedelta
+from core.dates import range_q
+from modules.analytics_intel.kpi_counters import KpiCountersRepo
 from modules.guard.guard_repo import GuardRepo
 from modules.bot.bot_alerts_repo import BotAlertsRepo
 from modules.bot.bot_settings_repo import BotSettingsRepo
@@ -31,6 +33,9 @@ def pct_drop(today: float, yesterday: float) -> float:
     return (1.0 - (today / yesterday)) * 100.0
 
 
+PAID_STATUSES = ["paid", "processing", "shipped", "delivered", "PAID", "PROCESSING", "SHIPPED", "DELIVERED"]
+AWAITING_STATUSES = ["pending", "AWAITING_PAYMENT"]
+
 DEFAULT_GUARD_CONFIG = {
     "enabled": True,
     "kpi": {
@@ -53,12 +58,16 @@ class GuardEngine:
         self.settings = BotSettingsRepo(db)
         self.alerts = BotAlertsRepo(db)
         self.repo = GuardRepo(db)
+        self.counters = KpiCountersRepo(db)
         self.orders = db["orders"]
         self.customers = db["customers"]
 
+    async def get_config(self) -> dict:
+        st = (await self.settings.snapshot()).data
+        return st.get("guard") or DEFAULT_GUARD_CONFIG
+
     async def run_once(self):
-        st = await self.settings.get()
-        guard = st.get("guard") or DEFAULT_GUARD_CONFIG
+        guard = await self.get_config()
         if not guard.get("enabled", True):
             return {"ok": True, "skipped": True}
 
@@ -81,34 +90,31 @@ class GuardEngine:
 
         return {"ok": True}
 
+    async def revenue_between(self, s: datetime, e: datetime) -> float:
+        """Paid revenue of orders created on the days in [s, e) (KPI counters)"""
+        last = e - timedelta(microseconds=1)
+        totals = await self.counters.totals(s.date().isoformat(), last.date().isoformat())
+        return totals.revenue
+
     async def _kpi_revenue_drop(self, guard: dict):
-        drop_thr = float((guard.get("kpi") or {}).get("revenue_drop_pct", 25))
         now = utcnow()
         today_s, today_e = day_bounds(now)
         yday_s, yday_e = day_bounds(now - timedelta(days=1))
 
-        async def sum_revenue(s, e):
-            pipeline = [
-                {"$match": {
-                    "created_at": {"$gte": iso(s), "$lt": iso(e)},
-                    "status": {"$in": ["paid", "processing", "shipped", "delivered", "PAID", "PROCESSING", "SHIPPED", "DELIVERED"]}
-                }},
-                {"$group": {"_id": None, "sum": {"$sum": "$total_amount"}}}
-            ]
-            rows = await self.orders.aggregate(pipeline).to_list(1)
-            return float(rows[0]["sum"]) if rows else 0.0
-
-        today = await sum_revenue(today_s, today_e)
-        yday = await sum_revenue(yday_s, yday_e)
+        today = await self.revenue_between(today_s, today_e)
+        yday = await self.revenue_between(yday_s, yday_e)
+        await self.report_revenue_drop(guard, today_s, today, yday)
 
+    async def report_revenue_drop(self, guard: dict, today_s: datetime, today: float, yday: float) -> bool:
+        drop_thr = float((guard.get("kpi") or {}).get("revenue_drop_pct", 25))
         drop = pct_drop(today, yday)
         if drop < drop_thr:
-            return
+            return False
 
         key = f"KPI_REVENUE_DROP:{today_s.date().isoformat()}"
         first = await self.repo.once(key, {"rule": "KPI_REVENUE_DROP", "key": key})
         if not first:
-            return
+            return False
 
         incident = {
             "key": key,
@@ -132,24 +138,25 @@ class GuardEngine:
             f"Key: <code>{key}</code>"
         )
         await self.alerts.enqueue("KPI_REVENUE_DROP", {"text": text}, key)
+        return True
 
     async def _kpi_awaiting_payment_spike(self, guard: dict):
-        thr = int((guard.get("kpi") or {}).get("awaiting_payment_daily", 15))
         now = utcnow()
-        today_s, today_e = day_bounds(now)
+        today_s, _ = day_bounds(now)
 
-        cnt = await self.orders.count_documents({
-            "created_at": {"$gte": iso(today_s), "$lt": iso(today_e)},
-            "status": {"$in": ["pending", "AWAITING_PAYMENT"]}
-        })
+        day = today_s.date().isoformat()
+        cnt = (await self.counters.totals(day, day)).count("AWAITING_PAYMENT")
+        await self.report_awaiting_spike(guard, today_s, cnt)
 
+    async def report_awaiting_spike(self, guard: dict, today_s: datetime, cnt: int) -> bool:
+        thr = int((guard.get("kpi") or {}).get("awaiting_payment_daily", 15))
         if cnt < thr:
-            return
+            return False
 
         key = f"KPI_AWAITING_PAYMENT_SPIKE:{today_s.date().isoformat()}"
         first = await self.repo.once(key, {"rule": "KPI_AWAITING_PAYMENT_SPIKE", "key": key})
         if not first:
-            return
+            return False
 
         incident = {
             "key": key,
@@ -172,6 +179,7 @@ class GuardEngine:
             f"Key: <code>{key}</code>"
         )
         await self.alerts.enqueue("KPI_AWAITING_PAYMENT_SPIKE", {"text": text}, key)
+        return True
 
     async def _fraud_burst_orders(self, guard: dict):
         cfg = guard.get("fraud") or {}
@@ -180,46 +188,54 @@ class GuardEngine:
         hour_ago = now - timedelta(hours=1)
 
         pipeline = [
-            {"$match": {"created_at": {"$gte": iso(hour_ago), "$lt": iso(now)}}},
+            {"$match": range_q("created_at", hour_ago, now)},
             {"$group": {"_id": "$buyer_id", "cnt": {"$sum": 1}, "orders": {"$push": "$id"}}},
             {"$match": {"cnt": {"$gte": thr}}}
         ]
         rows = await self.orders.aggregate(pipeline).to_list(20)
 
         for r in rows:
-            buyer_id = r["_id"]
-            if not buyer_id:
+            if not r["_id"]:
                 continue
+            await self.report_burst(guard, r["_id"], r.get("orders") or [], now)
 
-            key = f"FRAUD_BURST_ORDERS:{buyer_id}:{now.strftime('%Y-%m-%dT%H')}"
-            first = await self.repo.once(key, {"rule": "FRAUD_BURST_ORDERS", "key": key})
-            if not first:
-                continue
+    async def report_burst(self, guard: dict, buyer_id: str, orders: list, now: datetime) -> bool:
+        cfg = guard.get("fraud") or {}
+        thr = int(cfg.get("burst_orders_per_hour", 3))
+        cnt = len(orders)
+        if cnt < thr:
+            return False
+
+        key = f"FRAUD_BURST_ORDERS:{buyer_id}:{now.strftime('%Y-%m-%dT%H')}"
+        first = await self.repo.once(key, {"rule": "FRAUD_BURST_ORDERS", "key": key})
+        if not first:
+            return False
 
-            incident = {
-                "key": key,
-                "type": "FRAUD_BURST_ORDERS",
-                "status": "OPEN",
-                "severity": "CRITICAL",
-                "title": "Suspicious Order Burst",
-                "description": f"User {buyer_id} created {int(r['cnt'])} orders in last hour (threshold {thr}).",
-                "entity": f"customer:{buyer_id}",
-                "payload": {"buyer_id": buyer_id, "count": int(r["cnt"]), "orders": r.get("orders") or [], "threshold": thr},
-                "muted_until": None,
-                "resolved_at": None,
-            }
-            await self.repo.upsert_incident(incident)
-
-            if cfg.get("auto_tag", True):
-                await self._tag_customer(buyer_id, "FRAUD_SUSPECT")
-
-            text = (
-                f"<b>Suspicious Order Burst</b>\n"
-                f"User: <code>{buyer_id}</code>\n"
-                f"Orders in 1h: <b>{int(r['cnt'])}</b> (threshold {thr})\n"
-                f"Key: <code>{key}</code>"
-            )
-            await self.alerts.enqueue("FRAUD_BURST_ORDERS", {"text": text}, key)
+        incident = {
+            "key": key,
+            "type": "FRAUD_BURST_ORDERS",
+            "status": "OPEN",
+            "severity": "CRITICAL",
+            "title": "Suspicious Order Burst",
+            "description": f"User {buyer_id} created {cnt} orders in last hour (threshold {thr}).",
+            "entity": f"customer:{buyer_id}",
+            "payload": {"buyer_id": buyer_id, "count": cnt, "orders": orders, "threshold": thr},
+            "muted_until": None,
+            "resolved_at": None,
+        }
+        await self.repo.upsert_incident(incident)
+
+        if cfg.get("auto_tag", True):
+            await self._tag_customer(buyer_id, "FRAUD_SUSPECT")
+
+        text = (
+            f"<b>Suspicious Order Burst</b>\n"
+            f"User: <code>{buyer_id}</code>\n"
+            f"Orders in 1h: <b>{cnt}</b> (threshold {thr})\n"
+            f"Key: <code>{key}</code>"
+        )
+        await self.alerts.enqueue("FRAUD_BURST_ORDERS", {"text": text}, key)
+        return True
 
     async def _tag_customer(self, user_id: str, tag: str):
         user = await self.db["users"].find_one({"id": user_id}, {"_id": 0})
@@ -4,6 +4,8 @@ O14: Guard Repository
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone
 
+from modules.crm.customer360 import record_customer_event, timeline_event
+
 
 def utcnow():
     return datetime.now(timezone.utc).isoformat()
@@ -32,11 +34,21 @@ class GuardRepo:
 
     async def upsert_incident(self, incident: dict):
         incident["updated_at"] = utcnow()
-        await self.inc.update_one(
+        result = await self.inc.update_one(
             {"key": incident["key"]},
             {"$set": incident, "$setOnInsert": {"created_at": utcnow()}},
             upsert=True
         )
+        entity = incident.get("entity") or ""
+        if result.upserted_id is not None and entity.startswith("customer:"):
+            await record_customer_event(
+                self.db, entity.split(":", 1)[1],
+                timeline_event(
+                    incident["updated_at"], "GUARD_INCIDENT", f"Incident: {incident.get('title', 'Unknown')}",
+                    f"{incident.get('type')} | {incident.get('status')}", {"incident_key": incident["key"]}
+                ),
+                counter="incidents_count"
+            )
 
     async def get_incident(self, key: str):
         return await self.inc.find_one({"key": key}, {"_id": 0})
@@ -76,3 +76,20 @@ async def block_customer(user_id: str, body: dict, current_user: dict = Depends(
         {"$set": {"is_blocked": blocked, "blocked_at": utcnow().isoformat() if blocked else None}}
     )
     return {"ok": True, "blocked": blocked}
+
+
+@router.get("/stream")
+async def stream_status(current_user: dict = Depends(get_current_admin)):
+    """Streaming detector state as of its last checkpoint"""
+    doc = await db["guard_stream_state"].find_one({"_id": "orders"}, {"_id": 0, "resume_token": 0})
+    if not doc:
+        return {"checkpoint": None}
+    return {"checkpoint": {
+        "day": doc.get("day"),
+        "saved_at": doc.get("saved_at"),
+        "since": doc.get("since"),
+        "buyers_in_window": len({w[0] for w in doc.get("windows") or []}),
+        "today_revenue": round(sum(p[1] for p in doc.get("paid") or []), 2),
+        "yesterday_revenue": doc.get("yesterday_revenue"),
+        "awaiting_payment": len(doc.get("awaiting") or []),
+    }}
@@ -0,0 +1,311 @@
+"""
+O14: Guard Stream - event-driven fraud & KPI detection
+
+Consumes order inserts / status changes as they happen instead of
+re-aggregating orders on every guard tick:
+- per-buyer sliding 1h windows (order id -> created ts) for burst detection
+- per-day accumulators: paid revenue and AWAITING_PAYMENT orders, keyed by
+  order id so re-applying the same event is idempotent
+- source: orders change stream (GUARD_CHANGE_STREAM=true, needs a replica
+  set) or an incremental created_at/updated_at tail every few seconds
+- state is checkpointed to guard_stream_state and restored on restart or
+  leader hand-over; GuardEngine.run_once stays as the reconciliation pass
+  and `reseed()` realigns the accumulators after it
+"""
+from datetime import timedelta
+from typing import Callable, Dict, Optional, Set
+import asyncio
+import logging
+import time
+
+from pymongo.errors import OperationFailure
+
+from core.dates import range_q, to_dt, utcnow
+from modules.guard.guard_engine import GuardEngine, PAID_STATUSES, AWAITING_STATUSES, day_bounds
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = "orders"
+WINDOW_SEC = 3600
+CHECKPOINT_SEC = 60
+CONFIG_TTL_SEC = 60
+# No tick for this long: another worker may have led meanwhile, reload
+STALE_SEC = 90
+# Tail overlap for clock skew between app servers
+TAIL_SKEW_SEC = 5
+
+ORDER_FIELDS = {"_id": 0, "id": 1, "buyer_id": 1, "status": 1, "total_amount": 1, "created_at": 1}
+
+_stream: Optional["GuardStream"] = None
+
+
+class GuardStream:
+    def __init__(self, db, engine: Optional[GuardEngine] = None):
+        self.db = db
+        self.engine = engine or GuardEngine(db)
+        self.orders = db["orders"]
+        self.state = db["guard_stream_state"]
+
+        self.windows: Dict[str, Dict[str, float]] = {}
+        self.day: Optional[str] = None
+        self.paid: Dict[str, float] = {}
+        self.awaiting: Set[str] = set()
+        self.yesterday_revenue: Optional[float] = None
+        self.since = None
+        self.resume_token = None
+
+        self.loaded = False
+        self.streaming = False
+        self.applied = 0
+        self._fired: Set[str] = set()
+        self._guard: Optional[dict] = None
+        self._guard_at = 0.0
+        self._last_tick = 0.0
+        self._last_checkpoint = 0.0
+        self._lock = asyncio.Lock()
+
+    async def ensure_indexes(self):
+        await self.orders.create_index("updated_at")
+
+    # ---- state ----
+
+    async def _load(self):
+        """Restore from the last checkpoint, or seed from orders (lock held)"""
+        await self.ensure_indexes()
+        doc = await self.state.find_one({"_id": STATE_ID})
+        today = utcnow().date().isoformat()
+        if doc and doc.get("day") == today:
+            self.day = today
+            self.windows = {}
+            for buyer_id, order_id, created in doc.get("windows") or []:
+                self.windows.setdefault(buyer_id, {})[order_id] = created
+            self.paid = {oid: amount for oid, amount in doc.get("paid") or []}
+            self.awaiting = set(doc.get("awaiting") or [])
+            self.yesterday_revenue = doc.get("yesterday_revenue")
+            self.since = to_dt(doc.get("since"))
+            self.resume_token = doc.get("resume_token")
+            self.loaded = True
+            # Catch up on what happened while nobody was tailing
+            await self.tail_once()
+        else:
+            await self._reseed()
+        self._last_tick = time.monotonic()
+
+    async def reseed(self):
+        """Reconciliation: rebuild today's accumulators and the 1h windows from orders"""
+        async with self._lock:
+            await self._reseed()
+
+    async def _reseed(self):
+        now = utcnow()
+        today_s, today_e = day_bounds(now)
+        since = now
+        windows: Dict[str, Dict[str, float]] = {}
+        paid: Dict[str, float] = {}
+        awaiting: Set[str] = set()
+
+        hour_ago = now - timedelta(seconds=WINDOW_SEC)
+        q = range_q("created_at", min(hour_ago, today_s), today_e)
+        async for o in self.orders.find(q, ORDER_FIELDS):
+            created = to_dt(o.get("created_at"))
+            if not created or not o.get("id"):
+                continue
+            if created >= hour_ago and o.get("buyer_id"):
+                windows.setdefault(o["buyer_id"], {})[o["id"]] = created.timestamp()
+            if created >= today_s:
+                if o.get("status") in PAID_STATUSES:
+                    paid[o["id"]] = float(o.get("total_amount") or 0)
+                if o.get("status") in AWAITING_STATUSES:
+                    awaiting.add(o["id"])
+
+        yesterday = await self.engine.revenue_between(today_s - timedelta(days=1), today_s)
+
+        self.day = today_s.date().isoformat()
+        self.windows, self.paid, self.awaiting = windows, paid, awaiting
+        self.yesterday_revenue = yesterday
+        self.since = since
+        self.loaded = True
+        await self.checkpoint()
+
+    async def checkpoint(self):
+        self._prune(utcnow().timestamp())
+        await self.state.update_one(
+            {"_id": STATE_ID},
+            {"$set": {
+                "day": self.day,
+                "windows": [[b, oid, t] for b, w in self.windows.items() for oid, t in w.items()],
+                "paid": [[oid, amount] for oid, amount in self.paid.items()],
+                "awaiting": list(self.awaiting),
+                "yesterday_revenue": self.yesterday_revenue,
+                "since": self.since.isoformat() if self.since else None,
+                "resume_token": self.resume_token,
+                "saved_at": utcnow().isoformat(),
+            }},
+            upsert=True
+        )
+        self._last_checkpoint = time.monotonic()
+
+    def _prune(self, now_ts: float):
+        cutoff = now_ts - WINDOW_SEC
+        for buyer_id in list(self.windows):
+            w = {oid: t for oid, t in self.windows[buyer_id].items() if t >= cutoff}
+            if w:
+                self.windows[buyer_id] = w
+            else:
+                del self.windows[buyer_id]
+
+    async def _roll_day(self, today: str):
+        if self.day == today:
+            return
+        # The finished day is complete in memory: it becomes "yesterday"
+        finished = sum(self.paid.values())
+        prev = (to_dt(today) - timedelta(days=1)).date().isoformat()
+        self.yesterday_revenue = finished if self.day == prev else None
+        self.day = today
+        self.paid = {}
+        self.awaiting = set()
+        self._fired = set()
+        if self.yesterday_revenue is None:
+            today_s = to_dt(today)
+            self.yesterday_revenue = await self.engine.revenue_between(today_s - timedelta(days=1), today_s)
+
+    async def _config(self) -> dict:
+        if self._guard is None or time.monotonic() - self._guard_at > CONFIG_TTL_SEC:
+            self._guard = await self.engine.get_config()
+            self._guard_at = time.monotonic()
+        return self._guard
+
+    # ---- events ----
+
+    async def apply(self, order: dict):
+        """Fold one order snapshot into the windows/accumulators; fire rules"""
+        created = to_dt(order.get("created_at"))
+        order_id = order.get("id")
+        if not created or not order_id:
+            return
+        guard = await self._config()
+        if not guard.get("enabled", True):
+            return
+
+        now = utcnow()
+        await self._roll_day(now.date().isoformat())
+        self.applied += 1
+
+        buyer_id = order.get("buyer_id")
+        if buyer_id and created.timestamp() >= now.timestamp() - WINDOW_SEC:
+            window = self.windows.setdefault(buyer_id, {})
+            window[order_id] = created.timestamp()
+            cutoff = now.timestamp() - WINDOW_SEC
+            orders = [oid for oid, t in window.items() if t >= cutoff]
+            key = f"burst:{buyer_id}:{now.strftime('%Y-%m-%dT%H')}"
+            thr = int((guard.get("fraud") or {}).get("burst_orders_per_hour", 3))
+            if len(orders) >= thr and key not in self._fired:
+                self._fired.add(key)
+                await self.engine.report_burst(guard, buyer_id, orders, now)
+
+        if created.date().isoformat() != self.day:
+            return
+
+        status = order.get("status")
+        if status in PAID_STATUSES:
+            self.paid[order_id] = float(order.get("total_amount") or 0)
+        else:
+            self.paid.pop(order_id, None)
+
+        if status in AWAITING_STATUSES:
+            self.awaiting.add(order_id)
+            thr = int((guard.get("kpi") or {}).get("awaiting_payment_daily", 15))
+            if len(self.awaiting) >= thr and "awaiting" not in self._fired:
+                self._fired.add("awaiting")
+                await self.engine.report_awaiting_spike(guard, day_bounds(now)[0], len(self.awaiting))
+        else:
+            self.awaiting.discard(order_id)
+
+    async def tail_once(self) -> int:
+        """Apply orders created/updated since the last tail (polling source)"""
+        started = utcnow()
+        since = (self.since or started) - timedelta(seconds=TAIL_SKEW_SEC)
+        q = {"$or": [range_q("created_at", since), range_q("updated_at", since)]}
+        n = 0
+        async for o in self.orders.find(q, ORDER_FIELDS):
+            await self.apply(o)
+            n += 1
+        self.since = started
+        return n
+
+    async def tick(self) -> dict:
+        """
+        Scheduler entry (leader only, every few seconds): load/reload state,
+        tail when no change stream is active, evaluate the revenue KPI and
+        checkpoint periodically.
+        """
+        async with self._lock:
+            if not self.loaded or time.monotonic() - self._last_tick > STALE_SEC:
+                await self._load()
+            self._last_tick = time.monotonic()
+
+            tailed = 0
+            if not self.streaming:
+                tailed = await self.tail_once()
+
+            guard = await self._config()
+            if guard.get("enabled", True) and self.yesterday_revenue is not None:
+                await self._roll_day(utcnow().date().isoformat())
+                if "revenue" not in self._fired:
+                    today_s = day_bounds(utcnow())[0]
+                    if await self.engine.report_revenue_drop(guard, today_s, sum(self.paid.values()), self.yesterday_revenue):
+                        self._fired.add("revenue")
+
+            if time.monotonic() - self._last_checkpoint >= CHECKPOINT_SEC:
+                await self.checkpoint()
+
+        return {"ok": True, "tailed": tailed, "streaming": self.streaming}
+
+    async def watch(self, should_run: Callable[[], bool] = lambda: True):
+        """Tail order inserts/status changes with a change stream (needs a replica set)"""
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$in": ["insert", "replace"]}},
+            {"updateDescription.updatedFields.status": {"$exists": True}},
+        ]}}]
+        while True:
+            try:
+                async with self.orders.watch(
+                    pipeline, full_document="updateLookup", resume_after=self.resume_token
+                ) as stream:
+                    self.streaming = True
+                    logger.info("Guard stream: change stream active")
+                    async for change in stream:
+                        if not should_run():
+                            self.loaded = False
+                            continue
+                        async with self._lock:
+                            if not self.loaded:
+                                await self._load()
+                            doc = change.get("fullDocument")
+                            if doc:
+                                await self.apply(doc)
+                            self.resume_token = stream.resume_token
+                            self._last_tick = time.monotonic()
+            except asyncio.CancelledError:
+                self.streaming = False
+                raise
+            except OperationFailure as e:
+                self.streaming = False
+                if self.resume_token is not None:
+                    # Token fell off the oplog: start fresh, the tail covers the gap
+                    logger.warning(f"Guard stream resume failed, restarting without token: {e}")
+                    self.resume_token = None
+                    continue
+                logger.warning(f"Guard change stream unavailable, tailing orders instead: {e}")
+                return
+            except Exception as e:
+                self.streaming = False
+                logger.error(f"Guard change stream error: {e}")
+                await asyncio.sleep(5)
+
+
+def get_guard_stream(db) -> GuardStream:
+    global _stream
+    if _stream is None:
+        _stream = GuardStream(db)
+    return _stream
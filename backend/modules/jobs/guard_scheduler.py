@@ -2,45 +2,112 @@
 Guard + Analytics Scheduler
 Runs guard engine and analytics daily snapshots
 """
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from datetime import datetime, timezone, timedelta
 import logging
 
+from modules.jobs.job_runner import get_job_runner
+
 logger = logging.getLogger(__name__)
-scheduler = AsyncIOScheduler()
 
 
 def start_guard_scheduler(db):
     """Start guard and analytics background jobs"""
+    from core.config import settings
     from modules.guard.guard_engine import GuardEngine
+    from modules.guard.guard_stream import get_guard_stream
     from modules.analytics_intel.analytics_engine import AnalyticsEngine
-    
+
+    runner = get_job_runner(db)
     guard_engine = GuardEngine(db)
+    guard_stream = get_guard_stream(db)
     analytics_engine = AnalyticsEngine(db)
-    
+
     async def guard_job():
-        """Run guard checks every 10 minutes"""
-        try:
-            result = await guard_engine.run_once()
-            logger.info(f"Guard engine completed: {result}")
-        except Exception as e:
-            logger.error(f"Guard engine failed: {e}")
-    
+        """Reconciliation pass every 10 minutes (the stream fires within seconds)"""
+        result = await guard_engine.run_once()
+        await guard_stream.reseed()
+        logger.info(f"Guard engine completed: {result}")
+        return result
+
+    async def guard_stream_job():
+        """Streaming detector: tail orders (unless the change stream is live) + checkpoint"""
+        return await guard_stream.tick()
+
     async def analytics_daily_job():
         """Build daily analytics snapshot at 02:10 UTC"""
-        try:
-            now = datetime.now(timezone.utc)
-            yesterday = now - timedelta(days=1)
-            result = await analytics_engine.build_daily(yesterday)
-            logger.info(f"Analytics daily completed: {result}")
-        except Exception as e:
-            logger.error(f"Analytics daily failed: {e}")
-    
+        now = datetime.now(timezone.utc)
+        yesterday = now - timedelta(days=1)
+        result = await analytics_engine.build_daily(yesterday)
+        logger.info(f"Analytics daily completed: {result}")
+        return result
+
     # Guard checks every 10 minutes
-    scheduler.add_job(guard_job, "interval", minutes=10, id="guard_engine", replace_existing=True)
-    
+    runner.add_job(guard_job, "interval", minutes=10, id="guard_engine")
+
+    # Streaming guard detector every 5 seconds; optional orders change stream
+    runner.add_job(guard_stream_job, "interval", seconds=5, id="guard_stream")
+    if settings.GUARD_CHANGE_STREAM:
+        runner.add_task("guard_change_stream", lambda: guard_stream.watch(lambda: runner.is_leader))
+
+    async def payment_health_job():
+        """Rebuild recent payment health buckets at 02:30 UTC"""
+        from modules.payments.payment_health_service import PaymentHealthService
+        return await PaymentHealthService(db).rebuild_recent()
+
+    async def product_performance_job():
+        """Refresh cached product performance tables every 15 minutes"""
+        from modules.analytics_intel.product_performance import ProductPerformanceEngine
+        engine = ProductPerformanceEngine(db)
+        results = [await engine.refresh(days) for days in (7, 30)]
+        return {"ok": True, "rows": sum(r["rows"] for r in results)}
+
+    async def order_facts_job():
+        """Reconcile order_line_facts for orders touched in the last 2 days"""
+        from modules.analytics_intel.order_facts import OrderFactsRepo
+        return await OrderFactsRepo(db).backfill(since_days=2)
+
+    async def customer360_job():
+        """Rebuild customer 360 projections for buyers with orders touched in the last 2 days"""
+        from modules.crm.customer360 import Customer360Repo
+        return await Customer360Repo(db).reconcile(since_days=2)
+
+    async def kpi_counters_recent_job():
+        """Verify KPI counters for today/yesterday (drift from writes outside OrderRepository)"""
+        from modules.analytics_intel.kpi_counters import KpiCountersRepo
+        return await KpiCountersRepo(db).verify(since_days=1)
+
+    async def kpi_counters_nightly_job():
+        """Verify KPI counters for the last 35 days"""
+        from modules.analytics_intel.kpi_counters import KpiCountersRepo
+        return await KpiCountersRepo(db).verify(since_days=35)
+
+    async def kpi_counters_rebuild_job():
+        """Rebuild an empty KPI counter store from 400 days of orders (no-op afterwards)"""
+        from modules.analytics_intel.kpi_counters import KpiCountersRepo
+        repo = KpiCountersRepo(db)
+        if await repo.col.estimated_document_count() > 0:
+            return {"skipped": True}
+        return await repo.verify(since_days=400)
+
     # Daily analytics at 02:10 UTC
-    scheduler.add_job(analytics_daily_job, "cron", hour=2, minute=10, id="analytics_daily", replace_existing=True)
-    
-    scheduler.start()
-    logger.info("Guard + Analytics scheduler started")
+    runner.add_job(analytics_daily_job, "cron", hour=2, minute=10, id="analytics_daily", lock_ttl_sec=300)
+
+    # Payment health daily buckets at 02:30 UTC
+    runner.add_job(payment_health_job, "cron", hour=2, minute=30, id="payment_health_buckets")
+
+    # Order-line facts reconcile at 02:50 UTC
+    runner.add_job(order_facts_job, "cron", hour=2, minute=50, id="order_facts_reconcile", lock_ttl_sec=300)
+
+    # KPI counters verifier: recent days every 15 minutes, 35 days at 03:30 UTC
+    runner.add_job(kpi_counters_recent_job, "interval", minutes=15, id="kpi_counters_recent", lock_ttl_sec=120)
+    runner.add_job(kpi_counters_nightly_job, "cron", hour=3, minute=30, id="kpi_counters_nightly", lock_ttl_sec=600)
+    runner.add_job(kpi_counters_rebuild_job, "interval", minutes=10, id="kpi_counters_rebuild", lock_ttl_sec=600)
+
+    # Customer 360 reconcile at 03:10 UTC
+    runner.add_job(customer360_job, "cron", hour=3, minute=10, id="customer360_reconcile", lock_ttl_sec=600)
+
+    # Product performance (incremental sales buckets) every 15 minutes
+    runner.add_job(product_performance_job, "interval", minutes=15, id="product_performance", lock_ttl_sec=120)
+
+    runner.start()
+    logger.info("Guard + Analytics jobs registered: guard (10min), guard stream (5s), analytics daily (02:10 UTC), payment health (02:30 UTC), order facts (02:50 UTC), customer 360 (03:10 UTC), KPI counters (15min + 03:30 UTC, empty-store rebuild 10min), product performance (15min)")
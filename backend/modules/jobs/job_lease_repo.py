@@ -0,0 +1,95 @@
+"""
+O21: Job Leases Repository
+Mongo-backed leases (leader election + per-job locks) and run history
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+RUN_HISTORY_TTL_DAYS = 14
+
+
+def utcnow_dt():
+    return datetime.now(timezone.utc)
+
+
+class JobLeaseRepo:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.leases = db["job_leases"]
+        self.runs = db["job_runs"]
+        self.state = db["job_state"]
+
+    async def ensure_indexes(self):
+        await self.leases.create_index("expires_at")
+        await self.runs.create_index([("job_id", 1), ("started_at", -1)])
+        await self.runs.create_index("expire_at", expireAfterSeconds=0)
+        await self.state.create_index("job_id", unique=True)
+
+    async def acquire(self, name: str, owner: str, ttl_sec: int) -> bool:
+        """
+        Acquire or renew a lease.
+        Succeeds if the lease is free, expired or already held by owner.
+        """
+        now = utcnow_dt()
+        try:
+            doc = await self.leases.find_one_and_update(
+                {
+                    "_id": name,
+                    "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]
+                },
+                {"$set": {
+                    "owner": owner,
+                    "expires_at": now + timedelta(seconds=ttl_sec),
+                    "renewed_at": now
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lease exists and is held by someone else
+            return False
+        return bool(doc) and doc.get("owner") == owner
+
+    async def release(self, name: str, owner: str):
+        await self.leases.delete_one({"_id": name, "owner": owner})
+
+    async def get_lease(self, name: str) -> Optional[dict]:
+        return await self.leases.find_one({"_id": name})
+
+    async def record_run(self, run: dict):
+        """Store run history and roll up per-job state"""
+        now = utcnow_dt()
+        await self.runs.insert_one({
+            **run,
+            "expire_at": now + timedelta(days=RUN_HISTORY_TTL_DAYS)
+        })
+
+        inc = {"runs": 1}
+        if run["status"] == "FAILED":
+            inc["failures"] = 1
+        elif run["status"] == "SKIPPED":
+            inc = {"skipped": 1}
+
+        update = {"$inc": inc, "$set": {"job_id": run["job_id"], "last_status": run["status"]}}
+        if run["status"] != "SKIPPED":
+            update["$set"].update({
+                "last_started_at": run["started_at"],
+                "last_finished_at": run.get("finished_at"),
+                "last_duration_ms": run.get("duration_ms"),
+                "last_error": run.get("error"),
+                "last_owner": run.get("owner")
+            })
+        await self.state.update_one({"job_id": run["job_id"]}, update, upsert=True)
+
+    async def list_state(self) -> list:
+        cur = self.state.find({}, {"_id": 0}).sort("job_id", 1)
+        return [x async for x in cur]
+
+    async def recent_runs(self, job_id: str, limit: int = 50) -> list:
+        cur = self.runs.find(
+            {"job_id": job_id},
+            {"_id": 0, "expire_at": 0}
+        ).sort("started_at", -1).limit(limit)
+        return [x async for x in cur]
@@ -0,0 +1,39 @@
+"""
+O21: Job Runner Routes - status and run history
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from core.db import db
+from core.security import get_current_admin
+from modules.jobs.job_lease_repo import JobLeaseRepo
+from modules.jobs.job_runner import LEADER_LEASE, get_job_runner
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("")
+async def jobs_status(current_user: dict = Depends(get_current_admin)):
+    """Leader, registered jobs and last run per job"""
+    repo = JobLeaseRepo(db)
+    leader = await repo.get_lease(LEADER_LEASE)
+    return {
+        "leader": leader,
+        "this_process": get_job_runner(db).status(),
+        "jobs": await repo.list_state()
+    }
+
+
+@router.get("/{job_id}/runs")
+async def job_runs(job_id: str, limit: int = 50, current_user: dict = Depends(get_current_admin)):
+    """Recent runs of a job (status, duration, result summary)"""
+    return {"items": await JobLeaseRepo(db).recent_runs(job_id, min(limit, 200))}
+
+
+@router.post("/{job_id}/run")
+async def run_job_now(job_id: str, current_user: dict = Depends(get_current_admin)):
+    """Trigger a job now (only executes if this process is the leader)"""
+    runner = get_job_runner(db)
+    if not runner.is_leader:
+        raise HTTPException(status_code=409, detail="This process is not the job leader")
+    if not await runner.run_now(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"ok": True}
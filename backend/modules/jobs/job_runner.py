@@ -0,0 +1,232 @@
+"""
+O21: Unified Job Runner
+One APScheduler per process, but jobs only execute on the elected leader.
+
+- Leader election: a Mongo lease ("jobs:leader") renewed every few seconds
+- Per-job locks with heartbeats: a job never runs twice concurrently,
+  even while leadership is handed over between workers
+- Run history: job_runs (status, duration, result) + job_state rollup
+- JOBS_MODE env:
+    inline - API workers compete for leadership and run jobs (default)
+    worker - API workers don't run jobs; use `python -m modules.jobs.worker`
+    off    - no background jobs at all
+"""
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from .job_lease_repo import JobLeaseRepo
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE = "jobs:leader"
+LEADER_TTL_SEC = int(os.getenv("JOBS_LEADER_TTL_SEC", "30"))
+LEADER_RENEW_SEC = max(1, LEADER_TTL_SEC // 3)
+JOB_LOCK_TTL_SEC = 60
+
+_runner: Optional["JobRunner"] = None
+
+
+def utcnow():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def jobs_mode() -> str:
+    return (os.getenv("JOBS_MODE") or "inline").strip().lower()
+
+
+def jobs_enabled_in_api() -> bool:
+    """Whether API (uvicorn) workers should run background jobs"""
+    return jobs_mode() == "inline"
+
+
+def _summarize(result) -> Optional[dict]:
+    """Keep only small scalar fields of a job result for history"""
+    if not isinstance(result, dict):
+        return None
+    return {
+        k: v for k, v in result.items()
+        if isinstance(v, (int, float, bool, str)) and len(str(v)) <= 200
+    }
+
+
+class JobRunner:
+    def __init__(self, db, owner: Optional[str] = None):
+        self.db = db
+        self.repo = JobLeaseRepo(db)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.scheduler = AsyncIOScheduler()
+        self.is_leader = False
+        self.job_ids: list = []
+        self._running: Dict[str, float] = {}
+        self._indexes_ready = False
+        self._task_factories: Dict[str, Callable[[], Awaitable]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await self.repo.ensure_indexes()
+            self._indexes_ready = True
+
+    def add_job(
+        self,
+        func: Callable[[], Awaitable],
+        trigger: str,
+        id: str,
+        lock_ttl_sec: int = JOB_LOCK_TTL_SEC,
+        **trigger_args
+    ):
+        """Register a job; it will only run on the leader, one instance at a time"""
+        async def guarded():
+            await self._run_guarded(id, func, lock_ttl_sec)
+
+        self.scheduler.add_job(
+            guarded,
+            trigger,
+            id=id,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            **trigger_args
+        )
+        if id not in self.job_ids:
+            self.job_ids.append(id)
+
+    def add_task(self, id: str, factory: Callable[[], Awaitable]):
+        """
+        Long-running coroutine started with the runner (e.g. a change-stream
+        tail). Runs in every process: check `is_leader` before doing work.
+        """
+        self._task_factories[id] = factory
+        if self.scheduler.running and id not in self._tasks:
+            self._tasks[id] = asyncio.ensure_future(factory())
+
+    async def _leader_tick(self):
+        try:
+            await self._ensure_indexes()
+            leader = await self.repo.acquire(LEADER_LEASE, self.owner, LEADER_TTL_SEC)
+        except Exception as e:
+            logger.error(f"Job runner leader lease error: {e}")
+            leader = False
+
+        if leader != self.is_leader:
+            logger.info(f"Job runner {self.owner}: leader={leader}")
+        self.is_leader = leader
+
+    async def _heartbeat(self, lock_name: str, ttl_sec: int):
+        while True:
+            await asyncio.sleep(max(1, ttl_sec // 3))
+            try:
+                await self.repo.acquire(lock_name, self.owner, ttl_sec)
+            except Exception as e:
+                logger.warning(f"Job lock heartbeat failed for {lock_name}: {e}")
+
+    async def _run_guarded(self, job_id: str, func, lock_ttl_sec: int):
+        if not self.is_leader:
+            return
+
+        started_at = utcnow()
+
+        # Overlap prevention inside this process
+        if job_id in self._running:
+            await self.repo.record_run({
+                "job_id": job_id,
+                "owner": self.owner,
+                "status": "SKIPPED",
+                "reason": "overlap_local",
+                "started_at": started_at
+            })
+            return
+
+        # Overlap prevention across processes (e.g. previous leader still running)
+        lock_name = f"job:{job_id}"
+        if not await self.repo.acquire(lock_name, self.owner, lock_ttl_sec):
+            await self.repo.record_run({
+                "job_id": job_id,
+                "owner": self.owner,
+                "status": "SKIPPED",
+                "reason": "locked",
+                "started_at": started_at
+            })
+            return
+
+        t0 = time.monotonic()
+        self._running[job_id] = t0
+        heartbeat = asyncio.create_task(self._heartbeat(lock_name, lock_ttl_sec))
+        run = {"job_id": job_id, "owner": self.owner, "started_at": started_at}
+
+        try:
+            result = await func()
+            run.update({"status": "OK", "result": _summarize(result)})
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            run.update({"status": "FAILED", "error": str(e)[:500]})
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+            run["finished_at"] = utcnow()
+            run["duration_ms"] = int((time.monotonic() - t0) * 1000)
+            try:
+                await self.repo.release(lock_name, self.owner)
+                await self.repo.record_run(run)
+            except Exception as e:
+                logger.warning(f"Job {job_id} history write failed: {e}")
+
+    async def run_now(self, job_id: str) -> bool:
+        """Trigger a registered job immediately (still leader + lock guarded)"""
+        job = self.scheduler.get_job(job_id)
+        if not job:
+            return False
+        await job.func()
+        return True
+
+    def start(self):
+        if self.scheduler.running:
+            return
+        self.scheduler.add_job(
+            self._leader_tick,
+            "interval",
+            seconds=LEADER_RENEW_SEC,
+            id="jobs_leader_election",
+            replace_existing=True,
+            max_instances=1,
+            next_run_time=datetime.now(timezone.utc)
+        )
+        self.scheduler.start()
+        for task_id, factory in self._task_factories.items():
+            if task_id not in self._tasks:
+                self._tasks[task_id] = asyncio.ensure_future(factory())
+        logger.info(f"Job runner started as {self.owner} (mode={jobs_mode()})")
+
+    async def shutdown(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        if self.is_leader:
+            await self.repo.release(LEADER_LEASE, self.owner)
+            self.is_leader = False
+
+    def status(self) -> dict:
+        return {
+            "owner": self.owner,
+            "mode": jobs_mode(),
+            "is_leader": self.is_leader,
+            "jobs": list(self.job_ids),
+            "tasks": list(self._tasks.keys()),
+            "running": list(self._running.keys())
+        }
+
+
+def get_job_runner(db) -> JobRunner:
+    global _runner
+    if _runner is None:
+        _runner = JobRunner(db)
+    return _runner
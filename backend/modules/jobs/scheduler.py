@@ -1,113 +1,195 @@
 # O1+O2+O9+O11: Jobs Scheduler
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+# O21: jobs are registered on the unified JobRunner (leader-elected, locked)
 import logging
 
+from modules.jobs.job_runner import get_job_runner
+
 logger = logging.getLogger(__name__)
 
-scheduler = AsyncIOScheduler()
 
 def start_jobs_scheduler(db):
     """Start all background jobs"""
-    
+    runner = get_job_runner(db)
+
     # O1: Tracking sync every 15 minutes
     async def tracking_job():
-        try:
-            from modules.delivery.np.np_tracking_service import NPTrackingService
-            service = NPTrackingService(db)
-            result = await service.sync_all()
-            logger.info(f"Tracking job: {result}")
-        except Exception as e:
-            logger.error(f"Tracking job error: {e}")
-
-    scheduler.add_job(
+        from modules.delivery.np.np_tracking_service import NPTrackingService
+        service = NPTrackingService(db)
+        result = await service.sync_all()
+        logger.info(f"Tracking job: {result}")
+        return result
+
+    runner.add_job(
         tracking_job,
         "interval",
         minutes=15,
         id="np_tracking_sync",
-        replace_existing=True
+        lock_ttl_sec=120
     )
 
     # O2: Notifications worker every 30 seconds
     async def notifications_job():
-        try:
-            from modules.notifications.notifications_service import NotificationsService
-            service = NotificationsService(db)
-            await service.init()
-            result = await service.process_queue_once(100)
-            if result["processed"] > 0 or result["failed"] > 0:
-                logger.info(f"Notifications job: {result}")
-        except Exception as e:
-            logger.error(f"Notifications job error: {e}")
-
-    scheduler.add_job(
+        from modules.notifications.notifications_service import NotificationsService
+        service = NotificationsService(db)
+        await service.init()
+        result = await service.process_queue_once(1000)
+        if result["processed"] > 0 or result["failed"] > 0:
+            logger.info(f"Notifications job: {result}")
+        return result
+
+    runner.add_job(
         notifications_job,
         "interval",
         seconds=30,
-        id="notifications_worker",
-        replace_existing=True
+        id="notifications_worker"
+    )
+
+    # O2: Outbox dispatcher for domain_events (polling; change stream optional)
+    from core.config import settings
+    from modules.ops.events.outbox_dispatcher import OutboxDispatcher
+    from modules.ops.events.outbox_handlers import register_default_handlers
+
+    dispatcher = register_default_handlers(OutboxDispatcher(db))
+
+    async def outbox_job():
+        result = await dispatcher.run_once()
+        if result["claimed"] > 0:
+            logger.info(f"Outbox job: {result}")
+        return result
+
+    runner.add_job(
+        outbox_job,
+        "interval",
+        seconds=30 if settings.OUTBOX_CHANGE_STREAM else 5,
+        id="outbox_dispatcher"
     )
+    if settings.OUTBOX_CHANGE_STREAM:
+        runner.add_task("outbox_change_stream", lambda: dispatcher.watch(lambda: runner.is_leader))
+
+    # Payment webhook inbox: applies fast-acked webhooks (polling; change stream optional)
+    from modules.payments.webhook_inbox import WebhookInboxConsumer
+    from modules.payments.webhook_inbox_handlers import register_default_handlers as register_inbox_handlers
+
+    inbox = register_inbox_handlers(WebhookInboxConsumer(db, concurrency=settings.PAYMENT_WEBHOOK_CONCURRENCY))
+
+    async def payment_inbox_job():
+        result = await inbox.run_once()
+        if result["claimed"] > 0:
+            logger.info(f"Payment webhook inbox: {result}")
+        return result
+
+    runner.add_job(
+        payment_inbox_job,
+        "interval",
+        seconds=30 if settings.PAYMENT_WEBHOOK_CHANGE_STREAM else 1,
+        id="payment_webhook_inbox"
+    )
+    if settings.PAYMENT_WEBHOOK_CHANGE_STREAM:
+        runner.add_task("payment_webhook_change_stream", lambda: inbox.watch(lambda: runner.is_leader))
 
     # O9: Admin alerts worker every 15 seconds (for FastAPI process fallback)
     # Note: Main alerts processing is in bot process, this is backup
     async def alerts_fallback_job():
-        try:
-            import os
-            token = os.getenv("TELEGRAM_BOT_TOKEN")
-            if not token:
-                return
-            
-            from modules.bot.alerts_worker import AlertsWorker
-            worker = AlertsWorker(db, token)
-            await worker.init()
-            result = await worker.process_once()
-            if result.get("sent", 0) > 0:
-                logger.info(f"Alerts fallback job: {result}")
-        except Exception as e:
-            logger.error(f"Alerts fallback job error: {e}")
-
-    scheduler.add_job(
+        import os
+        token = os.getenv("TELEGRAM_BOT_TOKEN")
+        if not token:
+            return {"skipped": True}
+
+        from modules.bot.alerts_worker import AlertsWorker
+        worker = AlertsWorker(db, token)
+        await worker.init()
+        result = await worker.process_once()
+        if result.get("sent", 0) > 0:
+            logger.info(f"Alerts fallback job: {result}")
+        return result
+
+    runner.add_job(
         alerts_fallback_job,
         "interval",
         seconds=15,
-        id="alerts_fallback",
-        replace_existing=True
+        id="alerts_fallback"
     )
 
     # O11: Automation engine every 10 minutes
     async def automation_job():
-        try:
-            from modules.automation.automation_engine import AutomationEngine
-            engine = AutomationEngine(db)
-            await engine.init()
-            result = await engine.run_once()
-            if not result.get("skipped"):
-                logger.info(f"Automation job: {result}")
-        except Exception as e:
-            logger.error(f"Automation job error: {e}")
-
-    scheduler.add_job(
+        from modules.automation.automation_engine import AutomationEngine
+        engine = AutomationEngine(db)
+        await engine.init()
+        result = await engine.run_once()
+        if not result.get("skipped"):
+            logger.info(f"Automation job: {result}")
+        return result
+
+    runner.add_job(
         automation_job,
         "interval",
         minutes=10,
-        id="automation_engine",
-        replace_existing=True
+        id="automation_engine"
+    )
+
+    # V2-3: Normalized catalog keys for products that have none (leader + job lock)
+    async def catalog_keys_job():
+        from modules.catalog import catalog_query
+        if catalog_query._keys_ready:
+            return {"skipped": True}
+        return {"backfilled": await catalog_query.backfill_catalog_keys(db)}
+
+    runner.add_job(
+        catalog_keys_job,
+        "interval",
+        minutes=10,
+        id="catalog_keys_backfill",
+        lock_ttl_sec=300
+    )
+
+    # O5: Rebuild an empty seller ledger once (leader + job lock; no-op afterwards)
+    async def seller_ledger_rebuild_job():
+        from modules.finance.seller_ledger import SellerLedgerRepo
+        repo = SellerLedgerRepo(db)
+        if not await repo.needs_rebuild():
+            return {"skipped": True}
+        result = await repo.rebuild()
+        logger.info(f"Seller ledger rebuild: {result}")
+        return result
+
+    runner.add_job(
+        seller_ledger_rebuild_job,
+        "interval",
+        minutes=10,
+        id="seller_ledger_rebuild",
+        lock_ttl_sec=300
     )
 
-    scheduler.start()
-    logger.info("Jobs scheduler started: tracking (15min), notifications (30s), alerts (15s), automation (10min)")
-    
-    # O13-O18: Start Guard + Analytics scheduler
+    # O8: Move legacy embedded customers.notes to crm_notes (leader + job lock; no-op afterwards)
+    async def crm_notes_migration_job():
+        from modules.crm.actions import crm_actions_service
+        if crm_actions_service._notes_migrated:
+            return {"skipped": True}
+        return {"moved": await crm_actions_service.CRMActionsService(db).migrate_embedded_notes()}
+
+    runner.add_job(
+        crm_notes_migration_job,
+        "interval",
+        minutes=10,
+        id="crm_notes_migration",
+        lock_ttl_sec=300
+    )
+
+    logger.info("Jobs registered: tracking (15min), outbox (5s), payment webhooks (1s), notifications (30s), alerts (15s), automation (10min), catalog keys + seller ledger backfills + CRM notes migration (10min)")
+
+    # O13-O18: Guard + Analytics jobs
     try:
         from modules.jobs.guard_scheduler import start_guard_scheduler
         start_guard_scheduler(db)
-        logger.info("Guard + Analytics scheduler started: guard (10min), analytics daily (02:10 UTC)")
     except Exception as e:
         logger.error(f"Guard scheduler failed to start: {e}")
 
-    # O20: Start Pickup Control scheduler
+    # O20: Pickup Control job
     try:
         from modules.pickup_control.pickup_scheduler import start_pickup_control_scheduler
         start_pickup_control_scheduler(db, np_service=None)
-        logger.info("Pickup Control scheduler started (every 30 min)")
     except Exception as e:
         logger.error(f"Pickup Control scheduler failed to start: {e}")
+
+    runner.start()
+    return runner
@@ -0,0 +1,55 @@
+"""
+O21: Dedicated Jobs Worker
+Runs all background jobs outside of the API process:
+    JOBS_MODE=worker (API) + python -m modules.jobs.worker
+Several worker replicas are safe - only the lease leader executes jobs.
+"""
+import asyncio
+import os
+import logging
+import signal
+from pathlib import Path
+from dotenv import load_dotenv
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent.parent.parent
+load_dotenv(ROOT_DIR / '.env')
+
+from modules.jobs.scheduler import start_jobs_scheduler
+from modules.growth.scheduler import start_growth_scheduler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.getenv("DB_NAME", "marketplace_db")
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    runner = start_jobs_scheduler(db)
+    start_growth_scheduler(db)
+    logger.info(f"🛠 Jobs worker running: {runner.status()}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    await stop.wait()
+    logger.info("Jobs worker stopping...")
+    await runner.shutdown()
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
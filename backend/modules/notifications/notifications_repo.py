@@ -1,6 +1,7 @@
 # O2: Notifications Repository
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone
+from pymongo import UpdateOne
 import uuid
 
 def utcnow():
@@ -66,3 +67,22 @@ class NotificationsRepo:
                 "updated_at": utcnow()
             }}
         )
+
+    async def mark_many(self, sent: list, failed: list):
+        """One bulk write for a dispatched batch: sent [(id, meta)], failed [(id, reason, attempts, next_retry_at)]"""
+        now = utcnow()
+        ops = [
+            UpdateOne({"id": id_}, {"$set": {"status": "SENT", "provider_meta": meta, "updated_at": now}})
+            for id_, meta in sent
+        ] + [
+            UpdateOne({"id": id_}, {"$set": {
+                "status": "FAILED",
+                "fail_reason": reason,
+                "attempts": attempts,
+                "next_retry_at": next_retry_at,
+                "updated_at": now
+            }})
+            for id_, reason, attempts, next_retry_at in failed
+        ]
+        if ops:
+            await self.col.bulk_write(ops, ordered=False)
@@ -5,6 +5,8 @@ from .notifications_repo import NotificationsRepo
 from .providers.sms_turbosms import TurboSMSProvider
 from .providers.email_smtp import SMTPEmailProvider
 from .templates import render_sms, render_email_subject, render_email_body
+from core.config import settings
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,46 +22,79 @@ def backoff(attempts: int) -> str:
     m = minutes[min(attempts, len(minutes) - 1)]
     return iso(utcnow() + timedelta(minutes=m))
 
+_providers = None
+
+def get_providers():
+    """(sms, email) shared per process, so pooled connections outlive one job run"""
+    global _providers
+    if _providers is None:
+        if settings.NOTIFY_FAKE_PROVIDERS:
+            from .providers.fake import FakeProvider
+            _providers = (
+                FakeProvider("SMS", settings.NOTIFY_FAKE_LATENCY_MS, settings.TURBOSMS_BATCH_SIZE),
+                FakeProvider("EMAIL", settings.NOTIFY_FAKE_LATENCY_MS, settings.SMTP_BATCH_SIZE),
+            )
+        else:
+            _providers = (TurboSMSProvider(), SMTPEmailProvider())
+    return _providers
+
+async def dispatch_items(items: list, sms, email) -> list:
+    """Render + send queue items through the batch providers -> [(item, meta | Exception)]"""
+    by_channel = {"SMS": ([], []), "EMAIL": ([], [])}
+    results = []
+    for it in items:
+        ctx = it.get("payload") or {}
+        template = it["template"]
+        try:
+            if it["channel"] == "SMS":
+                msg = {"to": it["to"], "text": render_sms(template, ctx)}
+                channel = "SMS"
+            else:
+                msg = {"to": it["to"], "subject": render_email_subject(template, ctx), "body": render_email_body(template, ctx)}
+                channel = "EMAIL"
+        except Exception as e:
+            results.append((it, e))
+            continue
+        by_channel[channel][0].append(it)
+        by_channel[channel][1].append(msg)
+
+    sms_items, sms_msgs = by_channel["SMS"]
+    email_items, email_msgs = by_channel["EMAIL"]
+    sms_res, email_res = await asyncio.gather(
+        sms.send_batch(sms_msgs) if sms_msgs else asyncio.sleep(0, []),
+        email.send_batch(email_msgs) if email_msgs else asyncio.sleep(0, []),
+    )
+    results.extend(zip(sms_items, sms_res))
+    results.extend(zip(email_items, email_res))
+    return results
+
 class NotificationsService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.repo = NotificationsRepo(db)
-        self.sms = TurboSMSProvider()
-        self.email = SMTPEmailProvider()
+        self.sms, self.email = get_providers()
 
     async def init(self):
         await self.repo.ensure_indexes()
 
     async def process_queue_once(self, limit: int = 50):
         items = await self.repo.pick_pending(limit)
-        processed = 0
-        failed = 0
-
-        for it in items:
-            try:
-                channel = it["channel"]
-                ctx = it["payload"] or {}
-                template = it["template"]
-                to = it["to"]
-
-                if channel == "SMS":
-                    text = render_sms(template, ctx)
-                    meta = await self.sms.send(to, text)
-                else:
-                    subject = render_email_subject(template, ctx)
-                    body = render_email_body(template, ctx)
-                    meta = await self.email.send(to, subject, body)
+        if not items:
+            return {"processed": 0, "failed": 0}
 
-                await self.repo.mark_sent(it["id"], meta)
-                processed += 1
-                logger.info(f"Notification sent: {channel} to {to}")
-            except Exception as e:
+        sent, failed = [], []
+        for it, result in await dispatch_items(items, self.sms, self.email):
+            if isinstance(result, Exception):
                 attempts = int(it.get("attempts", 0)) + 1
-                await self.repo.mark_failed(it["id"], str(e), attempts, backoff(attempts))
-                failed += 1
-                logger.error(f"Notification failed: {e}")
+                failed.append((it["id"], str(result), attempts, backoff(attempts)))
+                logger.error(f"Notification failed: {it['channel']} to {it['to']}: {result}")
+            else:
+                sent.append((it["id"], result))
 
-        return {"processed": processed, "failed": failed}
+        await self.repo.mark_many(sent, failed)
+        if sent:
+            logger.info(f"Notifications sent: {len(sent)}")
+        return {"processed": len(sent), "failed": len(failed)}
 
     async def queue_for_order_event(self, event_type: str, order: dict, payload: dict):
         """Queue notifications based on order event"""
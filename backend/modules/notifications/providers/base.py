@@ -0,0 +1,104 @@
+# O2: Provider base - batch interface + per-provider limits
+#
+# Every provider exposes:
+#   send(to, ...)            one message (kept for direct callers)
+#   send_batch(messages)     list of {"to", "text"} / {"to", "subject", "body"};
+#                            returns one result per message, in order: a meta
+#                            dict or the Exception raised for that message
+#   close()                  release pooled connections
+# Requests to the upstream go through `limits` (max in-flight requests +
+# token bucket throughput), shared by everything using the provider instance.
+from typing import Dict, List, Optional, Union
+import asyncio
+import time
+
+Result = Union[dict, Exception]
+
+
+class RateLimiter:
+    """Token bucket: `rate` acquisitions per second, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst or rate or 1))
+        self.tokens = float(self.burst)
+        self.at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, n: int = 1):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.at) * self.rate)
+                self.at = now
+                if self.tokens >= n or self.tokens >= self.burst:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((min(n, self.burst) - self.tokens) / self.rate)
+
+
+class ProviderLimits:
+    """Max concurrent upstream requests + messages per second (0 = unlimited)"""
+
+    def __init__(self, concurrency: int = 4, rate_per_sec: float = 0):
+        self.concurrency = max(1, int(concurrency))
+        self.sem = asyncio.Semaphore(self.concurrency)
+        self.rate = RateLimiter(rate_per_sec) if rate_per_sec and rate_per_sec > 0 else None
+
+    async def __aenter__(self):
+        await self.sem.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.sem.release()
+
+    async def throttle(self, messages: int = 1):
+        if self.rate is not None:
+            await self.rate.acquire(messages)
+
+
+def chunks(items: list, size: int) -> List[list]:
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class BatchProvider:
+    # Max messages per upstream request
+    batch_size = 1
+
+    def __init__(self, limits: Optional[ProviderLimits] = None):
+        self.limits = limits or ProviderLimits()
+
+    def group_key(self, message: dict):
+        """Messages with the same key may share one upstream request"""
+        return None
+
+    async def _send_chunk(self, chunk: List[dict]) -> List[Result]:
+        raise NotImplementedError
+
+    async def send_batch(self, messages: List[dict]) -> List[Result]:
+        """Group + split into upstream-sized chunks, run them within the provider limits"""
+        groups: Dict[object, List[int]] = {}
+        for i, m in enumerate(messages):
+            groups.setdefault(self.group_key(m), []).append(i)
+
+        results: List[Result] = [None] * len(messages)
+
+        async def run(idx: List[int]):
+            chunk = [messages[i] for i in idx]
+            async with self.limits:
+                await self.limits.throttle(len(chunk))
+                try:
+                    out = await self._send_chunk(chunk)
+                except Exception as e:
+                    out = [e] * len(chunk)
+            for i, r in zip(idx, out):
+                results[i] = r
+
+        await asyncio.gather(*(run(c) for idx in groups.values() for c in chunks(idx, self.batch_size)))
+        return results
+
+    async def close(self):
+        pass
@@ -1,35 +1,99 @@
-# O2: SMTP Email Provider (mock for now)
+# O2: SMTP Email Provider (mock when SMTP_HOST is not set)
+# Keeps up to EMAIL_CONCURRENCY authenticated SMTP sessions open and sends a
+# whole chunk (SMTP_BATCH_SIZE messages) over one session instead of
+# connecting + STARTTLS + AUTH per message.
+from typing import List, Optional
+import asyncio
 import logging
 from core.config import settings
+from .base import BatchProvider, ProviderLimits, Result
 
 logger = logging.getLogger(__name__)
 
-class SMTPEmailProvider:
+class SMTPEmailProvider(BatchProvider):
+    def __init__(self, limits: Optional[ProviderLimits] = None):
+        super().__init__(limits or ProviderLimits(settings.EMAIL_CONCURRENCY, settings.EMAIL_RATE_PER_SEC))
+        self.batch_size = max(1, settings.SMTP_BATCH_SIZE)
+        self._idle: asyncio.Queue = asyncio.Queue()
+
+    @property
+    def configured(self) -> bool:
+        return bool(getattr(settings, 'SMTP_HOST', None))
+
+    async def _connect(self):
+        import aiosmtplib
+        smtp = aiosmtplib.SMTP(hostname=settings.SMTP_HOST, port=int(settings.SMTP_PORT), start_tls=True, timeout=30)
+        await smtp.connect()
+        if settings.SMTP_USER:
+            await smtp.login(settings.SMTP_USER, settings.SMTP_PASS)
+        return smtp
+
+    async def _session(self):
+        while not self._idle.empty():
+            smtp = self._idle.get_nowait()
+            if smtp.is_connected:
+                return smtp
+        return await self._connect()
+
+    def _release(self, smtp):
+        if smtp.is_connected and self._idle.qsize() < self.limits.concurrency:
+            self._idle.put_nowait(smtp)
+        else:
+            smtp.close()
+
+    @staticmethod
+    def _message(to: str, subject: str, body: str):
+        from email.message import EmailMessage
+
+        msg = EmailMessage()
+        msg["From"] = settings.EMAIL_FROM
+        msg["To"] = to
+        msg["Subject"] = subject
+        msg.set_content(body)
+        return msg
+
     async def send(self, to: str, subject: str, body: str) -> dict:
+        result = (await self.send_batch([{"to": to, "subject": subject, "body": body}]))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _send_chunk(self, chunk: List[dict]) -> List[Result]:
         # Check if credentials configured
-        if not getattr(settings, 'SMTP_HOST', None):
-            logger.warning(f"SMTP not configured, Email to {to} MOCKED: {subject}")
-            return {"status": "MOCKED", "to": to, "subject": subject}
-        
+        if not self.configured:
+            for m in chunk:
+                logger.warning(f"SMTP not configured, Email to {m['to']} MOCKED: {m['subject']}")
+            return [{"status": "MOCKED", "to": m["to"], "subject": m["subject"]} for m in chunk]
+
+        from aiosmtplib import SMTPServerDisconnected
+
+        results: List[Result] = []
+        smtp = None
         try:
-            import aiosmtplib
-            from email.message import EmailMessage
-            
-            msg = EmailMessage()
-            msg["From"] = settings.EMAIL_FROM
-            msg["To"] = to
-            msg["Subject"] = subject
-            msg.set_content(body)
-
-            await aiosmtplib.send(
-                msg,
-                hostname=settings.SMTP_HOST,
-                port=int(settings.SMTP_PORT),
-                username=settings.SMTP_USER,
-                password=settings.SMTP_PASS,
-                start_tls=True,
-            )
-            return {"ok": True, "to": to}
-        except Exception as e:
-            logger.error(f"SMTP error: {e}")
-            raise
+            for m in chunk:
+                msg = self._message(m["to"], m["subject"], m["body"])
+                try:
+                    if smtp is None or not smtp.is_connected:
+                        smtp = await self._session()
+                    try:
+                        await smtp.send_message(msg)
+                    except SMTPServerDisconnected:
+                        # Pooled session timed out server-side: one fresh session
+                        smtp = await self._connect()
+                        await smtp.send_message(msg)
+                    results.append({"ok": True, "to": m["to"]})
+                except Exception as e:
+                    logger.error(f"SMTP error: {e}")
+                    results.append(e)
+        finally:
+            if smtp is not None:
+                self._release(smtp)
+        return results
+
+    async def close(self):
+        while not self._idle.empty():
+            smtp = self._idle.get_nowait()
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
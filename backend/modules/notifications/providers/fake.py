@@ -0,0 +1,91 @@
+# O2: Fake provider for offline throughput tests (NOTIFY_FAKE_PROVIDERS=true)
+# Simulates one upstream request per chunk with a fixed latency and an
+# optional failure rate; records everything it "sent".
+#   python -m modules.notifications.providers.fake --messages 5000 --latency-ms 80
+from typing import List, Optional
+import asyncio
+import logging
+import random
+import time
+from .base import BatchProvider, ProviderLimits, Result
+
+logger = logging.getLogger(__name__)
+
+class FakeProvider(BatchProvider):
+    def __init__(
+        self,
+        channel: str = "SMS",
+        latency_ms: float = 50,
+        batch_size: int = 100,
+        fail_rate: float = 0.0,
+        limits: Optional[ProviderLimits] = None,
+    ):
+        super().__init__(limits)
+        self.channel = channel
+        self.latency = latency_ms / 1000.0
+        self.batch_size = max(1, batch_size)
+        self.fail_rate = fail_rate
+        self.sent: List[dict] = []
+        self.requests = 0
+
+    def group_key(self, message: dict):
+        # Mirrors TurboSMS: one request per distinct text
+        return message.get("text") if self.channel == "SMS" else None
+
+    async def send(self, to: str, *parts: str) -> dict:
+        keys = ("text",) if self.channel == "SMS" else ("subject", "body")
+        result = (await self.send_batch([{"to": to, **dict(zip(keys, parts))}]))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _send_chunk(self, chunk: List[dict]) -> List[Result]:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        out: List[Result] = []
+        for m in chunk:
+            if self.fail_rate and random.random() < self.fail_rate:
+                out.append(RuntimeError(f"FAKE_FAILURE:{m['to']}"))
+                continue
+            self.sent.append(m)
+            out.append({"status": "FAKE", "to": m["to"]})
+        return out
+
+
+async def _main():
+    import argparse
+    from modules.notifications.notifications_service import dispatch_items
+
+    parser = argparse.ArgumentParser(description="Offline notification dispatcher throughput")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0, help="messages/sec limit (0 = none)")
+    parser.add_argument("--texts", type=int, default=3, help="distinct SMS texts")
+    parser.add_argument("--emails", type=float, default=0.2, help="share of EMAIL items")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    def fake(channel):
+        return FakeProvider(channel, args.latency_ms, args.batch_size,
+                            limits=ProviderLimits(args.concurrency, args.rate))
+
+    sms, email = fake("SMS"), fake("EMAIL")
+    items = [
+        {"id": str(i), "channel": "EMAIL" if random.random() < args.emails else "SMS",
+         "to": f"+380{i:09d}", "template": "MANUAL", "payload": {"text": f"text {i % args.texts}"}}
+        for i in range(args.messages)
+    ]
+    started = time.perf_counter()
+    results = await dispatch_items(items, sms, email)
+    elapsed = time.perf_counter() - started
+    ok = sum(1 for _, r in results if not isinstance(r, Exception))
+    logger.info(
+        f"{ok}/{len(items)} sent in {elapsed:.2f}s ({len(items) / max(elapsed, 1e-9):.0f} msg/s), "
+        f"requests: sms={sms.requests} email={email.requests}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
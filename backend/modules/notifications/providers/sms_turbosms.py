@@ -1,31 +1,71 @@
-# O2: TurboSMS Provider (mock for now)
+# O2: TurboSMS Provider (mock when TURBOSMS_TOKEN is not set)
+# One pooled HTTP client per provider instance; messages with the same text
+# go out as one multi-recipient request (up to TURBOSMS_BATCH_SIZE).
+from typing import List, Optional
 import httpx
 import logging
 from core.config import settings
+from .base import BatchProvider, ProviderLimits, Result
 
 logger = logging.getLogger(__name__)
 
-class TurboSMSProvider:
+class TurboSMSProvider(BatchProvider):
+    def __init__(self, limits: Optional[ProviderLimits] = None):
+        super().__init__(limits or ProviderLimits(settings.SMS_CONCURRENCY, settings.SMS_RATE_PER_SEC))
+        self.batch_size = max(1, settings.TURBOSMS_BATCH_SIZE)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(getattr(settings, 'TURBOSMS_TOKEN', None))
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=settings.TURBOSMS_API_BASE,
+                timeout=20,
+                headers={"Authorization": f"Bearer {settings.TURBOSMS_TOKEN}"},
+                limits=httpx.Limits(max_connections=self.limits.concurrency, max_keepalive_connections=self.limits.concurrency),
+            )
+        return self._client
+
+    def group_key(self, message: dict):
+        return message["text"]
+
     async def send(self, to: str, text: str) -> dict:
+        result = (await self.send_batch([{"to": to, "text": text}]))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _send_chunk(self, chunk: List[dict]) -> List[Result]:
+        recipients = [m["to"] for m in chunk]
+        text = chunk[0]["text"]
         # Check if credentials configured
-        if not getattr(settings, 'TURBOSMS_TOKEN', None):
-            logger.warning(f"TURBOSMS not configured, SMS to {to} MOCKED: {text[:50]}...")
-            return {"status": "MOCKED", "to": to}
-        
-        url = f"{settings.TURBOSMS_API_BASE}/message/send.json"
+        if not self.configured:
+            logger.warning(f"TURBOSMS not configured, SMS to {len(recipients)} recipient(s) MOCKED: {text[:50]}...")
+            return [{"status": "MOCKED", "to": to} for to in recipients]
+
         payload = {
-            "recipients": [to],
+            "recipients": recipients,
             "sms": {"sender": settings.TURBOSMS_SENDER, "text": text}
         }
-        headers = {"Authorization": f"Bearer {settings.TURBOSMS_TOKEN}"}
-
         try:
-            async with httpx.AsyncClient(timeout=20) as client:
-                r = await client.post(url, json=payload, headers=headers)
-                return {
-                    "status_code": r.status_code,
-                    "body": r.json() if "application/json" in r.headers.get("content-type", "") else r.text
-                }
+            r = await self.client().post("/message/send.json", json=payload)
         except Exception as e:
             logger.error(f"TurboSMS error: {e}")
             raise
+
+        body = r.json() if "application/json" in r.headers.get("content-type", "") else r.text
+        per_recipient = body.get("response_result") if isinstance(body, dict) else None
+        if not isinstance(per_recipient, list) or len(per_recipient) != len(recipients):
+            per_recipient = [None] * len(recipients)
+        return [
+            {"status_code": r.status_code, "to": to, "body": res if res is not None else body}
+            for to, res in zip(recipients, per_recipient)
+        ]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,5 +1,5 @@
 # O7: Ops Dashboard Routes
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from core.db import db
 from core.security import get_current_admin
 from .dashboard_service import OpsDashboardService
@@ -12,4 +12,7 @@ async def dashboard(
     to: str = Query(...),
     admin: dict = Depends(get_current_admin)
 ):
-    return await OpsDashboardService(db).build(from_, to)
+    try:
+        return await OpsDashboardService(db).build(from_, to)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
@@ -1,5 +1,7 @@
 # O7: Ops Dashboard Service
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from core.dates import range_q
+from modules.analytics_intel.kpi_counters import KpiCountersRepo
 from modules.finance.finance_service import FinanceService
 from modules.ops.analytics.shipping_analytics_service import ShippingAnalyticsService
 from modules.returns.return_analytics import ReturnAnalyticsService
@@ -10,6 +12,7 @@ class OpsDashboardService:
         self.finance = FinanceService(db)
         self.shipping = ShippingAnalyticsService(db)
         self.returns = ReturnAnalyticsService(db)
+        self.counters = KpiCountersRepo(db)
         self.orders = db["orders"]
         self.notifs = db["notification_queue"]
         self.customers = db["customers"]
@@ -42,7 +45,7 @@ class OpsDashboardService:
 
     async def notifications_stats(self, date_from: str, date_to: str):
         pipeline = [
-            {"$match": {"created_at": {"$gte": date_from, "$lte": date_to}}},
+            {"$match": range_q("created_at", gte=date_from, lte=date_to)},
             {"$group": {"_id": "$status", "count": {"$sum": 1}}},
         ]
         rows = await self.notifs.aggregate(pipeline).to_list(length=20)
@@ -54,21 +57,10 @@ class OpsDashboardService:
         }
 
     async def orders_funnel(self, date_from: str, date_to: str):
-        pipeline = [
-            {"$match": {"created_at": {"$gte": date_from, "$lte": date_to}}},
-            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
-        ]
-        rows = await self.orders.aggregate(pipeline).to_list(length=50)
-        m = {r["_id"]: r["count"] for r in rows}
+        kpi = await self.counters.totals(date_from[:10], date_to[:10])
         return {
-            "NEW": m.get("NEW", 0),
-            "AWAITING_PAYMENT": m.get("AWAITING_PAYMENT", 0),
-            "PAID": m.get("PAID", 0),
-            "PROCESSING": m.get("PROCESSING", 0),
-            "SHIPPED": m.get("SHIPPED", 0),
-            "DELIVERED": m.get("DELIVERED", 0),
-            "CANCELED": m.get("CANCELED", 0),
-            "REFUNDED": m.get("REFUNDED", 0),
+            s: kpi.count(s)
+            for s in ("NEW", "AWAITING_PAYMENT", "PAID", "PROCESSING", "SHIPPED", "DELIVERED", "CANCELED", "REFUNDED")
         }
 
     async def crm_stats(self):
@@ -1,11 +1,17 @@
 # O2: Events Repository (Outbox Pattern)
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from pymongo import UpdateOne
+from typing import List
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+CLAIM_TTL_SEC = 120
+CLAIM_SCAN_PAGES = 10
+UNFINISHED = ["NEW", "FAILED", "PROCESSING"]
+
 def utcnow():
     return datetime.now(timezone.utc).isoformat()
 
@@ -17,6 +23,9 @@ class EventsRepo:
         await self.col.create_index("status")
         await self.col.create_index("next_retry_at")
         await self.col.create_index([("type", 1), ("order_id", 1), ("created_at", 1)])
+        await self.col.create_index([("status", 1), ("created_at", 1)])
+        await self.col.create_index([("order_id", 1), ("status", 1), ("created_at", 1)])
+        await self.col.create_index("claim_token", sparse=True)
 
     async def emit(self, type_: str, order_id: str, payload: dict):
         now = utcnow()
@@ -68,3 +77,111 @@ class EventsRepo:
                 "updated_at": utcnow()
             }}
         )
+
+    # ---- Outbox dispatcher: partition-ordered claims + bulk acks ----
+
+    def _ready_q(self, now: str) -> dict:
+        return {"$or": [
+            {"status": "NEW"},
+            {"status": "FAILED", "next_retry_at": {"$lte": now}},
+            {"status": "PROCESSING", "claim_until": {"$lt": now}},  # crashed dispatcher
+        ]}
+
+    async def _claimable(self, ready: dict, limit: int) -> List[str]:
+        """
+        Ids of ready events not behind an earlier unfinished event of their
+        order. Orders found blocked are excluded from the next page, so a
+        backlog behind one failing order never stalls dispatch.
+        """
+        blocked: set = set()
+        for _ in range(CLAIM_SCAN_PAGES):
+            q = {"$and": [ready, {"order_id": {"$nin": list(blocked)}}]} if blocked else ready
+            cands = await self.col.find(
+                q, {"_id": 0, "id": 1, "order_id": 1, "created_at": 1}
+            ).sort("created_at", 1).limit(limit).to_list(limit)
+            if not cands:
+                return []
+
+            cand_ids = [c["id"] for c in cands]
+            first_blocker = {}
+            async for b in self.col.find(
+                {"order_id": {"$in": list({c["order_id"] for c in cands})},
+                 "status": {"$in": UNFINISHED},
+                 "id": {"$nin": cand_ids}},
+                {"_id": 0, "order_id": 1, "created_at": 1}
+            ):
+                prev = first_blocker.get(b["order_id"])
+                if prev is None or b["created_at"] < prev:
+                    first_blocker[b["order_id"]] = b["created_at"]
+
+            ids = []
+            for c in cands:
+                if c["order_id"] in first_blocker and first_blocker[c["order_id"]] <= c["created_at"]:
+                    blocked.add(c["order_id"])
+                else:
+                    ids.append(c["id"])
+            if ids or len(cands) < limit:
+                return ids
+        return []
+
+    async def claim_batch(self, owner: str, limit: int = 100, claim_ttl_sec: int = CLAIM_TTL_SEC) -> List[dict]:
+        """
+        Claim ready events, oldest first. An event is skipped while an earlier
+        event of the same order_id is unfinished (retry pending / claimed
+        elsewhere), so each order's events are delivered in order.
+        """
+        now = utcnow()
+        ready = self._ready_q(now)
+        ids = await self._claimable(ready, limit)
+        if not ids:
+            return []
+
+        # Atomic per document: only still-ready events get our token
+        token = uuid.uuid4().hex
+        until = (datetime.now(timezone.utc) + timedelta(seconds=claim_ttl_sec)).isoformat()
+        await self.col.update_many(
+            {"$and": [{"id": {"$in": ids}}, ready]},
+            {"$set": {
+                "status": "PROCESSING",
+                "claimed_by": owner,
+                "claim_token": token,
+                "claim_until": until,
+                "updated_at": now
+            }}
+        )
+        cur = self.col.find({"claim_token": token}, {"_id": 0}).sort("created_at", 1)
+        return [x async for x in cur]
+
+    def done_op(self, event: dict, handled: List[str]) -> UpdateOne:
+        return UpdateOne(
+            {"id": event["id"], "claim_token": event["claim_token"]},
+            {"$set": {"status": "DONE", "handled": handled, "updated_at": utcnow()},
+             "$unset": {"claim_token": "", "claim_until": ""}}
+        )
+
+    def failed_op(self, event: dict, reason: str, attempts: int, next_retry_at: str,
+                  handled: List[str], dead: bool = False) -> UpdateOne:
+        return UpdateOne(
+            {"id": event["id"], "claim_token": event["claim_token"]},
+            {"$set": {
+                "status": "DEAD" if dead else "FAILED",
+                "fail_reason": reason,
+                "attempts": attempts,
+                "next_retry_at": next_retry_at,
+                "handled": handled,
+                "updated_at": utcnow()
+            },
+             "$unset": {"claim_token": "", "claim_until": ""}}
+        )
+
+    def release_op(self, event: dict) -> UpdateOne:
+        """Give a claimed event back untouched (an earlier one in its partition failed)"""
+        return UpdateOne(
+            {"id": event["id"], "claim_token": event["claim_token"]},
+            {"$set": {"status": "FAILED" if event.get("attempts") else "NEW", "updated_at": utcnow()},
+             "$unset": {"claim_token": "", "claim_until": ""}}
+        )
+
+    async def ack(self, ops: List[UpdateOne]):
+        if ops:
+            await self.col.bulk_write(ops, ordered=False)
@@ -0,0 +1,133 @@
+# O2: Outbox Dispatcher for domain_events
+#
+# - Claims batches atomically (claim_token) with per-order_id ordering
+# - Dispatches to registered in-process handlers; partitions run with
+#   bounded concurrency, events inside a partition run sequentially
+# - Handler progress is tracked per event ("handled"), so a retry only
+#   re-runs the handlers that failed
+# - Acks the whole batch with one bulk_write
+# - Optional change-stream tail (OUTBOX_CHANGE_STREAM=true) for
+#   sub-second latency; interval polling remains as the fallback
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from pymongo.errors import OperationFailure
+
+from .events_repo import EventsRepo
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BACKOFF_MINUTES = [1, 5, 15, 60, 240]
+
+Handler = Callable[[object, dict, Optional[dict]], Awaitable[None]]
+
+
+def backoff(attempts: int) -> str:
+    m = BACKOFF_MINUTES[min(attempts, len(BACKOFF_MINUTES)) - 1]
+    return (datetime.now(timezone.utc) + timedelta(minutes=m)).isoformat()
+
+
+class OutboxDispatcher:
+    def __init__(self, db, concurrency: int = 8, batch_size: int = 100, owner: Optional[str] = None):
+        self.db = db
+        self.repo = EventsRepo(db)
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.handlers: Dict[str, List[tuple]] = {}
+        self._lock = asyncio.Lock()
+
+    def register(self, event_type: str, name: str, handler: Handler):
+        """handler(db, event, order) - order is preloaded (None if not found)"""
+        self.handlers.setdefault(event_type, []).append((name, handler))
+
+    async def run_once(self, max_batches: int = 20) -> dict:
+        """Drain ready events (bounded); safe to call from job + watcher"""
+        stats = {"claimed": 0, "done": 0, "failed": 0, "released": 0, "batches": 0}
+        async with self._lock:
+            for _ in range(max_batches):
+                events = await self.repo.claim_batch(self.owner, limit=self.batch_size)
+                if not events:
+                    break
+                stats["batches"] += 1
+                stats["claimed"] += len(events)
+                ops = await self._dispatch(events, stats)
+                await self.repo.ack(ops)
+                if len(events) < self.batch_size:
+                    break
+        return stats
+
+    async def _dispatch(self, events: List[dict], stats: dict) -> list:
+        order_ids = list({e["order_id"] for e in events if e.get("order_id")})
+        orders = {}
+        if order_ids:
+            async for o in self.db["orders"].find({"id": {"$in": order_ids}}, {"_id": 0}):
+                orders[o["id"]] = o
+
+        partitions: Dict[str, List[dict]] = OrderedDict()
+        for e in events:
+            partitions.setdefault(e.get("order_id") or e["id"], []).append(e)
+
+        sem = asyncio.Semaphore(self.concurrency)
+        ops: list = []
+
+        async def run_partition(part: List[dict]):
+            async with sem:
+                for i, event in enumerate(part):
+                    ok = await self._handle(event, orders.get(event.get("order_id")), ops, stats)
+                    if not ok:
+                        # Keep partition order: later events wait for the retry
+                        for later in part[i + 1:]:
+                            ops.append(self.repo.release_op(later))
+                            stats["released"] += 1
+                        return
+
+        await asyncio.gather(*(run_partition(p) for p in partitions.values()))
+        return ops
+
+    async def _handle(self, event: dict, order: Optional[dict], ops: list, stats: dict) -> bool:
+        handled = list(event.get("handled") or [])
+        for name, handler in self.handlers.get(event["type"], []):
+            if name in handled:
+                continue
+            try:
+                await handler(self.db, event, order)
+                handled.append(name)
+            except Exception as e:
+                attempts = int(event.get("attempts", 0)) + 1
+                dead = attempts >= MAX_ATTEMPTS
+                ops.append(self.repo.failed_op(
+                    event, f"{name}: {e}"[:500], attempts, backoff(attempts), handled, dead=dead
+                ))
+                stats["failed"] += 1
+                logger.error(f"Outbox handler {name} failed for {event['type']} {event['id']}: {e}")
+                return False
+        ops.append(self.repo.done_op(event, handled))
+        stats["done"] += 1
+        return True
+
+    async def watch(self, should_run: Callable[[], bool] = lambda: True):
+        """Tail domain_events inserts and dispatch immediately (needs a replica set)"""
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with self.repo.col.watch(pipeline) as stream:
+                    logger.info("Outbox dispatcher: change stream active")
+                    async for _ in stream:
+                        if should_run():
+                            await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                logger.warning(f"Outbox change stream unavailable, interval polling only: {e}")
+                return
+            except Exception as e:
+                logger.error(f"Outbox change stream error: {e}")
+                await asyncio.sleep(5)
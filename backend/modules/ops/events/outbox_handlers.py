@@ -0,0 +1,60 @@
+# O2: Default outbox handlers (notifications, CRM counters, finance ledger)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _phone(event: dict, order: dict) -> str:
+    return (event.get("payload") or {}).get("phone") or ((order or {}).get("shipping") or {}).get("phone")
+
+
+async def notify_customer(db, event: dict, order: dict):
+    """SMS/email via notification_queue (dedupe_key makes it idempotent)"""
+    if not order:
+        return
+    from modules.notifications.notifications_service import NotificationsService
+    await NotificationsService(db).queue_for_order_event(event["type"], order, event.get("payload") or {})
+
+
+async def crm_delivered(db, event: dict, order: dict):
+    phone = _phone(event, order)
+    if phone:
+        from modules.crm.crm_repository import CRMRepository
+        await CRMRepository(db).increment_delivered(phone, event_id=event["id"])
+
+
+async def finance_ship_cost(db, event: dict, order: dict):
+    cost = (event.get("payload") or {}).get("cost")
+    if cost:
+        from modules.finance.finance_repo import FinanceRepo
+        await FinanceRepo(db).record(
+            order_id=event["order_id"],
+            type_="SHIP_COST_OUT",
+            amount=float(cost),
+            direction="OUT",
+            meta={"method": "NOVAPOSHTA", "ttn": (event.get("payload") or {}).get("ttn"), "event_id": event["id"]},
+            key=f"SHIP_COST_OUT:{event['id']}"
+        )
+
+
+async def customer_timeline(db, event: dict, order: dict):
+    """Customer 360 event ring (TTN / delivery)"""
+    if not order or not order.get("buyer_id"):
+        return
+    from modules.crm.customer360 import Customer360Repo, timeline_event
+    payload = event.get("payload") or {}
+    if event["type"] == "TTN_CREATED":
+        e = timeline_event(event.get("created_at"), "TTN_CREATED", "TTN Created", f"TTN {payload.get('ttn')}", {"ttn": payload.get("ttn")})
+    else:
+        e = timeline_event(event.get("created_at"), "DELIVERY_STATUS", "Delivered", f"ID {order['id'][:8]}... delivered", {"order_id": order["id"]})
+    await Customer360Repo(db).on_event(order["buyer_id"], e)
+
+
+def register_default_handlers(dispatcher):
+    for type_ in ("ORDER_PAID", "TTN_CREATED", "ORDER_DELIVERED"):
+        dispatcher.register(type_, "notifications", notify_customer)
+    dispatcher.register("ORDER_DELIVERED", "crm_counters", crm_delivered)
+    dispatcher.register("TTN_CREATED", "finance_ledger", finance_ship_cost)
+    for type_ in ("TTN_CREATED", "ORDER_DELIVERED"):
+        dispatcher.register(type_, "customer_360", customer_timeline)
+    return dispatcher
@@ -0,0 +1,24 @@
+# Prometheus-style metrics (per worker process): per-route DB time / duration
+# histograms and query counters from core.db_profiler, payment webhook queue
+# depth / lag from modules.payments.webhook_inbox. Off (404) until
+# METRICS_TOKEN is set; scrapers send "Authorization: Bearer <token>"
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from core.config import settings
+from core.db_profiler import render_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(authorization: str = Header(default="")):
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    from modules.payments.webhook_inbox import render_inbox_metrics
+    body = render_metrics() + await render_inbox_metrics()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,161 @@
+"""
+O22: BSON Dates Migration
+Online, batched conversion of ISO-string timestamps to native BSON dates.
+
+- walks each collection by _id, batch_size docs at a time
+- compare-and-set updates (filter on the old string) so concurrent
+  writers are never overwritten
+- checkpoint (last _id, counters) in migrations_state after every batch;
+  a restarted run resumes where it stopped
+
+Order of operations:
+    1. deploy dual-read queries (core.dates.range_q / day_expr)
+    2. NATIVE_DATES=true so new writes are datetimes
+    3. run: python -m modules.ops.migrations.bson_dates_migration
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from core.dates import to_dt
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_PLAN: Dict[str, List[str]] = {
+    "orders": ["created_at", "updated_at", "paid_at", "returns.updated_at"],
+    "fondy_logs": ["created_at"],
+    "payment_events": ["created_at"],
+}
+
+
+def utcnow():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _get_path(doc: dict, path: str):
+    cur = doc
+    for part in path.split("."):
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(part)
+    return cur
+
+
+class BsonDatesMigration:
+    def __init__(self, db):
+        self.db = db
+        self.state = db["migrations_state"]
+
+    @staticmethod
+    def _state_id(collection: str) -> str:
+        return f"bson_dates:{collection}"
+
+    async def status(self) -> list:
+        cur = self.state.find({"_id": {"$regex": "^bson_dates:"}})
+        items = []
+        async for x in cur:
+            x["collection"] = x.pop("_id").split(":", 1)[1]
+            x.pop("last_id", None)
+            items.append(x)
+        return items
+
+    async def reset(self, collection: str):
+        await self.state.delete_one({"_id": self._state_id(collection)})
+
+    async def run_collection(
+        self,
+        collection: str,
+        fields: List[str],
+        batch_size: int = 500,
+        max_batches: Optional[int] = None,
+        pause_ms: int = 50
+    ) -> dict:
+        """Convert string fields in one collection; returns progress"""
+        col = self.db[collection]
+        state_id = self._state_id(collection)
+        st = await self.state.find_one({"_id": state_id}) or {}
+        last_id = st.get("last_id")
+
+        base = {"$or": [{f: {"$type": "string"}} for f in fields]}
+        projection = {f: 1 for f in fields}
+        batches = 0
+        scanned = converted = 0
+
+        while max_batches is None or batches < max_batches:
+            q = base if last_id is None else {"$and": [base, {"_id": {"$gt": last_id}}]}
+            docs = await col.find(q, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not docs:
+                await self.state.update_one(
+                    {"_id": state_id},
+                    {"$set": {"done": True, "finished_at": utcnow()}},
+                    upsert=True
+                )
+                break
+
+            ops = []
+            for d in docs:
+                match = {"_id": d["_id"]}
+                patch = {}
+                for f in fields:
+                    value = _get_path(d, f)
+                    if not isinstance(value, str):
+                        continue
+                    dt = to_dt(value)
+                    if dt is None:
+                        continue
+                    match[f] = value
+                    patch[f] = dt
+                if patch:
+                    ops.append(UpdateOne(match, {"$set": patch}))
+
+            if ops:
+                res = await col.bulk_write(ops, ordered=False)
+                converted += res.modified_count
+
+            scanned += len(docs)
+            batches += 1
+            last_id = docs[-1]["_id"]
+
+            await self.state.update_one(
+                {"_id": state_id},
+                {
+                    "$set": {"last_id": last_id, "fields": fields, "done": False, "updated_at": utcnow()},
+                    "$setOnInsert": {"started_at": utcnow()},
+                    "$inc": {"scanned": len(docs), "converted": res.modified_count if ops else 0, "batches": 1},
+                },
+                upsert=True
+            )
+
+            if pause_ms:
+                await asyncio.sleep(pause_ms / 1000.0)
+
+        return {"collection": collection, "batches": batches, "scanned": scanned, "converted": converted}
+
+    async def run(self, batch_size: int = 500, max_batches: Optional[int] = None) -> dict:
+        results = []
+        for collection, fields in MIGRATION_PLAN.items():
+            results.append(await self.run_collection(collection, fields, batch_size, max_batches))
+        return {"ok": True, "results": results}
+
+
+async def _main():
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent.parent.parent.parent / ".env")
+    logging.basicConfig(level=logging.INFO)
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "marketplace_db")]
+    result = await BsonDatesMigration(db).run()
+    logger.info(f"BSON dates migration: {result}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,24 @@
+"""
+O22: Migration Routes - progress and online batches
+"""
+from fastapi import APIRouter, Depends, Query
+from core.db import db
+from core.security import get_current_admin
+from .bson_dates_migration import BsonDatesMigration
+
+router = APIRouter(prefix="/ops/migrations", tags=["Migrations"])
+
+
+@router.get("/bson-dates")
+async def bson_dates_status(admin: dict = Depends(get_current_admin)):
+    return {"items": await BsonDatesMigration(db).status()}
+
+
+@router.post("/bson-dates/run")
+async def bson_dates_run(
+    batch_size: int = Query(500, ge=50, le=5000),
+    max_batches: int = Query(20, ge=1, le=1000),
+    admin: dict = Depends(get_current_admin)
+):
+    """Run a bounded number of batches per collection (resumes from checkpoint)"""
+    return await BsonDatesMigration(db).run(batch_size=batch_size, max_batches=max_batches)
@@ -0,0 +1,66 @@
+"""
+Admin Orders Routes - keyset-paginated listing + streaming export
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from core.db import db
+from core.dates import utcnow
+from core.security import get_current_admin
+from .admin_orders_service import AdminOrdersService, build_filter
+
+router = APIRouter(prefix="/orders", tags=["Admin Orders"])
+
+
+def _filters(
+    status: Optional[str] = Query(None, description="Comma-separated statuses"),
+    payment_status: Optional[str] = Query(None, description="Comma-separated payment statuses"),
+    buyer_id: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Order id or order number prefix"),
+    date_from: Optional[str] = Query(None, description="ISO date/time, inclusive"),
+    date_to: Optional[str] = Query(None, description="ISO date/time, exclusive"),
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+) -> dict:
+    try:
+        return build_filter(status, payment_status, buyer_id, q, date_from, date_to, min_total, max_total)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+@router.get("")
+async def list_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    query: dict = Depends(_filters),
+    admin: dict = Depends(get_current_admin)
+):
+    """Orders page (newest first); pass next_cursor back as cursor"""
+    try:
+        items, next_cursor = await AdminOrdersService(db).page(query, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"items": items, "next_cursor": next_cursor, "count": len(items)}
+
+
+@router.get("/export")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    query: dict = Depends(_filters),
+    admin: dict = Depends(get_current_admin)
+):
+    """Stream all matching orders as NDJSON or CSV (constant memory)"""
+    service = AdminOrdersService(db)
+    stamp = utcnow().strftime("%Y%m%d-%H%M%S")
+    if format == "csv":
+        return StreamingResponse(
+            service.export_csv(query),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="orders-{stamp}.csv"'}
+        )
+    return StreamingResponse(
+        service.export_ndjson(query),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="orders-{stamp}.ndjson"'}
+    )
@@ -0,0 +1,203 @@
+"""
+Admin Orders Service - keyset pagination, batch joins, streaming export
+
+- Keyset cursor on (created_at desc, id desc): stable pages without skip()
+- Customers and products resolved with one $in query per page
+- Export walks the same keyset pages through an async generator, so a full
+  NDJSON/CSV export runs in constant memory
+
+created_at may be an ISO string or a native datetime (see core.dates), or
+null / missing on damaged legacy rows. Sorted descending, BSON puts all
+datetimes before all strings and those before null/missing, so the cursor
+carries the value type and the "after" filter follows that order.
+"""
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import base64
+import csv
+import io
+import json
+import re
+
+from core.dates import and_q, range_q, to_dt, to_iso
+
+EXPORT_PAGE = 500
+
+CSV_FIELDS = [
+    "id", "order_number", "created_at", "status", "payment_status", "payment_method",
+    "total_amount", "currency", "buyer_id", "customer_name", "customer_email", "items_count",
+]
+
+
+def encode_cursor(order: dict) -> str:
+    created = order.get("created_at")
+    if isinstance(created, datetime):
+        t, v = "d", to_iso(created)
+    elif created is None:
+        t, v = "n", None
+    else:
+        t, v = "s", created
+    payload = {"t": t, "v": v, "id": order.get("id")}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if payload["t"] not in ("d", "s", "n"):
+            raise ValueError
+        return payload
+    except Exception:
+        raise ValueError("INVALID_CURSOR")
+
+
+def _after_cursor(payload: dict) -> dict:
+    """Rows strictly after the cursor in (created_at desc, id desc) order"""
+    oid = payload["id"]
+    # Null / missing created_at sorts last: the tail of every page walk
+    tail = {"created_at": None}
+    if payload["t"] == "n":
+        return {"created_at": None, "id": {"$lt": oid}}
+    if payload["t"] == "d":
+        value = to_dt(payload["v"])
+        return {"$or": [
+            {"created_at": {"$lt": value, "$type": "date"}},
+            {"created_at": value, "id": {"$lt": oid}},
+            {"created_at": {"$type": "string"}},
+            tail,
+        ]}
+    value = payload["v"]
+    return {"$or": [
+        {"created_at": {"$lt": value, "$type": "string"}},
+        {"created_at": value, "id": {"$lt": oid}},
+        tail,
+    ]}
+
+
+def build_filter(
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    buyer_id: Optional[str] = None,
+    q: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+) -> dict:
+    parts: List[dict] = []
+    if status:
+        parts.append({"status": {"$in": status.split(",")}})
+    if payment_status:
+        parts.append({"payment_status": {"$in": payment_status.split(",")}})
+    if buyer_id:
+        parts.append({"buyer_id": buyer_id})
+    if q:
+        parts.append({"$or": [{"id": q}, {"order_number": {"$regex": f"^{re.escape(q.upper())}"}}]})
+    if date_from or date_to:
+        parts.append(range_q("created_at", gte=date_from, lt=date_to))
+    if min_total is not None or max_total is not None:
+        cond = {}
+        if min_total is not None:
+            cond["$gte"] = min_total
+        if max_total is not None:
+            cond["$lte"] = max_total
+        parts.append({"total_amount": cond})
+    return and_q(*parts) if parts else {}
+
+
+class AdminOrdersService:
+    def __init__(self, db):
+        self.db = db
+        self.orders = db["orders"]
+        self.users = db["users"]
+        self.products = db["products"]
+
+    async def ensure_indexes(self):
+        await self.orders.create_index([("created_at", -1), ("id", -1)])
+        await self.orders.create_index([("status", 1), ("created_at", -1), ("id", -1)])
+
+    async def page(self, query: dict, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        limit = max(1, limit)
+        q = and_q(query, _after_cursor(decode_cursor(cursor))) if cursor else query
+        rows = await self.orders.find(q, {"_id": 0}).sort(
+            [("created_at", -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        rows = rows[:limit]
+        await self.enrich(rows)
+        return rows, next_cursor
+
+    async def enrich(self, orders: List[dict]):
+        """Customer + product details for a page: one $in query each"""
+        buyer_ids = {o.get("buyer_id") for o in orders if o.get("buyer_id")}
+        product_ids = {
+            i.get("product_id") for o in orders for i in (o.get("items") or []) if i.get("product_id")
+        }
+
+        users: Dict[str, dict] = {}
+        if buyer_ids:
+            async for u in self.users.find(
+                {"id": {"$in": list(buyer_ids)}},
+                {"_id": 0, "id": 1, "full_name": 1, "email": 1}
+            ):
+                users[u["id"]] = u
+
+        products: Dict[str, dict] = {}
+        if product_ids:
+            async for p in self.products.find(
+                {"id": {"$in": list(product_ids)}},
+                {"_id": 0, "id": 1, "title": 1, "category_name": 1, "price": 1}
+            ):
+                products[p["id"]] = p
+
+        for order in orders:
+            customer = users.get(order.get("buyer_id"))
+            if customer:
+                order["customer_name"] = customer.get("full_name", "N/A")
+                order["customer_email"] = customer.get("email", "N/A")
+            else:
+                order["customer_name"] = "Unknown"
+                order["customer_email"] = "N/A"
+
+            for item in order.get("items") or []:
+                product = products.get(item.get("product_id"))
+                if product:
+                    item["product_name"] = product.get("title", "Unknown Product")
+                    item["category_name"] = product.get("category_name")
+                    item["price"] = item.get("price", product.get("price", 0))
+
+            for key in ("created_at", "updated_at"):
+                if isinstance(order.get(key), datetime):
+                    order[key] = order[key].isoformat()
+
+    async def iter_all(self, query: dict, page_size: int = EXPORT_PAGE) -> AsyncIterator[dict]:
+        cursor = None
+        while True:
+            rows, cursor = await self.page(query, limit=page_size, cursor=cursor)
+            for row in rows:
+                yield row
+            if not cursor:
+                return
+
+    async def export_ndjson(self, query: dict) -> AsyncIterator[bytes]:
+        async for order in self.iter_all(query):
+            yield (json.dumps(order, default=str, ensure_ascii=False) + "\n").encode()
+
+    async def export_csv(self, query: dict) -> AsyncIterator[bytes]:
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        async for order in self.iter_all(query):
+            writer.writerow(_csv_row(order))
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue().encode()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue().encode()
+
+
+def _csv_row(order: dict) -> Dict[str, Any]:
+    row = {k: order.get(k) for k in CSV_FIELDS}
+    row["items_count"] = len(order.get("items") or [])
+    return row
@@ -0,0 +1,36 @@
+"""
+Order write hooks - read models refreshed after an order insert or a
+status transition: order-line facts and KPI counters (O18), the seller
+ledger (O5) and the customer 360 projection.
+Each hook logs and swallows its own errors, so callers never fail on them.
+"""
+from typing import Optional
+
+from modules.analytics_intel.kpi_counters import record_order_created, record_order_transition
+from modules.analytics_intel.order_facts import record_order_facts, sync_order_status
+from modules.finance.seller_ledger import record_seller_order
+from modules.crm.customer360 import record_customer_order, record_customer_order_status
+
+
+async def on_order_created(db, order: dict):
+    await record_order_facts(db, order)
+    await record_order_created(db, order)
+    await record_seller_order(db, order.get("id"), order)
+    await record_customer_order(db, order)
+
+
+async def on_order_status(db, order_id: str, status: Optional[str] = None, payment_status: Optional[str] = None):
+    await sync_order_status(db, order_id, status=status, payment_status=payment_status)
+    await record_seller_order(db, order_id)
+    await record_customer_order_status(db, order_id, status=status, payment_status=payment_status)
+
+
+async def on_order_transition(
+    db, order: dict, from_status: str, payment_status: Optional[str] = None, before: Optional[dict] = None
+):
+    """
+    Status update that won (OrderRepository, admin / Stripe paths): `order` is
+    the new document, `before` the previous one if the caller has it
+    """
+    await record_order_transition(db, order, from_status, before)
+    await on_order_status(db, order.get("id"), status=order.get("status"), payment_status=payment_status)
@@ -6,6 +6,8 @@ from datetime import datetime, timezone
 from pymongo import ReturnDocument
 
 from core.db import db
+from core.dates import ts
+from modules.orders.order_hooks import on_order_transition
 from .order_status import OrderStatus
 from .order_state_machine import can_transition
 
@@ -79,7 +81,7 @@ class OrderRepository:
         if expected_version is not None:
             query["version"] = expected_version
         
-        now = utcnow().isoformat()
+        now = ts(utcnow())
         
         update = {
             "$set": {
@@ -109,6 +111,7 @@ class OrderRepository:
         if not doc:
             raise ValueError("ORDER_CONFLICT")
         
+        await on_order_transition(db, doc, frm.value)
         return doc
     
     async def mark_paid_atomic(
@@ -157,7 +160,7 @@ class OrderRepository:
         if expected_version is not None:
             query["version"] = expected_version
         
-        now = utcnow().isoformat()
+        now = ts(utcnow())
         
         update = {
             "$set": {
@@ -193,6 +196,7 @@ class OrderRepository:
         if not doc:
             raise ValueError("ORDER_CONFLICT")
         
+        await on_order_transition(db, doc, OrderStatus.AWAITING_PAYMENT.value)
         return doc
     
     async def idem_get_or_lock(
@@ -5,6 +5,7 @@ BLOCK V2-10
 from datetime import datetime, timezone
 from fastapi import HTTPException
 from core.db import db
+from modules.orders.order_hooks import on_order_status
 
 # Allowed status transitions
 ALLOWED_TRANSITIONS = {
@@ -75,6 +76,7 @@ async def atomic_transition(
         raise HTTPException(409, "Order status conflict - status may have changed")
     
     result.pop("_id", None)
+    await on_order_status(db, order_id, status=to_status)
     return result
 
 
@@ -10,6 +10,8 @@ import uuid
 import logging
 
 from core.db import db
+from core.dates import ts_now
+from modules.orders.order_hooks import on_order_created
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/v2/orders", tags=["Orders V2"])
@@ -176,12 +178,13 @@ async def create_order_v2(request: Request, order_data: CreateOrderV2Request):
         "payment_status": "pending",
         "payment_method": order_data.payment_method,
         "comment": order_data.comment,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "created_at": ts_now(),
+        "updated_at": ts_now()
     }
     
     # Save order
     await db.orders.insert_one(order_doc)
+    await on_order_created(db, order_doc)
     
     # Update product stock
     for item in order_data.items:
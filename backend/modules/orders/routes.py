@@ -9,21 +9,21 @@ from datetime import datetime, timezone
 import uuid
 import logging
 
+from pymongo import UpdateOne
+
 from core.db import db
+from core.dates import ts
 from core.security import get_current_user, get_current_admin
 from .order_status import OrderStatus
 from .order_state_machine import can_transition, get_allowed_transitions, is_cancellable
 from .order_repository import order_repository
 from .order_idempotency import make_idempotency_hash, stable_payload_hash
-from modules.ab.ab_service import ABService
-from modules.payments.prepaid_discount import calc_prepaid_discount
+from modules.cart.cart_pricing import get_cart_pricing
+from modules.orders.order_hooks import on_order_created
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 logger = logging.getLogger(__name__)
 
-# A/B experiment ID for prepaid discount testing
-AB_PREPAID_DISCOUNT_EXP_ID = "prepaid_discount_v1"
-
 
 class OrderItem(BaseModel):
     product_id: str
@@ -46,6 +46,8 @@ class CreateOrderRequest(BaseModel):
     shipping: ShippingAddress
     payment_method: str = "cash"
     notes: Optional[str] = None
+    # GET /cart pricing.fingerprint: reuse the priced cart instead of re-reading products
+    pricing_fingerprint: Optional[str] = None
 
 
 class UpdateStatusRequest(BaseModel):
@@ -126,75 +128,36 @@ async def create_order(
     if not cart or not cart.get("items"):
         raise HTTPException(status_code=400, detail="Cart is empty")
     
-    # Build order items
-    order_items = []
-    subtotal = 0
-    
-    for cart_item in cart["items"]:
-        product = await db.products.find_one(
-            {"id": cart_item["product_id"]}, 
-            {"_id": 0}
-        )
-        if not product:
-            continue
-        
-        # Handle both 'name' and 'title' field names
-        product_name = product.get("name") or product.get("title", "Unknown Product")
-        
-        order_items.append(OrderItem(
-            product_id=product["id"],
-            quantity=cart_item["quantity"],
-            price=product["price"],
-            name=product_name
-        ))
-        subtotal += product["price"] * cart_item["quantity"]
-        
-        # Increment sales count
-        await db.products.update_one(
-            {"id": product["id"]},
-            {"$inc": {"sales_count": cart_item["quantity"]}}
-        )
-    
-    if not order_items:
+    # --- Pricing: lines, prepaid discount and A/B variant in one pass ---
+    # Use phone number as the unit for A/B assignment (stable across sessions)
+    priced = await get_cart_pricing(db).price_for_checkout(
+        cart["items"], data.payment_method, data.shipping.phone, data.pricing_fingerprint
+    )
+    if not priced.lines:
         raise HTTPException(status_code=400, detail="No valid products in cart")
     
+    order_items = [
+        OrderItem(product_id=line["product_id"], quantity=line["quantity"], price=line["price"], name=line["name"])
+        for line in priced.lines
+    ]
+    subtotal = priced.subtotal
+    total = priced.total
+    discount_obj = priced.discount
+    ab_assignment = priced.ab
+    if ab_assignment and ab_assignment.get("active"):
+        logger.info(f"A/B assignment for {data.shipping.phone}: variant={ab_assignment.get('variant')}, discount={ab_assignment.get('discount_pct')}%")
+    if discount_obj:
+        logger.info(f"Discount applied: {discount_obj['amount']} UAH ({discount_obj['value']}%)")
+    
+    # Increment sales count (one bulk write)
+    await db.products.bulk_write([
+        UpdateOne({"id": line["product_id"]}, {"$inc": {"sales_count": line["quantity"]}})
+        for line in priced.lines
+    ], ordered=False)
+    
     order_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc)
     
-    # --- A/B Testing Integration ---
-    # Use phone number as the unit for A/B assignment (stable across sessions)
-    ab_unit = data.shipping.phone
-    ab_assignment = None
-    discount_pct_override = None
-    discount_obj = None
-    
-    try:
-        ab_service = ABService(db)
-        assignment = await ab_service.get_assignment(AB_PREPAID_DISCOUNT_EXP_ID, ab_unit)
-        
-        if assignment and assignment.get("active"):
-            ab_assignment = {
-                "exp_id": assignment.get("exp_id"),
-                "variant": assignment.get("variant"),
-                "discount_pct": assignment.get("discount_pct"),
-                "active": True
-            }
-            discount_pct_override = assignment.get("discount_pct")
-            logger.info(f"A/B assignment for {ab_unit}: variant={assignment.get('variant')}, discount={discount_pct_override}%")
-    except Exception as e:
-        logger.warning(f"A/B assignment failed, using default: {e}")
-        ab_assignment = {"exp_id": AB_PREPAID_DISCOUNT_EXP_ID, "variant": None, "discount_pct": None, "active": False}
-    
-    # Calculate discount based on payment method and A/B variant
-    total = subtotal
-    policy_mode = "FULL_PREPAID" if data.payment_method != "cash" else "COD"
-    
-    if policy_mode == "FULL_PREPAID":
-        discount_obj = calc_prepaid_discount(subtotal, policy_mode, discount_pct_override)
-        if discount_obj:
-            total = round(subtotal - discount_obj["amount"], 2)
-            logger.info(f"Discount applied: {discount_obj['amount']} UAH ({discount_obj['value']}%)")
-    
     # Determine initial status based on payment method
     initial_status = (
         OrderStatus.AWAITING_PAYMENT 
@@ -224,11 +187,12 @@ async def create_order(
             "reason": "ORDER_CREATED",
             "at": now.isoformat(),
         }],
-        "created_at": now,
+        "created_at": ts(now),
         "updated_at": None,
     }
     
     await db.orders.insert_one(order_doc)
+    await on_order_created(db, order_doc)
     
     # Clear cart
     await db.carts.update_one(
@@ -3,6 +3,7 @@ Fondy Routes - Webhook endpoint
 """
 from fastapi import APIRouter, Request
 import os
+from core.config import settings
 from core.db import db
 from modules.payments.fondy_webhook import FondyWebhookHandler
 
@@ -15,12 +16,15 @@ async def fondy_webhook(request: Request):
     Fondy callback webhook endpoint.
     
     Fondy sends payment status updates here.
-    Verifies signature, processes payment, updates order status.
+    Verifies signature, processes payment, updates order status
+    (PAYMENT_WEBHOOK_ASYNC: queued and applied by the webhook inbox job).
     """
     payload = await request.json()
     password = os.getenv("FONDY_MERCHANT_PASSWORD", "")
     
     handler = FondyWebhookHandler(db, fondy_password=password)
+    if settings.PAYMENT_WEBHOOK_ASYNC:
+        return await handler.accept(payload)
     return await handler.handle(payload)
 
 
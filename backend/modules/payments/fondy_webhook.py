@@ -6,6 +6,7 @@ from fastapi import HTTPException
 from datetime import datetime, timezone
 import logging
 
+from core.dates import to_dt, ts, ts_now
 from modules.payments.fondy_provider import verify_signature
 
 logger = logging.getLogger(__name__)
@@ -91,17 +92,66 @@ class FondyWebhookHandler:
         """
         await self.ensure_indexes()
 
-        # Extract order data
-        order = payload.get("order") or payload
-        if not isinstance(order, dict):
-            raise HTTPException(400, "BAD_PAYLOAD")
+        # 1) Verify signature, always log (even if invalid) for audit
+        order = await self._verified_order(payload, log_valid=True)
 
-        # 1) Verify signature
-        verified = verify_signature(payload, self.password)
+        # 2) Parse IDs
+        fondy_order_id, order_id, purpose, payment_id, mapped_status, dedupe_key = self._parse(order)
 
-        # 2) Always log (even if invalid) for audit
-        log_entry = {
-            "created_at": now_iso(),
+        # 3) Anti-replay: dedupe by signature + status
+        try:
+            await self.events.insert_one({
+                "dedupe_key": dedupe_key,
+                "created_at": ts_now(),
+                "order_id": order_id,
+                "payment_id": payment_id,
+                "status": mapped_status
+            })
+        except Exception:
+            # Duplicate webhook - return OK but don't process
+            logger.info(f"Fondy duplicate webhook: {fondy_order_id}")
+            return {"ok": True, "duplicate": True}
+
+        return await self._apply(order, fondy_order_id, order_id, purpose, payment_id, mapped_status)
+
+    async def accept(self, payload: dict) -> dict:
+        """
+        Fast-ack variant of handle(): verify, then append the callback to the
+        webhook inbox (payment_events, deduped by dedupe_key); the inbox
+        consumer applies it with process_queued().
+        """
+        from modules.payments.webhook_inbox import get_webhook_inbox
+
+        order = await self._verified_order(payload, log_valid=False)
+        fondy_order_id, order_id, purpose, payment_id, mapped_status, dedupe_key = self._parse(order)
+
+        ev = await get_webhook_inbox(self.db).enqueue("fondy_callback", {
+            "provider": "FONDY",
+            "provider_event_id": dedupe_key,
+            "dedupe_key": dedupe_key,
+            "order_id": order_id,
+            "payment_id": payment_id,
+            "type": mapped_status,
+            "raw": payload,
+        })
+        if ev["duplicate"]:
+            logger.info(f"Fondy duplicate webhook: {fondy_order_id}")
+            return {"ok": True, "duplicate": True}
+        return {"ok": True, "queued": True, "order_id": order_id}
+
+    async def process_queued(self, event: dict) -> dict:
+        """Apply a callback stored by accept(); returns the inbox event's final fields"""
+        order = event["raw"].get("order") or event["raw"]
+        if not event.get("attempts"):
+            # Audit entry for verified callbacks, dated when it was received
+            await self.logs.insert_one(self._log_entry(order, True, created_at=event.get("created_at")))
+        fondy_order_id, order_id, purpose, payment_id, mapped_status, _ = self._parse(order)
+        result = await self._apply(order, fondy_order_id, order_id, purpose, payment_id, mapped_status)
+        return {"result": result}
+
+    def _log_entry(self, order: dict, verified: bool, created_at=None) -> dict:
+        return {
+            "created_at": ts(to_dt(created_at)) if created_at else ts_now(),
             "verified": verified,
             "order_id": order.get("order_id"),
             "order_status": order.get("order_status"),
@@ -111,13 +161,24 @@ class FondyWebhookHandler:
             "actual_amount": order.get("actual_amount"),
             "response_status": order.get("response_status"),
         }
-        await self.logs.insert_one(log_entry)
+
+    async def _verified_order(self, payload: dict, log_valid: bool) -> dict:
+        # Extract order data
+        order = payload.get("order") or payload
+        if not isinstance(order, dict):
+            raise HTTPException(400, "BAD_PAYLOAD")
+
+        verified = verify_signature(payload, self.password)
+        if log_valid or not verified:
+            await self.logs.insert_one(self._log_entry(order, verified))
 
         if not verified:
             logger.warning(f"Fondy webhook invalid signature: {order.get('order_id')}")
             raise HTTPException(401, "INVALID_SIGNATURE")
+        return order
 
-        # 3) Parse IDs
+    def _parse(self, order: dict) -> tuple:
+        """(fondy_order_id, order_id, purpose, payment_id, mapped_status, dedupe_key)"""
         fondy_order_id = order.get("order_id")
         order_status = order.get("order_status")
         mapped_status = map_fondy_status(order_status)
@@ -130,22 +191,12 @@ class FondyWebhookHandler:
         if not order_id:
             raise HTTPException(400, "BAD_ORDER_ID_FORMAT")
 
-        # 4) Anti-replay: dedupe by signature + status
         dedupe_key = f"fondy:{fondy_order_id}:{order_status}:{order.get('signature', '')[:32]}"
-        try:
-            await self.events.insert_one({
-                "dedupe_key": dedupe_key,
-                "created_at": now_iso(),
-                "order_id": order_id,
-                "payment_id": payment_id,
-                "status": mapped_status
-            })
-        except Exception:
-            # Duplicate webhook - return OK but don't process
-            logger.info(f"Fondy duplicate webhook: {fondy_order_id}")
-            return {"ok": True, "duplicate": True}
+        return fondy_order_id, order_id, purpose, payment_id, mapped_status, dedupe_key
 
-        # 5) Update payment record
+    async def _apply(self, order: dict, fondy_order_id: str, order_id: str, purpose: str,
+                     payment_id: str, mapped_status: str) -> dict:
+        # Update payment record
         pay = await self.payments.find_one({"id": payment_id}, {"_id": 0})
         
         if not pay:
@@ -180,7 +231,7 @@ class FondyWebhookHandler:
             
             await self.payments.update_one({"id": payment_id}, {"$set": update_data})
 
-        # 6) Apply business logic based on status
+        # Apply business logic based on status
         if mapped_status == "PAID":
             return await self._handle_paid(order_id, purpose, payment_id, fondy_order_id)
         
@@ -199,9 +250,9 @@ class FondyWebhookHandler:
                 {"id": order_id},
                 {"$set": {
                     "deposit.paid": True,
-                    "deposit.paid_at": now_iso(),
+                    "deposit.paid_at": ts_now(),
                     "status": "NEW",  # Ready for processing, COD now allowed
-                    "updated_at": now_iso()
+                    "updated_at": ts_now()
                 }}
             )
             logger.info(f"Deposit paid for order {order_id}")
@@ -212,9 +263,9 @@ class FondyWebhookHandler:
             {"id": order_id, "status": {"$in": ["AWAITING_PAYMENT", "NEW", "PAYMENT_FROZEN"]}},
             {"$set": {
                 "status": "PAID",
-                "paid_at": now_iso(),
+                "paid_at": ts_now(),
                 "payment_id": payment_id,
-                "updated_at": now_iso()
+                "updated_at": ts_now()
             }}
         )
         
@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 import hashlib
 
 from core.db import db
+from core.dates import ts
 
 
 def utcnow():
@@ -39,7 +40,7 @@ class PaymentEventsRepository:
         """
         doc = {
             **doc, 
-            "created_at": doc.get("created_at") or utcnow().isoformat()
+            "created_at": doc.get("created_at") or ts(utcnow())
         }
         
         # Add signature hash for replay protection
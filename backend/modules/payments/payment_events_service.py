@@ -2,8 +2,8 @@
 Payment Events Service - Idempotent payment event handling
 BLOCK V2-10
 """
-from datetime import datetime, timezone
 from core.db import db
+from core.dates import ts_now
 
 
 async def is_event_seen(event_key: str) -> bool:
@@ -20,7 +20,7 @@ async def mark_event_seen(event_key: str, payload: dict):
             "$setOnInsert": {
                 "event_key": event_key,
                 "payload": payload,
-                "created_at": datetime.now(timezone.utc).isoformat(),
+                "created_at": ts_now(),
             }
         },
         upsert=True,
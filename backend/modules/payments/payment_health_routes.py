@@ -25,3 +25,14 @@ async def get_payment_health(
     """
     svc = PaymentHealthService(db)
     return await svc.get_health(range)
+
+
+@router.get("/payments/webhooks/queue")
+async def get_webhook_queue(current_user: dict = Depends(get_current_admin)):
+    """
+    Payment webhook inbox:
+    - Queue depth per status (QUEUED / RETRY / PROCESSING) and DEAD events
+    - Age of the oldest pending event (processing lag)
+    """
+    from modules.payments.webhook_inbox import get_webhook_inbox
+    return await get_webhook_inbox(db).stats()
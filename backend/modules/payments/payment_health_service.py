@@ -1,19 +1,50 @@
 """
 Payment Health Dashboard Service
 Metrics: webhook success, reconciliation, retry recovery, deposit conversion, prepaid analytics
+
+Metrics are built from daily buckets (payment_health_daily):
+- one $facet pass over orders + one $group pass over fondy_logs per window
+- closed days are cached; the last HOT_DAYS are always recomputed
+- a nightly job rebuilds the last SETTLE_DAYS to absorb late status changes
+The 7/30/90-day views sum buckets instead of rescanning orders.
 """
 from datetime import datetime, timezone, timedelta
+from typing import Dict, List
+from pymongo import UpdateOne
 import logging
 
+from core.dates import and_q, range_q, day_expr, dt_expr
+
 logger = logging.getLogger(__name__)
 
+BUCKET_VERSION = 1
+HOT_DAYS = 2
+SETTLE_DAYS = 7
+
+PAID_STATUSES = ["paid", "PAID", "completed", "COMPLETED"]
+
+# Additive counters stored in every daily bucket
+BUCKET_FIELDS = (
+    "total", "paid", "revenue",
+    "webhook_total", "webhook_valid",
+    "recon_fixes", "retry_recovered",
+    "deposit_total", "deposit_converted",
+    "prepaid_orders", "prepaid_paid",
+    "discount_total", "discount_count",
+    "paid_time_sum", "paid_time_count",
+)
+
 
 def utcnow():
     return datetime.now(timezone.utc)
 
 
-def since_iso(days: int) -> str:
-    return (utcnow() - timedelta(days=days)).isoformat()
+def day_str(d) -> str:
+    return d.strftime("%Y-%m-%d")
+
+
+def _empty_bucket(day: str) -> dict:
+    return {"day": day, "status": [], **{f: 0 for f in BUCKET_FIELDS}}
 
 
 class PaymentHealthService:
@@ -23,146 +54,218 @@ class PaymentHealthService:
         self.orders = db["orders"]
         self.fondy_logs = db["fondy_logs"]
         self.payment_events = db["payment_events"]
+        self.buckets = db["payment_health_daily"]
+
+    async def ensure_indexes(self):
+        await self.buckets.create_index("day", unique=True)
+        # Window branches of the orders $facet pass
+        await self.orders.create_index("paid_at", sparse=True)
+        await self.orders.create_index([("payment_updated_by", 1), ("updated_at", 1)], sparse=True)
+        await self.fondy_logs.create_index("created_at")
 
     async def get_health(self, range_days: int = 7) -> dict:
-        """Get payment health metrics for given range"""
-        since = since_iso(range_days)
+        """Get payment health metrics for given range (calendar days incl. today)"""
+        today = utcnow().date()
+        days = [day_str(today - timedelta(days=i)) for i in range(range_days - 1, -1, -1)]
+        hot_from = day_str(today - timedelta(days=HOT_DAYS - 1))
+        closed = [d for d in days if d < hot_from]
+
+        cached = {}
+        if closed:
+            cur = self.buckets.find(
+                {"day": {"$in": closed}, "version": BUCKET_VERSION},
+                {"_id": 0}
+            )
+            cached = {b["day"]: b async for b in cur}
+
+        # Recompute from the oldest missing closed day (or just the hot days)
+        missing = [d for d in closed if d not in cached]
+        computed = await self._compute_buckets(missing[0] if missing else hot_from)
+        await self._store_closed([computed.get(d) or _empty_bucket(d) for d in missing])
 
-        # 1. Base payment stats by status
-        base_pipeline = [
-            {"$match": {"created_at": {"$gte": since}}},
-            {"$group": {"_id": "$payment_status", "count": {"$sum": 1}}}
+        buckets = [cached.get(d) or computed.get(d) or _empty_bucket(d) for d in days]
+        return self._summarize(range_days, buckets)
+
+    async def rebuild_recent(self, days: int = SETTLE_DAYS) -> dict:
+        """Recompute recent closed buckets (nightly job)"""
+        today = utcnow().date()
+        from_day = day_str(today - timedelta(days=days))
+        computed = await self._compute_buckets(from_day)
+        closed = [
+            computed.get(d) or _empty_bucket(d)
+            for d in (day_str(today - timedelta(days=i)) for i in range(HOT_DAYS, days + 1))
         ]
-        base_results = await self.orders.aggregate(base_pipeline).to_list(20)
-
-        total = 0
-        paid = declined = expired = pending = 0
-        status_map = {}
-        for r in base_results:
-            cnt = r.get("count", 0)
-            total += cnt
-            status = (r.get("_id") or "").upper()
-            status_map[status] = cnt
-            if status in ("PAID", "COMPLETED"):
-                paid += cnt
-            elif status in ("DECLINED", "FAILED"):
-                declined += cnt
-            elif status == "EXPIRED":
-                expired += cnt
-            elif status == "PENDING":
-                pending += cnt
-
-        # 2. Webhook success rate
-        total_logs = await self.fondy_logs.count_documents({"created_at": {"$gte": since}})
-        valid_logs = await self.fondy_logs.count_documents({
-            "created_at": {"$gte": since},
-            "signature_valid": True
-        })
-        webhook_rate = (valid_logs / total_logs) if total_logs > 0 else 1.0
+        await self._store_closed(closed)
+        return {"ok": True, "rebuilt": len(closed), "from": from_day}
 
-        # 3. Reconciliation fixes
-        recon_fixes = await self.orders.count_documents({
-            "updated_at": {"$gte": since},
-            "payment_updated_by": "reconciliation"
-        })
-
-        # 4. Retry recovered
-        retry_recovered = await self.orders.count_documents({
-            "paid_at": {"$gte": since},
-            "retry.sent": True,
-            "payment_status": {"$in": ["paid", "PAID", "completed", "COMPLETED"]}
-        })
-        recovery_rate = (retry_recovered / total) if total > 0 else 0
+    async def _store_closed(self, buckets: List[dict]):
+        if not buckets:
+            return
+        now = utcnow().isoformat()
+        await self.buckets.bulk_write([
+            UpdateOne(
+                {"day": b["day"]},
+                {"$set": {**b, "version": BUCKET_VERSION, "computed_at": now}},
+                upsert=True
+            )
+            for b in buckets
+        ], ordered=False)
 
-        # 5. Deposit conversion
-        deposit_total = await self.orders.count_documents({
-            "created_at": {"$gte": since},
-            "payment_policy.mode": "SHIP_DEPOSIT"
-        })
-        deposit_converted = await self.orders.count_documents({
-            "created_at": {"$gte": since},
-            "payment_policy.mode": "SHIP_DEPOSIT",
-            "payment_status": {"$in": ["paid", "PAID", "completed", "COMPLETED"]}
-        })
-        deposit_rate = (deposit_converted / deposit_total) if deposit_total > 0 else 0
+    async def _compute_buckets(self, from_day: str) -> Dict[str, dict]:
+        """Daily buckets for [from_day, now]: one pass per collection"""
+        created = range_q("created_at", from_day)
+        recon = and_q({"payment_updated_by": "reconciliation"}, range_q("updated_at", from_day))
+        paid = range_q("paid_at", from_day)
+        paid_in = {"$in": ["$payment_status", PAID_STATUSES]}
 
-        # 6. Avg payment time (minutes)
-        time_pipeline = [
-            {"$match": {
-                "paid_at": {"$gte": since},
-                "payment_status": {"$in": ["paid", "PAID", "completed", "COMPLETED"]}
-            }},
+        orders_pipeline = [
+            {"$match": {"$or": [created, recon, paid]}},
             {"$project": {
-                "delta": {
-                    "$divide": [
-                        {"$subtract": [
-                            {"$toDate": "$paid_at"},
-                            {"$toDate": "$created_at"}
-                        ]},
-                        60000  # ms to minutes
-                    ]
-                }
+                "_id": 0,
+                "created_at": 1,
+                "updated_at": 1,
+                "paid_at": 1,
+                "payment_status": 1,
+                "payment_updated_by": 1,
+                "mode": "$payment_policy.mode",
+                "retry_sent": "$retry.sent",
+                "discount": "$pricing.discount.amount",
+                "has_discount": {"$ne": [{"$type": "$pricing.discount"}, "missing"]},
+                "amount": {"$ifNull": [{"$toDouble": "$totals.grand"}, {"$toDouble": "$total_amount"}]},
             }},
-            {"$group": {"_id": None, "avg": {"$avg": "$delta"}}}
-        ]
-        time_result = await self.orders.aggregate(time_pipeline).to_list(1)
-        avg_minutes = time_result[0]["avg"] if time_result else 0
-
-        # 7. Prepaid analytics
-        prepaid_orders = await self.orders.count_documents({
-            "created_at": {"$gte": since},
-            "payment_policy.mode": "FULL_PREPAID"
-        })
-        prepaid_paid = await self.orders.count_documents({
-            "created_at": {"$gte": since},
-            "payment_policy.mode": "FULL_PREPAID",
-            "payment_status": {"$in": ["paid", "PAID", "completed", "COMPLETED"]}
-        })
-        prepaid_conversion = (prepaid_paid / prepaid_orders) if prepaid_orders > 0 else 0
-
-        # 8. Discount analytics
-        discount_pipeline = [
-            {"$match": {
-                "created_at": {"$gte": since},
-                "pricing.discount": {"$exists": True}
+            {"$facet": {
+                # created_at day x payment_status x policy mode
+                "created": [
+                    {"$match": created},
+                    {"$group": {
+                        "_id": {
+                            "day": day_expr("created_at"),
+                            "status": "$payment_status",
+                            "mode": "$mode",
+                        },
+                        "count": {"$sum": 1},
+                        "paid": {"$sum": {"$cond": [paid_in, 1, 0]}},
+                        "revenue": {"$sum": {"$cond": [paid_in, "$amount", 0]}},
+                        "discount_total": {"$sum": {"$cond": ["$has_discount", {"$ifNull": ["$discount", 0]}, 0]}},
+                        "discount_count": {"$sum": {"$cond": ["$has_discount", 1, 0]}},
+                    }},
+                ],
+                "recon": [
+                    {"$match": recon},
+                    {"$group": {"_id": day_expr("updated_at"), "count": {"$sum": 1}}},
+                ],
+                # dt_expr ($toDate) only for paid orders in the window
+                "paid": [
+                    {"$match": and_q(paid, {"payment_status": {"$in": PAID_STATUSES}})},
+                    {"$group": {
+                        "_id": day_expr("paid_at"),
+                        "retry_recovered": {"$sum": {"$cond": [{"$eq": ["$retry_sent", True]}, 1, 0]}},
+                        "time_sum": {"$sum": {"$divide": [
+                            {"$subtract": [dt_expr("paid_at"), dt_expr("created_at")]},
+                            60000  # ms to minutes
+                        ]}},
+                        "time_count": {"$sum": 1},
+                    }},
+                ],
             }},
-            {"$group": {
-                "_id": None,
-                "total": {"$sum": "$pricing.discount.amount"},
-                "avg": {"$avg": "$pricing.discount.amount"},
-                "count": {"$sum": 1}
-            }}
         ]
-        discount_result = await self.orders.aggregate(discount_pipeline).to_list(1)
-        discount_total = discount_result[0]["total"] if discount_result else 0
-        discount_avg = discount_result[0]["avg"] if discount_result else 0
-        discount_count = discount_result[0]["count"] if discount_result else 0
 
-        # Estimated COD loss saved (avg return cost ~350 UAH)
-        cod_loss_saved = prepaid_paid * 350
-
-        # 9. Daily trend (last 7 days)
-        daily_pipeline = [
-            {"$match": {"created_at": {"$gte": since}}},
-            {"$addFields": {
-                "date": {"$substr": ["$created_at", 0, 10]}
-            }},
+        webhook_pipeline = [
+            {"$match": created},
             {"$group": {
-                "_id": "$date",
+                "_id": day_expr("created_at"),
                 "total": {"$sum": 1},
-                "paid": {"$sum": {"$cond": [
-                    {"$in": ["$payment_status", ["paid", "PAID", "completed", "COMPLETED"]]},
-                    1, 0
-                ]}},
-                "revenue": {"$sum": {"$cond": [
-                    {"$in": ["$payment_status", ["paid", "PAID", "completed", "COMPLETED"]]},
-                    {"$ifNull": [{"$toDouble": "$totals.grand"}, {"$toDouble": "$total_amount"}]},
-                    0
-                ]}}
+                "valid": {"$sum": {"$cond": [{"$eq": ["$signature_valid", True]}, 1, 0]}},
             }},
-            {"$sort": {"_id": 1}}
         ]
-        daily_trend = await self.orders.aggregate(daily_pipeline).to_list(30)
+
+        facet = (await self.orders.aggregate(orders_pipeline).to_list(1) or [{}])[0]
+        webhooks = await self.fondy_logs.aggregate(webhook_pipeline).to_list(None)
+
+        buckets: Dict[str, dict] = {}
+
+        def bucket(day: str) -> dict:
+            if day not in buckets:
+                buckets[day] = {**_empty_bucket(day), "status": {}}
+            return buckets[day]
+
+        for r in facet.get("created", []):
+            key = r["_id"]
+            b = bucket(key["day"])
+            status = key.get("status") or ""
+            mode = key.get("mode")
+            cnt = r["count"]
+
+            b["status"][status] = b["status"].get(status, 0) + cnt
+            b["total"] += cnt
+            b["paid"] += r["paid"]
+            b["revenue"] += r["revenue"] or 0
+            b["discount_total"] += r["discount_total"] or 0
+            b["discount_count"] += r["discount_count"]
+            if mode == "SHIP_DEPOSIT":
+                b["deposit_total"] += cnt
+                b["deposit_converted"] += r["paid"]
+            elif mode == "FULL_PREPAID":
+                b["prepaid_orders"] += cnt
+                b["prepaid_paid"] += r["paid"]
+
+        for r in facet.get("recon", []):
+            bucket(r["_id"])["recon_fixes"] += r["count"]
+
+        for r in facet.get("paid", []):
+            b = bucket(r["_id"])
+            b["retry_recovered"] += r["retry_recovered"]
+            b["paid_time_sum"] += r["time_sum"] or 0
+            b["paid_time_count"] += r["time_count"]
+
+        for r in webhooks:
+            b = bucket(r["_id"])
+            b["webhook_total"] += r["total"]
+            b["webhook_valid"] += r["valid"]
+
+        # Status keys may be empty/dotted: store as a list of pairs
+        for b in buckets.values():
+            b["status"] = [{"s": s, "n": n} for s, n in b["status"].items()]
+        return buckets
+
+    def _summarize(self, range_days: int, buckets: List[dict]) -> dict:
+        agg = {f: sum(b.get(f, 0) for b in buckets) for f in BUCKET_FIELDS}
+
+        status_map: Dict[str, int] = {}
+        for b in buckets:
+            for item in b.get("status", []):
+                status = (item["s"] or "").upper()
+                status_map[status] = status_map.get(status, 0) + item["n"]
+
+        total = sum(status_map.values())
+        paid = status_map.get("PAID", 0) + status_map.get("COMPLETED", 0)
+        declined = status_map.get("DECLINED", 0) + status_map.get("FAILED", 0)
+        expired = status_map.get("EXPIRED", 0)
+        pending = status_map.get("PENDING", 0)
+
+        total_logs = agg["webhook_total"]
+        valid_logs = agg["webhook_valid"]
+        webhook_rate = (valid_logs / total_logs) if total_logs > 0 else 1.0
+
+        retry_recovered = agg["retry_recovered"]
+        recovery_rate = (retry_recovered / total) if total > 0 else 0
+
+        deposit_total = agg["deposit_total"]
+        deposit_converted = agg["deposit_converted"]
+        deposit_rate = (deposit_converted / deposit_total) if deposit_total > 0 else 0
+
+        avg_minutes = (agg["paid_time_sum"] / agg["paid_time_count"]) if agg["paid_time_count"] else 0
+
+        prepaid_orders = agg["prepaid_orders"]
+        prepaid_paid = agg["prepaid_paid"]
+        prepaid_conversion = (prepaid_paid / prepaid_orders) if prepaid_orders > 0 else 0
+
+        discount_count = agg["discount_count"]
+        discount_total = agg["discount_total"]
+        discount_avg = (discount_total / discount_count) if discount_count else 0
+
+        # Estimated COD loss saved (avg return cost ~350 UAH)
+        cod_loss_saved = prepaid_paid * 350
 
         return {
             "range_days": range_days,
@@ -176,16 +279,16 @@ class PaymentHealthService:
             "webhook_success_rate": round(webhook_rate, 4),
             "webhook_total": total_logs,
             "webhook_valid": valid_logs,
-            
-            "reconciliation_fixes": recon_fixes,
-            
+
+            "reconciliation_fixes": agg["recon_fixes"],
+
             "retry_recovered": retry_recovered,
             "recovery_rate": round(recovery_rate, 4),
-            
+
             "deposit_total": deposit_total,
             "deposit_converted": deposit_converted,
             "deposit_conversion_rate": round(deposit_rate, 4),
-            
+
             "avg_payment_time_minutes": round(avg_minutes or 0, 2),
 
             "prepaid_orders": prepaid_orders,
@@ -198,7 +301,7 @@ class PaymentHealthService:
             "estimated_cod_loss_saved": round(cod_loss_saved, 2),
 
             "daily_trend": [
-                {"date": d["_id"], "total": d["total"], "paid": d["paid"], "revenue": round(d["revenue"], 2)}
-                for d in daily_trend
+                {"date": b["day"], "total": b["total"], "paid": b["paid"], "revenue": round(b["revenue"], 2)}
+                for b in buckets if b["total"] > 0
             ]
         }
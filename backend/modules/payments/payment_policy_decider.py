@@ -5,6 +5,8 @@ Determines payment mode: FULL_PREPAID | SHIP_DEPOSIT | COD_ALLOWED
 from datetime import datetime, timezone, timedelta
 import os
 
+from core.dates import and_q, range_q
+
 FULL_PREPAID = "FULL_PREPAID"
 SHIP_DEPOSIT = "SHIP_DEPOSIT"
 COD_ALLOWED = "COD_ALLOWED"
@@ -64,26 +66,24 @@ class PaymentPolicyDecider:
         since_60 = since_iso(60)
 
         # Returns in 60 days
-        returns_60 = await self.orders.count_documents({
+        returns_60 = await self.orders.count_documents(and_q({
             "$or": [
                 {"delivery.recipient.phone": phone},
                 {"shipping.phone": phone},
                 {"buyer_phone": phone}
             ],
-            "returns.updated_at": {"$gte": since_60},
             "returns.stage": {"$in": ["RETURNING", "RETURNED"]}
-        })
+        }, range_q("returns.updated_at", gte=since_60)))
 
         # COD refusals in 30 days
-        cod_ref_30 = await self.orders.count_documents({
+        cod_ref_30 = await self.orders.count_documents(and_q({
             "$or": [
                 {"delivery.recipient.phone": phone},
                 {"shipping.phone": phone},
                 {"buyer_phone": phone}
             ],
-            "returns.updated_at": {"$gte": since_30},
             "returns.reason": {"$in": ["REFUSED", "NOT_PICKED_UP", "STORAGE_EXPIRED"]}
-        })
+        }, range_q("returns.updated_at", gte=since_30)))
 
         # --- City policy ---
         city_policy = None
@@ -17,7 +17,7 @@ class PaymentWebhookService:
         await payment_events_repository.ensure_indexes()
         await order_repository.ensure_indexes()
     
-    async def handle_paid(
+    def build_paid_event(
         self,
         provider: str,
         payload: Dict[str, Any],
@@ -26,14 +26,8 @@ class PaymentWebhookService:
         amount: Optional[float] = None,
         currency: Optional[str] = None,
         order_id: Optional[str] = None,
-        signature: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """
-        Handle payment success webhook.
-        - Saves event idempotently
-        - Validates amount against order
-        - Atomically transitions order to PAID
-        """
+        """Normalize a payment success webhook into a payment_events document"""
         
         # Extract fields if not provided
         provider_event_id = event_id or str(
@@ -59,18 +53,40 @@ class PaymentWebhookService:
         if not provider_event_id or not order_id:
             raise HTTPException(400, "BAD_WEBHOOK_PAYLOAD")
         
-        # 1) Save event idempotently
-        ev_doc = {
+        return {
             "provider": provider,
             "provider_event_id": provider_event_id,
             "order_id": order_id,
+            "payment_id": payment_id,
             "type": "PAID",
             "status": "RECEIVED",
             "amount": amount,
             "currency": currency,
             "raw": payload,
         }
+    
+    async def handle_paid(
+        self,
+        provider: str,
+        payload: Dict[str, Any],
+        payment_id: Optional[str] = None,
+        event_id: Optional[str] = None,
+        amount: Optional[float] = None,
+        currency: Optional[str] = None,
+        order_id: Optional[str] = None,
+        signature: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Handle payment success webhook.
+        - Saves event idempotently
+        - Validates amount against order
+        - Atomically transitions order to PAID
+        """
+        ev_doc = self.build_paid_event(provider, payload, payment_id, event_id, amount, currency, order_id)
+        provider_event_id = ev_doc["provider_event_id"]
+        order_id = ev_doc["order_id"]
         
+        # 1) Save event idempotently
         ev = await payment_events_repository.insert_event_idempotent(ev_doc, signature)
         
         # If duplicate event already processed, return OK quickly
@@ -83,15 +99,78 @@ class PaymentWebhookService:
                     "order_id": order_id
                 }
         
-        # 2) Validate against order snapshot (anti-tamper)
-        order = await order_repository.get_by_id(order_id)
+        # 2) + 3) Validate against the order and mark it paid
+        outcome = await self.apply_paid(ev_doc)
+        await payment_events_repository.update_event_status(
+            provider, provider_event_id, outcome.pop("status"), outcome
+        )
         
-        if not order:
-            await payment_events_repository.update_event_status(
-                provider, provider_event_id, "FAILED",
-                {"fail_reason": "ORDER_NOT_FOUND"}
+        reason = outcome.get("fail_reason")
+        if reason is None:
+            return {
+                "ok": True, 
+                "order_id": order_id, 
+                "order_status": outcome.get("processed_order_status")
+            }
+        if reason == "AMOUNT_MISMATCH":
+            raise HTTPException(
+                409, 
+                f"AMOUNT_MISMATCH: expected {outcome['expected_amount']}, got {outcome['received_amount']}"
             )
-            raise HTTPException(404, "ORDER_NOT_FOUND")
+        if reason == "ORDER_NOT_FOUND":
+            raise HTTPException(404, reason)
+        if reason == "ORDER_CONFLICT":
+            raise HTTPException(409, reason)
+        if reason.startswith("ORDER_NOT_PAYABLE"):
+            # Order already moved to different status - idempotent OK
+            return {
+                "ok": True, 
+                "ignored": True, 
+                "reason": reason, 
+                "order_id": order_id
+            }
+        raise ValueError(reason)
+    
+    async def queue_paid(
+        self,
+        provider: str,
+        payload: Dict[str, Any],
+        payment_id: Optional[str] = None,
+        event_id: Optional[str] = None,
+        amount: Optional[float] = None,
+        currency: Optional[str] = None,
+        order_id: Optional[str] = None,
+        signature: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fast-ack variant of handle_paid: stores the event for the webhook
+        inbox consumer, which runs apply_paid (see webhook_inbox)
+        """
+        from .webhook_inbox import get_webhook_inbox
+        
+        ev_doc = self.build_paid_event(provider, payload, payment_id, event_id, amount, currency, order_id)
+        ev = await get_webhook_inbox(db).enqueue("payment", ev_doc, signature)
+        return {
+            "ok": True,
+            "queued": ev["queued"],
+            "duplicate": ev["duplicate"],
+            "order_id": ev_doc["order_id"],
+        }
+    
+    async def apply_paid(self, ev_doc: Dict[str, Any], order: Optional[dict] = None) -> Dict[str, Any]:
+        """
+        Validate a PAID event against its order snapshot (anti-tamper) and
+        atomically transition the order to PAID.
+        Returns the event's final fields: status PROCESSED, or FAILED with fail_reason.
+        """
+        order_id = ev_doc["order_id"]
+        amount = ev_doc["amount"]
+        
+        if order is None:
+            order = await order_repository.get_by_id(order_id)
+        
+        if not order:
+            return {"status": "FAILED", "fail_reason": "ORDER_NOT_FOUND"}
         
         # Check amount matches
         snapshot_total = float(
@@ -100,58 +179,27 @@ class PaymentWebhookService:
         )
         
         if snapshot_total > 0 and abs(snapshot_total - amount) > 0.01:
-            await payment_events_repository.update_event_status(
-                provider, provider_event_id, "FAILED",
-                {
-                    "fail_reason": "AMOUNT_MISMATCH",
-                    "expected_amount": snapshot_total,
-                    "received_amount": amount
-                }
-            )
-            raise HTTPException(409, f"AMOUNT_MISMATCH: expected {snapshot_total}, got {amount}")
+            return {
+                "status": "FAILED",
+                "fail_reason": "AMOUNT_MISMATCH",
+                "expected_amount": snapshot_total,
+                "received_amount": amount
+            }
         
-        # 3) Atomic mark paid (idempotent-safe)
+        # Atomic mark paid (idempotent-safe)
         try:
             updated = await order_repository.mark_paid_atomic(
                 order_id=order_id,
-                provider=provider,
-                payment_id=payment_id,
+                provider=ev_doc["provider"],
+                payment_id=ev_doc.get("payment_id") or ev_doc["provider_event_id"],
                 amount=amount,
-                currency=currency,
-                raw=payload,
+                currency=ev_doc["currency"],
+                raw=ev_doc["raw"],
             )
         except ValueError as e:
-            msg = str(e)
-            await payment_events_repository.update_event_status(
-                provider, provider_event_id, "FAILED",
-                {"fail_reason": msg}
-            )
-            
-            if msg == "ORDER_NOT_FOUND":
-                raise HTTPException(404, msg)
-            if msg == "ORDER_CONFLICT":
-                raise HTTPException(409, msg)
-            if msg.startswith("ORDER_NOT_PAYABLE"):
-                # Order already moved to different status - idempotent OK
-                return {
-                    "ok": True, 
-                    "ignored": True, 
-                    "reason": msg, 
-                    "order_id": order_id
-                }
-            raise
-        
-        # 4) Mark event processed
-        await payment_events_repository.update_event_status(
-            provider, provider_event_id, "PROCESSED",
-            {"processed_order_status": updated.get("status")}
-        )
+            return {"status": "FAILED", "fail_reason": str(e)}
         
-        return {
-            "ok": True, 
-            "order_id": order_id, 
-            "order_status": updated.get("status")
-        }
+        return {"status": "PROCESSED", "processed_order_status": updated.get("status")}
 
 
 # Singleton instance
@@ -6,6 +6,8 @@ Supports A/B testing override for discount percentage
 import os
 from typing import Optional
 
+from core.runtime_config import ConfigSection, get_runtime_config, register_section
+
 
 def _env_bool(name: str, default: str = "false") -> bool:
     return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
@@ -18,6 +20,30 @@ def _env_float(name: str, default: float) -> float:
         return default
 
 
+PREPAID_DEFAULTS = {
+    "enabled": True,
+    "apply_to": "FULL_PREPAID",
+    "mode": "PERCENT",
+    "value": 1.0,  # 1% default
+    "max_uah": 300.0,
+    "min_order": 500.0,
+}
+
+
+def _load_from_env() -> dict:
+    return {
+        "enabled": _env_bool("PREPAID_DISCOUNT_ENABLED", "true"),
+        "apply_to": os.getenv("PREPAID_DISCOUNT_APPLY_TO", "FULL_PREPAID"),
+        "mode": os.getenv("PREPAID_DISCOUNT_MODE", "PERCENT").upper(),
+        "value": _env_float("PREPAID_DISCOUNT_VALUE", 1.0),
+        "max_uah": _env_float("PREPAID_DISCOUNT_MAX_UAH", 300.0),
+        "min_order": _env_float("PREPAID_DISCOUNT_MIN_ORDER", 500.0),
+    }
+
+
+register_section(ConfigSection("prepaid", _load_from_env, PREPAID_DEFAULTS, env=True))
+
+
 def calc_prepaid_discount(
     grand_uah: float, 
     policy_mode: str,
@@ -33,11 +59,14 @@ def calc_prepaid_discount(
     
     Returns:
         dict with discount info or None if not applicable
+        (config_version = fingerprint of the env config used)
     """
-    if not _env_bool("PREPAID_DISCOUNT_ENABLED", "true"):
+    cfg = get_runtime_config().peek("prepaid")
+    c = cfg.data
+    if not c["enabled"]:
         return None
 
-    apply_to = os.getenv("PREPAID_DISCOUNT_APPLY_TO", "FULL_PREPAID")
+    apply_to = c["apply_to"]
     
     # Check if discount applies to this mode
     allowed = (
@@ -51,7 +80,7 @@ def calc_prepaid_discount(
     if grand <= 0:
         return None
 
-    mode = os.getenv("PREPAID_DISCOUNT_MODE", "PERCENT").upper()
+    mode = c["mode"]
     
     # Use A/B test override if provided, otherwise use env value
     if discount_pct_override is not None:
@@ -60,10 +89,10 @@ def calc_prepaid_discount(
         if val <= 0:
             return None
     else:
-        val = _env_float("PREPAID_DISCOUNT_VALUE", 1.0)  # 1% default
+        val = c["value"]
     
-    cap = _env_float("PREPAID_DISCOUNT_MAX_UAH", 300.0)
-    min_order = _env_float("PREPAID_DISCOUNT_MIN_ORDER", 500.0)
+    cap = c["max_uah"]
+    min_order = c["min_order"]
 
     # Don't apply discount for small orders
     if grand < min_order:
@@ -84,7 +113,8 @@ def calc_prepaid_discount(
         "amount": amount,
         "reason": "PREPAID_PROMO",
         "description": f"Знижка {val}% за онлайн оплату" if mode == "PERCENT" else f"Знижка {val} грн за онлайн оплату",
-        "ab_override": discount_pct_override is not None
+        "ab_override": discount_pct_override is not None,
+        "config_version": cfg.fingerprint
     }
 
 
@@ -2,16 +2,15 @@
 D-Mode Step 6: Reconciliation Routes & Scheduler
 """
 from fastapi import APIRouter, Depends
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from core.db import db
 from core.security import get_current_admin
+from modules.jobs.job_runner import get_job_runner
 from modules.payments.reconciliation_service import PaymentReconciliationService
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v2/admin/payments/reconciliation", tags=["Payment Reconciliation"])
-recon_scheduler = AsyncIOScheduler()
 
 
 @router.post("/run")
@@ -40,16 +39,15 @@ async def reconciliation_logs(
 
 def start_reconciliation_scheduler(db_instance):
     """Start reconciliation scheduler (every 10 min)"""
+    runner = get_job_runner(db_instance)
     svc = PaymentReconciliationService(db_instance)
 
     async def job():
-        try:
-            result = await svc.run_once(hours_back=48, limit=200)
-            if result.get("fixed", 0) > 0:
-                logger.info(f"Reconciliation: {result}")
-        except Exception as e:
-            logger.error(f"Reconciliation error: {e}")
-
-    recon_scheduler.add_job(job, "interval", minutes=10, id="payment_reconciliation", replace_existing=True)
-    recon_scheduler.start()
-    logger.info("Payment reconciliation scheduler started (every 10 min)")
+        result = await svc.run_once(hours_back=48, limit=200)
+        if result.get("fixed", 0) > 0:
+            logger.info(f"Reconciliation: {result}")
+        return result
+
+    runner.add_job(job, "interval", minutes=10, id="payment_reconciliation")
+    runner.start()
+    logger.info("Payment reconciliation job registered (every 10 min)")
@@ -5,6 +5,8 @@ Fixes orders stuck in AWAITING_PAYMENT when payment was actually completed
 from datetime import datetime, timezone, timedelta
 import logging
 
+from core.dates import range_q
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,13 +31,13 @@ class PaymentReconciliationService:
         """
         Scan pending payments and reconcile with provider status.
         """
-        since = (datetime.now(timezone.utc) - timedelta(hours=hours_back)).isoformat()
+        since = datetime.now(timezone.utc) - timedelta(hours=hours_back)
 
         # Find unconfirmed payments
         candidates = self.payments.find(
             {
                 "status": {"$in": ["CREATED", "PENDING"]},
-                "created_at": {"$gte": since}
+                **range_q("created_at", gte=since)
             },
             {"_id": 0}
         ).limit(limit)
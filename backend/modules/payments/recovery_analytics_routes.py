@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, Query
 from datetime import datetime, timezone, timedelta
 from core.db import db
 from core.security import get_current_admin
+from core.dates import day_of, range_q
 
 router = APIRouter(prefix="/api/v2/admin/payments/recovery", tags=["Payment Recovery Analytics"])
 
@@ -28,7 +29,7 @@ async def recovery_summary(
     # Orders that entered AWAITING_PAYMENT
     awaiting_created = await db["orders"].count_documents({
         "status": {"$in": ["AWAITING_PAYMENT", "PAID", "PROCESSING", "SHIPPED", "DELIVERED", "CANCELLED_AUTO"]},
-        "created_at": {"$gte": since},
+        **range_q("created_at", since),
         "payment_policy.mode": {"$in": ["FULL_PREPAID", "SHIP_DEPOSIT"]}
     })
 
@@ -36,7 +37,7 @@ async def recovery_summary(
     paid_orders = [x async for x in db["orders"].find(
         {
             "status": {"$in": ["PAID", "PROCESSING", "SHIPPED", "DELIVERED"]},
-            "created_at": {"$gte": since},
+            **range_q("created_at", since),
             "payment_policy.mode": {"$in": ["FULL_PREPAID", "SHIP_DEPOSIT"]}
         },
         {"_id": 0, "id": 1, "created_at": 1, "totals": 1}
@@ -97,7 +98,7 @@ async def recovery_trend(
     paid = [x async for x in db["orders"].find(
         {
             "status": {"$in": ["PAID", "PROCESSING", "SHIPPED", "DELIVERED"]},
-            "created_at": {"$gte": since},
+            **range_q("created_at", since),
             "payment_policy.mode": {"$in": ["FULL_PREPAID", "SHIP_DEPOSIT"]}
         },
         {"_id": 0, "id": 1, "created_at": 1, "totals": 1}
@@ -126,7 +127,7 @@ async def recovery_trend(
     bucket_r = {}
 
     for o in paid:
-        day = (o.get("created_at") or "")[:10]
+        day = day_of(o.get("created_at"))
         if o["id"] in reminded:
             bucket_c[day] = bucket_c.get(day, 0) + 1
             bucket_r[day] = bucket_r.get(day, 0.0) + float((o.get("totals") or {}).get("grand") or 0)
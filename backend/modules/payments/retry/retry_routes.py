@@ -3,6 +3,7 @@ D-Mode: Payment Retry Routes
 """
 from fastapi import APIRouter, Depends
 from core.db import db
+from core.dates import range_q
 from core.security import get_current_admin
 from modules.payments.retry.retry_service import PaymentRetryService
 
@@ -24,19 +25,19 @@ async def retry_stats(admin: dict = Depends(get_current_admin)):
     """Get retry statistics"""
     from datetime import datetime, timezone, timedelta
     
-    since_24h = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+    since_24h = datetime.now(timezone.utc) - timedelta(hours=24)
     
     # Reminders sent
     sent = await db["notifications_outbox"].count_documents({
         "dedupe_key": {"$regex": r"^outbox:payretry:"},
-        "created_at": {"$gte": since_24h}
+        **range_q("created_at", gte=since_24h)
     })
     
     # Auto-cancelled
     cancelled = await db["orders"].count_documents({
         "status": "CANCELLED_AUTO",
         "cancel_reason": "PAYMENT_TIMEOUT_24H",
-        "cancelled_at": {"$gte": since_24h}
+        **range_q("cancelled_at", gte=since_24h)
     })
     
     return {
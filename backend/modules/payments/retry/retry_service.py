@@ -5,16 +5,16 @@ Auto-reminders for unpaid orders: 15min, 60min, 24h auto-cancel
 from datetime import datetime, timezone, timedelta
 import os
 
+from core.dates import range_q, to_dt
+
 
 def now_iso():
     return datetime.now(timezone.utc).isoformat()
 
 
-def minutes_since(iso_ts: str) -> int:
-    try:
-        dt = datetime.fromisoformat(iso_ts.replace("Z", "+00:00"))
-    except Exception:
-        dt = datetime.now(timezone.utc)
+def minutes_since(ts) -> int:
+    """Minutes since a stored timestamp (ISO string or datetime)"""
+    dt = to_dt(ts) or datetime.now(timezone.utc)
     return int((datetime.now(timezone.utc) - dt).total_seconds() // 60)
 
 
@@ -49,7 +49,7 @@ class PaymentRetryRepo:
     async def find_awaiting_payment(self, since_iso: str, limit: int = 500):
         q = {
             "status": "AWAITING_PAYMENT",
-            "created_at": {"$gte": since_iso},
+            **range_q("created_at", since_iso),
         }
         cur = self.orders.find(q, {"_id": 0}).sort("created_at", 1).limit(limit)
         return [x async for x in cur]
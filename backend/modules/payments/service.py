@@ -66,9 +66,15 @@ class PaymentsService:
         # Parse webhook
         parsed = self.provider.parse_webhook(payload)
         
-        # Only process successful payments
+        # Only process successful payments (queued for the webhook inbox
+        # consumer unless PAYMENT_WEBHOOK_ASYNC is off)
         if parsed["status"] == "PAID":
-            return await payment_webhook_service.handle_paid(
+            handle = (
+                payment_webhook_service.queue_paid
+                if settings.PAYMENT_WEBHOOK_ASYNC
+                else payment_webhook_service.handle_paid
+            )
+            return await handle(
                 provider=self.provider.name,
                 payload=payload,
                 payment_id=parsed["payment_id"],
@@ -0,0 +1,402 @@
+"""
+Payment Webhook Inbox - fast-ack ingestion of provider callbacks
+
+With PAYMENT_WEBHOOK_ASYNC (off by default: only the job runner consumes
+the inbox, so it needs a worker or in-API jobs) a webhook request only verifies the signature
+and appends the raw event to payment_events (status QUEUED, one insert,
+idempotent on provider + provider_event_id / signature_hash), then answers
+200. Order lookups, amount checks and status transitions run in the
+`payment_webhook_inbox` job:
+
+- Claims batches atomically (claim_token) oldest first; an event waits while
+  an earlier event of the same order is unfinished, so each order's events
+  apply in arrival order; blocked orders are excluded from the next
+  candidate page, so one retrying order never stalls the rest
+- Orders of a batch are loaded with one query; orders run with bounded
+  concurrency, events of one order sequentially, the order re-read before
+  each event after the first (the previous one may have changed it)
+- Handler outcomes are acked with one bulk_write. Handlers return the
+  event's final fields (PROCESSED, or FAILED with fail_reason for business
+  rejections); exceptions are retried with backoff (RETRY) up to
+  MAX_ATTEMPTS, then DEAD
+- Optional change-stream tail (PAYMENT_WEBHOOK_CHANGE_STREAM=true)
+
+Queue depth / oldest pending event (`stats()`) and per-kind processing lag
+(received -> acked, in-process histogram) are exported on /metrics.
+"""
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import uuid
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from core.dates import dt_expr, range_q, to_dt, ts
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "QUEUED"
+UNFINISHED = [QUEUED, "RETRY", "PROCESSING"]
+CLAIM_TTL_SEC = 120
+CLAIM_SCAN_PAGES = 10
+MAX_ATTEMPTS = 8
+BACKOFF_SECONDS = [5, 30, 120, 600, 1800]
+EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_inbox: Optional["WebhookInboxRepo"] = None
+
+Handler = Callable[[object, dict, Optional[dict]], Awaitable[dict]]
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def backoff(attempts: int):
+    s = BACKOFF_SECONDS[min(attempts, len(BACKOFF_SECONDS)) - 1]
+    return ts(utcnow() + timedelta(seconds=s))
+
+
+def _age_sec(value) -> Optional[float]:
+    at = to_dt(value)
+    if at is None:
+        return None
+    return max(0.0, (utcnow() - at).total_seconds())
+
+
+class WebhookInboxRepo:
+    def __init__(self, db):
+        self.col = db["payment_events"]
+
+    async def ensure_indexes(self):
+        await self.col.create_index([("status", 1), ("created_at", 1)])
+        await self.col.create_index([("order_id", 1), ("status", 1), ("created_at", 1)])
+        await self.col.create_index("claim_token", sparse=True)
+
+    async def enqueue(self, kind: str, doc: dict, signature: Optional[str] = None) -> dict:
+        """Durably append a verified webhook event; {"queued": False} for a replay"""
+        now = ts(utcnow())
+        doc = {
+            **doc,
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "status": QUEUED,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        if signature:
+            doc["signature_hash"] = hashlib.sha256(signature.encode()).hexdigest()
+        try:
+            await self.col.insert_one(doc)
+        except DuplicateKeyError:
+            return {"queued": False, "duplicate": True, "event": doc}
+        return {"queued": True, "duplicate": False, "event": doc}
+
+    def _ready_q(self, now: datetime) -> dict:
+        # next_retry_at / claim_until may predate NATIVE_DATES: dual-read
+        return {"$or": [
+            {"status": QUEUED},
+            {"status": "RETRY", **range_q("next_retry_at", lte=now)},
+            {"status": "PROCESSING", **range_q("claim_until", lt=now)},  # crashed consumer
+        ]}
+
+    async def _claimable(self, ready: dict, limit: int) -> List[str]:
+        """
+        Ids of ready events not behind an earlier unfinished event of their
+        order. Orders found blocked are excluded from the next page, so a
+        backlog behind a retrying order never starves the other orders.
+        """
+        blocked: set = set()
+        for _ in range(CLAIM_SCAN_PAGES):
+            q = {"$and": [ready, {"order_id": {"$nin": list(blocked)}}]} if blocked else ready
+            cands = await self.col.find(
+                q, {"_id": 0, "id": 1, "order_id": 1, "created_at": 1}
+            ).sort("created_at", 1).limit(limit).to_list(limit)
+            if not cands:
+                return []
+
+            cand_ids = [c["id"] for c in cands]
+            order_ids = list({c["order_id"] for c in cands if c.get("order_id")})
+            first_blocker: Dict[str, datetime] = {}
+            if order_ids:
+                async for b in self.col.find(
+                    {"order_id": {"$in": order_ids},
+                     "status": {"$in": UNFINISHED},
+                     "id": {"$nin": cand_ids}},
+                    {"_id": 0, "order_id": 1, "created_at": 1}
+                ):
+                    at = to_dt(b.get("created_at")) or EPOCH  # unparseable: blocks
+                    if b["order_id"] not in first_blocker or at < first_blocker[b["order_id"]]:
+                        first_blocker[b["order_id"]] = at
+
+            ids = []
+            for c in cands:
+                blocker = first_blocker.get(c.get("order_id"))
+                if blocker is not None and blocker <= (to_dt(c.get("created_at")) or blocker):
+                    blocked.add(c["order_id"])
+                else:
+                    ids.append(c["id"])
+            if ids or len(cands) < limit:
+                return ids
+        return []
+
+    async def claim_batch(self, owner: str, limit: int = 100, claim_ttl_sec: int = CLAIM_TTL_SEC) -> List[dict]:
+        """Claim ready events, oldest first, skipping orders with an earlier unfinished event"""
+        now = utcnow()
+        ready = self._ready_q(now)
+        ids = await self._claimable(ready, limit)
+        if not ids:
+            return []
+
+        token = uuid.uuid4().hex
+        await self.col.update_many(
+            {"$and": [{"id": {"$in": ids}}, ready]},
+            {"$set": {
+                "status": "PROCESSING",
+                "claimed_by": owner,
+                "claim_token": token,
+                "claim_until": ts(now + timedelta(seconds=claim_ttl_sec)),
+                "updated_at": ts(now)
+            }}
+        )
+        cur = self.col.find({"claim_token": token}, {"_id": 0}).sort("created_at", 1)
+        return [x async for x in cur]
+
+    def done_op(self, event: dict, fields: dict) -> UpdateOne:
+        """Final state from the handler: PROCESSED, or FAILED with a fail_reason"""
+        now = ts(utcnow())
+        return UpdateOne(
+            {"id": event["id"], "claim_token": event["claim_token"]},
+            {"$set": {"status": "PROCESSED", **fields, "processed_at": now, "updated_at": now},
+             "$unset": {"claim_token": "", "claim_until": ""}}
+        )
+
+    def retry_op(self, event: dict, reason: str, attempts: int, dead: bool = False) -> UpdateOne:
+        return UpdateOne(
+            {"id": event["id"], "claim_token": event["claim_token"]},
+            {"$set": {
+                "status": "DEAD" if dead else "RETRY",
+                "fail_reason": reason,
+                "attempts": attempts,
+                "next_retry_at": None if dead else backoff(attempts),
+                "updated_at": ts(utcnow())
+            },
+             "$unset": {"claim_token": "", "claim_until": ""}}
+        )
+
+    def release_op(self, event: dict) -> UpdateOne:
+        """Give a claimed event back untouched (an earlier one of its order is retrying)"""
+        return UpdateOne(
+            {"id": event["id"], "claim_token": event["claim_token"]},
+            {"$set": {"status": "RETRY" if event.get("attempts") else QUEUED, "updated_at": ts(utcnow())},
+             "$unset": {"claim_token": "", "claim_until": ""}}
+        )
+
+    async def ack(self, ops: List[UpdateOne]):
+        if ops:
+            await self.col.bulk_write(ops, ordered=False)
+
+    async def stats(self) -> dict:
+        """Queue depth per unfinished status and age of the oldest pending event"""
+        by_status = {s: 0 for s in UNFINISHED}
+        oldest = None
+        async for r in self.col.aggregate([
+            {"$match": {"status": {"$in": UNFINISHED}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "oldest": {"$min": dt_expr("created_at")}}},
+        ]):
+            by_status[r["_id"]] = r["count"]
+            at = to_dt(r["oldest"])
+            if at is not None and (oldest is None or at < oldest):
+                oldest = at
+        dead = await self.col.count_documents({"status": "DEAD"})
+        age = _age_sec(oldest)
+        return {
+            "depth": sum(by_status.values()),
+            "by_status": by_status,
+            "dead": dead,
+            "oldest_pending_sec": round(age, 3) if age is not None else 0.0,
+        }
+
+
+def get_webhook_inbox(db=None) -> WebhookInboxRepo:
+    global _inbox
+    if _inbox is None:
+        if db is None:
+            from core.db import db
+        _inbox = WebhookInboxRepo(db)
+    return _inbox
+
+
+class InboxMetrics:
+    """In-process counters of the consumer (per worker, like core.db_profiler)"""
+
+    def __init__(self):
+        self.outcomes: Counter = Counter()
+        self.lag: Dict[str, list] = {}
+
+    def observe(self, kind: str, outcome: str, lag_sec: Optional[float] = None):
+        self.outcomes[(kind, outcome)] += 1
+        if lag_sec is None:
+            return
+        h = self.lag.setdefault(kind, [[0] * len(LAG_BUCKETS), 0.0, 0])
+        for i, bound in enumerate(LAG_BUCKETS):
+            if lag_sec <= bound:
+                h[0][i] += 1
+        h[1] += lag_sec
+        h[2] += 1
+
+    def render(self, stats: Optional[dict] = None) -> str:
+        out = []
+        if stats is not None:
+            out += ["# HELP payment_webhook_queue_depth Unfinished webhook events by status",
+                    "# TYPE payment_webhook_queue_depth gauge"]
+            for status, n in stats["by_status"].items():
+                out.append(f'payment_webhook_queue_depth{{status="{status}"}} {n}')
+            out += ["# HELP payment_webhook_dead_events Webhook events that exhausted their retries",
+                    "# TYPE payment_webhook_dead_events gauge"]
+            out.append(f"payment_webhook_dead_events {stats['dead']}")
+            out += ["# HELP payment_webhook_oldest_pending_seconds Age of the oldest unfinished webhook event",
+                    "# TYPE payment_webhook_oldest_pending_seconds gauge"]
+            out.append(f"payment_webhook_oldest_pending_seconds {stats['oldest_pending_sec']}")
+        if self.outcomes:
+            out += ["# HELP payment_webhook_events_total Webhook events handled by this process",
+                    "# TYPE payment_webhook_events_total counter"]
+            for (kind, outcome), n in sorted(self.outcomes.items()):
+                out.append(f'payment_webhook_events_total{{kind="{kind}",outcome="{outcome}"}} {n}')
+        if self.lag:
+            out += ["# HELP payment_webhook_lag_seconds Webhook received -> applied",
+                    "# TYPE payment_webhook_lag_seconds histogram"]
+            for kind, (buckets, total, count) in sorted(self.lag.items()):
+                for bound, n in zip(LAG_BUCKETS, buckets):
+                    out.append(f'payment_webhook_lag_seconds_bucket{{kind="{kind}",le="{bound}"}} {n}')
+                out.append(f'payment_webhook_lag_seconds_bucket{{kind="{kind}",le="+Inf"}} {count}')
+                out.append(f'payment_webhook_lag_seconds_sum{{kind="{kind}"}} {total:.6f}')
+                out.append(f'payment_webhook_lag_seconds_count{{kind="{kind}"}} {count}')
+        return "\n".join(out) + "\n" if out else ""
+
+
+inbox_metrics = InboxMetrics()
+
+
+async def render_inbox_metrics(db=None) -> str:
+    """Prometheus text for /metrics; never fails the scrape"""
+    try:
+        stats = await get_webhook_inbox(db).stats()
+    except Exception as e:
+        logger.warning(f"Payment webhook inbox stats failed: {e}")
+        stats = None
+    return inbox_metrics.render(stats)
+
+
+class WebhookInboxConsumer:
+    def __init__(self, db, concurrency: int = 8, batch_size: int = 100, owner: Optional[str] = None):
+        self.db = db
+        self.repo = WebhookInboxRepo(db)
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.handlers: Dict[str, Handler] = {}
+        self._lock = asyncio.Lock()
+
+    def register(self, kind: str, handler: Handler):
+        """handler(db, event, order) -> final event fields; order is preloaded by id (None if not found)"""
+        self.handlers[kind] = handler
+
+    async def run_once(self, max_batches: int = 20) -> dict:
+        """Drain ready events (bounded); safe to call from job + watcher"""
+        stats = {"claimed": 0, "processed": 0, "rejected": 0, "retry": 0, "released": 0, "batches": 0}
+        async with self._lock:
+            for _ in range(max_batches):
+                events = await self.repo.claim_batch(self.owner, limit=self.batch_size)
+                if not events:
+                    break
+                stats["batches"] += 1
+                stats["claimed"] += len(events)
+                ops, done = await self._dispatch(events, stats)
+                await self.repo.ack(ops)
+                for kind, outcome, lag in done:
+                    inbox_metrics.observe(kind, outcome, lag)
+                if len(events) < self.batch_size:
+                    break
+        return stats
+
+    async def _dispatch(self, events: List[dict], stats: dict):
+        order_ids = list({e["order_id"] for e in events if e.get("order_id")})
+        orders = {}
+        if order_ids:
+            async for o in self.db["orders"].find({"id": {"$in": order_ids}}, {"_id": 0}):
+                orders[o["id"]] = o
+
+        partitions: Dict[str, List[dict]] = OrderedDict()
+        for e in events:
+            partitions.setdefault(e.get("order_id") or e["id"], []).append(e)
+
+        sem = asyncio.Semaphore(self.concurrency)
+        ops: list = []
+        done: list = []
+
+        async def run_partition(part: List[dict]):
+            async with sem:
+                order_id = part[0].get("order_id")
+                order = orders.get(order_id)
+                for i, event in enumerate(part):
+                    if i and order_id:
+                        order = await self.db["orders"].find_one({"id": order_id}, {"_id": 0})
+                    ok = await self._handle(event, order, ops, done, stats)
+                    if not ok:
+                        for later in part[i + 1:]:
+                            ops.append(self.repo.release_op(later))
+                            stats["released"] += 1
+                        return
+
+        await asyncio.gather(*(run_partition(p) for p in partitions.values()))
+        return ops, done
+
+    async def _handle(self, event: dict, order: Optional[dict], ops: list, done: list, stats: dict) -> bool:
+        kind = event.get("kind") or "unknown"
+        handler = self.handlers.get(kind)
+        try:
+            if handler is None:
+                raise RuntimeError(f"NO_HANDLER:{kind}")
+            fields = await handler(self.db, event, order) or {}
+        except Exception as e:
+            attempts = int(event.get("attempts", 0)) + 1
+            dead = attempts >= MAX_ATTEMPTS
+            ops.append(self.repo.retry_op(event, str(e)[:500], attempts, dead=dead))
+            stats["retry"] += 1
+            done.append((kind, "dead" if dead else "retry", None))
+            logger.error(f"Payment webhook {kind} {event['id']} (order {event.get('order_id')}) failed: {e}")
+            return False
+
+        rejected = fields.get("status") == "FAILED"
+        ops.append(self.repo.done_op(event, fields))
+        stats["rejected" if rejected else "processed"] += 1
+        done.append((kind, "rejected" if rejected else "processed", _age_sec(event.get("created_at"))))
+        return True
+
+    async def watch(self, should_run: Callable[[], bool] = lambda: True):
+        """Tail payment_events inserts and process immediately (needs a replica set)"""
+        pipeline = [{"$match": {"operationType": "insert", "fullDocument.status": QUEUED}}]
+        while True:
+            try:
+                async with self.repo.col.watch(pipeline) as stream:
+                    logger.info("Payment webhook inbox: change stream active")
+                    async for _ in stream:
+                        if should_run():
+                            await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                logger.warning(f"Payment webhook change stream unavailable, interval polling only: {e}")
+                return
+            except Exception as e:
+                logger.error(f"Payment webhook change stream error: {e}")
+                await asyncio.sleep(5)
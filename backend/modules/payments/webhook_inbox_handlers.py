@@ -0,0 +1,80 @@
+"""
+Payment Webhook Inbox - default handlers (one per inbox event kind)
+
+Each handler applies one stored webhook and returns the event's final
+fields; raising leaves the event for a retry.
+"""
+from datetime import datetime, timezone
+import logging
+import os
+
+from core.dates import ts_now
+
+logger = logging.getLogger(__name__)
+
+
+async def apply_payment_paid(db, event: dict, order: dict) -> dict:
+    """PaymentWebhookService PAID events (/payments/webhook/fondy)"""
+    from modules.payments.payment_webhook_service import payment_webhook_service
+    outcome = await payment_webhook_service.apply_paid(event, order)
+    if outcome.get("fail_reason") == "ORDER_CONFLICT":
+        # Concurrent order update: retry instead of rejecting the payment
+        raise RuntimeError("ORDER_CONFLICT")
+    return outcome
+
+
+async def apply_fondy_callback(db, event: dict, order: dict) -> dict:
+    """FondyWebhookHandler callbacks (/api/v2/payments/webhook/fondy)"""
+    from modules.payments.fondy_webhook import FondyWebhookHandler
+    handler = FondyWebhookHandler(db, fondy_password=os.getenv("FONDY_MERCHANT_PASSWORD", ""))
+    return await handler.process_queued(event)
+
+
+async def apply_rozetkapay_event(db, payload: dict) -> dict:
+    """RozetkaPay webhook: order payment status + payment transaction (orders keyed by order_number)"""
+    external_id = payload.get("external_id")
+    payment_id = payload.get("id")
+    is_success = payload.get("is_success")
+    details = payload.get("details", {})
+    status = details.get("status")
+    now = datetime.now(timezone.utc).isoformat()
+
+    logger.info(f"Webhook for order {external_id}: status={status}, success={is_success}")
+
+    # Update order status
+    if external_id:
+        new_status = "paid" if is_success else "payment_failed"
+        result = await db.orders.update_one(
+            {"order_number": external_id},
+            {"$set": {
+                "payment_status": new_status,
+                "payment_session_id": payment_id,
+                "updated_at": ts_now()
+            }}
+        )
+        if result.matched_count:
+            logger.info(f"Order {external_id} updated to status: {new_status}")
+
+    # Update payment transaction
+    await db.payment_transactions.update_one(
+        {"order_id": external_id},
+        {"$set": {
+            "status": status,
+            "is_success": is_success,
+            "webhook_received": True,
+            "webhook_data": payload,
+            "updated_at": now
+        }}
+    )
+    return {"status": "processed", "order_id": external_id}
+
+
+async def apply_rozetkapay(db, event: dict, order: dict) -> dict:
+    return {"result": await apply_rozetkapay_event(db, event["raw"])}
+
+
+def register_default_handlers(consumer):
+    consumer.register("payment", apply_payment_paid)
+    consumer.register("fondy_callback", apply_fondy_callback)
+    consumer.register("rozetkapay", apply_rozetkapay)
+    return consumer
@@ -17,6 +17,7 @@ from modules.pickup_control.pickup_templates import (
     sms_pickup_template, email_pickup_template, admin_alert_pickup_risk
 )
 from modules.pickup_control.pickup_repo import PickupRepo
+from modules.delivery.shipment_pipeline import ShipmentPipeline, DEFAULT_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
@@ -30,51 +31,47 @@ class PickupControlEngine:
     4. Alert admin for high-risk shipments
     """
     
-    def __init__(self, db, np_service=None):
+    def __init__(self, db, np_service=None, concurrency: int = DEFAULT_CONCURRENCY):
         self.db = db
         self.repo = PickupRepo(db)
         self.np_service = np_service  # Nova Poshta tracking service
+        self.concurrency = concurrency
 
     async def run_once(self, limit: int = 500) -> Dict[str, Any]:
         """Run pickup control processing cycle"""
         await self.repo.ensure_indexes()
-        
-        orders = await self.repo.list_active_shipments(limit=limit)
-        logger.info(f"Pickup control: processing {len(orders)} orders")
-        
+
         now = utcnow()
         sent = 0
-        processed = 0
         high_risk = []
-        errors = []
 
-        for o in orders:
-            try:
-                result = await self._process_order(o, now)
-                processed += 1
-                
-                if result.get("sent"):
-                    sent += 1
-                if result.get("high_risk"):
-                    high_risk.append(result["high_risk"])
-                    
-            except Exception as e:
-                logger.error(f"Error processing order {o.get('id')}: {e}")
-                errors.append({"order_id": o.get("id"), "error": str(e)})
+        async def handle(order: Dict, pipe: ShipmentPipeline):
+            nonlocal sent
+            result = await self._process_order(order, now, pipe)
+            if result.get("sent"):
+                sent += 1
+            if result.get("high_risk"):
+                high_risk.append(result["high_risk"])
+
+        pipe = ShipmentPipeline(self.db, concurrency=self.concurrency)
+        stats = await pipe.run(self.repo.iter_active_shipments(limit=limit), handle)
+        logger.info(f"Pickup control: processed {stats['processed']}/{stats['scanned']} orders in {stats['duration_ms']} ms")
 
         # Send admin alert if many high risk
         await self._maybe_admin_alert(high_risk, now)
 
         return {
             "ok": True,
-            "processed": processed,
+            "processed": stats["processed"],
             "sent": sent,
             "high_risk_count": len(high_risk),
-            "errors": len(errors)
+            "errors": stats["errors"],
+            "duration_ms": stats["duration_ms"],
+            "timings": stats["timings"]
         }
 
-    async def _process_order(self, order: Dict, now: datetime) -> Dict[str, Any]:
-        """Process single order for pickup control"""
+    async def _process_order(self, order: Dict, now: datetime, pipe: ShipmentPipeline) -> Dict[str, Any]:
+        """Process single order for pickup control (writes are batched on pipe)"""
         result = {"sent": False, "high_risk": None}
         
         shipment = order.get("shipment") or {}
@@ -90,10 +87,11 @@ class PickupControlEngine:
             return result
 
         # Fetch NP tracking
-        tracking = await self._fetch_tracking(ttn)
+        async with pipe.timer.stage("tracking"):
+            tracking = await self._fetch_tracking(ttn, order)
         if not tracking:
             return result
-            
+
         # Normalize tracking data
         norm = self._normalize_tracking(ttn, tracking)
         
@@ -125,7 +123,7 @@ class PickupControlEngine:
             "np_status_text": norm.get("np_status_text"),
             "risk": risk.risk
         }
-        await self.repo.update_shipment_state(order_id, state)
+        pipe.writes.add("orders", self.repo.shipment_state_op(order_id, state))
 
         # Track high risk
         if risk.risk == "HIGH":
@@ -139,7 +137,8 @@ class PickupControlEngine:
             }
 
         # Check if should send reminder
-        prefs = await self.repo.get_user_prefs(phone)
+        async with pipe.timer.stage("prefs"):
+            prefs = await self.repo.get_user_prefs(phone)
         if prefs.get("opt_out") or prefs.get("is_blocked"):
             return result
 
@@ -159,9 +158,10 @@ class PickupControlEngine:
         if not decision.should_send:
             return result
 
-        # Check dedupe
-        if not await self.repo.dedupe_once(decision.dedupe_key):
-            return result
+        # Check dedupe (immediate: decides whether we send)
+        async with pipe.timer.stage("notify"):
+            if not await self.repo.dedupe_once(decision.dedupe_key):
+                return result
 
         # Generate and send SMS
         text = sms_pickup_template(
@@ -180,21 +180,22 @@ class PickupControlEngine:
         }
 
         # Enqueue SMS
-        sms_sent = await self.repo.enqueue_sms(phone, text, decision.dedupe_key, meta)
-        
+        async with pipe.timer.stage("notify"):
+            sms_sent = await self.repo.enqueue_sms(phone, text, decision.dedupe_key, meta)
+
         if sms_sent:
-            await self.repo.mark_reminder_sent(order_id, decision.level, iso(now))
-            
+            pipe.writes.add("orders", self.repo.reminder_sent_op(order_id, decision.level, iso(now)))
+
             # Add timeline event
-            await self.repo.timeline_event(
+            pipe.writes.add("timeline_events", self.repo.timeline_op(
                 phone=phone,
                 ts=iso(now),
                 type_="PICKUP_REMINDER_SENT",
                 title="📲 Надіслано нагадування про отримання",
                 description=f"Рівень {decision.level}, ТТН {ttn}, днів у точці: {int(days_at)}",
                 payload=meta
-            )
-            
+            ))
+
             result["sent"] = True
             logger.info(f"Pickup reminder sent: TTN {ttn}, level {decision.level}")
 
@@ -241,7 +242,7 @@ class PickupControlEngine:
         await self.repo.enqueue_admin_alert(text, f"admin_alert:{dedupe_key}", reply_markup=reply_markup)
         logger.info(f"Admin alert sent: {count} high-risk shipments, {total_amount:.0f} UAH at risk")
 
-    async def _fetch_tracking(self, ttn: str) -> Optional[Dict]:
+    async def _fetch_tracking(self, ttn: str, order: Optional[Dict] = None) -> Optional[Dict]:
         """Fetch tracking from Nova Poshta"""
         if self.np_service:
             try:
@@ -250,8 +251,9 @@ class PickupControlEngine:
                 logger.error(f"NP tracking fetch failed for {ttn}: {e}")
                 return None
         
-        # Fallback: try to get from stored shipment data
-        order = await self.db["orders"].find_one({"shipment.ttn": ttn}, {"_id": 0, "shipment": 1})
+        # Fallback: stored shipment data (already on the streamed order)
+        if order is None:
+            order = await self.db["orders"].find_one({"shipment.ttn": ttn}, {"_id": 0, "shipment": 1})
         if order and order.get("shipment"):
             return order["shipment"]
         return None
@@ -322,5 +324,7 @@ class PickupControlEngine:
         if not order:
             return {"ok": False, "error": "Order not found"}
         
-        result = await self._process_order(order, utcnow())
+        pipe = ShipmentPipeline(self.db, concurrency=1)
+        result = await self._process_order(order, utcnow(), pipe)
+        await pipe.writes.flush()
         return {"ok": True, **result}
@@ -3,6 +3,7 @@ O20: Pickup Repository - MongoDB operations
 """
 from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Any, Optional
+from pymongo import InsertOne, UpdateOne
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,6 +43,14 @@ class PickupRepo:
         cur = self.orders.find(q, {"_id": 0}).sort("created_at", -1).limit(limit)
         return [x async for x in cur]
 
+    def iter_active_shipments(self, limit: int = 500, batch_size: int = 200):
+        """Cursor over active shipments (streamed by the pipeline)"""
+        q = {
+            "shipment.ttn": {"$exists": True, "$ne": None},
+            "status": {"$in": ["shipped", "processing", "SHIPPED", "PROCESSING"]}
+        }
+        return self.orders.find(q, {"_id": 0}).sort("created_at", -1).limit(limit).batch_size(batch_size)
+
     async def list_risk_shipments(self, min_days: int = 7, limit: int = 100) -> List[Dict]:
         """Get shipments at point for N+ days"""
         q = {
@@ -90,9 +99,9 @@ class PickupRepo:
         u = await self.users.find_one({"phone": phone}, {"_id": 0, "opt_out": 1, "is_blocked": 1, "email": 1})
         return u or {}
 
-    async def update_shipment_state(self, order_id: str, state: Dict):
-        """Update shipment tracking state"""
-        await self.orders.update_one(
+    def shipment_state_op(self, order_id: str, state: Dict) -> UpdateOne:
+        """Shipment tracking state update (for bulk_write)"""
+        return UpdateOne(
             {"id": order_id},
             {"$set": {
                 "shipment.pickupPointType": state.get("pickup_point_type"),
@@ -107,10 +116,10 @@ class PickupRepo:
             }}
         )
 
-    async def mark_reminder_sent(self, order_id: str, level: str, now_iso: str):
-        """Mark reminder as sent with cooldown"""
+    def reminder_sent_op(self, order_id: str, level: str, now_iso: str) -> UpdateOne:
+        """Mark reminder as sent with cooldown (for bulk_write)"""
         cooldown_until = (datetime.now(timezone.utc) + timedelta(hours=24)).isoformat()
-        await self.orders.update_one(
+        return UpdateOne(
             {"id": order_id},
             {
                 "$set": {
@@ -209,9 +218,9 @@ class PickupRepo:
             logger.warning(f"Admin alert enqueue failed: {e}")
             return False
 
-    async def timeline_event(self, phone: str, ts: str, type_: str, title: str, description: str, payload: Dict):
-        """Add event to customer timeline"""
-        await self.timeline.insert_one({
+    def timeline_op(self, phone: str, ts: str, type_: str, title: str, description: str, payload: Dict) -> InsertOne:
+        """Customer timeline event (for bulk_write)"""
+        return InsertOne({
             "phone": phone,
             "ts": ts,
             "type": type_,
@@ -8,13 +8,18 @@ import uuid
 import re
 
 from core.db import db
+from core.responses import DocumentShape, trusted_response
 from core.security import get_current_user, get_current_seller, get_current_admin
+from modules.catalog.catalog_query import catalog_keys, refresh_catalog_keys
+from modules.cart.cart_pricing import invalidate_products
+from modules.catalog.dimensions import enrich_products, get_categories as get_category_dims, invalidate_categories
 from .models import (
     Category, CategoryCreate, CategoryUpdate,
     Product, ProductCreate, ProductUpdate, ProductListResponse
 )
 
 router = APIRouter(prefix="/products", tags=["Products"])
+PRODUCT_SHAPE = DocumentShape(Product)
 categories_router = APIRouter(prefix="/categories", tags=["Categories"])
 
 
@@ -23,26 +28,20 @@ categories_router = APIRouter(prefix="/categories", tags=["Categories"])
 @categories_router.get("", response_model=List[Category])
 async def get_categories(tree: bool = False):
     """Get all categories, optionally as tree structure"""
-    categories = await db.categories.find({}, {"_id": 0}).to_list(1000)
+    dims = await get_category_dims(db)
     
-    # Add product counts
-    for cat in categories:
-        cat["product_count"] = await db.products.count_documents({"category_id": cat["id"]})
+    # Add product counts (one grouped count)
+    counts = {r["_id"]: r["n"] async for r in db.products.aggregate([
+        {"$group": {"_id": "$category_id", "n": {"$sum": 1}}}
+    ])}
     
-    if not tree:
-        return categories
-    
-    # Build tree structure
-    cat_map = {c["id"]: {**c, "children": []} for c in categories}
-    roots = []
+    def with_count(cat: dict) -> dict:
+        return {**cat, "product_count": counts.get(cat["id"], 0)}
     
-    for cat in categories:
-        if cat.get("parent_id") and cat["parent_id"] in cat_map:
-            cat_map[cat["parent_id"]]["children"].append(cat_map[cat["id"]])
-        else:
-            roots.append(cat_map[cat["id"]])
+    if not tree:
+        return [with_count(c) for c in dims.items]
     
-    return roots
+    return dims.tree(with_count)
 
 
 @categories_router.post("", response_model=Category)
@@ -59,6 +58,7 @@ async def create_category(
     }
     
     await db.categories.insert_one(cat_doc)
+    await invalidate_categories(db)
     return Category(**cat_doc, product_count=0)
 
 
@@ -81,6 +81,7 @@ async def update_category(
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    await invalidate_categories(db)
     
     category = await db.categories.find_one({"id": category_id}, {"_id": 0})
     category["product_count"] = await db.products.count_documents({"category_id": category_id})
@@ -97,6 +98,7 @@ async def delete_category(
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    await invalidate_categories(db)
     
     return {"message": "Category deleted"}
 
@@ -148,21 +150,16 @@ async def get_products(
         .limit(limit)\
         .to_list(limit)
     
-    # Enrich with category and seller names
-    for p in products:
-        if p.get("category_id"):
-            cat = await db.categories.find_one({"id": p["category_id"]}, {"name": 1})
-            p["category_name"] = cat["name"] if cat else None
-        if p.get("seller_id"):
-            seller = await db.users.find_one({"id": p["seller_id"]}, {"full_name": 1})
-            p["seller_name"] = seller["full_name"] if seller else None
-    
-    return ProductListResponse(
-        items=products,
-        total=total,
-        page=page,
-        pages=(total + limit - 1) // limit
-    )
+    # Enrich with category and seller names (dimension cache)
+    await enrich_products(db, products)
+    
+    # ProductListResponse shape, rendered without per-item validation
+    return trusted_response({
+        "items": PRODUCT_SHAPE.many(products),
+        "total": total,
+        "page": page,
+        "pages": (total + limit - 1) // limit
+    })
 
 
 @router.get("/search/suggestions")
@@ -191,12 +188,7 @@ async def get_product(product_id: str):
     await db.products.update_one({"id": product_id}, {"$inc": {"views": 1}})
     
     # Add category and seller names
-    if product.get("category_id"):
-        cat = await db.categories.find_one({"id": product["category_id"]}, {"name": 1})
-        product["category_name"] = cat["name"] if cat else None
-    if product.get("seller_id"):
-        seller = await db.users.find_one({"id": product["seller_id"]}, {"full_name": 1})
-        product["seller_name"] = seller["full_name"] if seller else None
+    await enrich_products(db, [product])
     
     return Product(**product)
 
@@ -221,6 +213,7 @@ async def create_product(
         "created_at": now,
         **data.model_dump()
     }
+    product_doc.update(catalog_keys(product_doc))
     
     await db.products.insert_one(product_doc)
     return Product(**product_doc)
@@ -246,6 +239,8 @@ async def update_product(
     update_dict["updated_at"] = datetime.now(timezone.utc)
     
     await db.products.update_one({"id": product_id}, {"$set": update_dict})
+    await refresh_catalog_keys(db, product_id)
+    invalidate_products(product_id)
     
     updated = await db.products.find_one({"id": product_id}, {"_id": 0})
     return Product(**updated)
@@ -266,4 +261,5 @@ async def delete_product(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.products.delete_one({"id": product_id})
+    invalidate_products(product_id)
     return {"message": "Product deleted"}
@@ -1,11 +1,19 @@
 """
 O20.5: Return Policy Engine - Main Engine
 Rule-based policy decisions with window metrics (30/60 days)
+
+Window metrics for every phone (cod_refusals_30d, returns_60d) and every
+city (orders / returns 30d) come from one $facet aggregation over orders
+touched in the window; customers with issues are then joined in memory
+(one $in read), so a run covers all customers in O(window) instead of
+per-customer count queries. Phones with no customer record are skipped.
 """
 from datetime import datetime, timezone, timedelta
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import logging
 
+from core.dates import and_q, dt_expr, range_q, to_dt
+
 from modules.returns.policy_types import PolicyDecision, PolicyRunResult
 from modules.returns.policy_repo import PolicyRepo
 
@@ -20,6 +28,12 @@ def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+RETURN_STAGES = ["RETURNING", "RETURNED"]
+COD_REFUSAL_REASONS = ["REFUSED", "NOT_PICKED_UP", "STORAGE_EXPIRED"]
+PHONE_FIELDS = ["delivery.recipient.phone", "shipping.phone", "buyer_phone"]
+CITY_EXPR = {"$ifNull": ["$delivery.recipient.city", "$shipping.city"]}
+
+
 class ReturnPolicyEngine:
     """
     Rule-based policy engine for return management.
@@ -38,29 +52,32 @@ class ReturnPolicyEngine:
         self.repo = PolicyRepo(db)
         self._scanned_cities = 0
 
-    async def run_once(self, limit_customers: int = 500) -> dict:
-        """Run policy engine once"""
+    async def run_once(self, limit_customers: Optional[int] = None) -> dict:
+        """Run policy engine once (`limit_customers` caps evaluated customers, default all)"""
         await self.repo.ensure_indexes()
         
         decisions: List[PolicyDecision] = []
         
-        # 1) Customer policies
-        customers = await self.repo.list_customers_with_orders(limit=limit_customers)
-        scanned_customers = len(customers)
+        # 1) Window metrics for all phones and cities in one aggregation
+        phone_metrics, city_metrics = await self._window_metrics()
+        
+        # Customer policies: only phones with issues can trigger a rule
+        flagged = [p for p, m in phone_metrics.items() if m["cod_refusals_30d"] or m["returns_60d"]]
+        if limit_customers:
+            flagged = flagged[:limit_customers]
+        customers = await self.repo.customers_by_phones(flagged)
+        scanned_customers = len(phone_metrics)
         
-        for c in customers:
-            phone = c.get("phone")
-            if not phone:
+        for phone in flagged:
+            # Only phones with a customer record get decisions; a bare phone
+            # would leave queued decisions pointing at no customer
+            c = customers.get(phone)
+            if c is None:
                 continue
-            
-            m = await self._customer_window_metrics(phone)
+            m = phone_metrics[phone]
             cod_ref_30 = m["cod_refusals_30d"]
             ret_60 = m["returns_60d"]
             
-            # Skip if no issues
-            if cod_ref_30 == 0 and ret_60 == 0:
-                continue
-            
             # Current flags
             policy = c.get("policy") or {}
             cod_blocked = bool(policy.get("cod_blocked"))
@@ -90,7 +107,7 @@ class ReturnPolicyEngine:
                 ))
         
         # 2) City policies
-        city_decisions = await self._city_policy_decisions()
+        city_decisions = await self._city_policy_decisions(city_metrics)
         decisions.extend(city_decisions)
         
         # 3) Apply or queue for approval
@@ -187,72 +204,101 @@ class ReturnPolicyEngine:
 
     # --- Metrics ---
     
+    async def _window_metrics(self) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+        """
+        ({phone: {cod_refusals_30d, returns_60d}}, {city: {orders, returns}})
+        from one $facet over orders created in 30d or with a return update in 60d.
+        Same filters as _customer_window_metrics / the former per-city scans.
+        """
+        since_30 = since_iso(30)
+        since_60 = since_iso(60)
+        ret_stage = {"$in": [{"$ifNull": ["$returns.stage", None]}, RETURN_STAGES]}
+        # ISO strings and BSON dates never compare: normalize first (missing -> null)
+        upd = dt_expr("returns.updated_at")
+        pipeline = [
+            {"$match": {"$or": [
+                range_q("created_at", gte=since_30),
+                range_q("returns.updated_at", gte=since_60),
+            ]}},
+            {"$facet": {
+                "phones": [
+                    {"$match": range_q("returns.updated_at", gte=since_60)},
+                    {"$project": {
+                        "_id": 0,
+                        "phones": {"$setUnion": [{"$filter": {
+                            "input": [f"${f}" for f in PHONE_FIELDS],
+                            "cond": {"$and": [{"$ne": ["$$this", None]}, {"$ne": ["$$this", ""]}]},
+                        }}]},
+                        "ret60": {"$cond": [ret_stage, 1, 0]},
+                        "cod30": {"$cond": [{"$and": [
+                            {"$gte": [upd, to_dt(since_30)]},
+                            {"$in": [{"$ifNull": ["$returns.reason", None]}, COD_REFUSAL_REASONS]},
+                        ]}, 1, 0]},
+                    }},
+                    {"$match": {"$or": [{"ret60": 1}, {"cod30": 1}]}},
+                    {"$unwind": "$phones"},
+                    {"$group": {"_id": "$phones", "returns_60d": {"$sum": "$ret60"}, "cod_refusals_30d": {"$sum": "$cod30"}}},
+                ],
+                "city_orders": [
+                    {"$match": range_q("created_at", gte=since_30)},
+                    {"$group": {"_id": CITY_EXPR, "orders": {"$sum": 1}}},
+                ],
+                "city_returns": [
+                    {"$match": {**range_q("returns.updated_at", gte=since_30), "returns.stage": {"$in": RETURN_STAGES}}},
+                    {"$group": {"_id": CITY_EXPR, "returns": {"$sum": 1}}},
+                ],
+            }},
+        ]
+        rows = await self.db["orders"].aggregate(pipeline, allowDiskUse=True).to_list(1)
+        facets = rows[0] if rows else {}
+        
+        phones = {
+            r["_id"]: {"cod_refusals_30d": int(r["cod_refusals_30d"]), "returns_60d": int(r["returns_60d"])}
+            for r in facets.get("phones", []) if r["_id"]
+        }
+        cities: Dict[str, dict] = {}
+        for r in facets.get("city_orders", []):
+            if r["_id"]:
+                cities.setdefault(r["_id"], {"orders": 0, "returns": 0})["orders"] = int(r["orders"])
+        for r in facets.get("city_returns", []):
+            if r["_id"]:
+                cities.setdefault(r["_id"], {"orders": 0, "returns": 0})["returns"] = int(r["returns"])
+        return phones, cities
+    
     async def _customer_window_metrics(self, phone: str) -> dict:
-        """Calculate customer metrics for policy windows"""
+        """Calculate customer metrics for policy windows (single customer view)"""
         since_30 = since_iso(30)
         since_60 = since_iso(60)
         
         # Returns in 60 days
-        returns_60 = await self.db["orders"].count_documents({
+        returns_60 = await self.db["orders"].count_documents(and_q({
             "$or": [
                 {"delivery.recipient.phone": phone},
                 {"shipping.phone": phone},
                 {"buyer_phone": phone}
             ],
-            "returns.updated_at": {"$gte": since_60},
             "returns.stage": {"$in": ["RETURNING", "RETURNED"]}
-        })
+        }, range_q("returns.updated_at", gte=since_60)))
         
         # COD refusals in 30 days
-        cod_ref_30 = await self.db["orders"].count_documents({
+        cod_ref_30 = await self.db["orders"].count_documents(and_q({
             "$or": [
                 {"delivery.recipient.phone": phone},
                 {"shipping.phone": phone},
                 {"buyer_phone": phone}
             ],
-            "returns.updated_at": {"$gte": since_30},
             "returns.reason": {"$in": ["REFUSED", "NOT_PICKED_UP", "STORAGE_EXPIRED"]}
-        })
+        }, range_q("returns.updated_at", gte=since_30)))
         
         return {
             "returns_60d": int(returns_60),
             "cod_refusals_30d": int(cod_ref_30)
         }
 
-    async def _city_policy_decisions(self) -> List[PolicyDecision]:
+    async def _city_policy_decisions(self, city_metrics: Dict[str, dict]) -> List[PolicyDecision]:
         """Generate city-level policy decisions"""
-        since_30 = since_iso(30)
-        
-        # Total orders per city (30d)
-        pipeline_total = [
-            {"$match": {"created_at": {"$gte": since_30}}},
-            {"$group": {
-                "_id": {"$ifNull": ["$delivery.recipient.city", "$shipping.city"]},
-                "orders": {"$sum": 1}
-            }}
-        ]
-        totals = {}
-        async for r in self.db["orders"].aggregate(pipeline_total):
-            city = r["_id"]
-            if city:
-                totals[city] = int(r["orders"])
-        
-        # Returns per city (30d)
-        pipeline_ret = [
-            {"$match": {
-                "returns.updated_at": {"$gte": since_30},
-                "returns.stage": {"$in": ["RETURNING", "RETURNED"]}
-            }},
-            {"$group": {
-                "_id": {"$ifNull": ["$delivery.recipient.city", "$shipping.city"]},
-                "returns": {"$sum": 1}
-            }}
-        ]
-        rets = {}
-        async for r in self.db["orders"].aggregate(pipeline_ret):
-            city = r["_id"]
-            if city:
-                rets[city] = int(r["returns"])
+        totals = {city: m["orders"] for city, m in city_metrics.items() if m["orders"]}
+        rets = {city: m["returns"] for city, m in city_metrics.items()}
         
         self._scanned_cities = len(totals)
         
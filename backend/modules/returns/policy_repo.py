@@ -130,6 +130,14 @@ class PolicyRepo:
         
         return customers
 
+    async def customers_by_phones(self, phones: list, chunk: int = 1000) -> dict:
+        """phone -> customer record, batched $in reads"""
+        out = {}
+        for i in range(0, len(phones), chunk):
+            async for c in self.customers.find({"phone": {"$in": phones[i:i + chunk]}}, {"_id": 0}):
+                out[c["phone"]] = c
+        return out
+
     async def get_approval_queue(self, status: str = "PENDING", skip: int = 0, limit: int = 50):
         """Get pending approvals"""
         cursor = self.actions_queue.find(
@@ -16,12 +16,13 @@ router = APIRouter(prefix="/policy", tags=["Return Policy"])
 
 @router.post("/run")
 async def run_policy_engine(
-    limit: int = Query(default=500, le=1000),
+    limit: Optional[int] = Query(default=None, ge=1),
     admin: dict = Depends(get_current_admin)
 ):
     """
     Manually trigger policy engine run.
-    Scans customers/cities and generates policy decisions.
+    Scans customers/cities and generates policy decisions
+    (`limit` caps evaluated customers; default all).
     """
     engine = ReturnPolicyEngine(db)
     return await engine.run_once(limit_customers=limit)
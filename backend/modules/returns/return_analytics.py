@@ -6,6 +6,9 @@ from datetime import datetime, timezone, timedelta
 from typing import Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from core.dates import and_q, range_q, day_expr
+from modules.analytics_intel.kpi_counters import KpiCountersRepo
+
 
 class ReturnAnalyticsService:
     """Analytics for return management KPIs"""
@@ -15,9 +18,10 @@ class ReturnAnalyticsService:
         self.orders = db["orders"]
         self.ledger = db["finance_ledger"]
         self.customers = db["customers"]
+        self.counters = KpiCountersRepo(db)
 
-    def _since(self, days: int) -> str:
-        return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    def _since(self, days: int) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(days=days)
 
     async def summary(self) -> Dict[str, Any]:
         """Get comprehensive return analytics summary"""
@@ -26,48 +30,42 @@ class ReturnAnalyticsService:
         since_30 = self._since(30)
 
         # Total orders in 30 days
-        total_30 = await self.orders.count_documents({"created_at": {"$gte": since_30}})
+        total_30 = (await self.counters.last(30)).orders
         
         # Returns by period
-        returns_today = await self.orders.count_documents({
-            "returns.stage": {"$in": ["RETURNING", "RETURNED"]},
-            "returns.updated_at": {"$gte": since_1}
-        })
+        returns_today = await self.orders.count_documents(and_q(range_q("returns.updated_at", since_1), {
+            "returns.stage": {"$in": ["RETURNING", "RETURNED"]}
+        }))
         
-        returns_7 = await self.orders.count_documents({
-            "returns.stage": {"$in": ["RETURNING", "RETURNED"]},
-            "returns.updated_at": {"$gte": since_7}
-        })
+        returns_7 = await self.orders.count_documents(and_q(range_q("returns.updated_at", since_7), {
+            "returns.stage": {"$in": ["RETURNING", "RETURNED"]}
+        }))
         
-        returns_30 = await self.orders.count_documents({
-            "returns.stage": {"$in": ["RETURNING", "RETURNED"]},
-            "returns.updated_at": {"$gte": since_30}
-        })
+        returns_30 = await self.orders.count_documents(and_q(range_q("returns.updated_at", since_30), {
+            "returns.stage": {"$in": ["RETURNING", "RETURNED"]}
+        }))
 
         # COD refusals in 30 days
-        cod_ref_30 = await self.orders.count_documents({
+        cod_ref_30 = await self.orders.count_documents(and_q(range_q("returns.updated_at", since_30), {
             "returns.reason": {"$in": ["REFUSED", "NOT_PICKED_UP", "STORAGE_EXPIRED"]},
-            "returns.updated_at": {"$gte": since_30},
             "$or": [
                 {"payment.method": {"$in": ["COD", "cod", "CASH_ON_DELIVERY", "postpaid"]}},
                 {"payment_method": {"$in": ["COD", "cod", "CASH_ON_DELIVERY", "postpaid"]}}
             ]
-        })
+        }))
 
         # Shipping losses in 30 days
         losses_30 = 0
-        async for l in self.ledger.find({
-            "type": {"$in": ["SHIP_COST_OUT", "RETURN_COST_OUT"]},
-            "created_at": {"$gte": since_30}
-        }):
+        async for l in self.ledger.find(and_q(range_q("created_at", since_30), {
+            "type": {"$in": ["SHIP_COST_OUT", "RETURN_COST_OUT"]}
+        })):
             losses_30 += float(l.get("amount", 0))
 
         # Top reasons (30 days)
         pipeline_reasons = [
-            {"$match": {
-                "returns.updated_at": {"$gte": since_30},
+            {"$match": and_q(range_q("returns.updated_at", since_30), {
                 "returns.reason": {"$exists": True}
-            }},
+            })},
             {"$group": {"_id": "$returns.reason", "count": {"$sum": 1}}},
             {"$sort": {"count": -1}},
             {"$limit": 5}
@@ -79,10 +77,9 @@ class ReturnAnalyticsService:
 
         # Top cities by returns (30 days)
         pipeline_cities = [
-            {"$match": {
-                "returns.updated_at": {"$gte": since_30},
+            {"$match": and_q(range_q("returns.updated_at", since_30), {
                 "returns.stage": {"$in": ["RETURNING", "RETURNED"]}
-            }},
+            })},
             {"$group": {
                 "_id": {"$ifNull": [
                     "$delivery.recipient.city",
@@ -115,11 +112,10 @@ class ReturnAnalyticsService:
         
         # Returns per day
         pipeline_returns = [
-            {"$match": {
-                "returns.updated_at": {"$gte": since},
+            {"$match": and_q(range_q("returns.updated_at", since), {
                 "returns.stage": {"$in": ["RETURNING", "RETURNED"]}
-            }},
-            {"$addFields": {"day": {"$substr": ["$returns.updated_at", 0, 10]}}},
+            })},
+            {"$addFields": {"day": day_expr("returns.updated_at")}},
             {"$group": {"_id": "$day", "count": {"$sum": 1}}},
             {"$sort": {"_id": 1}}
         ]
@@ -130,11 +126,10 @@ class ReturnAnalyticsService:
         
         # Losses per day
         pipeline_losses = [
-            {"$match": {
-                "type": {"$in": ["SHIP_COST_OUT", "RETURN_COST_OUT"]},
-                "created_at": {"$gte": since}
-            }},
-            {"$addFields": {"day": {"$substr": ["$created_at", 0, 10]}}},
+            {"$match": and_q(range_q("created_at", since), {
+                "type": {"$in": ["SHIP_COST_OUT", "RETURN_COST_OUT"]}
+            })},
+            {"$addFields": {"day": day_expr("created_at")}},
             {"$group": {"_id": "$day", "amount": {"$sum": "$amount"}}},
             {"$sort": {"_id": 1}}
         ]
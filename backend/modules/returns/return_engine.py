@@ -9,6 +9,7 @@ import logging
 from modules.returns.return_repo import ReturnRepo
 from modules.returns.return_mapping import detect_return_from_np
 from modules.returns.return_types import ReturnDetection
+from modules.delivery.shipment_pipeline import ShipmentPipeline, DEFAULT_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
@@ -28,43 +29,43 @@ class ReturnEngine:
     6. Send admin alerts
     """
     
-    def __init__(self, db, np_client=None):
+    def __init__(self, db, np_client=None, concurrency: int = DEFAULT_CONCURRENCY):
         self.db = db
         self.np_client = np_client
         self.repo = ReturnRepo(db)
+        self.concurrency = concurrency
 
     async def run_once(self, limit: int = 500) -> Dict[str, Any]:
         """Run return detection and processing cycle"""
         await self.repo.ensure_indexes()
-        
-        orders = await self.repo.list_active_shipments(limit=limit)
-        logger.info(f"Return engine: processing {len(orders)} orders")
-        
+
         updated = 0
         detected = 0
-        errors = []
 
-        for o in orders:
-            try:
-                result = await self._process_order(o)
-                if result.get("detected"):
-                    detected += 1
-                if result.get("updated"):
-                    updated += 1
-            except Exception as e:
-                logger.error(f"Error processing order {o.get('id')}: {e}")
-                errors.append({"order_id": o.get("id"), "error": str(e)})
+        async def handle(order: Dict, pipe: ShipmentPipeline):
+            nonlocal updated, detected
+            result = await self._process_order(order, pipe)
+            if result.get("detected"):
+                detected += 1
+            if result.get("updated"):
+                updated += 1
+
+        pipe = ShipmentPipeline(self.db, concurrency=self.concurrency)
+        stats = await pipe.run(self.repo.iter_active_shipments(limit=limit), handle)
+        logger.info(f"Return engine: processed {stats['processed']}/{stats['scanned']} orders in {stats['duration_ms']} ms")
 
         return {
             "ok": True,
-            "scanned": len(orders),
+            "scanned": stats["scanned"],
             "detected": detected,
             "updated": updated,
-            "errors": len(errors)
+            "errors": stats["errors"],
+            "duration_ms": stats["duration_ms"],
+            "timings": stats["timings"]
         }
 
-    async def _process_order(self, order: Dict) -> Dict[str, Any]:
-        """Process single order for return detection"""
+    async def _process_order(self, order: Dict, pipe: ShipmentPipeline) -> Dict[str, Any]:
+        """Process single order for return detection (ledger writes are batched on pipe, the rest follows the flush)"""
         result = {"detected": False, "updated": False}
         
         shipment = order.get("shipment") or {}
@@ -85,10 +86,11 @@ class ReturnEngine:
             return result
 
         # Fetch NP tracking
-        tracking = await self._fetch_tracking(ttn)
+        async with pipe.timer.stage("tracking"):
+            tracking = await self._fetch_tracking(ttn, order)
         if not tracking:
             return result
-            
+
         # Detect return
         det = detect_return_from_np(tracking)
         if not det.is_return:
@@ -96,85 +98,90 @@ class ReturnEngine:
 
         result["detected"] = True
 
-        # Idempotency per (ttn + stage + reason)
+        # Idempotency per (ttn + stage + reason). The marker is written only
+        # after the batched ledger entries are stored (commit below), so a
+        # failed flush leaves the order to be redone by the next cycle
         dedupe_key = f"return:{ttn}:{det.stage}:{det.reason}"
-        if not await self.repo.mark_event_once(dedupe_key, {
-            "order_id": order_id, 
-            "ttn": ttn, 
-            "det": det.model_dump()
-        }):
-            return result
-
-        # 1) Set returns block
-        await self.repo.set_return_state(order_id, det.stage, det.reason, {
-            "status_code": det.raw_status_code,
-            "status_text": det.raw_status_text
-        })
+        async with pipe.timer.stage("dedupe"):
+            if await self.repo.event_seen(dedupe_key):
+                return result
 
-        # 2) Transition order status
-        if det.stage == "RETURNING":
-            await self.repo.transition_order_status(order_id, "RETURNING")
-        elif det.stage == "RETURNED":
-            await self.repo.transition_order_status(order_id, "RETURNED")
-
-        # 3) Ledger - shipping losses
+        # 1) Ledger - shipping losses (batched; unique index dedupes replays)
         ship_cost = float(shipment.get("cost") or shipment.get("delivery_cost") or 0)
         return_cost = float((order.get("returns") or {}).get("return_cost") or ship_cost * 0.5)
         amount = float((order.get("totals") or {}).get("grand") or order.get("total_amount") or 0)
 
-        ledger_entries = 0
-        if await self.repo.add_ledger_once(
-            order_id, "SHIP_COST_OUT", ship_cost, 
-            ref=f"{ttn}:ship", 
+        pipe.writes.add("finance_ledger", self.repo.ledger_op(
+            order_id, "SHIP_COST_OUT", ship_cost,
+            ref=f"{ttn}:ship",
             meta={"ttn": ttn, "reason": det.reason}
-        ):
-            ledger_entries += 1
-            
-        if await self.repo.add_ledger_once(
-            order_id, "RETURN_COST_OUT", return_cost, 
-            ref=f"{ttn}:return", 
+        ))
+        pipe.writes.add("finance_ledger", self.repo.ledger_op(
+            order_id, "RETURN_COST_OUT", return_cost,
+            ref=f"{ttn}:return",
             meta={"ttn": ttn, "reason": det.reason}
-        ):
-            ledger_entries += 1
+        ))
 
         # If COD - record SALE_LOST for analytics
         payment_method = (order.get("payment") or {}).get("method") or order.get("payment_method")
         is_cod = str(payment_method).upper() in ["COD", "CASH_ON_DELIVERY", "POSTPAID"]
-        
+
         if is_cod:
-            if await self.repo.add_ledger_once(
-                order_id, "SALE_LOST", amount, 
-                ref=f"{ttn}:sale_lost", 
+            pipe.writes.add("finance_ledger", self.repo.ledger_op(
+                order_id, "SALE_LOST", amount,
+                ref=f"{ttn}:sale_lost",
                 meta={"ttn": ttn, "reason": det.reason}
-            ):
-                ledger_entries += 1
-
-        # 4) CRM counters + risk segment
-        if phone:
-            await self.repo.inc_customer_return_counters(phone, is_cod=is_cod, reason=det.reason)
-            await self.repo.set_customer_risk_if_needed(phone)
-
-            # 5) Timeline event
-            await self.repo.timeline_event(
-                phone=phone,
-                type_="RETURN_DETECTED",
-                title="↩️ Виявлено повернення",
-                description=f"ТТН {ttn} • {det.stage} • {det.reason}",
-                payload={
-                    "order_id": order_id, 
-                    "ttn": ttn, 
-                    "amount": amount, 
-                    "reason": det.reason, 
-                    "stage": det.stage
-                }
-            )
-
-        # 6) Telegram admin alert
-        await self._admin_alert(order, det, amount)
-
+            ))
+
+        async def commit():
+            # 2) Returns block + order status transition (order_hooks); a
+            # repeat is a no-op $set
+            new_status = det.stage if det.stage in ("RETURNING", "RETURNED") else None
+            async with pipe.timer.stage("order"):
+                await self.repo.apply_return_state(order_id, det.stage, det.reason, {
+                    "status_code": det.raw_status_code,
+                    "status_text": det.raw_status_text
+                }, new_status=new_status)
+
+            # 3) Marker: gates the non-idempotent steps below
+            async with pipe.timer.stage("dedupe"):
+                if not await self.repo.mark_event_once(dedupe_key, {
+                    "order_id": order_id,
+                    "ttn": ttn,
+                    "det": det.model_dump()
+                }):
+                    return
+
+            # 4) CRM counters + risk segment (segment reads the counters)
+            if phone:
+                async with pipe.timer.stage("crm"):
+                    await self.repo.inc_customer_return_counters(phone, is_cod=is_cod, reason=det.reason)
+                    await self.repo.set_customer_risk_if_needed(phone)
+
+                    # 5) Timeline event
+                    await self.repo.timeline_event(
+                        phone=phone,
+                        type_="RETURN_DETECTED",
+                        title="↩️ Виявлено повернення",
+                        description=f"ТТН {ttn} • {det.stage} • {det.reason}",
+                        payload={
+                            "order_id": order_id,
+                            "ttn": ttn,
+                            "amount": amount,
+                            "reason": det.reason,
+                            "stage": det.stage
+                        }
+                    )
+
+            # 6) Telegram admin alert
+            async with pipe.timer.stage("alert"):
+                await self._admin_alert(order, det, amount)
+
+            logger.info(f"Return detected: TTN {ttn}, stage={det.stage}, reason={det.reason}")
+
+        # Steps 2-6 run once this order's ledger entries are written
+        pipe.writes.after_flush(commit)
         result["updated"] = True
-        logger.info(f"Return detected: TTN {ttn}, stage={det.stage}, reason={det.reason}")
-        
         return result
 
     async def _admin_alert(self, order: dict, det: ReturnDetection, amount: float):
@@ -216,7 +223,7 @@ class ReturnEngine:
 
         await self.repo.enqueue_admin_alert(dedupe_key, text, reply_markup=reply_markup)
 
-    async def _fetch_tracking(self, ttn: str) -> Optional[Dict]:
+    async def _fetch_tracking(self, ttn: str, order: Optional[Dict] = None) -> Optional[Dict]:
         """Fetch tracking from Nova Poshta"""
         if self.np_client:
             try:
@@ -225,11 +232,12 @@ class ReturnEngine:
                 logger.error(f"NP tracking fetch failed for {ttn}: {e}")
                 return None
         
-        # Fallback: get from stored shipment data
-        order = await self.db["orders"].find_one(
-            {"shipment.ttn": ttn}, 
-            {"_id": 0, "shipment": 1}
-        )
+        # Fallback: stored shipment data (already on the streamed order)
+        if order is None:
+            order = await self.db["orders"].find_one(
+                {"shipment.ttn": ttn},
+                {"_id": 0, "shipment": 1}
+            )
         if order and order.get("shipment"):
             return order["shipment"]
         return None
@@ -240,5 +248,7 @@ class ReturnEngine:
         if not order:
             return {"ok": False, "error": "Order not found"}
         
-        result = await self._process_order(order)
+        pipe = ShipmentPipeline(self.db, concurrency=1)
+        result = await self._process_order(order, pipe)
+        await pipe.writes.flush()
         return {"ok": True, **result}
@@ -3,9 +3,14 @@ O20.3: Return Management Engine - Repository
 Handles DB operations: idempotency, order updates, ledger, CRM counters, alerts
 """
 from datetime import datetime, timezone
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import InsertOne, ReturnDocument
 import logging
 
+from core.dates import range_q, ts_now
+from modules.orders.order_hooks import on_order_transition
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,6 +69,18 @@ class ReturnRepo:
         cursor = self.orders.find(query, {"_id": 0}).sort("created_at", -1).limit(limit)
         return [x async for x in cursor]
 
+    def iter_active_shipments(self, limit: int = 500, batch_size: int = 200):
+        """Cursor over active shipments (streamed by the pipeline)"""
+        query = {
+            "shipment.ttn": {"$exists": True, "$ne": None},
+            "status": {"$in": ["SHIPPED", "shipped", "PROCESSING", "processing"]},
+            "returns.stage": {"$nin": ["RETURNED", "RESOLVED"]}
+        }
+        return self.orders.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).batch_size(batch_size)
+
+    async def event_seen(self, dedupe_key: str) -> bool:
+        return await self.events.find_one({"dedupe_key": dedupe_key}, {"_id": 1}) is not None
+
     async def mark_event_once(self, dedupe_key: str, payload: dict) -> bool:
         """Idempotent event marker - returns True if this is new event"""
         try:
@@ -76,31 +93,42 @@ class ReturnRepo:
         except Exception:
             return False
 
-    async def set_return_state(self, order_id: str, stage: str, reason: str, np: dict):
-        """Update order with return state information"""
-        await self.orders.update_one(
+    async def apply_return_state(
+        self, order_id: str, stage: str, reason: str, np: dict, new_status: str = None
+    ) -> Optional[dict]:
+        """
+        Return state (+ optional order status transition, run through
+        order_hooks like the admin status path); returns the order before it
+        """
+        now = ts_now()
+        upd = {
+            "returns.stage": stage,
+            "returns.reason": reason,
+            "returns.updated_at": now,
+            "returns.np_status": {
+                "code": np.get("status_code") or np.get("StatusCode"),
+                "text": np.get("status_text") or np.get("StatusText") or np.get("Status"),
+            }
+        }
+        if new_status:
+            upd["status"] = new_status
+            upd["updated_at"] = now
+        before = await self.orders.find_one_and_update(
             {"id": order_id},
-            {"$set": {
-                "returns.stage": stage,
-                "returns.reason": reason,
-                "returns.updated_at": now_iso(),
-                "returns.np_status": {
-                    "code": np.get("status_code") or np.get("StatusCode"),
-                    "text": np.get("status_text") or np.get("StatusText") or np.get("Status"),
-                }
-            }}
-        )
-
-    async def transition_order_status(self, order_id: str, new_status: str):
-        """Transition order to new status"""
-        await self.orders.update_one(
-            {"id": order_id}, 
-            {"$set": {"status": new_status, "updated_at": now_iso()}}
+            {"$set": upd},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
         )
+        if before is not None and new_status and before.get("status") != new_status:
+            await on_order_transition(
+                self.db, {**before, "status": new_status, "updated_at": now}, before.get("status"), before=before
+            )
+        return before
 
-    async def add_ledger_once(self, order_id: str, type_: str, amount: float, ref: str, meta: dict) -> bool:
-        """Add ledger entry with idempotency (unique: order_id+type+ref)"""
-        doc = {
+    def ledger_op(self, order_id: str, type_: str, amount: float, ref: str, meta: dict) -> InsertOne:
+        """Ledger entry for bulk_write; the unique (order_id, type, ref) index
+        turns replays into duplicate-key skips"""
+        return InsertOne({
             "order_id": order_id,
             "type": type_,
             "direction": "OUT",  # Losses are always OUT
@@ -109,12 +137,7 @@ class ReturnRepo:
             "ref": ref,
             "meta": meta,
             "created_at": now_iso(),
-        }
-        try:
-            await self.ledger.insert_one(doc)
-            return True
-        except Exception:
-            return False
+        })
 
     async def inc_customer_return_counters(self, phone: str, is_cod: bool, reason: str):
         """Increment customer return counters"""
@@ -157,7 +180,7 @@ class ReturnRepo:
             logger.info(f"Customer {phone} segment changed: {segment} -> {new_segment}")
 
     async def timeline_event(self, phone: str, type_: str, title: str, description: str, payload: dict):
-        """Add event to customer timeline"""
+        """Customer timeline event"""
         await self.timeline.insert_one({
             "phone": phone,
             "ts": now_iso(),
@@ -185,21 +208,21 @@ class ReturnRepo:
         """Get return statistics for analytics"""
         from datetime import timedelta
         
-        since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+        since = datetime.now(timezone.utc) - timedelta(days=days)
         
         # Total orders in period
-        total = await self.orders.count_documents({"created_at": {"$gte": since}})
+        total = await self.orders.count_documents(range_q("created_at", since))
         
         # Returns in period
         returns = await self.orders.count_documents({
             "returns.stage": {"$in": ["RETURNING", "RETURNED"]},
-            "returns.updated_at": {"$gte": since}
+            **range_q("returns.updated_at", since)
         })
         
         # COD refusals
         cod_refusals = await self.orders.count_documents({
             "returns.reason": {"$in": ["REFUSED", "NOT_PICKED_UP", "STORAGE_EXPIRED"]},
-            "returns.updated_at": {"$gte": since},
+            **range_q("returns.updated_at", since),
             "payment.method": {"$in": ["COD", "cod", "CASH_ON_DELIVERY", "cash_on_delivery", "postpaid"]}
         })
         
@@ -207,7 +230,7 @@ class ReturnRepo:
         pipeline = [
             {"$match": {
                 "type": {"$in": ["SHIP_COST_OUT", "RETURN_COST_OUT"]},
-                "created_at": {"$gte": since}
+                **range_q("created_at", since)
             }},
             {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
         ]
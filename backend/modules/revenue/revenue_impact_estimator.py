@@ -2,6 +2,7 @@
 Revenue Impact Estimator - Calculate expected cost vs uplift
 """
 from datetime import datetime, timedelta, timezone
+from core.dates import and_q, range_q
 from .revenue_settings import get_settings
 
 
@@ -20,30 +21,29 @@ class RevenueImpactEstimator:
 
     async def _base_window_stats(self, range_days: int) -> dict:
         """Get base statistics for impact calculation"""
-        since = (now() - timedelta(days=range_days)).isoformat()
+        created = range_q("created_at", gte=now() - timedelta(days=range_days))
         paid_statuses = ["PAID", "PROCESSING", "SHIPPED", "DELIVERED", "paid", "completed"]
 
         # Total orders
-        total = await self.orders.count_documents({"created_at": {"$gte": since}})
+        total = await self.orders.count_documents(created)
 
         # FULL_PREPAID orders
         prepaid_total = await self.orders.count_documents({
-            "created_at": {"$gte": since},
+            **created,
             "payment_policy.mode": "FULL_PREPAID"
         })
 
-        prepaid_paid = await self.orders.count_documents({
-            "created_at": {"$gte": since},
+        prepaid_paid = await self.orders.count_documents(and_q(created, {
             "payment_policy.mode": "FULL_PREPAID",
             "$or": [
                 {"status": {"$in": paid_statuses}},
                 {"payment_status": {"$in": paid_statuses}}
             ]
-        })
+        }))
 
         # Avg order grand
         avg_pipeline = [
-            {"$match": {"created_at": {"$gte": since}}},
+            {"$match": created},
             {"$group": {"_id": None, "avg": {"$avg": {"$ifNull": ["$totals.grand", 0]}}}}
         ]
         avg_result = await self.orders.aggregate(avg_pipeline).to_list(1)
@@ -51,17 +51,16 @@ class RevenueImpactEstimator:
 
         # Avg grand for prepaid
         prepaid_avg_pipeline = [
-            {"$match": {"created_at": {"$gte": since}, "payment_policy.mode": "FULL_PREPAID"}},
+            {"$match": {**created, "payment_policy.mode": "FULL_PREPAID"}},
             {"$group": {"_id": None, "avg": {"$avg": {"$ifNull": ["$totals.grand", 0]}}}}
         ]
         prepaid_avg_result = await self.orders.aggregate(prepaid_avg_pipeline).to_list(1)
         avg_prepaid_grand = float(prepaid_avg_result[0]["avg"]) if prepaid_avg_result else avg_grand
 
         # Return rate
-        returns = await self.orders.count_documents({
-            "created_at": {"$gte": since},
+        returns = await self.orders.count_documents(and_q(created, {
             "$or": [{"return.is_return": True}, {"status": {"$in": ["RETURNED", "CANCELLED_RETURNED"]}}]
-        })
+        }))
         return_rate = (returns / total) if total > 0 else 0.0
 
         prepaid_paid_rate = (prepaid_paid / prepaid_total) if prepaid_total > 0 else 0.0
@@ -3,6 +3,8 @@ Revenue Settings - Configuration for ROE
 """
 from datetime import datetime, timezone
 
+from core.runtime_config import ConfigSection, bump_config, get_config, register_section
+
 def now_iso():
     return datetime.now(timezone.utc).isoformat()
 
@@ -26,7 +28,16 @@ DEFAULT_SETTINGS = {
 }
 
 
-async def get_settings(db):
+DEFAULT_SYSTEM_CONFIG = {
+    "id": "main",
+    "prepaid_discount_value": 1.0,
+    "deposit_min_uah": 100,
+    "risk_threshold_high": 70,
+    "risk_threshold_watch": 40,
+}
+
+
+async def _load_settings(db):
     doc = await db["revenue_settings"].find_one({"id": "main"}, {"_id": 0})
     if not doc:
         await db["revenue_settings"].insert_one(DEFAULT_SETTINGS.copy())
@@ -34,30 +45,36 @@ async def get_settings(db):
     return doc
 
 
+async def _load_system_config(db):
+    doc = await db["system_settings"].find_one({"id": "main"}, {"_id": 0})
+    if not doc:
+        default = {**DEFAULT_SYSTEM_CONFIG, "updated_at": now_iso()}
+        await db["system_settings"].insert_one(dict(default))
+        return default
+    return doc
+
+
+register_section(ConfigSection("revenue", _load_settings, DEFAULT_SETTINGS))
+register_section(ConfigSection("system", _load_system_config, DEFAULT_SYSTEM_CONFIG))
+
+
+async def get_settings(db):
+    """Cached snapshot copy (see core.runtime_config)"""
+    return (await get_config(db, "revenue")).copy()
+
+
 async def patch_settings(db, patch: dict):
     patch["updated_at"] = now_iso()
     await db["revenue_settings"].update_one({"id": "main"}, {"$set": patch}, upsert=True)
-    return await get_settings(db)
+    return (await bump_config(db, "revenue")).copy()
 
 
 async def get_system_config(db):
     """Get current system config (discount, deposit, thresholds)"""
-    doc = await db["system_settings"].find_one({"id": "main"}, {"_id": 0})
-    if not doc:
-        default = {
-            "id": "main",
-            "prepaid_discount_value": 1.0,
-            "deposit_min_uah": 100,
-            "risk_threshold_high": 70,
-            "risk_threshold_watch": 40,
-            "updated_at": now_iso()
-        }
-        await db["system_settings"].insert_one(default)
-        return default
-    return doc
+    return (await get_config(db, "system")).copy()
 
 
 async def patch_system_config(db, patch: dict):
     patch["updated_at"] = now_iso()
     await db["system_settings"].update_one({"id": "main"}, {"$set": patch}, upsert=True)
-    return await get_system_config(db)
+    return (await bump_config(db, "system")).copy()
@@ -4,6 +4,9 @@ Revenue Snapshot Service - Captures key metrics for ROE analysis
 from datetime import datetime, timedelta, timezone
 import logging
 
+from core.dates import and_q, range_q
+from modules.analytics_intel.kpi_counters import KpiCountersRepo
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,48 +21,41 @@ class RevenueSnapshotService:
         self.payments = db["payments"]
         self.ledger = db["finance_ledger"]
         self.snaps = db["revenue_snapshots"]
+        self.counters = KpiCountersRepo(db)
 
     async def build_snapshot(self, range_days: int = 7) -> dict:
         """Build a comprehensive snapshot of revenue metrics"""
-        since = (now() - timedelta(days=range_days)).isoformat()
-
-        # Total orders
-        orders_total = await self.orders.count_documents({"created_at": {"$gte": since}})
-        
-        # Paid orders
+        since = now() - timedelta(days=range_days)
+        created = range_q("created_at", since)
+        paid = range_q("paid_at", since)
+
+        # Total / paid orders (KPI counters, whole days)
+        kpi = await self.counters.last(range_days)
+        orders_total = kpi.orders
+        paid_total = kpi.paid
         paid_statuses = ["PAID", "PROCESSING", "SHIPPED", "DELIVERED", "paid", "completed"]
-        paid_total = await self.orders.count_documents({
-            "created_at": {"$gte": since},
-            "$or": [
-                {"status": {"$in": paid_statuses}},
-                {"payment_status": {"$in": paid_statuses}}
-            ]
-        })
 
         # Declined payments
-        declined_total = await self.payments.count_documents({
-            "created_at": {"$gte": since},
+        declined_total = await self.payments.count_documents(and_q(created, {
             "status": {"$in": ["DECLINED", "declined", "FAILED", "failed"]}
-        }) if "payments" in await self.db.list_collection_names() else 0
+        })) if "payments" in await self.db.list_collection_names() else 0
 
         # Returns
-        returns_total = await self.orders.count_documents({
-            "created_at": {"$gte": since},
+        returns_total = await self.orders.count_documents(and_q(created, {
             "$or": [
                 {"return.is_return": True},
                 {"status": {"$in": ["RETURNED", "CANCELLED_RETURNED"]}}
             ]
-        })
+        }))
 
         # Recovery (retry)
-        retry_paid = await self.orders.count_documents({
-            "paid_at": {"$gte": since},
+        retry_paid = await self.orders.count_documents(and_q(paid, {
             "retry.sent": True,
             "$or": [
                 {"status": {"$in": paid_statuses}},
                 {"payment_status": {"$in": paid_statuses}}
             ]
-        })
+        }))
 
         # Rates
         total_attempts = max(1, paid_total + declined_total)
@@ -68,43 +64,38 @@ class RevenueSnapshotService:
         recovery_rate = (retry_paid / orders_total) if orders_total > 0 else 0
 
         # Deposit conversion
-        deposit_total = await self.orders.count_documents({
-            "created_at": {"$gte": since},
+        deposit_total = await self.orders.count_documents(and_q(created, {
             "$or": [
                 {"deposit.required": True},
                 {"payment_policy.mode": "SHIP_DEPOSIT"}
             ]
-        })
-        deposit_paid = await self.orders.count_documents({
-            "created_at": {"$gte": since},
+        }))
+        deposit_paid = await self.orders.count_documents(and_q(created, {
             "deposit.paid": True
-        })
+        }))
         deposit_conv = (deposit_paid / deposit_total) if deposit_total > 0 else 0
 
         # Prepaid metrics
-        prepaid_total = await self.orders.count_documents({
-            "created_at": {"$gte": since},
+        prepaid_total = await self.orders.count_documents(and_q(created, {
             "payment_policy.mode": "FULL_PREPAID"
-        })
-        prepaid_paid = await self.orders.count_documents({
-            "created_at": {"$gte": since},
+        }))
+        prepaid_paid = await self.orders.count_documents(and_q(created, {
             "payment_policy.mode": "FULL_PREPAID",
             "$or": [
                 {"status": {"$in": paid_statuses}},
                 {"payment_status": {"$in": paid_statuses}}
             ]
-        })
+        }))
         prepaid_conv = (prepaid_paid / prepaid_total) if prepaid_total > 0 else 0
 
         # Avg payment time
         time_pipeline = [
-            {"$match": {
-                "paid_at": {"$gte": since},
+            {"$match": and_q(paid, {
                 "$or": [
                     {"status": {"$in": paid_statuses}},
                     {"payment_status": {"$in": paid_statuses}}
                 ]
-            }},
+            })},
             {"$project": {
                 "delta": {
                     "$divide": [
@@ -123,10 +114,9 @@ class RevenueSnapshotService:
 
         # Discount stats
         discount_pipeline = [
-            {"$match": {
-                "created_at": {"$gte": since},
+            {"$match": and_q(created, {
                 "pricing.discount.amount": {"$exists": True, "$gt": 0}
-            }},
+            })},
             {"$group": {
                 "_id": None,
                 "total": {"$sum": "$pricing.discount.amount"},
@@ -140,13 +130,12 @@ class RevenueSnapshotService:
 
         # Revenue
         revenue_pipeline = [
-            {"$match": {
-                "created_at": {"$gte": since},
+            {"$match": and_q(created, {
                 "$or": [
                     {"status": {"$in": paid_statuses}},
                     {"payment_status": {"$in": paid_statuses}}
                 ]
-            }},
+            })},
             {"$group": {
                 "_id": None,
                 "gross": {"$sum": {"$ifNull": ["$totals.grand_before_discount", "$totals.grand"]}},
@@ -162,7 +151,7 @@ class RevenueSnapshotService:
         try:
             loss_pipeline = [
                 {"$match": {
-                    "ts": {"$gte": since},
+                    **range_q("ts", since),
                     "type": {"$in": ["SHIP_COST_OUT", "RETURN_COST_OUT", "SALE_LOST"]}
                 }},
                 {"$group": {"_id": None, "sum": {"$sum": "$amount"}}}
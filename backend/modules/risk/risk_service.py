@@ -2,6 +2,7 @@
 O16: Risk Service - Customer Risk Score Engine (0-100)
 """
 from datetime import datetime, timezone, timedelta
+from core.dates import range_q
 from modules.risk.risk_types import RiskResult
 from modules.risk.risk_config import DEFAULT_RISK_CONFIG
 import logging
@@ -13,10 +14,6 @@ def utcnow():
     return datetime.now(timezone.utc)
 
 
-def iso(dt: datetime):
-    return dt.isoformat()
-
-
 def clamp(x: float, a: float, b: float) -> float:
     return max(a, min(b, x))
 
@@ -32,14 +29,15 @@ class RiskService:
         self.alerts_repo = alerts_repo
 
     async def _load_cfg(self):
+        """(risk config, bot settings version) from the cached settings snapshot"""
         if not self.settings_repo:
-            return DEFAULT_RISK_CONFIG
-        st = await self.settings_repo.get()
-        cfg = ((st.get("guard") or {}).get("risk") or None)
-        return cfg or DEFAULT_RISK_CONFIG
+            return DEFAULT_RISK_CONFIG, None
+        snap = await self.settings_repo.snapshot()
+        cfg = ((snap.data.get("guard") or {}).get("risk") or None)
+        return cfg or DEFAULT_RISK_CONFIG, snap.version
 
     async def compute_for_user(self, user_id: str) -> RiskResult:
-        cfg = await self._load_cfg()
+        cfg, cfg_version = await self._load_cfg()
         w = cfg["weights"]
         caps = cfg["caps"]
         th = cfg["thresholds"]
@@ -49,7 +47,7 @@ class RiskService:
         # Count orders in last hour (burst detection)
         hour_ago = now - timedelta(hours=1)
         burst_cnt = await self.orders.count_documents({
-            "created_at": {"$gte": iso(hour_ago), "$lt": iso(now)},
+            **range_q("created_at", gte=hour_ago, lt=now),
             "buyer_id": user_id
         })
         c_burst = clamp((burst_cnt / 3.0) * w["burst_1h"], 0, caps["burst_1h"])
@@ -57,7 +55,7 @@ class RiskService:
         # Count cancelled/returned orders in 60d
         days_60_ago = now - timedelta(days=60)
         returns_cnt = await self.orders.count_documents({
-            "created_at": {"$gte": iso(days_60_ago)},
+            **range_q("created_at", gte=days_60_ago),
             "buyer_id": user_id,
             "status": {"$in": ["returned", "RETURNED", "cancelled", "CANCELLED"]}
         })
@@ -66,7 +64,7 @@ class RiskService:
         # Payment failures (simplified - count failed payment status)
         days_30_ago = now - timedelta(days=30)
         payment_fails = await self.orders.count_documents({
-            "created_at": {"$gte": iso(days_30_ago)},
+            **range_q("created_at", gte=days_30_ago),
             "buyer_id": user_id,
             "payment_status": {"$in": ["failed", "FAILED"]}
         })
@@ -130,7 +128,8 @@ class RiskService:
                 "returns_60d": {"n": returns_cnt, "score": round(c_returns, 2)},
                 "burst_1h": {"n": int(burst_cnt), "score": round(c_burst, 2)},
                 "payment_fails_30d": {"n": int(payment_fails), "score": round(c_pay, 2)},
-            }
+            },
+            config_version=cfg_version
         )
 
     async def apply_to_user(self, user_id: str) -> dict:
@@ -144,6 +143,7 @@ class RiskService:
                     "band": rr.band,
                     "reasons": rr.reasons,
                     "components": rr.components,
+                    "config_version": rr.config_version,
                     "updated_at": utcnow().isoformat()
                 }
             }}
@@ -158,7 +158,7 @@ class RiskService:
         if not (self.guard_repo and self.alerts_repo):
             return
 
-        cfg = await self._load_cfg()
+        cfg, _ = await self._load_cfg()
         alert_thr = int(cfg["thresholds"].get("alert_score", 80))
         if rr.score < alert_thr:
             return
@@ -12,3 +12,5 @@ class RiskResult(BaseModel):
     band: RiskBand
     reasons: List[str]
     components: Dict[str, Any]
+    # Bot settings version the score was computed with (core.runtime_config)
+    config_version: Optional[int] = None
@@ -1,11 +1,12 @@
 """
 Search Routes - ElasticSearch-powered product search
 """
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from core.responses import trusted_response
 from .service import get_search_service
 
 router = APIRouter(prefix="/api/v2/search", tags=["Search V2"])
@@ -29,7 +30,8 @@ async def search_products(
     sort: str = Query("relevance", description="Sort by: relevance, price_asc, price_desc, newest, popular"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
-    lang: str = Query("uk", description="Language for search")
+    lang: str = Query("uk", description="Language for search"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
 ):
     """
     Advanced product search with filters, sorting, and aggregations
@@ -42,24 +44,29 @@ async def search_products(
     """
     service = get_search_service(db)
     
-    result = await service.search_products(
-        query=q,
-        category_id=category,
-        min_price=min_price,
-        max_price=max_price,
-        brand=brand,
-        in_stock=in_stock,
-        sort_by=sort,
-        page=page,
-        limit=limit,
-        lang=lang
-    )
-    
-    # Log search for analytics
+    try:
+        result = await service.search_products(
+            query=q,
+            category_id=category,
+            min_price=min_price,
+            max_price=max_price,
+            brand=brand,
+            in_stock=in_stock,
+            sort_by=sort,
+            page=page,
+            limit=limit,
+            lang=lang,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Log search for analytics (once per search, not per page)
     user_id = None  # Could extract from auth token
-    await service.log_search(q, result.get("total", 0), user_id)
+    if not cursor:
+        await service.log_search(q, result.get("total", 0), user_id)
     
-    return result
+    return trusted_response(result)
 
 
 @router.get("/autocomplete")
@@ -2,11 +2,15 @@
 ElasticSearch Service
 Full-text search with autocomplete, fuzzy matching, and relevance scoring
 """
+import base64
+import json
 import os
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone
 
+from modules.catalog.catalog_query import cached_count, encode_cursor, keyset_page, sort_spec
+
 logger = logging.getLogger(__name__)
 
 # ElasticSearch configuration
@@ -20,6 +24,23 @@ _search_cache: Dict[str, Any] = {}
 _products_index: List[Dict] = []
 
 
+def encode_es_cursor(sort_values: list, sort_by: str) -> str:
+    payload = {"s": f"es:{sort_by}", "v": sort_values}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_es_cursor(cursor: str, sort_by: str) -> list:
+    """`next_cursor` of an ES page -> search_after values"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        values = list(payload["v"])
+    except Exception:
+        raise ValueError("INVALID_CURSOR")
+    if payload.get("s") != f"es:{sort_by}":
+        raise ValueError("CURSOR_SORT_MISMATCH")
+    return values
+
+
 class SearchService:
     """
     ElasticSearch service with MongoDB fallback
@@ -60,29 +81,34 @@ class SearchService:
         sort_by: str = "relevance",
         page: int = 1,
         limit: int = 20,
-        lang: str = "uk"
+        lang: str = "uk",
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Advanced product search with filters and sorting
+        Advanced product search with filters and sorting.
+        `cursor` continues from a previous `next_cursor` (ES: search_after,
+        MongoDB: keyset); cursor pages skip the aggregations.
         """
         if self.es_client:
             return await self._es_search(
                 query, category_id, min_price, max_price, 
-                brand, in_stock, sort_by, page, limit, lang
+                brand, in_stock, sort_by, page, limit, lang, cursor
             )
         else:
             return await self._mongo_search(
                 query, category_id, min_price, max_price,
-                brand, in_stock, sort_by, page, limit, lang
+                brand, in_stock, sort_by, page, limit, lang, cursor
             )
     
     async def _es_search(
         self, query: str, category_id: Optional[str], 
         min_price: Optional[float], max_price: Optional[float],
         brand: Optional[str], in_stock: bool, sort_by: str,
-        page: int, limit: int, lang: str
+        page: int, limit: int, lang: str, cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """ElasticSearch query"""
+        search_after = decode_es_cursor(cursor, sort_by) if cursor else None
+
         must = []
         filter_clauses = []
         
@@ -145,30 +171,43 @@ class SearchService:
             sort.append({"views_count": "desc"})
         else:  # relevance
             sort.append({"_score": "desc"})
+        # Tiebreaker: search_after needs a total order
+        sort.append({"id.keyword": {"order": "asc", "unmapped_type": "keyword"}})
+        
+        params: Dict[str, Any] = {
+            "index": ES_INDEX,
+            "query": es_query,
+            "sort": sort,
+            "size": limit,
+            "highlight": {
+                "fields": {
+                    f"title.{lang}": {},
+                    f"description.{lang}": {"fragment_size": 150}
+                }
+            },
+        }
+        if search_after is not None:
+            params["search_after"] = search_after
+        else:
+            params["from_"] = (page - 1) * limit
+            params["aggs"] = {
+                "categories": {"terms": {"field": "category_id", "size": 20}},
+                "brands": {"terms": {"field": "brand.keyword", "size": 20}},
+                "price_stats": {"stats": {"field": "price"}}
+            }
         
         # Execute search
         try:
-            result = await self.es_client.search(
-                index=ES_INDEX,
-                query=es_query,
-                sort=sort,
-                from_=(page - 1) * limit,
-                size=limit,
-                highlight={
-                    "fields": {
-                        f"title.{lang}": {},
-                        f"description.{lang}": {"fragment_size": 150}
-                    }
-                },
-                aggs={
-                    "categories": {"terms": {"field": "category_id", "size": 20}},
-                    "brands": {"terms": {"field": "brand.keyword", "size": 20}},
-                    "price_stats": {"stats": {"field": "price"}}
-                }
-            )
+            result = await self.es_client.search(**params)
             
             hits = result["hits"]["hits"]
             total = result["hits"]["total"]["value"]
+            # "gte": ES stopped counting at track_total_hits
+            exact = result["hits"]["total"].get("relation", "eq") == "eq"
+            next_cursor = (
+                encode_es_cursor(hits[-1]["sort"], sort_by)
+                if len(hits) == limit and hits[-1].get("sort") else None
+            )
             
             products = []
             for hit in hits:
@@ -179,12 +218,23 @@ class SearchService:
                     product["_highlight"] = hit["highlight"]
                 products.append(product)
             
+            if search_after is not None:
+                return {
+                    "products": products,
+                    "total": total,
+                    "total_exact": exact,
+                    "limit": limit,
+                    "next_cursor": next_cursor,
+                }
+            
             return {
                 "products": products,
                 "total": total,
                 "page": page,
                 "limit": limit,
                 "total_pages": (total + limit - 1) // limit,
+                "total_exact": exact,
+                "next_cursor": next_cursor,
                 "aggregations": {
                     "categories": result["aggregations"]["categories"]["buckets"],
                     "brands": result["aggregations"]["brands"]["buckets"],
@@ -194,18 +244,23 @@ class SearchService:
             
         except Exception as e:
             logger.error(f"ElasticSearch error: {e}")
+            # An ES cursor is rejected by the keyset fallback (CURSOR_SORT_MISMATCH)
             return await self._mongo_search(
                 query, category_id, min_price, max_price,
-                brand, in_stock, sort_by, page, limit, lang
+                brand, in_stock, sort_by, page, limit, lang, cursor
             )
     
     async def _mongo_search(
         self, query: str, category_id: Optional[str],
         min_price: Optional[float], max_price: Optional[float],
         brand: Optional[str], in_stock: bool, sort_by: str,
-        page: int, limit: int, lang: str
+        page: int, limit: int, lang: str, cursor: Optional[str] = None
     ) -> Dict[str, Any]:
-        """MongoDB fallback search with text index"""
+        """
+        MongoDB fallback search with text index.
+        Keyset pages when a cursor is given (or on page 1); facets and the
+        cached total are computed only for non-cursor requests' first page.
+        """
         if self.db is None:
             return {"products": [], "total": 0, "page": page, "limit": limit}
         
@@ -248,9 +303,6 @@ class SearchService:
         elif sort_by == "popular":
             sort_field = [("views_count", -1)]
         
-        # Execute query
-        skip = (page - 1) * limit
-        
         try:
             # Handle $text search separately
             if query and "$or" in mongo_query:
@@ -266,14 +318,30 @@ class SearchService:
                 ]
                 mongo_query = simple_query
             
-            cursor = self.db.products.find(mongo_query).sort(sort_field).skip(skip).limit(limit)
-            products = await cursor.to_list(limit)
+            if cursor or page <= 1:
+                products, next_cursor = await keyset_page(
+                    self.db.products, mongo_query, sort_field, limit, cursor, projection=None
+                )
+            else:
+                spec = sort_spec(sort_field)
+                products = await self.db.products.find(mongo_query).sort(spec).skip((page - 1) * limit).limit(limit + 1).to_list(limit + 1)
+                next_cursor = encode_cursor(products[limit - 1], spec) if len(products) > limit else None
+                products = products[:limit]
             
             # Convert ObjectId
             for p in products:
                 p["_id"] = str(p.get("_id", ""))
             
-            total = await self.db.products.count_documents(mongo_query)
+            total, exact = await cached_count(self.db.products, mongo_query)
+            
+            if cursor:
+                return {
+                    "products": products,
+                    "total": total,
+                    "total_exact": exact,
+                    "limit": limit,
+                    "next_cursor": next_cursor,
+                }
             
             # Get aggregations
             agg_pipeline = [
@@ -310,6 +378,8 @@ class SearchService:
                 "page": page,
                 "limit": limit,
                 "total_pages": (total + limit - 1) // limit,
+                "total_exact": exact,
+                "next_cursor": next_cursor,
                 "aggregations": {
                     "categories": [
                         {"key": c["_id"], "doc_count": c["count"]} 
@@ -323,6 +393,8 @@ class SearchService:
                 }
             }
             
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"MongoDB search error: {e}")
             return {"products": [], "total": 0, "page": page, "limit": limit}
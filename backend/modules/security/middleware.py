@@ -1,63 +1,78 @@
 """
 Security Middleware - Headers, Rate Limiting, Anti-abuse
 """
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.datastructures import MutableHeaders
 from .rate_limiter import api_limiter, auth_limiter, checkout_limiter
 import hashlib
 import time
 
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+SECURITY_HEADERS = {
+    "X-Frame-Options": "DENY",
+    "X-Content-Type-Options": "nosniff",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Permissions-Policy": "geolocation=(), microphone=(), camera=()",
+}
+RATE_LIMIT_EXEMPT = ("/health", "/api/health")
+
+
+def limiter_for(path: str):
+    """Select appropriate rate limiter"""
+    if "/auth" in path or "/login" in path or "/register" in path:
+        return auth_limiter
+    if "/checkout" in path or "/orders/create" in path:
+        return checkout_limiter
+    return api_limiter
+
+
+class SecurityMiddleware:
     """
-    Security middleware for FastAPI
-    - Security headers
+    Security middleware (pure ASGI: no per-request task / body streaming
+    overhead of BaseHTTPMiddleware)
     - Rate limiting
-    - Anti-abuse timing
+    - Security headers
+    - Anti-abuse timing (X-Process-Time)
     """
-    
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Get client identifier
-        client_ip = request.client.host if request.client else "unknown"
-        path = request.url.path
-        
-        # Select appropriate rate limiter
-        if "/auth" in path or "/login" in path or "/register" in path:
-            limiter = auth_limiter
-        elif "/checkout" in path or "/orders/create" in path:
-            limiter = checkout_limiter
-        else:
-            limiter = api_limiter
-        
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start_time = time.perf_counter()
+        path = scope["path"]
+
         # Check rate limit (skip for static files and health checks)
-        if not path.startswith("/static") and path not in ["/health", "/api/health"]:
-            allowed, reason = await limiter.is_allowed(client_ip)
+        if not path.startswith("/static") and path not in RATE_LIMIT_EXEMPT:
+            client = scope.get("client")
+            allowed, reason = await limiter_for(path).is_allowed(client[0] if client else "unknown")
             if not allowed:
-                return Response(
-                    content=f'{{"error": "{reason}"}}',
-                    status_code=429,
-                    media_type="application/json",
-                    headers={"Retry-After": "60"}
-                )
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Add security headers
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        
-        # Add timing header for debugging (remove in production if needed)
-        process_time = time.time() - start_time
-        response.headers["X-Process-Time"] = str(round(process_time, 4))
-        
-        return response
+                body = f'{{"error": "{reason}"}}'.encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", b"60"),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for key, value in SECURITY_HEADERS.items():
+                    headers[key] = value
+                # Timing header for debugging (time to first byte)
+                headers["X-Process-Time"] = str(round(time.perf_counter() - start_time, 4))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 
 # Create middleware instance
@@ -1,10 +1,9 @@
 """
 Rate Limiter - In-memory rate limiting (Redis-ready)
 """
-from collections import defaultdict
-from datetime import datetime, timezone
-import asyncio
-from typing import Dict, Tuple
+from collections import defaultdict, deque
+import time
+from typing import Deque, Dict, Tuple
 
 
 class RateLimiter:
@@ -16,41 +15,38 @@ class RateLimiter:
     def __init__(self, requests_per_minute: int = 60, requests_per_hour: int = 1000):
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour
-        self.minute_counters: Dict[str, list] = defaultdict(list)
-        self.hour_counters: Dict[str, list] = defaultdict(list)
-        self._lock = asyncio.Lock()
+        # Timestamps in arrival order: expired ones are popped from the left
+        self.minute_counters: Dict[str, Deque[float]] = defaultdict(deque)
+        self.hour_counters: Dict[str, Deque[float]] = defaultdict(deque)
     
     async def is_allowed(self, identifier: str) -> Tuple[bool, str]:
         """
         Check if request is allowed
         Returns (allowed, reason)
+        No awaits inside: the check-and-record is atomic on the event loop.
         """
-        async with self._lock:
-            now = datetime.now(timezone.utc)
-            minute_ago = now.timestamp() - 60
-            hour_ago = now.timestamp() - 3600
-            
-            # Clean old entries
-            self.minute_counters[identifier] = [
-                t for t in self.minute_counters[identifier] if t > minute_ago
-            ]
-            self.hour_counters[identifier] = [
-                t for t in self.hour_counters[identifier] if t > hour_ago
-            ]
-            
-            # Check limits
-            if len(self.minute_counters[identifier]) >= self.requests_per_minute:
-                return False, f"Rate limit exceeded: {self.requests_per_minute}/min"
-            
-            if len(self.hour_counters[identifier]) >= self.requests_per_hour:
-                return False, f"Rate limit exceeded: {self.requests_per_hour}/hour"
-            
-            # Record request
-            current_time = now.timestamp()
-            self.minute_counters[identifier].append(current_time)
-            self.hour_counters[identifier].append(current_time)
-            
-            return True, "OK"
+        now = time.time()
+        minute = self.minute_counters[identifier]
+        hour = self.hour_counters[identifier]
+        
+        # Drop old entries
+        while minute and minute[0] <= now - 60:
+            minute.popleft()
+        while hour and hour[0] <= now - 3600:
+            hour.popleft()
+        
+        # Check limits
+        if len(minute) >= self.requests_per_minute:
+            return False, f"Rate limit exceeded: {self.requests_per_minute}/min"
+        
+        if len(hour) >= self.requests_per_hour:
+            return False, f"Rate limit exceeded: {self.requests_per_hour}/hour"
+        
+        # Record request
+        minute.append(now)
+        hour.append(now)
+        
+        return True, "OK"
     
     def get_stats(self, identifier: str) -> dict:
         """Get current usage stats for identifier"""
@@ -1,7 +1,8 @@
 """
 O17: Timeline Routes
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
 from core.db import db
 from core.security import get_current_admin
 from modules.timeline.timeline_service import TimelineService
@@ -10,8 +11,16 @@ router = APIRouter(prefix="/timeline", tags=["Timeline"])
 
 
 @router.get("/{user_id}")
-async def get_timeline(user_id: str, limit: int = 100, current_user: dict = Depends(get_current_admin)):
-    """Get customer event timeline"""
+async def get_timeline(
+    user_id: str,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_admin)
+):
+    """Get customer event timeline (pass next_cursor back as cursor for older events)"""
     svc = TimelineService(db)
-    events = await svc.get_customer_timeline(user_id, limit)
-    return {"events": events, "count": len(events)}
+    try:
+        events, next_cursor = await svc.page(user_id, min(limit, 500), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"events": events, "count": len(events), "next_cursor": next_cursor}
@@ -1,84 +1,156 @@
 """
 O17: Timeline Service - Customer Event Stream
+
+k-way merge over per-source cursors (orders, TTNs, CRM notes, guard
+incidents, risk), each already sorted by timestamp desc in MongoDB.
+Pages continue from an opaque cursor: the last timestamp plus the event
+keys already returned at exactly that timestamp.
+
+Timestamps may be ISO strings or BSON dates (see core.dates); each source
+is read as two sorted sub-streams (one per type) so the merge stays ordered.
 """
-from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import heapq
+import json
+
+from core.dates import to_dt, to_iso
+
+DEFAULT_LIMIT = 100
+
+
+def _key(e: dict) -> str:
+    return f"{e['type']}:{e['_id']}"
+
+
+def encode_cursor(ts: str, seen: List[str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"ts": ts, "seen": seen}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, set]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return payload["ts"], set(payload.get("seen") or [])
+    except Exception:
+        raise ValueError("INVALID_CURSOR")
 
 
 class TimelineService:
     def __init__(self, db):
         self.db = db
 
-    async def get_customer_timeline(self, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
-        events = []
-
-        # Orders
-        orders_cursor = self.db["orders"].find(
-            {"buyer_id": user_id},
-            {"_id": 0}
-        ).sort("created_at", -1).limit(50)
-
-        async for o in orders_cursor:
-            # Order created event
-            events.append({
-                "ts": o.get("created_at"),
+    def _sources(self, user_id: str) -> List[Tuple[Any, dict, str, Any]]:
+        """(collection, filter, ts field, doc -> event)"""
+        def order_created(o):
+            return {
                 "type": "ORDER_CREATED",
                 "title": "Order Created",
-                "description": f"ID {o.get('id')[:8]}... | {o.get('status')} | {o.get('total_amount', 0):.2f} {o.get('currency', 'UAH')}",
-                "payload": {"order_id": o.get("id")}
-            })
-
-            # TTN if exists
-            if o.get("shipment", {}).get("ttn"):
-                events.append({
-                    "ts": o.get("shipment", {}).get("created_at") or o.get("updated_at"),
-                    "type": "TTN_CREATED",
-                    "title": "TTN Created",
-                    "description": f"TTN {o.get('shipment', {}).get('ttn')}",
-                    "payload": {"ttn": o.get("shipment", {}).get("ttn")}
-                })
-
-        # CRM notes
-        notes_cursor = self.db["crm_notes"].find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).limit(20)
-        async for n in notes_cursor:
-            events.append({
-                "ts": n.get("created_at"),
+                "description": f"ID {(o.get('id') or '')[:8]}... | {o.get('status')} | {float(o.get('total_amount') or 0):.2f} {o.get('currency', 'UAH')}",
+                "payload": {"order_id": o.get("id")},
+                "_id": o.get("id"),
+            }
+
+        def ttn_created(o):
+            ttn = (o.get("shipment") or {}).get("ttn")
+            return {
+                "type": "TTN_CREATED",
+                "title": "TTN Created",
+                "description": f"TTN {ttn}",
+                "payload": {"ttn": ttn},
+                "_id": o.get("id"),
+            }
+
+        def crm_note(n):
+            return {
                 "type": "CRM_NOTE",
                 "title": "CRM Note",
-                "description": n.get("note", "")[:100],
-                "payload": {"note_id": n.get("id")}
-            })
-
-        # Guard incidents
-        incidents_cursor = self.db["guard_incidents"].find(
-            {"entity": f"customer:{user_id}"},
-            {"_id": 0}
-        ).sort("created_at", -1).limit(20)
-        async for inc in incidents_cursor:
-            events.append({
-                "ts": inc.get("created_at"),
+                "description": (n.get("text") or n.get("note") or "")[:100],
+                "payload": {"note_id": n.get("id")},
+                "_id": n.get("id"),
+            }
+
+        def incident(inc):
+            return {
                 "type": "GUARD_INCIDENT",
                 "title": f"Incident: {inc.get('title', 'Unknown')}",
                 "description": f"{inc.get('type')} | {inc.get('status')}",
-                "payload": {"incident_key": inc.get("key")}
-            })
+                "payload": {"incident_key": inc.get("key")},
+                "_id": inc.get("key"),
+            }
 
-        # Risk updates
+        orders = self.db["orders"]
+        return [
+            (orders, {"buyer_id": user_id}, "created_at", order_created),
+            (orders, {"buyer_id": user_id, "shipment.ttn": {"$nin": [None, ""]}}, "shipment.created_at", ttn_created),
+            (self.db["crm_notes"], {"user_id": user_id}, "created_at", crm_note),
+            (self.db["guard_incidents"], {"entity": f"customer:{user_id}"}, "created_at", incident),
+        ]
+
+    async def _fetch(self, col, flt: dict, field: str, build, before: Optional[str], seen: set, n: int) -> List[dict]:
+        """Newest n events of one source at or before `before`, minus already seen keys"""
+        out = []
+        for bson_type, bound in (("date", to_dt(before) if before else None), ("string", before)):
+            cond: Dict[str, Any] = {"$type": bson_type}
+            if bound is not None:
+                cond["$lte"] = bound
+            cur = col.find({**flt, field: cond}, {"_id": 0}).sort(field, -1).limit(n + len(seen))
+            async for doc in cur:
+                ts = doc
+                for part in field.split("."):
+                    ts = (ts or {}).get(part)
+                e = build(doc)
+                e["ts"] = to_iso(ts)
+                if e["ts"] and _key(e) not in seen:
+                    out.append(e)
+        out.sort(key=lambda e: (e["ts"], _key(e)), reverse=True)
+        return out[:n]
+
+    async def _risk(self, user_id: str, before: Optional[str], seen: set) -> List[dict]:
         user = await self.db["users"].find_one({"id": user_id}, {"_id": 0, "risk": 1})
-        if user and user.get("risk"):
-            events.append({
-                "ts": user["risk"].get("updated_at"),
-                "type": "RISK_UPDATED",
-                "title": "Risk Score Updated",
-                "description": f"Score {user['risk'].get('score')}/100 | {user['risk'].get('band')}",
-                "payload": {"risk": user["risk"]}
-            })
-
-        # Sort by timestamp DESC
-        events = sorted(
-            [e for e in events if e.get("ts")],
-            key=lambda x: x["ts"],
-            reverse=True
-        )
-
-        return events[:limit]
+        risk = (user or {}).get("risk")
+        if not risk or not risk.get("updated_at"):
+            return []
+        e = {
+            "ts": to_iso(risk.get("updated_at")),
+            "type": "RISK_UPDATED",
+            "title": "Risk Score Updated",
+            "description": f"Score {risk.get('score')}/100 | {risk.get('band')}",
+            "payload": {"risk": risk},
+            "_id": user_id,
+        }
+        if not e["ts"] or (before and e["ts"] > before) or _key(e) in seen:
+            return []
+        return [e]
+
+    async def page(self, user_id: str, limit: int = DEFAULT_LIMIT, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of the merged stream + cursor for the next page"""
+        limit = max(1, limit)
+        before, seen = decode_cursor(cursor) if cursor else (None, set())
+
+        streams = [
+            await self._fetch(col, flt, field, build, before, seen, limit + 1)
+            for col, flt, field, build in self._sources(user_id)
+        ]
+        streams.append(await self._risk(user_id, before, seen))
+
+        merged = heapq.merge(*streams, key=lambda e: (e["ts"], _key(e)), reverse=True)
+        events = []
+        for e in merged:
+            events.append(e)
+            if len(events) > limit:
+                break
+
+        next_cursor = None
+        if len(events) > limit:
+            events = events[:limit]
+            last_ts = events[-1]["ts"]
+            same = {_key(e) for e in events if e["ts"] == last_ts}
+            next_cursor = encode_cursor(last_ts, sorted(same | (seen if last_ts == before else set())))
+
+        for e in events:
+            e.pop("_id", None)
+        return events, next_cursor
+
+    async def get_customer_timeline(self, user_id: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        events, _ = await self.page(user_id, limit)
+        return events
@@ -7,51 +7,16 @@ from typing import Dict, List, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from uuid import uuid4
 
+from modules.finance.seller_ledger import SellerLedgerRepo, record_seller_payout
+
 class PayoutsService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
+        self.ledger = SellerLedgerRepo(db)
     
     async def calculate_seller_balance(self, seller_id: str) -> Dict[str, float]:
-        """Calculate seller's available balance"""
-        # Get all completed orders for this seller
-        pipeline = [
-            {"$unwind": "$items"},
-            {
-                "$match": {
-                    "items.seller_id": seller_id,
-                    "payment_status": "paid",
-                    "status": {"$in": ["delivered", "completed"]}
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}}
-                }
-            }
-        ]
-        
-        result = await self.db.orders.aggregate(pipeline).to_list(1)
-        total_revenue = result[0]["total_revenue"] if result else 0
-        
-        # Get total paid out amount
-        payouts = await self.db.payouts.find(
-            {"seller_id": seller_id, "status": {"$in": ["completed", "processing"]}},
-            {"_id": 0}
-        ).to_list(1000)
-        
-        total_paid = sum(p.get("amount", 0) for p in payouts)
-        
-        # Platform commission (10%)
-        commission = total_revenue * 0.10
-        available_balance = total_revenue - commission - total_paid
-        
-        return {
-            "total_revenue": round(total_revenue, 2),
-            "commission": round(commission, 2),
-            "total_paid": round(total_paid, 2),
-            "available_balance": round(max(0, available_balance), 2)
-        }
+        """Calculate seller's available balance (seller ledger, one document read)"""
+        return await self.ledger.balance(seller_id)
     
     async def create_payout_request(self, seller_id: str, amount: float, payment_method: str, payment_details: Dict) -> Dict:
         """Create a new payout request"""
@@ -77,6 +42,8 @@ class PayoutsService:
         }
         
         await self.db.payouts.insert_one(payout)
+        payout.pop("_id", None)
+        await record_seller_payout(self.db, payout)
         
         return payout
     
@@ -126,6 +93,7 @@ class PayoutsService:
             raise ValueError("Payout not found")
         
         payout = await self.db.payouts.find_one({"id": payout_id}, {"_id": 0})
+        await record_seller_payout(self.db, payout)
         return payout
 
 payouts_service = None
@@ -10,6 +10,8 @@ from datetime import datetime, timezone
 import uuid
 import re
 
+from modules.catalog.catalog_query import catalog_keys
+
 load_dotenv(Path(__file__).parent / '.env')
 
 PRODUCTS = [
@@ -455,6 +457,7 @@ async def seed_products():
             'created_at': datetime.now(timezone.utc).isoformat(),
             'updated_at': datetime.now(timezone.utc).isoformat()
         }
+        product_doc.update(catalog_keys(product_doc))
         
         await db.products.insert_one(product_doc)
         created += 1
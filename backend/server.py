@@ -1,8 +1,9 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request, BackgroundTasks, UploadFile, File
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request, Response, BackgroundTasks, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 import os
 import logging
 from pathlib import Path
@@ -13,7 +14,22 @@ from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 import asyncio
+
+# Before any Motor client exists: listeners are bound when a client is created
+from core.dates import range_q, ts, ts_now
+from core.db_profiler import DBProfilerMiddleware, install_db_profiler
+from core.compression import CompressionMiddleware
+from core.responses import DocumentShape, FastJSONResponse, trusted_response
+install_db_profiler()
+
 from crm_service import CRMService
+from modules.orders.order_hooks import on_order_created, on_order_transition
+from modules.cart.cart_pricing import add_cart_line, get_cart_pricing, invalidate_products
+from modules.catalog.dimensions import get_categories as get_category_dims, invalidate_categories, invalidate_sellers
+from modules.catalog.catalog_query import (
+    catalog_keys, keyset_page, refresh_catalog_keys,
+    encode_cursor as catalog_encode_cursor, sort_spec as catalog_sort_spec
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -33,7 +49,7 @@ JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRATION = int(os.environ.get('JWT_EXPIRATION_MINUTES', 10080))
 
 # Create the main app
-app = FastAPI(title="Global Marketplace API")
+app = FastAPI(title="Global Marketplace API", default_response_class=FastJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Health check endpoints
@@ -133,6 +149,8 @@ class Product(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+PRODUCT_SHAPE = DocumentShape(Product)
+
 class ProductCreate(BaseModel):
     title: str
     slug: Optional[str] = None
@@ -773,6 +791,7 @@ async def update_my_profile(
         {"id": current_user.id},
         {"$set": update_data}
     )
+    invalidate_sellers(current_user.id)
     
     updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0})
     updated_user.pop("password_hash", None)
@@ -843,27 +862,18 @@ async def get_categories(tree: bool = False):
     Get all categories. If tree=true, returns nested structure.
     Otherwise returns flat list.
     """
-    categories = await db.categories.find({}, {"_id": 0}).to_list(1000)
-    for cat in categories:
+    dims = await get_category_dims(db)
+    
+    def node(cat: dict) -> dict:
+        cat = dict(cat)
         if isinstance(cat.get("created_at"), str):
             cat["created_at"] = datetime.fromisoformat(cat["created_at"])
+        return cat
     
     if not tree:
-        return categories
-    
-    # Build tree structure
-    def build_tree(parent_id=None):
-        result = []
-        for cat in categories:
-            if cat.get("parent_id") == parent_id:
-                cat_copy = dict(cat)
-                children = build_tree(cat["id"])
-                if children:
-                    cat_copy["children"] = children
-                result.append(cat_copy)
-        return result
+        return [node(c) for c in dims.items]
     
-    return build_tree(None)
+    return dims.tree(node, keep_empty=False)
 
 @api_router.post("/categories", response_model=Category)
 async def create_category(
@@ -874,6 +884,7 @@ async def create_category(
     cat_doc = category.model_dump()
     cat_doc["created_at"] = cat_doc["created_at"].isoformat()
     await db.categories.insert_one(cat_doc)
+    await invalidate_categories(db)
     return category
 
 @api_router.put("/categories/{category_id}", response_model=Category)
@@ -894,6 +905,7 @@ async def update_category(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    await invalidate_categories(db)
     
     # Return updated category
     updated_category = await db.categories.find_one({"id": category_id}, {"_id": 0})
@@ -911,6 +923,7 @@ async def delete_category(
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    await invalidate_categories(db)
     
     return {"message": "Category deleted successfully"}
 
@@ -925,8 +938,13 @@ async def get_products(
     max_price: Optional[float] = None,
     sort_by: Optional[str] = None,
     skip: int = 0,
-    limit: int = 50
+    limit: int = 50,
+    cursor: Optional[str] = None
 ):
+    """
+    Products list. The next-page keyset token is returned in the
+    X-Next-Cursor header; pass it back as `cursor` instead of raising `skip`.
+    """
     query = {"status": "published"}
     
     # Build filter query
@@ -941,6 +959,9 @@ async def get_products(
         if max_price is not None:
             query["price"]["$lte"] = max_price
     
+    # Default: popularity when searching, newest first otherwise
+    sort_field = [("views_count", -1), ("rating", -1)] if search else [("created_at", -1)]
+    
     # Use MongoDB text search for better relevance
     if search:
         # Use regex search for better compatibility (no text index required)
@@ -950,44 +971,32 @@ async def get_products(
             {"description": search_regex},
             {"brand": search_regex}
         ]
-        
-        # Default sort when searching
+    
+    # Override sort if explicitly requested
+    if sort_by == "popularity":
         sort_field = [("views_count", -1), ("rating", -1)]
-        
-        # Override sort if explicitly requested
-        if sort_by == "popularity":
-            sort_field = [("views_count", -1), ("rating", -1)]
-        elif sort_by == "newest":
-            sort_field = [("created_at", -1)]
-        elif sort_by == "price_asc":
-            sort_field = [("price", 1)]
-        elif sort_by == "price_desc":
-            sort_field = [("price", -1)]
-        elif sort_by == "rating":
-            sort_field = [("rating", -1), ("reviews_count", -1)]
-        
-        products = await db.products.find(query, {"_id": 0}).sort(sort_field).skip(skip).limit(limit).to_list(limit)
+    elif sort_by == "newest":
+        sort_field = [("created_at", -1)]
+    elif sort_by == "price_asc":
+        sort_field = [("price", 1)]
+    elif sort_by == "price_desc":
+        sort_field = [("price", -1)]
+    elif sort_by == "rating":
+        sort_field = [("rating", -1), ("reviews_count", -1)]
+    
+    if cursor or not skip:
+        try:
+            products, next_cursor = await keyset_page(db.products, query, sort_field, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     else:
-        # No search query - use standard sorting
-        sort_field = [("created_at", -1)]  # Default: newest first
-        if sort_by == "popularity":
-            sort_field = [("views_count", -1), ("rating", -1)]
-        elif sort_by == "newest":
-            sort_field = [("created_at", -1)]
-        elif sort_by == "price_asc":
-            sort_field = [("price", 1)]
-        elif sort_by == "price_desc":
-            sort_field = [("price", -1)]
-        elif sort_by == "rating":
-            sort_field = [("rating", -1), ("reviews_count", -1)]
-        
-        products = await db.products.find(query, {"_id": 0}).sort(sort_field).skip(skip).limit(limit).to_list(limit)
-    for prod in products:
-        if isinstance(prod.get("created_at"), str):
-            prod["created_at"] = datetime.fromisoformat(prod["created_at"])
-        if isinstance(prod.get("updated_at"), str):
-            prod["updated_at"] = datetime.fromisoformat(prod["updated_at"])
-    return products
+        spec = catalog_sort_spec(sort_field)
+        products = await db.products.find(query, {"_id": 0}).sort(spec).skip(skip).limit(limit + 1).to_list(limit + 1)
+        next_cursor = catalog_encode_cursor(products[limit - 1], spec) if len(products) > limit else None
+        products = products[:limit]
+    # Stored documents are rendered directly (no per-item model validation)
+    return trusted_response(PRODUCT_SHAPE.many(products),
+                            headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 @api_router.get("/products/search/suggestions")
 async def search_suggestions(q: str, limit: int = 5):
@@ -1068,16 +1077,16 @@ async def search_stats(search: str):
     category_results = await db.products.aggregate(category_pipeline).to_list(10)
     
     # Enrich with category names
+    cats = await get_category_dims(db)
     categories = []
     for cat in category_results:
-        if cat["_id"]:
-            category = await db.categories.find_one({"id": cat["_id"]}, {"_id": 0, "name": 1})
-            if category:
-                categories.append({
-                    "id": cat["_id"],
-                    "name": category["name"],
-                    "count": cat["count"]
-                })
+        category = cats.get(cat["_id"])
+        if category:
+            categories.append({
+                "id": cat["_id"],
+                "name": category["name"],
+                "count": cat["count"]
+            })
     
     return {
         "total": total,
@@ -1139,6 +1148,7 @@ async def create_product(
     prod_doc = product.model_dump()
     prod_doc["created_at"] = prod_doc["created_at"].isoformat()
     prod_doc["updated_at"] = prod_doc["updated_at"].isoformat()
+    prod_doc.update(catalog_keys(prod_doc))
     
     await db.products.insert_one(prod_doc)
     return product
@@ -1205,6 +1215,7 @@ async def seed_products():
         prod_data["seller_id"] = "system"
         prod_data["created_at"] = datetime.now(timezone.utc).isoformat()
         prod_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        prod_data.update(catalog_keys(prod_data))
         
         await db.products.insert_one(prod_data)
         created += 1
@@ -1228,6 +1239,8 @@ async def update_product(
     if update_dict:
         update_dict["updated_at"] = datetime.now(timezone.utc).isoformat()
         await db.products.update_one({"id": product_id}, {"$set": update_dict})
+        await refresh_catalog_keys(db, product_id)
+        invalidate_products(product_id)
     
     updated_product = await db.products.find_one({"id": product_id}, {"_id": 0})
     if isinstance(updated_product.get("created_at"), str):
@@ -1249,6 +1262,7 @@ async def delete_product(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.products.delete_one({"id": product_id})
+    invalidate_products(product_id)
     return {"message": "Product deleted successfully"}
 
 # ============= REVIEWS ENDPOINTS =============
@@ -1341,40 +1355,20 @@ async def add_to_cart(
     item: AddToCartRequest,
     current_user: User = Depends(get_current_user)
 ):
-    product = await db.products.find_one({"id": item.product_id}, {"_id": 0})
+    products = await get_cart_pricing(db).products.get_many(db, [item.product_id])
+    product = products.get(item.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     if product["stock_level"] < item.quantity:
         raise HTTPException(status_code=400, detail="Insufficient stock")
     
-    cart = await db.carts.find_one({"user_id": current_user.id}, {"_id": 0})
-    if not cart:
-        cart = Cart(user_id=current_user.id).model_dump()
-        cart["created_at"] = cart["created_at"].isoformat()
-        cart["updated_at"] = cart["updated_at"].isoformat()
-    
-    cart_item = CartItem(
-        product_id=item.product_id,
-        quantity=item.quantity,
-        price=product["price"]
-    )
-    
-    items = cart.get("items", [])
-    existing_idx = next((i for i, x in enumerate(items) if x["product_id"] == item.product_id), None)
-    
-    if existing_idx is not None:
-        items[existing_idx]["quantity"] += item.quantity
-    else:
-        items.append(cart_item.model_dump())
-    
-    cart["items"] = items
-    cart["updated_at"] = datetime.now(timezone.utc).isoformat()
-    
-    await db.carts.update_one(
-        {"user_id": current_user.id},
-        {"$set": cart},
-        upsert=True
+    seed = Cart(user_id=current_user.id).model_dump(exclude={"items", "updated_at", "user_id"})
+    seed["created_at"] = seed["created_at"].isoformat()
+    cart = await add_cart_line(
+        db, current_user.id, item.product_id, item.quantity,
+        datetime.now(timezone.utc).isoformat(),
+        line={"price": product["price"]}, seed=seed
     )
     
     return {"message": "Item added to cart", "cart": cart}
@@ -1422,8 +1416,9 @@ async def create_checkout_session(
     total = sum(item["price"] * item["quantity"] for item in cart["items"])
     
     order_items = []
+    products = await get_cart_pricing(db).products.get_many(db, (item["product_id"] for item in cart["items"]))
     for item in cart["items"]:
-        product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
+        product = products.get(item["product_id"])
         if product:
             order_items.append(OrderItem(
                 product_id=item["product_id"],
@@ -1444,9 +1439,10 @@ async def create_checkout_session(
     )
     
     order_doc = order.model_dump()
-    order_doc["created_at"] = order_doc["created_at"].isoformat()
-    order_doc["updated_at"] = order_doc["updated_at"].isoformat()
+    order_doc["created_at"] = ts(order_doc["created_at"])
+    order_doc["updated_at"] = ts(order_doc["updated_at"])
     await db.orders.insert_one(order_doc)
+    await on_order_created(db, order_doc)
     
     stripe_api_key = os.environ.get('STRIPE_API_KEY')
     host_url = str(request.base_url).rstrip('/')
@@ -1513,15 +1509,22 @@ async def get_checkout_status(session_id: str):
                 {"$set": {"payment_status": "paid", "updated_at": datetime.now(timezone.utc).isoformat()}}
             )
             
-            await db.orders.update_one(
+            fields = {
+                "payment_status": "paid",
+                "status": "processing",
+                "payment_method": "stripe",
+                "updated_at": ts_now()
+            }
+            before = await db.orders.find_one_and_update(
                 {"id": payment["order_id"]},
-                {"$set": {
-                    "payment_status": "paid",
-                    "status": "processing",
-                    "payment_method": "stripe",
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
+                {"$set": fields},
+                projection={"_id": 0},
+                return_document=ReturnDocument.BEFORE
             )
+            if before is not None:
+                await on_order_transition(
+                    db, {**before, **fields}, before.get("status"), payment_status="paid", before=before
+                )
             
             order = await db.orders.find_one({"id": payment["order_id"]})
             if order:
@@ -1575,9 +1578,10 @@ async def create_order(
         
         # Save to database
         order_doc = order.model_dump()
-        order_doc["created_at"] = order_doc["created_at"].isoformat()
-        order_doc["updated_at"] = order_doc["updated_at"].isoformat()
+        order_doc["created_at"] = ts(order_doc["created_at"])
+        order_doc["updated_at"] = ts(order_doc["updated_at"])
         await db.orders.insert_one(order_doc)
+        await on_order_created(db, order_doc)
         
         # Clear cart after successful order creation
         await db.carts.update_one(
@@ -1648,41 +1652,16 @@ async def get_orders(current_user: User = Depends(get_current_user)):
 async def get_admin_orders(current_user: User = Depends(get_current_admin)):
     """
     Get all orders with detailed information for admin analytics
+    Legacy full list (max 10000); use /api/v2/admin/orders for keyset pages
+    and /api/v2/admin/orders/export for full exports.
     """
     try:
-        # Get all orders
-        orders = await db.orders.find({}, {"_id": 0}).to_list(10000)
-        
-        # Enrich with customer information
-        for order in orders:
-            # Get customer info
-            customer = await db.users.find_one({"id": order.get("buyer_id")}, {"_id": 0})
-            if customer:
-                order["customer_name"] = customer.get("full_name", "N/A")
-                order["customer_email"] = customer.get("email", "N/A")
-            else:
-                order["customer_name"] = "Unknown"
-                order["customer_email"] = "N/A"
-            
-            # Enrich items with product details
-            for item in order.get("items", []):
-                product = await db.products.find_one({"id": item.get("product_id")}, {"_id": 0})
-                if product:
-                    item["product_name"] = product.get("title", "Unknown Product")
-                    item["category_name"] = product.get("category_name")
-                    item["price"] = item.get("price", product.get("price", 0))
-            
-            # Handle datetime serialization
-            if isinstance(order.get("created_at"), str):
-                order["created_at"] = order["created_at"]
-            elif hasattr(order.get("created_at"), 'isoformat'):
-                order["created_at"] = order["created_at"].isoformat()
-                
-            if isinstance(order.get("updated_at"), str):
-                order["updated_at"] = order["updated_at"]
-            elif hasattr(order.get("updated_at"), 'isoformat'):
-                order["updated_at"] = order["updated_at"].isoformat()
-        
+        from modules.orders.admin_orders_service import AdminOrdersService
+        orders = []
+        async for order in AdminOrdersService(db).iter_all({}):
+            orders.append(order)
+            if len(orders) >= 10000:
+                break
         return orders
     except Exception as e:
         logger.error(f"Error fetching admin orders: {str(e)}")
@@ -1906,24 +1885,16 @@ async def get_seller_orders(current_user: User = Depends(get_current_seller)):
 
 @api_router.get("/seller/stats")
 async def get_seller_stats(current_user: User = Depends(get_current_seller)):
-    products = await db.products.find({"seller_id": current_user.id}).to_list(1000)
-    orders = await db.orders.find({}).to_list(1000)
-    
-    total_products = len(products)
-    total_revenue = 0.0
-    total_orders = 0
-    
-    for order in orders:
-        if order.get("payment_status") == "paid":
-            for item in order.get("items", []):
-                if item["seller_id"] == current_user.id:
-                    total_revenue += item["price"] * item["quantity"]
-                    total_orders += 1
+    from modules.finance.seller_ledger import SellerLedgerRepo
+    total_products = await db.products.count_documents({"seller_id": current_user.id})
+    ledger = await SellerLedgerRepo(db).get(current_user.id)
     
     return {
         "total_products": total_products,
-        "total_revenue": total_revenue,
-        "total_orders": total_orders
+        "total_revenue": round(float(ledger["revenue"]), 2),
+        "total_orders": int(ledger["orders"]),
+        "total_items": int(ledger["items"]),
+        "by_month": ledger["months"]
     }
 
 # ============= AI ENDPOINTS =============
@@ -2723,47 +2694,30 @@ async def rozetkapay_webhook(request: Request):
         import json
         payload = json.loads(body_str)
         
-        # Extract payment details
-        external_id = payload.get("external_id")
-        payment_id = payload.get("id")
-        is_success = payload.get("is_success")
-        details = payload.get("details", {})
-        status = details.get("status")
-        
-        logger.info(f"Webhook for order {external_id}: status={status}, success={is_success}")
-        
-        # Update order status
-        if external_id:
-            order = await db.orders.find_one({"order_number": external_id})
-            if order:
-                new_status = "paid" if is_success else "payment_failed"
-                await db.orders.update_one(
-                    {"order_number": external_id},
-                    {
-                        "$set": {
-                            "payment_status": new_status,
-                            "payment_session_id": payment_id,
-                            "updated_at": datetime.now(timezone.utc).isoformat()
-                        }
-                    }
-                )
-                logger.info(f"Order {external_id} updated to status: {new_status}")
-        
-        # Update payment transaction
-        await db.payment_transactions.update_one(
-            {"order_id": external_id},
-            {
-                "$set": {
-                    "status": status,
-                    "is_success": is_success,
-                    "webhook_received": True,
-                    "webhook_data": payload,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-            }
+        from core.config import settings
+        from modules.payments.webhook_inbox_handlers import apply_rozetkapay_event
+        if not settings.PAYMENT_WEBHOOK_ASYNC:
+            return await apply_rozetkapay_event(db, payload)
+        
+        # Fast ack: applied by the payment webhook inbox job
+        import hashlib
+        from modules.payments.webhook_inbox import get_webhook_inbox
+        details = payload.get("details") or {}
+        event_id = (
+            f"{payload['id']}:{details.get('status')}:{payload.get('is_success')}"
+            if payload.get("id") else hashlib.sha256(body).hexdigest()
         )
-        
-        return {"status": "processed", "order_id": external_id}
+        ev = await get_webhook_inbox(db).enqueue("rozetkapay", {
+            "provider": "ROZETKAPAY",
+            "provider_event_id": event_id,
+            "order_id": payload.get("external_id"),
+            "type": details.get("status"),
+            "raw": payload,
+        }, signature)
+        return {
+            "status": "duplicate" if ev["duplicate"] else "queued",
+            "order_id": payload.get("external_id")
+        }
     
     except HTTPException:
         raise
@@ -3065,9 +3019,7 @@ async def get_crm_dashboard(
     
     # Get recent customers (last 7 days)
     week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    new_customers_week = await db.users.count_documents({
-        "created_at": {"$gte": week_ago}
-    })
+    new_customers_week = await db.users.count_documents(range_q("created_at", gte=week_ago))
     
     return {
         "sales_funnel": funnel,
@@ -3145,13 +3097,17 @@ async def update_order_status(
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    result = await db.orders.update_one(
+    fields = {"status": status, "updated_at": ts_now()}
+    before = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc)}}
+        {"$set": fields},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.modified_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    await on_order_transition(db, {**before, **fields}, before.get("status"), before=before)
     
     # Create note about status change
     order = await db.orders.find_one({"id": order_id}, {"_id": 0})
@@ -3734,6 +3690,10 @@ app.include_router(catalog_router, tags=["Catalog V2 (Filters/Search)"])
 # O1-O8: Include operational routers
 app.include_router(shipping_analytics_router, prefix="/api/v2/admin", tags=["Shipping Analytics"])
 app.include_router(ops_dashboard_router, prefix="/api/v2/admin", tags=["Ops Dashboard"])
+
+# O22: Data migrations (BSON dates)
+from modules.ops.migrations.migration_routes import router as migrations_router
+app.include_router(migrations_router, prefix="/api/v2/admin", tags=["Migrations"])
 app.include_router(finance_router, prefix="/api/v2/admin", tags=["Finance"])
 app.include_router(crm_router, prefix="/api/v2/admin", tags=["CRM"])
 app.include_router(crm_actions_router, prefix="/api/v2/admin", tags=["CRM Actions"])
@@ -3744,6 +3704,14 @@ app.include_router(risk_router, prefix="/api/v2/admin", tags=["Risk Score"])
 app.include_router(timeline_router, prefix="/api/v2/admin", tags=["Customer Timeline"])
 app.include_router(analytics_router, prefix="/api/v2/admin", tags=["Analytics Intelligence"])
 
+# Admin orders: keyset pages + streaming export
+from modules.orders.admin_orders_routes import router as admin_orders_router
+app.include_router(admin_orders_router, prefix="/api/v2/admin", tags=["Admin Orders"])
+
+# O21: Job runner status / history
+from modules.jobs.job_routes import router as jobs_router
+app.include_router(jobs_router, prefix="/api/v2/admin", tags=["Jobs"])
+
 # O20: Pickup Control router
 from modules.pickup_control.pickup_routes import router as pickup_control_router
 app.include_router(pickup_control_router, prefix="/api/v2/admin", tags=["Pickup Control"])
@@ -3824,10 +3792,18 @@ app.include_router(wishlist_router, tags=["Wishlist V2"])
 from modules.compare.compare_routes import router as compare_router
 app.include_router(compare_router, tags=["Compare V2"])
 
+# Catalog payload compression (innermost: sees the final JSON body)
+app.add_middleware(CompressionMiddleware)
+
 # Security Middleware (Rate Limiting, Anti-abuse)
 from modules.security.middleware import SecurityMiddleware
 app.add_middleware(SecurityMiddleware)
 
+# DB profiler (wraps rate limiting + routes) + /metrics
+from modules.ops.metrics.metrics_routes import router as metrics_router
+app.include_router(metrics_router)
+app.add_middleware(DBProfilerMiddleware)
+
 # CORS configuration - allow all origins for development
 cors_origins = os.environ.get('CORS_ORIGINS', '*')
 if cors_origins == '*':
@@ -3860,92 +3836,23 @@ async def startup_init():
     """Initialize database indexes for production-ready modules"""
     logger.info("🚀 Initializing production-ready indexes...")
     
-    # Analytics indexes
-    await db.events.create_index("event")
-    await db.events.create_index("ts")
-    await db.events.create_index("sid")
-    await db.events.create_index([("ts", -1), ("event", 1)])
-    logger.info("✅ Analytics indexes created")
-    
-    # Orders indexes - with optimistic locking support
-    await db.orders.create_index("id", unique=True)
-    await db.orders.create_index("user_id")
-    await db.orders.create_index("status")
-    await db.orders.create_index("created_at")
-    
-    # Payment events - webhook idempotency
-    await db.payment_events.create_index(
-        [("provider", 1), ("provider_event_id", 1)], 
-        unique=True
-    )
-    await db.payment_events.create_index("order_id")
-    await db.payment_events.create_index("signature_hash", unique=True, sparse=True)
-    
-    # Shipment events - TTN idempotency (Nova Poshta)
-    await db.shipment_events.create_index(
-        [("provider", 1), ("event_id", 1)],
-        unique=True
-    )
-    await db.shipment_events.create_index("order_id")
-    
-    # Idempotency keys - general API idempotency
-    await db.idempotency_keys.create_index("key_hash", unique=True)
-    await db.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
-    
-    # O2: Domain events (outbox)
-    await db.domain_events.create_index("status")
-    await db.domain_events.create_index("next_retry_at")
-    
-    # O2: Notification queue
-    await db.notification_queue.create_index("status")
-    await db.notification_queue.create_index("dedupe_key", unique=True, sparse=True)
-    
-    # O5: Finance ledger
-    await db.finance_ledger.create_index("order_id")
-    await db.finance_ledger.create_index("created_at")
-    await db.finance_ledger.create_index("type")
-    
-    # O5: Customers CRM
-    await db.customers.create_index("phone", unique=True)
-    await db.customers.create_index("segment")
-    
-    # Performance: Compound indexes for fast queries
-    await db.products.create_index([("category_id", 1), ("status", 1), ("created_at", -1)])
-    await db.products.create_index([("is_active", 1), ("price", 1)])
-    await db.products.create_index("slug")
-    await db.products.create_index("sku", sparse=True)
-    
-    await db.orders.create_index([("phone", 1), ("created_at", -1)])
-    await db.orders.create_index([("status", 1), ("payment_status", 1)])
-    await db.orders.create_index([("user_id", 1), ("status", 1)])
-    
-    # Growth: Abandoned cart indexes
-    await db.carts.create_index([("updated_at", 1), ("converted", 1)])
-    await db.carts.create_index("phone")
-    
-    # Notifications indexes
-    await db.notifications.create_index([("type", 1), ("status", 1)])
-    await db.notifications.create_index("created_at")
-    
-    logger.info("✅ Production indexes created")
-    
-    # O1+O2: Start background jobs scheduler
-    try:
-        from modules.jobs.scheduler import start_jobs_scheduler
-        start_jobs_scheduler(db)
-        logger.info("✅ Background jobs scheduler started")
-    except Exception as e:
-        logger.error(f"Failed to start jobs scheduler: {e}")
+    from core.startup import ensure_indexes, start_background_jobs
+    await ensure_indexes(db)
+
+    # Runtime config snapshots: refreshed in every worker (change stream or version poll)
+    from core.runtime_config import get_runtime_config
+    get_runtime_config(db).start()
     
-    # Start Growth Automation scheduler
-    try:
-        from modules.growth.scheduler import start_growth_scheduler
-        start_growth_scheduler(db)
-        logger.info("✅ Growth automation scheduler started")
-    except Exception as e:
-        logger.warning(f"Growth scheduler not started: {e}")
+    start_background_jobs(db)
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    from modules.jobs.job_runner import get_job_runner
+    try:
+        await get_job_runner(db).shutdown()
+    except Exception as e:
+        logger.warning(f"Job runner shutdown failed: {e}")
+    from core.runtime_config import get_runtime_config
+    await get_runtime_config(db).stop()
     client.close()
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Test CompressionMiddleware
+- large JSON under COMPRESSION_PATHS is compressed
+- every response under those paths varies on Accept-Encoding
+"""
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.compression import CompressionMiddleware
+
+BIG = {"items": [{"id": i, "title": f"Product {i}"} for i in range(200)]}
+
+
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, prefixes=["/api/v2/catalog"], minimum_size=1024)
+
+    @app.get("/api/v2/catalog/big")
+    async def big():
+        return BIG
+
+    @app.get("/api/v2/catalog/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/api/other")
+    async def other():
+        return BIG
+
+    return TestClient(app)
+
+
+class TestCompression:
+    def test_large_json_is_compressed(self):
+        r = client().get("/api/v2/catalog/big", headers={"Accept-Encoding": "gzip"})
+        assert r.headers["content-encoding"] in ("gzip", "br")
+        assert r.headers["vary"] == "Accept-Encoding"
+        assert r.json() == BIG
+
+    def test_gzip_only_client(self):
+        r = client().get("/api/v2/catalog/big", headers={"Accept-Encoding": "gzip;q=1, br;q=0"})
+        assert r.headers["content-encoding"] == "gzip"
+        assert int(r.headers["content-length"]) < len(json.dumps(BIG))
+        assert r.json() == BIG
+
+    def test_small_response_varies_uncompressed(self):
+        r = client().get("/api/v2/catalog/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in r.headers
+        assert r.headers["vary"] == "Accept-Encoding"
+
+    def test_identity_client_varies(self):
+        r = client().get("/api/v2/catalog/big", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in r.headers
+        assert r.headers["vary"] == "Accept-Encoding"
+
+    def test_other_paths_untouched(self):
+        r = client().get("/api/other", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in r.headers
+        assert "vary" not in r.headers
@@ -0,0 +1,41 @@
+"""
+Test moving embedded customers.notes to crm_notes against an in-memory MongoDB
+- id-less notes get a deterministic id: overlapping runs never duplicate them
+"""
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from modules.crm.actions.crm_actions_service import CRMActionsService, legacy_note_id  # noqa: E402
+
+PHONE = "+380671234567"
+NOTES = [
+    {"text": "Call back after 18:00", "author": "a1", "created_at": "2025-03-01T10:00:00+00:00"},
+    {"id": "n-kept", "text": "VIP", "author": "a1", "created_at": "2025-03-02T10:00:00+00:00"},
+]
+
+
+class TestMigrateEmbeddedNotes:
+    """CRMActionsService.migrate_embedded_notes"""
+
+    def test_legacy_note_id_is_stable(self):
+        assert legacy_note_id(PHONE, NOTES[0]) == legacy_note_id(PHONE, dict(NOTES[0]))
+        assert legacy_note_id(PHONE, NOTES[0]) != legacy_note_id("+380000000000", NOTES[0])
+
+    def test_overlapping_runs_do_not_duplicate_notes(self):
+        async def go():
+            db = mongomock_motor.AsyncMongoMockClient()["crm_test"]
+            await db.customers.insert_one({"phone": PHONE, "notes": [dict(n) for n in NOTES]})
+            await CRMActionsService(db).migrate_embedded_notes()
+            # A second process that read the array before the first one unset it
+            await db.customers.update_one({"phone": PHONE}, {"$set": {"notes": [dict(n) for n in NOTES]}})
+            await CRMActionsService(db).migrate_embedded_notes()
+            notes = [n async for n in db.crm_notes.find({}, {"_id": 0})]
+            customer = await db.customers.find_one({"phone": PHONE}, {"_id": 0})
+            return notes, customer
+
+        notes, customer = asyncio.run(go())
+        assert sorted(n["id"] for n in notes) == sorted([legacy_note_id(PHONE, NOTES[0]), "n-kept"])
+        assert "notes" not in customer
@@ -0,0 +1,86 @@
+"""
+Test the catalog dimension cache against an in-memory MongoDB
+- seller names are served from memory until invalidated or expired
+- category writes become visible after invalidate_categories (version bump)
+- enrich_products sets category_name / seller_name
+"""
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from core import runtime_config  # noqa: E402
+from modules.catalog.dimensions import DimensionCache, invalidate_categories  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_runtime_config(monkeypatch):
+    monkeypatch.setattr(runtime_config, "_service", None)
+
+
+def new_db():
+    return mongomock_motor.AsyncMongoMockClient()["test"]
+
+
+class TestSellerNames:
+    def test_cached_until_invalidated(self):
+        async def go():
+            db = new_db()
+            await db.users.insert_one({"id": "s1", "full_name": "Old Shop"})
+            cache = DimensionCache(db, ttl_sec=3600)
+            first = await cache.seller_names(["s1", "s2"])
+            await db.users.update_one({"id": "s1"}, {"$set": {"full_name": "New Shop"}})
+            cached = await cache.seller_names(["s1"])
+            cache.invalidate_sellers(["s1"])
+            fresh = await cache.seller_names(["s1"])
+            return first, cached, fresh
+
+        first, cached, fresh = asyncio.run(go())
+        assert first == {"s1": "Old Shop", "s2": None}
+        assert cached == {"s1": "Old Shop"}
+        assert fresh == {"s1": "New Shop"}
+
+    def test_expired_entries_are_refetched(self):
+        async def go():
+            db = new_db()
+            await db.users.insert_one({"id": "s1", "full_name": "Old Shop"})
+            cache = DimensionCache(db, ttl_sec=0)
+            await cache.seller_names(["s1"])
+            await db.users.update_one({"id": "s1"}, {"$set": {"full_name": "New Shop"}})
+            return await cache.seller_names(["s1"])
+
+        assert asyncio.run(go()) == {"s1": "New Shop"}
+
+
+class TestCategories:
+    def test_invalidate_reloads_categories(self):
+        async def go():
+            db = new_db()
+            await db.categories.insert_one({"id": "c1", "name": "Phones", "slug": "phones"})
+            cache = DimensionCache(db, ttl_sec=3600)
+            before = await cache.categories()
+            await db.categories.insert_one({"id": "c2", "name": "Cases", "slug": "cases", "parent_id": "c1"})
+            stale = await cache.categories()
+            await invalidate_categories(db)
+            after = await cache.categories()
+            return before, stale, after
+
+        before, stale, after = asyncio.run(go())
+        assert list(before.by_id) == ["c1"]
+        assert stale is before
+        assert after.resolve("cases") == "c2"
+        assert after.descendants("c1") == ["c1", "c2"]
+
+    def test_enrich_products(self):
+        async def go():
+            db = new_db()
+            await db.categories.insert_one({"id": "c1", "name": "Phones", "slug": "phones"})
+            await db.users.insert_one({"id": "s1", "full_name": "Shop"})
+            products = [{"id": "p1", "category_id": "c1", "seller_id": "s1"}, {"id": "p2"}]
+            return await DimensionCache(db, ttl_sec=3600).enrich_products(products)
+
+        assert asyncio.run(go()) == [
+            {"id": "p1", "category_id": "c1", "seller_id": "s1", "category_name": "Phones", "seller_name": "Shop"},
+            {"id": "p2"},
+        ]
@@ -0,0 +1,93 @@
+"""
+Test KPI counter writes against an in-memory MongoDB
+- creation and status transitions move counts / amounts between statuses
+- revenue follows PAID_STATUSES, `paid` follows status or payment_status
+- amounts come from totals.grand (total_amount for legacy orders)
+"""
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from modules.analytics_intel.kpi_counters import KpiCountersRepo, is_paid, order_amount  # noqa: E402
+
+DAY = "2026-10-19"
+CREATED = f"{DAY}T10:00:00+00:00"
+
+
+def order(status, **extra):
+    return {"id": "o1", "status": status, "created_at": CREATED, "total_amount": 100.0, **extra}
+
+
+def run(*steps):
+    """Apply (method, args) steps; returns the day's KpiTotals"""
+    async def go():
+        repo = KpiCountersRepo(mongomock_motor.AsyncMongoMockClient()["kpi_test"])
+        for method, args in steps:
+            await getattr(repo, method)(*args)
+        return await repo.totals(DAY, DAY)
+    return asyncio.run(go())
+
+
+class TestHelpers:
+    def test_order_amount_prefers_totals_grand(self):
+        assert order_amount({"totals": {"grand": 120.5}, "total_amount": 100}) == 120.5
+        assert order_amount({"total_amount": 100}) == 100.0
+        assert order_amount({}) == 0.0
+
+    def test_is_paid_spellings(self):
+        assert is_paid({"status": "paid"})
+        assert is_paid({"status": "AWAITING_PAYMENT", "payment_status": "completed"})
+        assert is_paid({"status": "shipped"})
+        assert not is_paid({"status": "pending", "payment_status": "pending"})
+
+
+class TestTransitions:
+    """KpiCountersRepo.on_created / on_transition"""
+
+    def test_created_then_paid(self):
+        kpi = run(
+            ("on_created", (order("AWAITING_PAYMENT"),)),
+            ("on_transition", (order("PAID"), "AWAITING_PAYMENT")),
+        )
+        assert kpi.orders == 1
+        assert kpi.count("AWAITING_PAYMENT") == 0
+        assert kpi.count("PAID") == 1
+        assert kpi.revenue == 100.0
+        assert kpi.paid == 1
+
+    def test_lower_case_statuses_are_normalized(self):
+        kpi = run(
+            ("on_created", (order("pending"),)),
+            ("on_transition", (order("processing"), "pending")),
+        )
+        assert kpi.count("AWAITING_PAYMENT") == 0
+        assert kpi.count("PROCESSING") == 1
+        assert (kpi.revenue, kpi.paid) == (100.0, 1)
+
+    def test_payment_status_change_counts_as_paid(self):
+        before = order("confirmed", payment_status="pending")
+        kpi = run(
+            ("on_created", (before,)),
+            ("on_transition", (order("confirmed", payment_status="completed"), "confirmed", before)),
+        )
+        # Same status: only the paid count moves
+        assert kpi.count("CONFIRMED") == 1
+        assert (kpi.revenue, kpi.paid) == (0.0, 1)
+
+    def test_same_status_without_payment_change_is_a_no_op(self):
+        kpi = run(
+            ("on_created", (order("PAID"),)),
+            ("on_transition", (order("paid"), "PAID")),
+        )
+        assert (kpi.count("PAID"), kpi.revenue, kpi.paid) == (1, 100.0, 1)
+
+    def test_cancel_after_payment_reverses_revenue_and_paid(self):
+        kpi = run(
+            ("on_created", (order("PAID", totals={"grand": 80.0}),)),
+            ("on_transition", (order("CANCELED", totals={"grand": 80.0}), "PAID")),
+        )
+        assert kpi.count("PAID") == 0
+        assert kpi.by_status["CANCELED"]["amount"] == 80.0
+        assert (kpi.revenue, kpi.paid) == (0.0, 0)
@@ -0,0 +1,37 @@
+"""
+Test GET /metrics access
+- off (404) without METRICS_TOKEN, 401 without the bearer token
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.config import settings
+from modules.ops.metrics import metrics_routes
+
+
+def client():
+    app = FastAPI()
+    app.include_router(metrics_routes.router)
+    return TestClient(app)
+
+
+class TestMetricsAccess:
+    def test_disabled_without_token(self, monkeypatch):
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+        assert client().get("/metrics").status_code == 404
+
+    def test_requires_bearer_token(self, monkeypatch):
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+        assert client().get("/metrics").status_code == 401
+        assert client().get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+    def test_serves_metrics_with_token(self, monkeypatch):
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+
+        async def no_inbox(db=None):
+            return ""
+
+        monkeypatch.setattr("modules.payments.webhook_inbox.render_inbox_metrics", no_inbox)
+        response = client().get("/metrics", headers={"Authorization": "Bearer s3cret"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
@@ -0,0 +1,101 @@
+"""
+Test batched notification dispatch with the fake providers
+- SMS messages are grouped by text and split into batch_size requests
+- results stay in message order; a failed request fails only its messages
+- ProviderLimits caps concurrent upstream requests
+- process_queue_once marks sent and failed queue items in one pass
+"""
+import asyncio
+
+import pytest
+
+from modules.notifications.providers.base import BatchProvider, ProviderLimits
+from modules.notifications.providers.fake import FakeProvider
+
+
+class FailingTextProvider(FakeProvider):
+    """Fake SMS provider whose requests for one text raise"""
+
+    async def _send_chunk(self, chunk):
+        if chunk[0]["text"] == "boom":
+            self.requests += 1
+            raise RuntimeError("UPSTREAM_DOWN")
+        return await super()._send_chunk(chunk)
+
+
+class ConcurrencyProbe(BatchProvider):
+    batch_size = 1
+
+    def __init__(self, limits):
+        super().__init__(limits)
+        self.active = 0
+        self.peak = 0
+
+    async def _send_chunk(self, chunk):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return [{"to": m["to"]} for m in chunk]
+
+
+class TestBatchProvider:
+    def test_groups_by_text_and_chunks(self):
+        sms = FakeProvider("SMS", latency_ms=0, batch_size=2)
+        messages = [{"to": f"+38050000000{i}", "text": "a" if i % 2 else "b"} for i in range(6)]
+
+        results = asyncio.run(sms.send_batch(messages))
+
+        assert [r["to"] for r in results] == [m["to"] for m in messages]
+        # 3 x "a" and 3 x "b", two per request
+        assert sms.requests == 4
+
+    def test_failed_request_fails_only_its_messages(self):
+        sms = FailingTextProvider("SMS", latency_ms=0, batch_size=10)
+        messages = [
+            {"to": "+380500000001", "text": "ok"},
+            {"to": "+380500000002", "text": "boom"},
+            {"to": "+380500000003", "text": "ok"},
+        ]
+
+        results = asyncio.run(sms.send_batch(messages))
+
+        assert isinstance(results[1], RuntimeError)
+        assert [r["to"] for r in (results[0], results[2])] == ["+380500000001", "+380500000003"]
+        assert [m["to"] for m in sms.sent] == ["+380500000001", "+380500000003"]
+
+    def test_limits_cap_concurrency(self):
+        async def go():
+            probe = ConcurrencyProbe(ProviderLimits(concurrency=3))
+            await probe.send_batch([{"to": str(i)} for i in range(12)])
+            return probe.peak
+
+        assert asyncio.run(go()) == 3
+
+
+class TestProcessQueue:
+    def test_marks_sent_and_failed(self, monkeypatch):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from modules.notifications import notifications_service
+
+        sms = FailingTextProvider("SMS", latency_ms=0, batch_size=10)
+        email = FakeProvider("EMAIL", latency_ms=0, batch_size=10)
+        monkeypatch.setattr(notifications_service, "_providers", (sms, email))
+
+        async def go():
+            db = mongomock_motor.AsyncMongoMockClient()["test"]
+            svc = notifications_service.NotificationsService(db)
+            await svc.repo.enqueue("SMS", "+380500000001", "MANUAL", {"text": "hello"})
+            await svc.repo.enqueue("SMS", "+380500000002", "MANUAL", {"text": "boom"})
+            await svc.repo.enqueue("EMAIL", "a@example.com", "MANUAL", {"text": "hello"})
+            res = await svc.process_queue_once()
+            docs = {d["to"]: d async for d in svc.repo.col.find({}, {"_id": 0})}
+            return res, docs
+
+        res, docs = asyncio.run(go())
+        assert res == {"processed": 2, "failed": 1}
+        assert docs["+380500000001"]["status"] == "SENT"
+        assert docs["a@example.com"]["status"] == "SENT"
+        assert docs["+380500000002"]["status"] == "FAILED"
+        assert docs["+380500000002"]["attempts"] == 1
+        assert sms.requests == 2 and email.requests == 1
@@ -0,0 +1,71 @@
+"""
+Test outbox claims and handler idempotency against an in-memory MongoDB
+- orders blocked by a failed event do not stall dispatch
+- finance_ship_cost / crm_delivered replays are no-ops
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from modules.finance.finance_repo import FinanceRepo  # noqa: E402
+from modules.ops.events.events_repo import EventsRepo  # noqa: E402
+from modules.ops.events.outbox_handlers import crm_delivered, finance_ship_cost  # noqa: E402
+
+
+def iso(seconds: int) -> str:
+    return (datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+def new_db():
+    return mongomock_motor.AsyncMongoMockClient()["outbox_test"]
+
+
+class TestClaimBatch:
+    """EventsRepo.claim_batch"""
+
+    def test_blocked_order_does_not_stall_dispatch(self):
+        async def go():
+            db = new_db()
+            later = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+            events = [{"id": "f", "order_id": "o1", "status": "FAILED", "attempts": 1,
+                       "next_retry_at": later, "created_at": iso(0)}]
+            events += [{"id": f"n{i}", "order_id": "o1", "status": "NEW", "created_at": iso(1 + i)} for i in range(4)]
+            events.append({"id": "other", "order_id": "o2", "status": "NEW", "created_at": iso(100)})
+            await db.domain_events.insert_many(events)
+            return await EventsRepo(db).claim_batch("test", limit=2)
+
+        claimed = asyncio.run(go())
+        assert [e["id"] for e in claimed] == ["other"]
+
+
+class TestHandlerIdempotency:
+    """Outbox handlers replayed with the same event"""
+
+    def test_finance_ship_cost_once_per_event(self):
+        async def go():
+            db = new_db()
+            await FinanceRepo(db).ensure_indexes()
+            event = {"id": "ev1", "type": "TTN_CREATED", "order_id": "o1", "payload": {"cost": 70, "ttn": "204"}}
+            await finance_ship_cost(db, event, None)
+            await finance_ship_cost(db, event, None)
+            await finance_ship_cost(db, {**event, "id": "ev2"}, None)
+            return await db.finance_ledger.count_documents({"order_id": "o1", "type": "SHIP_COST_OUT"})
+
+        assert asyncio.run(go()) == 2
+
+    def test_crm_delivered_once_per_event(self):
+        async def go():
+            db = new_db()
+            await db.customers.insert_one({"phone": "+380500000000", "delivered_count": 0})
+            event = {"id": "ev1", "type": "ORDER_DELIVERED", "order_id": "o1", "payload": {"phone": "+380500000000"}}
+            await crm_delivered(db, event, None)
+            await crm_delivered(db, event, None)
+            await crm_delivered(db, {**event, "id": "ev2"}, None)
+            return await db.customers.find_one({"phone": "+380500000000"})
+
+        customer = asyncio.run(go())
+        assert customer["delivered_count"] == 2
+        assert customer["delivered_events"] == ["ev1", "ev2"]
@@ -0,0 +1,42 @@
+"""
+Test ReturnPolicyEngine customer decisions against an in-memory MongoDB
+- flagged phones with a customer record get queued decisions
+- flagged phones with no customer record are skipped (no orphaned decisions)
+"""
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from modules.returns.policy_engine import ReturnPolicyEngine  # noqa: E402
+
+KNOWN = "+380501112233"
+UNKNOWN = "+380679998877"
+
+
+class FixedMetricsEngine(ReturnPolicyEngine):
+    """Engine with canned window metrics (mongomock has no $toDate)"""
+
+    async def _window_metrics(self):
+        metrics = {"cod_refusals_30d": 2, "returns_60d": 0}
+        return {KNOWN: dict(metrics), UNKNOWN: dict(metrics)}, {}
+
+
+class TestPolicyEngineCustomers:
+    def test_skips_phones_without_customer(self):
+        async def go():
+            db = mongomock_motor.AsyncMongoMockClient()["test"]
+            await db.customers.insert_one({"phone": KNOWN, "segment": "REGULAR"})
+
+            res = await FixedMetricsEngine(db).run_once()
+            queued = [x async for x in db.policy_actions_queue.find({}, {"_id": 0})]
+            events = [x async for x in db.policy_events.find({}, {"_id": 0})]
+            return res, queued, events, await db.customers.count_documents({})
+
+        res, queued, events, customers = asyncio.run(go())
+        assert res["proposed"] == 1
+        assert res["approvals_enqueued"] == 1
+        assert [q["decision"]["target_id"] for q in queued] == [KNOWN]
+        assert all(UNKNOWN not in e["dedupe_key"] for e in events)
+        assert customers == 1
@@ -0,0 +1,71 @@
+"""
+Test ProductPerformanceEngine ranking and table swap against an in-memory MongoDB
+- only published products are ranked, no unranked filler
+- a refresh replaces the previous run's rows
+"""
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from modules.analytics_intel.product_performance import ProductPerformanceEngine  # noqa: E402
+
+
+class Engine(ProductPerformanceEngine):
+    """Sales come from `sold` instead of the orders aggregation"""
+
+    def __init__(self, db, sold):
+        super().__init__(db)
+        self.sold = sold
+
+    async def _sync_sales(self, window_from):
+        pass
+
+    async def _sales_by_product(self, window_from):
+        return self.sold
+
+
+def new_db():
+    return mongomock_motor.AsyncMongoMockClient()["perf_test"]
+
+
+class TestRefresh:
+    """ProductPerformanceEngine.refresh / get"""
+
+    def test_ranks_published_products_only(self):
+        async def go():
+            db = new_db()
+            await db.products.insert_many([
+                {"id": "a", "title": "A", "status": "published"},
+                {"id": "b", "title": "B", "status": "draft"},
+                {"id": "c", "title": "C", "status": "published"},
+                {"id": "idle", "title": "Idle", "status": "published"},
+            ])
+            sold = {"a": {"sold": 1, "revenue": 10}, "b": {"sold": 9, "revenue": 900},
+                    "gone": {"sold": 5, "revenue": 500}, "c": {"sold": 2, "revenue": 20}}
+            return await Engine(db, sold).get(days=30, top_k=3)
+
+        rows = asyncio.run(go())
+        assert [r["product_id"] for r in rows] == ["c", "a"]
+        assert rows[0]["revenue"] == 20
+
+    def test_refresh_replaces_previous_run(self):
+        async def go():
+            db = new_db()
+            await db.products.insert_many([
+                {"id": "a", "title": "A", "status": "published"},
+                {"id": "c", "title": "C", "status": "published"},
+            ])
+            engine = Engine(db, {"a": {"sold": 1, "revenue": 10}})
+            first = await engine.refresh(days=30)
+            engine.sold = {"c": {"sold": 1, "revenue": 5}}
+            second = await engine.refresh(days=30)
+            rows = await engine.get(days=30)
+            run_ids = {r["run_id"] async for r in db.product_performance.find({"days": 30})}
+            return first, second, rows, run_ids
+
+        first, second, rows, run_ids = asyncio.run(go())
+        assert second["run_id"] > first["run_id"]
+        assert run_ids == {second["run_id"]}
+        assert [r["product_id"] for r in rows] == ["c"]
@@ -0,0 +1,108 @@
+"""
+Test DocumentShape / trusted_response
+- stored product documents render byte-for-byte like the response_model path
+  (ints in float fields, ISO date strings, native datetimes, missing defaults)
+- fields outside the model are dropped
+"""
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.models import Product as CatalogProduct
+from core.responses import DocumentShape, FastJSONResponse, trusted_response
+from modules.products.models import Product, ProductListResponse
+
+PRODUCTS = [
+    {
+        "id": "p1",
+        "seller_id": "s1",
+        "title": "Phone",
+        "slug": "phone",
+        "description": "",
+        "category_id": "c1",
+        "price": 100,
+        "compare_price": 120,
+        "images": ["a.jpg"],
+        "rating": 4,
+        "created_at": "2026-10-01T10:00:00+00:00",
+        "updated_at": "2026-10-02T11:30:00.123456+00:00",
+        "internal_notes": "not in the model",
+    },
+    {
+        "id": "p2",
+        "seller_id": "s1",
+        "title": "Case",
+        "slug": "case",
+        "description": "Silicone",
+        "category_id": "c1",
+        "price": 9.99,
+        "compare_price": None,
+        "specifications": [{"k": "color", "v": "black"}],
+        "created_at": datetime(2026, 10, 3, 8, 0, tzinfo=timezone.utc),
+        "updated_at": datetime(2026, 10, 3, 8, 0, 5, 250000, tzinfo=timezone.utc),
+    },
+    {
+        "id": "p3",
+        "seller_id": "s2",
+        "title": "Cable",
+        "slug": "cable",
+        "description": "USB-C",
+        "category_id": "c2",
+        "price": 5,
+        "status": "draft",
+        "created_at": "2026-10-04T09:15:00",
+        "updated_at": "2026-10-04T09:15:00+02:00",
+    },
+]
+
+# modules/products.Product keeps specifications as a dict
+LEGACY_PRODUCTS = [dict(p, specifications={"color": "black"}) if "specifications" in p else p for p in PRODUCTS]
+
+
+def client():
+    app = FastAPI(default_response_class=FastJSONResponse)
+    catalog_shape = DocumentShape(CatalogProduct)
+    product_shape = DocumentShape(Product)
+
+    @app.get("/old/catalog", response_model=List[CatalogProduct])
+    async def old_catalog():
+        return PRODUCTS
+
+    @app.get("/new/catalog", response_model=List[CatalogProduct])
+    async def new_catalog():
+        return trusted_response(catalog_shape.many(PRODUCTS))
+
+    @app.get("/old/products", response_model=ProductListResponse)
+    async def old_products():
+        return {"items": LEGACY_PRODUCTS, "total": 3, "page": 1, "pages": 1}
+
+    @app.get("/new/products", response_model=ProductListResponse)
+    async def new_products():
+        return trusted_response({
+            "items": product_shape.many(LEGACY_PRODUCTS), "total": 3, "page": 1, "pages": 1
+        })
+
+    return TestClient(app)
+
+
+class TestTrustedResponse:
+    def test_catalog_list_matches_response_model(self):
+        c = client()
+        old, new = c.get("/old/catalog"), c.get("/new/catalog")
+        assert old.status_code == new.status_code == 200
+        assert new.content == old.content
+
+    def test_product_list_matches_response_model(self):
+        c = client()
+        old, new = c.get("/old/products"), c.get("/new/products")
+        assert old.status_code == new.status_code == 200
+        assert new.content == old.content
+
+    def test_shape_coerces_and_drops_unknown_fields(self):
+        doc = DocumentShape(CatalogProduct)(PRODUCTS[0])
+        assert "internal_notes" not in doc
+        assert doc["price"] == 100.0 and isinstance(doc["price"], float)
+        assert doc["created_at"] == "2026-10-01T10:00:00Z"
+        assert doc["currency"] == "USD"
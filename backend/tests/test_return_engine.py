@@ -0,0 +1,115 @@
+"""
+Test ReturnEngine side effects against an in-memory MongoDB
+- a detected return moves the order through order_hooks (KPI counters)
+- replays of the same (ttn, stage, reason) are no-ops
+- a failed ledger bulk write leaves no marker, so the next cycle redoes it
+"""
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from modules.returns.return_engine import ReturnEngine  # noqa: E402
+
+TTN = "20450000000001"
+PHONE = "+380501112233"
+
+
+class FailingCollection:
+    """Delegates to the collection; bulk_write raises"""
+
+    def __init__(self, col):
+        self.col = col
+
+    async def bulk_write(self, *args, **kwargs):
+        raise RuntimeError("primary stepped down")
+
+    def __getattr__(self, name):
+        return getattr(self.col, name)
+
+
+class FlakyDB:
+    """Database whose `failing` collections reject bulk writes"""
+
+    def __init__(self, db, failing=()):
+        self.db = db
+        self.failing = set(failing)
+
+    def __getitem__(self, name):
+        col = self.db[name]
+        return FailingCollection(col) if name in self.failing else col
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+def shipped_order():
+    return {
+        "id": "o1",
+        "status": "SHIPPED",
+        "created_at": "2026-10-01T10:00:00+00:00",
+        "total_amount": 500.0,
+        "payment_method": "cod",
+        "shipping": {"phone": PHONE},
+        "shipment": {"ttn": TTN, "cost": 80, "status_text": "Відмова від отримання"},
+    }
+
+
+async def snapshot(db):
+    order = await db.orders.find_one({"id": "o1"}, {"_id": 0})
+    customer = await db.customers.find_one({"phone": PHONE}, {"_id": 0}) or {}
+    return {
+        "status": order["status"],
+        "stage": (order.get("returns") or {}).get("stage"),
+        "markers": await db.return_events.count_documents({}),
+        "ledger": await db.finance_ledger.count_documents({"order_id": "o1"}),
+        "returns_total": (customer.get("counters") or {}).get("returns_total", 0),
+        "timeline": await db.timeline_events.count_documents({"phone": PHONE}),
+        "kpi": await db.kpi_counters.find_one({"day": "2026-10-01"}, {"_id": 0}),
+    }
+
+
+def new_db():
+    return mongomock_motor.AsyncMongoMockClient()["returns_test"]
+
+
+class TestReturnEngine:
+    """ReturnEngine.run_once / process_single_ttn"""
+
+    def test_detected_return_applies_once(self):
+        async def go():
+            db = new_db()
+            await db.orders.insert_one(shipped_order())
+            first = await ReturnEngine(db).run_once()
+            after_first = await snapshot(db)
+            # Manual replay of the same TTN: the marker skips every side effect
+            await ReturnEngine(db).process_single_ttn(TTN)
+            return first, after_first, await snapshot(db)
+
+        first, after_first, after_replay = asyncio.run(go())
+        assert (first["detected"], first["updated"]) == (1, 1)
+        assert after_first["status"] == "RETURNING"
+        assert after_first["stage"] == "RETURNING"
+        assert (after_first["markers"], after_first["returns_total"], after_first["timeline"]) == (1, 1, 1)
+        # SHIP_COST_OUT + RETURN_COST_OUT + SALE_LOST (COD)
+        assert after_first["ledger"] == 3
+        # Status transition went through order_hooks
+        assert after_first["kpi"]["status"]["RETURNING"]["n"] == 1
+        assert after_first["kpi"]["status"]["SHIPPED"]["n"] == -1
+        assert after_replay == after_first
+
+    def test_failed_bulk_write_is_redone_next_cycle(self):
+        async def go():
+            db = new_db()
+            await db.orders.insert_one(shipped_order())
+            await ReturnEngine(FlakyDB(db, failing={"finance_ledger"})).run_once()
+            after_failure = await snapshot(db)
+            await ReturnEngine(db).run_once()
+            return after_failure, await snapshot(db)
+
+        after_failure, after_retry = asyncio.run(go())
+        assert after_failure["status"] == "SHIPPED"
+        assert (after_failure["markers"], after_failure["ledger"], after_failure["returns_total"]) == (0, 0, 0)
+        assert after_retry["status"] == "RETURNING"
+        assert (after_retry["markers"], after_retry["ledger"], after_retry["returns_total"]) == (1, 3, 1)
@@ -0,0 +1,101 @@
+"""
+Test SearchService ElasticSearch path with a stubbed client
+- total / total_exact from hits.total
+- next_cursor from the last hit's sort values, sent back as search_after
+- ES errors fall back to MongoDB
+"""
+import asyncio
+
+import pytest
+
+from modules.search.service import SearchService, decode_es_cursor
+
+
+class StubES:
+    """Records search() kwargs and returns canned responses"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    async def search(self, **kwargs):
+        self.calls.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def es_response(ids, total=50, relation="eq", aggs=True):
+    out = {
+        "hits": {
+            "total": {"value": total, "relation": relation},
+            "hits": [
+                {"_id": i, "_score": 1.0, "_source": {"id": i, "title": f"Product {i}"},
+                 "sort": [1.0, i]}
+                for i in ids
+            ],
+        }
+    }
+    if aggs:
+        out["aggregations"] = {
+            "categories": {"buckets": []},
+            "brands": {"buckets": []},
+            "price_stats": {"count": 0},
+        }
+    return out
+
+
+def make_service(es):
+    service = SearchService(db=None)
+    service.es_client = es
+    return service
+
+
+class TestElasticSearchPath:
+    """SearchService._es_search"""
+
+    def test_first_page_totals_and_cursor(self):
+        es = StubES(es_response(["a", "b"], total=10000, relation="gte"))
+        result = asyncio.run(make_service(es).search_products("phone", limit=2))
+
+        assert [p["id"] for p in result["products"]] == ["a", "b"]
+        assert result["total"] == 10000
+        assert result["total_exact"] is False
+        assert result["page"] == 1
+        assert "aggregations" in result
+        assert decode_es_cursor(result["next_cursor"], "relevance") == [1.0, "b"]
+        assert es.calls[0]["from_"] == 0
+        assert "search_after" not in es.calls[0]
+
+    def test_cursor_page_uses_search_after(self):
+        es = StubES(es_response(["a", "b"]), es_response(["c"], aggs=False))
+        service = make_service(es)
+        first = asyncio.run(service.search_products("phone", limit=2))
+        second = asyncio.run(service.search_products("phone", limit=2, cursor=first["next_cursor"]))
+
+        assert es.calls[1]["search_after"] == [1.0, "b"]
+        assert "from_" not in es.calls[1]
+        assert "aggs" not in es.calls[1]
+        assert [p["id"] for p in second["products"]] == ["c"]
+        assert second["total_exact"] is True
+        # Short page: nothing after it
+        assert second["next_cursor"] is None
+
+    def test_cursor_sort_mismatch(self):
+        es = StubES(es_response(["a", "b"]))
+        service = make_service(es)
+        first = asyncio.run(service.search_products("phone", limit=2))
+        with pytest.raises(ValueError, match="CURSOR_SORT_MISMATCH"):
+            asyncio.run(service.search_products("phone", sort_by="price_asc", limit=2, cursor=first["next_cursor"]))
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError, match="INVALID_CURSOR"):
+            asyncio.run(make_service(StubES()).search_products("phone", cursor="not-a-cursor"))
+
+    def test_es_error_falls_back_to_mongo(self):
+        es = StubES(RuntimeError("cluster down"))
+        result = asyncio.run(make_service(es).search_products("phone"))
+        # db=None: the MongoDB fallback's empty result
+        assert result["products"] == []
+        assert result["total"] == 0
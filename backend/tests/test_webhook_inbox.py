@@ -0,0 +1,142 @@
+"""
+Test the payment webhook inbox consumer against an in-memory MongoDB
+- per-order sequencing, release of later events after a failure
+- RETRY with backoff, DEAD after MAX_ATTEMPTS
+- orders blocked by a retrying event do not stall the others
+- ISO string and BSON date created_at values side by side
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from modules.payments.webhook_inbox import MAX_ATTEMPTS, WebhookInboxConsumer  # noqa: E402
+
+
+def at(seconds: int) -> datetime:
+    return datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+
+
+def event(id_, order_id, created_at, status="QUEUED", **extra):
+    return {"id": id_, "kind": "test", "order_id": order_id, "status": status,
+            "attempts": 0, "created_at": created_at, **extra}
+
+
+class Recorder:
+    """Inbox handler recording calls; raises for the ids in `fail`"""
+
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    async def __call__(self, db, ev, order):
+        self.calls.append(ev["id"])
+        if ev["id"] in self.fail:
+            raise RuntimeError("boom")
+        return {"handled": True}
+
+
+def run(events, handler, **consumer_kwargs):
+    async def go():
+        db = mongomock_motor.AsyncMongoMockClient()["inbox_test"]
+        if events:
+            await db.payment_events.insert_many([dict(e) for e in events])
+        consumer = WebhookInboxConsumer(db, **consumer_kwargs)
+        consumer.register("test", handler)
+        stats = await consumer.run_once()
+        docs = {d["id"]: d async for d in db.payment_events.find({}, {"_id": 0})}
+        return consumer, stats, docs
+    return asyncio.run(go())
+
+
+class TestInboxConsumer:
+    """WebhookInboxConsumer.run_once"""
+
+    def test_events_of_an_order_apply_in_arrival_order(self):
+        handler = Recorder()
+        _, stats, docs = run([
+            event("e2", "o1", at(2)),
+            event("e1", "o1", at(1)),
+            event("e3", "o1", at(3)),
+        ], handler)
+        assert handler.calls == ["e1", "e2", "e3"]
+        assert stats["processed"] == 3
+        assert {d["status"] for d in docs.values()} == {"PROCESSED"}
+
+    def test_mixed_string_and_date_created_at(self):
+        handler = Recorder()
+        _, stats, docs = run([
+            event("e1", "o1", at(1).isoformat()),
+            event("e2", "o1", at(2)),
+        ], handler)
+        assert handler.calls == ["e1", "e2"]
+        assert stats["processed"] == 2
+
+    def test_failure_releases_later_events_of_the_order(self):
+        handler = Recorder(fail={"e1"})
+        _, stats, docs = run([
+            event("e1", "o1", at(1)),
+            event("e2", "o1", at(2)),
+            event("e3", "o2", at(3)),
+        ], handler)
+        assert "e2" not in handler.calls
+        assert (stats["processed"], stats["retry"], stats["released"]) == (1, 1, 1)
+        assert docs["e1"]["status"] == "RETRY"
+        assert docs["e1"]["attempts"] == 1
+        assert docs["e1"]["next_retry_at"] is not None
+        assert docs["e2"]["status"] == "QUEUED"
+        assert "claim_token" not in docs["e2"]
+        assert docs["e3"]["status"] == "PROCESSED"
+
+    def test_retry_is_claimed_again_when_due(self):
+        handler = Recorder()
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        _, stats, docs = run([
+            event("e1", "o1", at(1), status="RETRY", attempts=2, next_retry_at=past.isoformat()),
+        ], handler)
+        assert handler.calls == ["e1"]
+        assert docs["e1"]["status"] == "PROCESSED"
+
+    def test_dead_after_max_attempts(self):
+        handler = Recorder(fail={"e1"})
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+        _, stats, docs = run([
+            event("e1", "o1", at(1), status="RETRY", attempts=MAX_ATTEMPTS - 1, next_retry_at=past),
+        ], handler)
+        assert docs["e1"]["status"] == "DEAD"
+        assert docs["e1"]["attempts"] == MAX_ATTEMPTS
+        assert docs["e1"]["next_retry_at"] is None
+
+    def test_blocked_order_does_not_stall_others(self):
+        handler = Recorder()
+        future = datetime.now(timezone.utc) + timedelta(hours=1)
+        events = [event("r", "o1", at(0), status="RETRY", attempts=1, next_retry_at=future)]
+        # A full claim page of o1 events queued behind the retrying one
+        events += [event(f"q{i}", "o1", at(1 + i)) for i in range(4)]
+        events.append(event("other", "o2", at(100)))
+        _, stats, docs = run(events, handler, batch_size=2)
+        assert handler.calls == ["other"]
+        assert docs["other"]["status"] == "PROCESSED"
+        assert all(docs[f"q{i}"]["status"] == "QUEUED" for i in range(4))
+        assert docs["r"]["status"] == "RETRY"
+
+    def test_later_event_sees_the_order_as_updated_by_the_earlier_one(self):
+        seen = []
+
+        async def pay(db, ev, order):
+            seen.append((ev["id"], order["status"]))
+            await db.orders.update_one({"id": ev["order_id"]}, {"$set": {"status": "PAID"}})
+            return {}
+
+        async def go():
+            db = mongomock_motor.AsyncMongoMockClient()["inbox_test"]
+            await db.orders.insert_one({"id": "o1", "status": "AWAITING_PAYMENT"})
+            await db.payment_events.insert_many([event("e1", "o1", at(1)), event("e2", "o1", at(2))])
+            consumer = WebhookInboxConsumer(db)
+            consumer.register("test", pay)
+            await consumer.run_once()
+
+        asyncio.run(go())
+        assert seen == [("e1", "AWAITING_PAYMENT"), ("e2", "PAID")]
@@ -7,6 +7,8 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 
+from modules.catalog.catalog_query import catalog_keys
+
 load_dotenv(Path(__file__).parent / '.env')
 
 # Brand mapping based on product title keywords
@@ -55,7 +57,10 @@ async def update_brands():
     db = client[db_name]
     
     # Get all products
-    products = await db.products.find({}, {"_id": 1, "id": 1, "title": 1, "brand": 1}).to_list(1000)
+    products = await db.products.find(
+        {},
+        {"_id": 1, "id": 1, "title": 1, "brand": 1, "category_name": 1, "category_slug": 1, "category_id": 1}
+    ).to_list(1000)
     
     updated = 0
     for p in products:
@@ -70,7 +75,7 @@ async def update_brands():
         
         await db.products.update_one(
             {"_id": p["_id"]},
-            {"$set": {"brand": new_brand}}
+            {"$set": {"brand": new_brand, **catalog_keys({**p, "brand": new_brand})}}
         )
         updated += 1
         print(f"Updated: {title[:40]} -> {new_brand}")